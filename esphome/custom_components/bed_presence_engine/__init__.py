@@ -19,3 +19,4 @@ BedPresenceEngine = bed_presence_engine_ns.class_(
     cg.Component,
     binary_sensor.BinarySensor
 )
+PresenceZone = bed_presence_engine_ns.class_("PresenceZone", binary_sensor.BinarySensor)
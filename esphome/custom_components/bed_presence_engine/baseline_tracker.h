@@ -0,0 +1,177 @@
+#pragma once
+
+#include "esphome/core/preferences.h"
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+// Baseline of the last calibration (or reset), persisted so drift is measured against it across reboots
+struct PersistedDriftReference {
+  float mu;
+  float sigma;
+};
+
+/**
+ * Background tracking of the empty-bed still energy baseline.
+ *
+ * Seasonal HVAC, a moved nightstand or a re-seated sensor shift the empty
+ * bed's energy over weeks; with μ/σ fixed until the next calibration that
+ * shows up as slowly growing false occupancy. The engine feeds this tracker
+ * the frames it is confident are empty (all frames once it has been IDLE
+ * for a while, with no cut at the off threshold, which would bias the
+ * estimate low), and the tracker keeps an exponentially weighted estimate:
+ *
+ *   x  = energy winsorized to μ̂ ± 3σ̂
+ *   μ̂ += α·(x − μ̂)
+ *   d̂ += α·(|x − μ̂| − d̂),   σ̂ = 1.2533·d̂   (mean absolute deviation → σ for Gaussian data)
+ *
+ * with α = Δt / time_constant, so the weighting is in time rather than frames.
+ * The LD2410 only publishes readings that change, so each reading is weighted
+ * by how long it stood (up to the next reading, or up to step() while it still
+ * stands); held frames add no samples of their own. The engine calls
+ * interrupt() as soon as a frame does not qualify, which drops the time since
+ * the last reading. Winsorizing keeps one loud frame from moving the
+ * estimate more than a 3σ frame would. Each step is O(1) with no history.
+ *
+ * The engine's μ/σ follow the estimate in steps of at most
+ * max_drift_per_day / STEPS_PER_DAY, at most once per STEP_INTERVAL_MS, so no
+ * 24 hours can move either by more than max_drift_per_day (energy %), however
+ * wrong the frames fed in are. Drift is reported against the reference: the
+ * baseline of the last calibration or reset.
+ */
+class BaselineTracker {
+ public:
+  static constexpr uint32_t STEP_INTERVAL_MS = 60000;
+  static constexpr uint32_t STEPS_PER_DAY = 86400000 / STEP_INTERVAL_MS;
+  static constexpr float WINSOR_SIGMAS = 3.0f;
+  static constexpr float MIN_SIGMA = 0.1f;
+  static constexpr uint32_t PERSISTED_VERSION = 1;
+
+  void set_time_constant_ms(uint32_t ms) { this->time_constant_ms_ = ms > 0 ? ms : 1; }
+  void set_max_drift_per_day(float drift) { this->max_drift_per_day_ = drift; }
+  uint32_t get_time_constant_ms() const { return this->time_constant_ms_; }
+  float get_max_drift_per_day() const { return this->max_drift_per_day_; }
+  float get_reference_mu() const { return this->reference_.mu; }
+  float get_reference_sigma() const { return this->reference_.sigma; }
+  float estimated_mu() const { return this->mu_; }
+  float estimated_sigma() const { return 1.2533f * this->deviation_; }
+
+  // A new calibrated (or reset) baseline: drift restarts from zero and the estimate from the baseline
+  void set_reference(float mu, float sigma) {
+    this->reference_.mu = mu;
+    this->reference_.sigma = sigma;
+    this->seed(mu, sigma);
+  }
+
+  // Start the estimate from the engine's current baseline without touching the reference
+  void seed(float mu, float sigma) {
+    this->mu_ = mu;
+    this->deviation_ = sigma / 1.2533f;
+    this->last_sample_time_ = 0;
+    this->has_sample_ = false;
+    this->has_estimate_ = false;
+  }
+
+  // A new reading the engine is confident comes from an empty bed; the previous one is weighted by how long it stood
+  void add(float energy, uint32_t now) {
+    if (this->has_sample_)
+      this->integrate(this->last_energy_, now - this->last_sample_time_);
+    this->has_sample_ = !std::isnan(energy);
+    this->has_estimate_ = this->has_estimate_ || this->has_sample_;
+    this->last_energy_ = energy;
+    this->last_sample_time_ = now;
+  }
+
+  // The bed is no longer known to be empty: the pending reading is dropped, the estimate kept
+  void interrupt() { this->has_sample_ = false; }
+  // A qualifying reading is standing (and counting) since the last add()
+  bool has_reading() const { return this->has_sample_; }
+
+  // Bring the estimate up to now, then move *mu/*sigma toward it within the per-step budget; true if either changed
+  bool step(uint32_t now, float *mu, float *sigma) {
+    if (this->has_sample_) {
+      this->integrate(this->last_energy_, now - this->last_sample_time_);
+      this->last_sample_time_ = now;
+    }
+    if (this->has_stepped_ && now - this->last_step_time_ < STEP_INTERVAL_MS)
+      return false;
+    this->has_stepped_ = true;
+    this->last_step_time_ = now;
+    if (!this->has_estimate_)
+      return false;
+    float budget = this->max_drift_per_day_ / static_cast<float>(STEPS_PER_DAY);
+    float target_sigma = this->estimated_sigma();
+    if (target_sigma < MIN_SIGMA)
+      target_sigma = MIN_SIGMA;
+    float next_mu = approach(*mu, this->mu_, budget);
+    float next_sigma = approach(*sigma, target_sigma, budget);
+    if (next_mu == *mu && next_sigma == *sigma)
+      return false;
+    *mu = next_mu;
+    *sigma = next_sigma;
+    return true;
+  }
+
+  // Flash persistence of the reference (see BedPresenceEngine::restore_config); false if nothing was stored
+  bool restore(uint32_t key) {
+    this->persist_ = true;
+    this->pref_ = global_preferences->make_preference<PersistedDriftReference>(key, true);
+    PersistedDriftReference stored{};
+    if (!this->pref_.load(&stored) || !std::isfinite(stored.mu) || !std::isfinite(stored.sigma) ||
+        stored.sigma <= 0.001f)
+      return false;
+    this->reference_ = stored;
+    this->persisted_ = stored;
+    return true;
+  }
+
+  void persist() {
+    if (!this->persist_ || std::memcmp(&this->reference_, &this->persisted_, sizeof(this->reference_)) == 0)
+      return;
+    if (this->pref_.save(&this->reference_))
+      this->persisted_ = this->reference_;
+  }
+
+ protected:
+  void integrate(float energy, uint32_t dt) {
+    float alpha = static_cast<float>(dt) / static_cast<float>(this->time_constant_ms_);
+    if (alpha > 1.0f)
+      alpha = 1.0f;
+    float limit = WINSOR_SIGMAS * this->estimated_sigma();
+    float x = energy < this->mu_ - limit ? this->mu_ - limit : (energy > this->mu_ + limit ? this->mu_ + limit : energy);
+    this->mu_ += alpha * (x - this->mu_);
+    this->deviation_ += alpha * (std::fabs(x - this->mu_) - this->deviation_);
+  }
+
+  static float approach(float current, float target, float budget) {
+    float delta = target - current;
+    if (delta > budget)
+      delta = budget;
+    else if (delta < -budget)
+      delta = -budget;
+    return current + delta;
+  }
+
+  uint32_t time_constant_ms_{6 * 3600 * 1000};
+  float max_drift_per_day_{1.0f};
+
+  float mu_{0.0f};
+  float deviation_{0.0f};
+  bool has_estimate_{false};  // At least one reading since the last seed
+  bool has_sample_{false};    // last_energy_ is a qualifying reading still standing
+  float last_energy_{0.0f};
+  uint32_t last_sample_time_{0};
+  bool has_stepped_{false};
+  uint32_t last_step_time_{0};
+
+  PersistedDriftReference reference_{};
+  bool persist_{false};
+  ESPPreferenceObject pref_;
+  PersistedDriftReference persisted_{};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
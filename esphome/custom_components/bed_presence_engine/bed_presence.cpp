@@ -2,197 +2,1009 @@
 #include "esphome/core/log.h"
 #include <algorithm>
 #include <cmath>
+#include <cstddef>
+#include <cstring>
+
+#ifdef USE_ESP32
+#include <esp_attr.h>
+#include <sys/time.h>
+#endif
 
 namespace esphome {
 namespace bed_presence_engine {
 
 static const char *const TAG = "bed_presence_engine";
 
+#ifdef USE_BED_PRESENCE_GATES
+// Keeps the gate baseline record apart from the PersistedConfig record of the same engine
+static const uint32_t GATE_BASELINES_PREF_SALT = 0x47415445u;  // "GATE"
+#endif
+
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+// Keeps the drift reference record apart from the other records of the same engine
+static const uint32_t DRIFT_REFERENCE_PREF_SALT = 0x44524654u;  // "DRFT"
+#endif
+
+#ifdef USE_BED_PRESENCE_FUSION
+static const char *const FUSION_NAMES[] = {"still only", "max", "weighted", "moving arms / still holds"};
+#endif
+
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+static const uint32_t WARM_RESTART_MAGIC = 0xB0D5EA7Eu;
+
+#ifdef USE_ESP32
+// RTC slow memory is left untouched by software resets (OTA, crash, watchdog);
+// after a power-on reset it holds garbage, which the magic/checksum rejects.
+static RTC_NOINIT_ATTR WarmRestartSnapshot rtc_snapshot;
+
+// The system time is kept by the RTC across software resets (and restarts at 0
+// on power-on, which makes any snapshot look like it came from the future)
+static int64_t wall_clock_ms() {
+  struct timeval tv;
+  gettimeofday(&tv, nullptr);
+  return static_cast<int64_t>(tv.tv_sec) * 1000 + tv.tv_usec / 1000;
+}
+#else
+// Other targets (and the host build) keep the snapshot for the life of the process
+static WarmRestartSnapshot rtc_snapshot;
+
+static int64_t wall_clock_ms() { return millis(); }
+#endif
+
+// FNV-1a over everything but the checksum field
+static uint32_t snapshot_checksum(const WarmRestartSnapshot &snapshot) {
+  const uint8_t *bytes = reinterpret_cast<const uint8_t *>(&snapshot);
+  uint32_t hash = 2166136261u;
+  for (size_t i = 0; i < offsetof(WarmRestartSnapshot, checksum); i++) {
+    hash ^= bytes[i];
+    hash *= 16777619u;
+  }
+  return hash;
+}
+#endif
+
 void BedPresenceEngine::setup() {
   ESP_LOGCONFIG(TAG, "Setting up Bed Presence Engine (Phase 3)...");
+  // Only a still energy reading marks a new frame; loop() pairs it with the latest distance, moving and
+  // gate readings. Those are published from the same LD2410 frame, and on their own they are not a new
+  // energy sample, so they wait for the next energy reading or held frame.
+  if (this->energy_sensor_ != nullptr) {
+    this->energy_sensor_->add_on_state_callback([this](float) {
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+      if (this->energy_pending_) {
+        this->frames_dropped_++;  // The previous reading never reached the engine
+      }
+      this->energy_pending_ = true;
+      this->frames_received_++;
+#endif
+      this->frame_pending_ = true;
+    });
+  }
+  if (this->persist_parameters_) {
+    this->restore_config();
+  }
+  this->rebuild_model();
   ESP_LOGCONFIG(TAG, "  Baseline (still): μ=%.2f, σ=%.2f", this->mu_still_, this->sigma_still_);
-  ESP_LOGCONFIG(TAG, "  Baseline (stat): μ=%.2f, σ=%.2f", this->mu_stat_, this->sigma_stat_);
+#ifdef USE_BED_PRESENCE_FUSION
+  if (this->moving_energy_sensor_ != nullptr) {
+    ESP_LOGCONFIG(TAG, "  Baseline (moving): μ=%.2f, σ=%.2f", this->mu_stat_, this->sigma_stat_);
+    ESP_LOGCONFIG(TAG, "  Fusion: %s (moving weight %.2f)", FUSION_NAMES[this->fusion_mode_],
+                  this->fusion_moving_weight_);
+  }
+#endif
   ESP_LOGCONFIG(TAG, "  Threshold multipliers: k_on=%.2f, k_off=%.2f", this->k_on_, this->k_off_);
   ESP_LOGCONFIG(TAG, "  Debounce timers: on=%lums, off=%lums, abs_clear=%lums",
                 this->on_debounce_ms_, this->off_debounce_ms_, this->abs_clear_delay_ms_);
   ESP_LOGCONFIG(TAG, "  Distance window: [%.1fcm, %.1fcm]", this->d_min_cm_, this->d_max_cm_);
+  ESP_LOGCONFIG(TAG, "  Frame hold: %lums", this->frame_hold_ms_);
+#ifdef USE_BED_PRESENCE_PREFILTER
+  this->prefilter_.configure(this->prefilter_mode_, this->prefilter_window_, this->prefilter_threshold_);
+  if (this->prefilter_.enabled()) {
+    ESP_LOGCONFIG(TAG, "  Pre-filter: %s over %u frames (threshold %.1f MAD)",
+                  this->prefilter_mode_ == PREFILTER_HAMPEL ? "Hampel" : "median",
+                  static_cast<unsigned>(this->prefilter_.get_window()), this->prefilter_threshold_);
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_) {
+    ESP_LOGCONFIG(TAG, "  Gate mask: 0x%03X (%s)", this->gate_baselines_.get_mask(),
+                  this->gate_baselines_.is_calibrated() ? "calibrated" : "not calibrated, using aggregate energy");
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      if (this->gate_baselines_.is_calibrated() && (this->gate_baselines_.get_mask() & (1u << gate))) {
+        ESP_LOGCONFIG(TAG, "    Gate %u: μ=%.2f, σ=%.2f", static_cast<unsigned>(gate), this->gate_baselines_.get_mu(gate),
+                      this->gate_baselines_.get_sigma(gate));
+      }
+    }
+  }
+#endif
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  if (this->baseline_tracking_) {
+    // Drift is measured from the last calibration, which may predate this boot
+    bool restored = this->persist_parameters_ &&
+                    this->baseline_tracker_.restore(this->get_object_id_hash() ^ DRIFT_REFERENCE_PREF_SALT ^
+                                                    BaselineTracker::PERSISTED_VERSION);
+    if (!restored) {
+      this->baseline_tracker_.set_reference(this->mu_still_, this->sigma_still_);
+    }
+    this->baseline_tracker_.seed(this->mu_still_, this->sigma_still_);
+    this->idle_since_ = millis();
+    ESP_LOGCONFIG(TAG, "  Baseline tracking: time constant %us, at most %.2f%%/day after %us IDLE (drift μ%+.2f, σ%+.2f)",
+                  static_cast<unsigned>(this->baseline_tracker_.get_time_constant_ms() / 1000),
+                  this->baseline_tracker_.get_max_drift_per_day(),
+                  static_cast<unsigned>(this->baseline_tracking_min_idle_ms_ / 1000),
+                  this->mu_still_ - this->baseline_tracker_.get_reference_mu(),
+                  this->sigma_still_ - this->baseline_tracker_.get_reference_sigma());
+    this->publish_drift();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  if (this->adaptive_thresholds_) {
+    ESP_LOGCONFIG(TAG, "  Adaptive thresholds: %s every %us from states held %us (k_on %.1f-%.1f, n >= %u)",
+                  this->adaptive_mode_ == ADAPTIVE_APPLY ? "apply" : "suggest",
+                  static_cast<unsigned>(this->adaptive_update_interval_ms_ / 1000),
+                  static_cast<unsigned>(this->adaptive_min_state_ms_ / 1000), this->threshold_learner_.get_k_on_min(),
+                  this->threshold_learner_.get_k_on_max(),
+                  static_cast<unsigned>(this->threshold_learner_.get_min_samples()));
+    this->adaptive_last_update_ = millis();
+    this->learning_since_ = millis();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    ESP_LOGCONFIG(TAG, "  Zone: [%.1fcm, %.1fcm], μ=%.2f, σ=%.2f", zone->get_d_min_cm(), zone->get_d_max_cm(),
+                  zone->get_mu_still(), zone->get_sigma_still());
+    zone->reset();
+  }
+#endif
+  // The active profile name is not persisted; recognise it from the restored parameters
+  PresenceProfile current = this->get_parameters();
+  const char *active_profile = "custom";
+  for (const auto &named : this->profiles_) {
+    bool active = std::memcmp(&named.profile, &current, sizeof(current)) == 0;
+    ESP_LOGCONFIG(TAG, "  Profile '%s': k_on=%.2f, k_off=%.2f%s", named.name.c_str(), named.profile.k_on,
+                  named.profile.k_off, active ? " (active)" : "");
+    if (active) {
+      active_profile = named.name.c_str();
+    }
+  }
+  this->publish_active_profile(active_profile);
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  if (this->telemetry_enabled_) {
+    ESP_LOGCONFIG(TAG, "  Telemetry window: %ums", static_cast<unsigned>(this->telemetry_window_ms_));
+  }
+  this->telemetry_window_start_ = millis();
+#endif
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  if (this->instrumentation_enabled_) {
+    ESP_LOGCONFIG(TAG, "  Instrumentation window: %ums", static_cast<unsigned>(this->instrumentation_window_ms_));
+    this->add_on_state_callback([this](bool) { this->state_publishes_++; });
+  }
+  this->instrumentation_window_start_ = millis();
+#endif
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  if (this->flight_recorder_capacity_ > 0) {
+    if (this->flight_recorder_.allocate(this->flight_recorder_capacity_)) {
+      ESP_LOGCONFIG(TAG, "  Flight recorder: %u frames (%u bytes)%s", static_cast<unsigned>(this->flight_recorder_capacity_),
+                    static_cast<unsigned>(this->flight_recorder_capacity_ * FlightRecorder::RECORD_SIZE),
+                    this->flight_recorder_auto_dump_ ? ", auto dump" : "");
+    } else {
+      ESP_LOGE(TAG, "  Flight recorder: could not allocate %u frames", static_cast<unsigned>(this->flight_recorder_capacity_));
+    }
+  }
+#endif
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+  if (this->frame_stream_enabled_) {
+    ESP_LOGCONFIG(TAG, "  Frame stream: %u frames per batch%s",
+                  static_cast<unsigned>(this->frame_stream_.get_frames_per_batch()),
+                  this->frame_stream_sensor_ != nullptr ? " (logger and text sensor)" : " (logger)");
+  }
+#endif
   ESP_LOGCONFIG(TAG, "  Phase 3: Distance windowing + MAD calibration enabled");
 
   // Initialize to IDLE state
   this->current_state_ = IDLE;
-  this->publish_state(false);
 
-  if (this->state_reason_sensor_ != nullptr) {
-    this->state_reason_sensor_->publish_state("Initial state: IDLE");
-  }
-  if (this->last_change_reason_sensor_ != nullptr) {
-    this->last_change_reason_sensor_->publish_state("idle:init");
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  if (this->warm_restart_ && this->load_warm_restart_snapshot()) {
+    // Hold the initial publish until the first frame confirms or rejects the snapshot
+    this->warm_restart_pending_ = true;
+    this->warm_restart_boot_time_ = millis();
+    return;
   }
+#endif
+
+  this->publish_initial_state();
+}
+
+void BedPresenceEngine::publish_initial_state() {
+  this->current_state_ = IDLE;
+  this->publish_state(false);
+  this->publish_reason("Initial state: IDLE");
+  this->publish_change_reason("idle:init");
 }
 
 void BedPresenceEngine::loop() {
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  if (this->instrumentation_enabled_) {
+    uint32_t start_us = micros();
+    this->run_loop();
+    this->loop_time_.add(micros() - start_us);
+    this->publish_instrumentation_if_due(millis());
+    return;
+  }
+#endif
+  this->run_loop();
+}
+
+void BedPresenceEngine::run_loop() {
+  this->persist_config_if_due();
+  this->state_reason_publisher_.loop(millis());
+  this->change_reason_publisher_.loop(millis());
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  if (this->telemetry_enabled_) {
+    this->publish_telemetry_if_due(millis());
+  }
+#endif
+
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  if (this->adaptive_thresholds_ && (millis() - this->adaptive_last_update_) >= this->adaptive_update_interval_ms_) {
+    this->update_adaptive_thresholds();
+  }
+#endif
+
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+  // A partly filled batch still goes out when frames slow down or stop
+  if (this->frame_stream_enabled_ && this->frame_stream_.due(millis())) {
+    this->flush_frame_stream();
+  }
+#endif
+
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  if (this->flight_recorder_.dumping()) {
+    this->dump_flight_recorder_chunk();
+  } else if (this->flight_recorder_auto_dump_ && this->flight_recorder_.frozen()) {
+    this->dump_flight_recorder();
+  }
+#endif
+
   if (this->calibrating_ && millis() >= this->calibration_end_time_) {
     this->finalize_calibration();
   }
 
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  if (this->warm_restart_pending_ && (millis() - this->warm_restart_boot_time_) >= WARM_RESTART_FRAME_TIMEOUT_MS) {
+    ESP_LOGW(TAG, "Warm restart: no frame within %lums, cold start", WARM_RESTART_FRAME_TIMEOUT_MS);
+    this->warm_restart_pending_ = false;
+    this->publish_initial_state();
+  }
+#endif
+
   // Check if we have a valid energy reading
   if (this->energy_sensor_ == nullptr || !this->energy_sensor_->has_state()) {
     return;
   }
 
-  if (this->distance_sensor_ != nullptr && this->distance_sensor_->has_state()) {
-    float distance = this->distance_sensor_->state;
-    if (distance < this->d_min_cm_ || distance > this->d_max_cm_) {
-      ESP_LOGVV(TAG, "Ignoring frame, distance %.2fcm outside window [%.1fcm, %.1fcm]", distance, this->d_min_cm_,
-                this->d_max_cm_);
-      return;
+  unsigned long now = millis();
+  if (!this->frame_pending_ && (this->frame_hold_ms_ == 0 || (now - this->last_frame_time_) < this->frame_hold_ms_)) {
+    return;
+  }
+  // Held frames repeat the last reading every frame_hold_ms_. The LD2410 only publishes changes, so they are
+  // samples too: calibration and the statistics count a standing reading once per hold interval, which
+  // weights it by how long it stood (as scripts/collect_baseline.py does). Baseline tracking weights by time.
+  bool held = !this->frame_pending_;
+  uint8_t record_flags = held ? FlightRecorder::FLAG_HELD : 0;
+  this->frame_pending_ = false;
+  this->last_frame_time_ = now;
+  this->frame_count_++;
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  this->energy_pending_ = false;
+  this->frames_processed_++;
+#endif
+
+  // The flight recorder keeps the radar's reading so a dump replays through the same filter
+  float raw_energy = this->energy_sensor_->state;
+  float energy = raw_energy;
+#ifdef USE_BED_PRESENCE_PREFILTER
+  if (this->prefilter_.enabled()) {
+    if (!held || std::isnan(this->prefiltered_energy_)) {
+      this->prefiltered_energy_ = this->prefilter_.filter(raw_energy);
     }
+    energy = this->prefiltered_energy_;
+  }
+#endif
+  float moving_energy = NAN;
+#ifdef USE_BED_PRESENCE_FUSION
+  if (this->moving_energy_sensor_ != nullptr && this->moving_energy_sensor_->has_state()) {
+    moving_energy = this->moving_energy_sensor_->state;
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_) {
+    this->read_gate_energies();
+  }
+#endif
+  float distance = NAN;
+  if (this->distance_sensor_ != nullptr && this->distance_sensor_->has_state()) {
+    distance = this->distance_sensor_->state;
+  }
+#ifdef USE_BED_PRESENCE_ZONES
+  this->process_zones(energy, distance, now);
+#endif
+  if (distance < this->model_->d_min_cm || distance > this->model_->d_max_cm) {  // Never true for NaN
+    ESP_LOGVV(TAG, "Ignoring frame, distance %.2fcm outside window [%.1fcm, %.1fcm]", distance,
+              this->model_->d_min_cm, this->model_->d_max_cm);
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+    this->baseline_tracker_.interrupt();  // Nothing is known about the bed until the next in-window frame
+#endif
+    this->record_frame(now, raw_energy, energy, moving_energy, distance, record_flags | FlightRecorder::FLAG_GATED);
+    return;
+  }
+
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  bool was_occupied = this->state;
+#endif
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  if (this->warm_restart_pending_) {
+    float z_arm, z_hold;
+    this->fuse_z_scores(energy, moving_energy, &z_arm, &z_hold);
+    this->resolve_warm_restart(z_hold);
+  }
+#endif
+  this->handle_calibration_sample(energy, moving_energy);
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  uint32_t process_start_us = micros();
+#endif
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  float scored_z = this->process_energy_reading(energy, moving_energy);
+#else
+  this->process_energy_reading(energy, moving_energy);
+#endif
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  if (this->instrumentation_enabled_) {
+    this->process_time_.add(micros() - process_start_us);
+  }
+#endif
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  if (this->telemetry_enabled_) {
+    // The score the state machine compared, against the model it used; still energy alone is compared as energy
+    this->telemetry_window_.add(energy);
+    this->telemetry_z_window_.add(std::isnan(scored_z) ? this->model_->z_still(energy) : scored_z);
+  }
+#endif
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  if (this->warm_restart_) {
+    this->save_warm_restart_snapshot(millis());
+  }
+#endif
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  if (this->baseline_tracking_) {
+    this->track_baseline(energy, now, held);
   }
+#endif
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  if (this->adaptive_thresholds_) {
+    this->learn_thresholds(energy, moving_energy, now);
+  }
+#endif
 
-  float energy = this->energy_sensor_->state;
-  this->handle_calibration_sample(energy);
-  this->process_energy_reading(energy);
+  this->record_frame(now, raw_energy, energy, moving_energy, distance, record_flags);
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  if (this->state != was_occupied) {
+    this->flight_recorder_.trigger();
+  }
+#endif
 }
 
-float BedPresenceEngine::calculate_z_score(float energy, float mu, float sigma) {
-  // Prevent division by zero
-  if (sigma <= 0.001f) {
-    ESP_LOGW(TAG, "Invalid sigma (%.2f), returning z=0", sigma);
-    return 0.0f;
+void BedPresenceEngine::rebuild_model() {
+  // Prevent division by zero: an unusable σ gives z=0 for every frame
+  if (this->sigma_still_ <= 0.001f) {
+    ESP_LOGW(TAG, "Invalid sigma (%.2f), z-scores will be 0", this->sigma_still_);
   }
+  PresenceThresholds thresholds{this->k_on_, this->k_off_, this->on_debounce_ms_, this->off_debounce_ms_,
+                                this->abs_clear_delay_ms_};
+  ThresholdModel *next = this->model_ == &this->models_[0] ? &this->models_[1] : &this->models_[0];
+  *next = ThresholdModel::build(this->mu_still_, this->sigma_still_, this->mu_stat_, this->sigma_stat_,
+                                this->d_min_cm_, this->d_max_cm_, thresholds);
+  this->model_ = next;
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    zone->set_thresholds(thresholds);
+  }
+#endif
+}
 
-  // z = (x - μ) / σ
-  return (energy - mu) / sigma;
+// Still energy alone can be compared against the model's energy thresholds; fusion and gates need z-scores
+bool BedPresenceEngine::scores_need_z(float moving_energy) const {
+  if (!this->model_->energy_domain) {
+    return true;
+  }
+#ifdef USE_BED_PRESENCE_FUSION
+  if (this->fusion_mode_ != FUSION_STILL && !std::isnan(moving_energy)) {
+    return true;
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_ && this->gate_baselines_.is_calibrated()) {
+    return true;
+  }
+#endif
+  return false;
 }
 
-void BedPresenceEngine::process_energy_reading(float energy) {
-  // Calculate z-score for still energy (Phase 2 uses still_energy)
-  float z_still = this->calculate_z_score(energy, this->mu_still_, this->sigma_still_);
+#ifdef USE_BED_PRESENCE_GATES
+void BedPresenceEngine::read_gate_energies() {
+  for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+    sensor::Sensor *gate_sensor = this->gate_energy_sensors_[gate];
+    this->gate_energies_[gate] = (gate_sensor != nullptr && gate_sensor->has_state()) ? gate_sensor->state : NAN;
+  }
+}
+#endif
 
-  // Log the z-score for debugging
-  ESP_LOGVV(TAG, "Energy=%.2f, z_still=%.2f, state=%d", energy, z_still, this->current_state_);
+void BedPresenceEngine::fuse_z_scores(float energy, float moving_energy, float *z_arm, float *z_hold) {
+  float z_still = NAN;
+#ifdef USE_BED_PRESENCE_GATES
+  // Calibrated per-gate baselines stand in for the aggregate still energy
+  if (this->gates_enabled_) {
+    z_still = this->gate_baselines_.score(this->gate_energies_);
+  }
+#endif
+  if (std::isnan(z_still)) {
+    z_still = this->model_->z_still(energy);
+  }
+  *z_arm = z_still;
+  *z_hold = z_still;
+#ifdef USE_BED_PRESENCE_FUSION
+  // Without a moving reading (not configured, or not published yet) every mode falls back to still energy
+  if (this->fusion_mode_ == FUSION_STILL || std::isnan(moving_energy)) {
+    return;
+  }
 
+  float z_moving = this->model_->z_moving(moving_energy);
+  switch (this->fusion_mode_) {
+    case FUSION_MAX:
+      *z_arm = *z_hold = std::max(z_still, z_moving);
+      break;
+    case FUSION_WEIGHTED:
+      *z_arm = *z_hold = this->fusion_moving_weight_ * z_moving + (1.0f - this->fusion_moving_weight_) * z_still;
+      break;
+    case FUSION_MOVING_ARMS:
+      // Getting into bed shows up in moving energy first; staying there is a still energy signal
+      *z_arm = std::max(z_still, z_moving);
+      break;
+    default:
+      break;
+  }
+#endif
+}
+
+float BedPresenceEngine::process_energy_reading(float energy, float moving_energy) {
+  const ThresholdModel &model = *this->model_;
   unsigned long now = millis();
+  bool vacant = this->current_state_ == IDLE || this->current_state_ == DEBOUNCING_ON;
 
-  // Phase 2 Logic: 4-state machine with debouncing
-  switch (this->current_state_) {
-    case IDLE:
-      if (z_still >= this->k_on_) {
-        this->debounce_start_time_ = now;
-        this->current_state_ = DEBOUNCING_ON;
-        ESP_LOGD(TAG, "IDLE → DEBOUNCING_ON (z=%.2f >= k_on=%.2f)", z_still, this->k_on_);
-      }
+  // The arm score decides arming from vacancy (IDLE, DEBOUNCING_ON) and the hold score everything once
+  // occupied. With still energy as the only input both are the energy itself, compared against the
+  // model's μ + kσ thresholds; otherwise they are (fused) z-scores compared against k_on/k_off.
+  Transition transition;
+  float z_arm, z_hold;
+  if (this->scores_need_z(moving_energy)) {
+    this->fuse_z_scores(energy, moving_energy, &z_arm, &z_hold);
+    ESP_LOGVV(TAG, "Energy=%.2f, moving=%.2f, z_arm=%.2f, z_hold=%.2f, state=%d", energy, moving_energy, z_arm,
+              z_hold, this->current_state_);
+    transition = step_state_machine(this->current_state_, this->debounce_start_time_,
+                                    this->last_high_confidence_time_, z_arm, z_hold, now, model.z_thresholds);
+  } else {
+    ESP_LOGVV(TAG, "Energy=%.2f (on >= %.2f, off < %.2f), state=%d", energy, model.energy_thresholds.k_on,
+              model.energy_thresholds.k_off, this->current_state_);
+    transition = step_state_machine(this->current_state_, this->debounce_start_time_,
+                                    this->last_high_confidence_time_, energy, energy, now, model.energy_thresholds);
+    if (transition == TRANSITION_NONE) {
+      return NAN;
+    }
+    z_arm = z_hold = model.z_still(energy);  // Only needed for the messages below
+  }
+  float scored_z = vacant ? z_arm : z_hold;
+
+  // Phase 2: report the transition taken by the 4-state machine (state_machine.h)
+  char reason[64];
+  switch (transition) {
+    case TRANSITION_DEBOUNCE_ON:
+      ESP_LOGD(TAG, "IDLE → DEBOUNCING_ON (z=%.2f >= k_on=%.2f)", z_arm, model.z_thresholds.k_on);
       break;
 
-    case DEBOUNCING_ON:
-      if (z_still >= this->k_on_) {
-        // Condition still holds, check timer
-        if ((now - this->debounce_start_time_) >= this->on_debounce_ms_) {
-          this->current_state_ = PRESENT;
-          this->last_high_confidence_time_ = now;
-          this->publish_state(true);
-
-          char reason[64];
-          snprintf(reason, sizeof(reason), "ON: z=%.2f, debounced %lums", z_still, this->on_debounce_ms_);
-          this->publish_reason(reason);
-          this->publish_change_reason("on:threshold_exceeded");
-
-          ESP_LOGI(TAG, "DEBOUNCING_ON → PRESENT: %s", reason);
-        }
-      } else {
-        // Condition lost, abort debounce
-        this->current_state_ = IDLE;
-        ESP_LOGD(TAG, "DEBOUNCING_ON → IDLE (z=%.2f < k_on, abort)", z_still);
-      }
+    case TRANSITION_ON:
+      this->publish_state(true);
+      snprintf(reason, sizeof(reason), "ON: z=%.2f, debounced %lums", z_arm, model.z_thresholds.on_debounce_ms);
+      this->publish_reason(reason);
+      this->publish_change_reason("on:threshold_exceeded");
+      ESP_LOGI(TAG, "DEBOUNCING_ON → PRESENT: %s", reason);
       break;
 
-    case PRESENT:
-      // Update high confidence timestamp whenever strong signal detected
-      if (z_still > this->k_on_) {
-        this->last_high_confidence_time_ = now;
-      }
+    case TRANSITION_ABORT_ON:
+      ESP_LOGD(TAG, "DEBOUNCING_ON → IDLE (z=%.2f < k_on, abort)", z_arm);
+      break;
 
-      // Check for transition to DEBOUNCING_OFF
-      if (z_still < this->k_off_) {
-        // Low signal detected, check absolute clear delay
-        if ((now - this->last_high_confidence_time_) >= this->abs_clear_delay_ms_) {
-          this->debounce_start_time_ = now;
-          this->current_state_ = DEBOUNCING_OFF;
-          ESP_LOGD(TAG, "PRESENT → DEBOUNCING_OFF (z=%.2f < k_off, abs_clear=%lums ago)",
-                   z_still, (now - this->last_high_confidence_time_));
-        }
-      }
+    case TRANSITION_DEBOUNCE_OFF:
+      ESP_LOGD(TAG, "PRESENT → DEBOUNCING_OFF (z=%.2f < k_off, abs_clear=%lums ago)", z_hold,
+               (now - this->last_high_confidence_time_));
       break;
 
-    case DEBOUNCING_OFF:
-      if (z_still < this->k_off_) {
-        // Condition still holds, check timer
-        if ((now - this->debounce_start_time_) >= this->off_debounce_ms_) {
-          this->current_state_ = IDLE;
-          this->publish_state(false);
-
-          char reason[64];
-          snprintf(reason, sizeof(reason), "OFF: z=%.2f, debounced %lums", z_still, this->off_debounce_ms_);
-          this->publish_reason(reason);
-          this->publish_change_reason("off:abs_clear_delay");
-
-          ESP_LOGI(TAG, "DEBOUNCING_OFF → IDLE: %s", reason);
-        }
-      } else if (z_still >= this->k_on_) {
-        // High signal returned, abort debounce
-        this->current_state_ = PRESENT;
-        this->last_high_confidence_time_ = now;
-        ESP_LOGD(TAG, "DEBOUNCING_OFF → PRESENT (z=%.2f >= k_on, signal returned)", z_still);
-      }
+    case TRANSITION_OFF:
+      this->publish_state(false);
+      snprintf(reason, sizeof(reason), "OFF: z=%.2f, debounced %lums", z_hold, model.z_thresholds.off_debounce_ms);
+      this->publish_reason(reason);
+      this->publish_change_reason("off:abs_clear_delay");
+      ESP_LOGI(TAG, "DEBOUNCING_OFF → IDLE: %s", reason);
+      break;
+
+    case TRANSITION_ABORT_OFF:
+      ESP_LOGD(TAG, "DEBOUNCING_OFF → PRESENT (z=%.2f >= k_on, signal returned)", z_hold);
+      break;
+
+    case TRANSITION_NONE:
       break;
   }
+  return scored_z;
+}
+
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+void BedPresenceEngine::track_baseline(float energy, unsigned long now, bool held) {
+  if (this->current_state_ != IDLE || this->calibrating_ || this->warm_restart_pending_) {
+    this->idle_since_ = now;
+    this->baseline_tracker_.interrupt();
+    return;
+  }
+  // Confidently empty: IDLE for a while. Every frame of that stretch counts, including those between k_off
+  // and k_on; keeping only the frames below k_off would cut off the empty bed's upper tail and bias μ/σ low.
+  if ((now - this->idle_since_) < this->baseline_tracking_min_idle_ms_) {
+    this->baseline_tracker_.interrupt();
+    return;
+  }
+  // A held frame repeats the standing reading, which the tracker already weights by how long it stands;
+  // it only starts the clock again after an interruption
+  if (!held || !this->baseline_tracker_.has_reading()) {
+    this->baseline_tracker_.add(energy, now);
+  }
+  if (!this->baseline_tracker_.step(now, &this->mu_still_, &this->sigma_still_)) {
+    return;
+  }
+  this->rebuild_model();
+  this->publish_drift();
+  ESP_LOGD(TAG, "Baseline tracking: μ=%.3f, σ=%.3f (estimate μ=%.3f, σ=%.3f)", this->mu_still_, this->sigma_still_,
+           this->baseline_tracker_.estimated_mu(), this->baseline_tracker_.estimated_sigma());
+  if ((now - this->last_drift_persist_time_) >= DRIFT_PERSIST_INTERVAL_MS) {
+    this->last_drift_persist_time_ = now;
+    this->schedule_persist();
+  }
+}
+
+void BedPresenceEngine::publish_drift() {
+  if (this->mu_drift_sensor_ != nullptr) {
+    this->mu_drift_sensor_->publish_state(this->mu_still_ - this->baseline_tracker_.get_reference_mu());
+  }
+  if (this->sigma_drift_sensor_ != nullptr) {
+    this->sigma_drift_sensor_->publish_state(this->sigma_still_ - this->baseline_tracker_.get_reference_sigma());
+  }
+}
+#endif
+
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+void BedPresenceEngine::learn_thresholds(float energy, float moving_energy, unsigned long now) {
+  this->threshold_learner_.age(now);
+  bool occupied = this->current_state_ == PRESENT || this->current_state_ == DEBOUNCING_OFF;
+  if (occupied != this->learning_occupied_ || this->calibrating_ || this->warm_restart_pending_) {
+    this->learning_occupied_ = occupied;
+    this->learning_since_ = now;
+    this->threshold_learner_.discard_vacant();  // On an arrival, the pending vacant frames included the sleeper
+    return;
+  }
+  if ((now - this->learning_since_) < this->adaptive_min_state_ms_) {
+    return;
+  }
+  // The scores the state machine compares: arm against k_on while vacant, hold against k_off once occupied
+  float z_arm, z_hold;
+  this->fuse_z_scores(energy, moving_energy, &z_arm, &z_hold);
+  if (occupied) {
+    this->threshold_learner_.add_occupied(z_hold);
+    return;
+  }
+  // Vacant frames, including those that arm a debounce which then aborts, count once the bed is seen empty
+  this->threshold_learner_.add_vacant(z_arm, now);
+  if (this->current_state_ == IDLE) {
+    this->threshold_learner_.commit_vacant(now, this->adaptive_min_state_ms_);
+  }
+}
+
+void BedPresenceEngine::update_adaptive_thresholds() {
+  this->adaptive_last_update_ = millis();
+  const ThresholdLearner &learner = this->threshold_learner_;
+  ThresholdSuggestion suggestion = learner.suggest(this->k_on_, this->k_off_);
+  if (!suggestion.valid) {
+    // The quantiles are only computed once both histograms have enough samples
+    ESP_LOGI(TAG, "Adaptive thresholds: no suggestion (empty n=%u p99.9 z=%.2f, occupied n=%u p5 z=%.2f%s)",
+             static_cast<unsigned>(learner.empty_count()), suggestion.empty_high,
+             static_cast<unsigned>(learner.occupied_count()), suggestion.occupied_low,
+             std::isnan(suggestion.empty_high) ? "" : ", distributions overlap");
+    return;
+  }
+
+  ESP_LOGI(TAG, "Adaptive thresholds: empty p99.9 z=%.2f, occupied p5 z=%.2f → k_on=%.2f, k_off=%.2f",
+           suggestion.empty_high, suggestion.occupied_low, suggestion.k_on, suggestion.k_off);
+  if (this->adaptive_mode_ == ADAPTIVE_APPLY && (suggestion.k_on != this->k_on_ || suggestion.k_off != this->k_off_)) {
+    PresenceProfile profile = this->get_parameters();
+    profile.k_on = suggestion.k_on;
+    profile.k_off = suggestion.k_off;
+    this->apply_parameters(profile);
+  }
+  // Published after applying, so an on_value automation (e.g. re-syncing the number entities) sees the new values
+  if (this->suggested_k_on_sensor_ != nullptr) {
+    this->suggested_k_on_sensor_->publish_state(suggestion.k_on);
+  }
+  if (this->suggested_k_off_sensor_ != nullptr) {
+    this->suggested_k_off_sensor_->publish_state(suggestion.k_off);
+  }
+}
+#endif
+
+#ifdef USE_BED_PRESENCE_ZONES
+// Zones run ahead of the engine's own distance window, which may exclude their frames. Every zone steps on
+// every frame, so one whose window the frames have left times out instead of holding its last state.
+void BedPresenceEngine::process_zones(float energy, float distance, unsigned long now) {
+  for (auto *zone : this->zones_) {
+    bool in_window = zone->contains(distance);  // False for a NaN distance
+    if (in_window && this->calibrating_) {
+      zone->add_calibration_sample(energy);
+    }
+    zone->process(energy, in_window, now);
+  }
+}
+#endif
+
+#ifdef USE_BED_PRESENCE_TELEMETRY
+void BedPresenceEngine::publish_telemetry_if_due(unsigned long now) {
+  if (this->telemetry_window_ms_ == 0 || (now - this->telemetry_window_start_) < this->telemetry_window_ms_) {
+    return;
+  }
+  this->telemetry_window_start_ = now;
+
+  const EnergyWindow &window = this->telemetry_window_;
+  float values[TELEMETRY_STAT_COUNT];
+  values[TELEMETRY_FRAMES] = static_cast<float>(window.count());
+  values[TELEMETRY_ENERGY_MIN] = window.min();
+  values[TELEMETRY_ENERGY_MEAN] = window.mean();
+  values[TELEMETRY_ENERGY_MAX] = window.max();
+  values[TELEMETRY_ENERGY_P95] = window.quantile(0.95f);
+  const EnergyWindow &z_window = this->telemetry_z_window_;
+  values[TELEMETRY_Z_MIN] = z_window.min();
+  values[TELEMETRY_Z_MEAN] = z_window.mean();
+  values[TELEMETRY_Z_MAX] = z_window.max();
+  values[TELEMETRY_Z_P95] = z_window.quantile(0.95f);
+  values[TELEMETRY_Z_P95_CLAMPED] = z_window.quantile_clamped(0.95f) ? 1.0f : 0.0f;
+  values[TELEMETRY_BASELINE_MU] = this->mu_still_;
+  values[TELEMETRY_BASELINE_SIGMA] = this->sigma_still_;
+
+  for (int stat = 0; stat < TELEMETRY_STAT_COUNT; stat++) {
+    if (this->telemetry_sensors_[stat] != nullptr) {
+      this->telemetry_sensors_[stat]->publish_state(values[stat]);
+    }
+  }
+  ESP_LOGD(TAG, "Telemetry: n=%u, energy mean=%.2f p95=%.2f max=%.2f", static_cast<unsigned>(window.count()),
+           values[TELEMETRY_ENERGY_MEAN], values[TELEMETRY_ENERGY_P95], values[TELEMETRY_ENERGY_MAX]);
+  this->telemetry_window_.clear();
+  this->telemetry_z_window_.clear();
+}
+#endif
+
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+void BedPresenceEngine::publish_instrumentation_if_due(unsigned long now) {
+  unsigned long elapsed = now - this->instrumentation_window_start_;
+  if (this->instrumentation_window_ms_ == 0 || elapsed < this->instrumentation_window_ms_) {
+    return;
+  }
+  this->instrumentation_window_start_ = now;
+
+  float seconds = static_cast<float>(elapsed) / 1000.0f;
+  uint32_t reason_publishes =
+      this->state_reason_publisher_.get_published_count() + this->change_reason_publisher_.get_published_count();
+  float values[INSTRUMENTATION_STAT_COUNT];
+  values[INSTRUMENTATION_FRAMES_RECEIVED] = static_cast<float>(this->frames_received_) / seconds;
+  values[INSTRUMENTATION_FRAMES_PROCESSED] = static_cast<float>(this->frames_processed_) / seconds;
+  values[INSTRUMENTATION_FRAMES_DROPPED] = static_cast<float>(this->frames_dropped_);
+  values[INSTRUMENTATION_LOOP_TIME_MEAN] = this->loop_time_.mean();
+  values[INSTRUMENTATION_LOOP_TIME_MAX] = this->loop_time_.max();
+  values[INSTRUMENTATION_PROCESS_TIME_MEAN] = this->process_time_.mean();
+  values[INSTRUMENTATION_PROCESS_TIME_MAX] = this->process_time_.max();
+  values[INSTRUMENTATION_CALIBRATION_PEAK_SAMPLES] = static_cast<float>(this->calibration_peak_samples_);
+  values[INSTRUMENTATION_PUBLISHES] =
+      static_cast<float>(this->state_publishes_ + reason_publishes - this->reason_publishes_at_window_start_);
+
+  this->frames_received_ = 0;
+  this->frames_processed_ = 0;
+  this->frames_dropped_ = 0;
+  this->state_publishes_ = 0;
+  this->reason_publishes_at_window_start_ = reason_publishes;
+  this->loop_time_.clear();
+  this->process_time_.clear();
+
+  for (int stat = 0; stat < INSTRUMENTATION_STAT_COUNT; stat++) {
+    if (this->instrumentation_sensors_[stat] != nullptr) {
+      this->instrumentation_sensors_[stat]->publish_state(values[stat]);
+    }
+  }
+  ESP_LOGD(TAG, "Instrumentation: %.1f frames/s received, %.1f processed, %u dropped, loop max %.0fus, process max %.0fus",
+           values[INSTRUMENTATION_FRAMES_RECEIVED], values[INSTRUMENTATION_FRAMES_PROCESSED],
+           static_cast<unsigned>(values[INSTRUMENTATION_FRAMES_DROPPED]), values[INSTRUMENTATION_LOOP_TIME_MAX],
+           values[INSTRUMENTATION_PROCESS_TIME_MAX]);
 }
+#endif
 
-void BedPresenceEngine::publish_reason(const std::string &reason) {
-  if (this->state_reason_sensor_ != nullptr) {
-    this->state_reason_sensor_->publish_state(reason.c_str());
+void BedPresenceEngine::record_frame(unsigned long now, float raw_energy, float energy, float moving_energy,
+                                     float distance, uint8_t flags) {
+#if defined(USE_BED_PRESENCE_FLIGHT_RECORDER) || defined(USE_BED_PRESENCE_FRAME_STREAM)
+  float z_still = this->model_->z_still(energy);
+  uint8_t state = static_cast<uint8_t>(this->current_state_);
+#endif
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  if (this->flight_recorder_.capacity() > 0) {
+    this->flight_recorder_.record(now, raw_energy, distance, z_still, state, flags);
   }
+#endif
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+  if (this->frame_stream_enabled_ &&
+      this->frame_stream_.add(now, raw_energy, moving_energy, distance, z_still, (state & 0x03) | flags)) {
+    this->flush_frame_stream();
+  }
+#endif
 }
 
-void BedPresenceEngine::publish_change_reason(const std::string &reason) {
-  if (this->last_change_reason_sensor_ != nullptr) {
-    this->last_change_reason_sensor_->publish_state(reason.c_str());
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+void BedPresenceEngine::flush_frame_stream() {
+  char line[FrameStream::LINE_SIZE];
+  if (!this->frame_stream_.flush(line)) {
+    return;
+  }
+  ESP_LOGI(TAG, "%s", line);
+  if (this->frame_stream_sensor_ != nullptr) {
+    this->frame_stream_sensor_->publish_state(line);
   }
 }
+#endif
+
+#ifndef USE_BED_PRESENCE_FLIGHT_RECORDER
+void BedPresenceEngine::dump_flight_recorder() { ESP_LOGW(TAG, "Flight recorder is disabled"); }
+#else
+void BedPresenceEngine::dump_flight_recorder() {
+  if (this->flight_recorder_.capacity() == 0) {
+    ESP_LOGW(TAG, "Flight recorder is disabled");
+    return;
+  }
+  if (this->flight_recorder_.dumping()) {
+    ESP_LOGW(TAG, "Flight recorder dump already in progress");
+    return;
+  }
+
+  char header[112];
+  snprintf(header, sizeof(header), "FR1 begin frames=%u capacity=%u t_last_ms=%u frozen=%d missed=%u",
+           static_cast<unsigned>(this->flight_recorder_.size()), static_cast<unsigned>(this->flight_recorder_.capacity()),
+           static_cast<unsigned>(this->flight_recorder_.last_time()), this->flight_recorder_.frozen() ? 1 : 0,
+           static_cast<unsigned>(this->flight_recorder_.missed()));
+  this->emit_flight_recorder_line(header);
+  this->flight_recorder_chunk_seq_ = 0;
+  this->flight_recorder_.start_dump();
+}
+
+// One chunk per loop() keeps a dump from blocking the main loop
+void BedPresenceEngine::dump_flight_recorder_chunk() {
+  char hex[FlightRecorder::CHUNK_TEXT_SIZE];
+  if (!this->flight_recorder_.next_chunk(hex)) {
+    this->emit_flight_recorder_line("FR1 end");
+    return;
+  }
+  char line[FlightRecorder::CHUNK_TEXT_SIZE + 16];
+  snprintf(line, sizeof(line), "FR1 %04u %s", static_cast<unsigned>(this->flight_recorder_chunk_seq_++), hex);
+  this->emit_flight_recorder_line(line);
+}
+
+void BedPresenceEngine::emit_flight_recorder_line(const char *line) {
+  ESP_LOGI(TAG, "%s", line);
+  if (this->flight_recorder_sensor_ != nullptr) {
+    this->flight_recorder_sensor_->publish_state(line);
+  }
+}
+#endif
+
+void BedPresenceEngine::publish_reason(const char *reason) { this->state_reason_publisher_.publish(reason, millis()); }
+
+void BedPresenceEngine::publish_change_reason(const char *reason) {
+  this->change_reason_publisher_.publish(reason, millis());
+}
 
 void BedPresenceEngine::update_k_on(float k) {
+  if (k == this->k_on_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
+  if (!(k >= this->k_off_)) {
+    ESP_LOGW(TAG, "Rejecting k_on=%.2f below k_off=%.2f, keeping %.2f", k, this->k_off_, this->k_on_);
+    return;
+  }
   ESP_LOGI(TAG, "Updating k_on: %.2f -> %.2f", this->k_on_, k);
   this->k_on_ = k;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_k_off(float k) {
+  if (k == this->k_off_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
+  if (!(k <= this->k_on_)) {
+    ESP_LOGW(TAG, "Rejecting k_off=%.2f above k_on=%.2f, keeping %.2f", k, this->k_on_, this->k_off_);
+    return;
+  }
   ESP_LOGI(TAG, "Updating k_off: %.2f -> %.2f", this->k_off_, k);
   this->k_off_ = k;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_on_debounce_ms(unsigned long ms) {
+  if (ms == this->on_debounce_ms_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
   ESP_LOGI(TAG, "Updating on_debounce_ms: %lu -> %lu", this->on_debounce_ms_, ms);
   this->on_debounce_ms_ = ms;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_off_debounce_ms(unsigned long ms) {
+  if (ms == this->off_debounce_ms_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
   ESP_LOGI(TAG, "Updating off_debounce_ms: %lu -> %lu", this->off_debounce_ms_, ms);
   this->off_debounce_ms_ = ms;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_abs_clear_delay_ms(unsigned long ms) {
+  if (ms == this->abs_clear_delay_ms_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
   ESP_LOGI(TAG, "Updating abs_clear_delay_ms: %lu -> %lu", this->abs_clear_delay_ms_, ms);
   this->abs_clear_delay_ms_ = ms;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_d_min_cm(float value) {
+  if (value == this->d_min_cm_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
   ESP_LOGI(TAG, "Updating d_min_cm: %.1f -> %.1f", this->d_min_cm_, value);
   this->d_min_cm_ = value;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
 }
 
 void BedPresenceEngine::update_d_max_cm(float value) {
+  if (value == this->d_max_cm_) {
+    return;  // Number entities re-sync after apply_parameters()
+  }
   ESP_LOGI(TAG, "Updating d_max_cm: %.1f -> %.1f", this->d_max_cm_, value);
   this->d_max_cm_ = value;
+  this->rebuild_model();
+  this->schedule_persist();
+  this->publish_active_profile("custom");
+}
+
+PresenceProfile BedPresenceEngine::get_parameters() const {
+  return PresenceProfile{this->k_on_,
+                         this->k_off_,
+                         static_cast<uint32_t>(this->on_debounce_ms_),
+                         static_cast<uint32_t>(this->off_debounce_ms_),
+                         static_cast<uint32_t>(this->abs_clear_delay_ms_),
+                         this->d_min_cm_,
+                         this->d_max_cm_};
+}
+
+bool BedPresenceEngine::apply_parameters(const PresenceProfile &profile) {
+  if (!this->store_parameters(profile)) {
+    return false;
+  }
+  this->publish_active_profile("custom");
+  return true;
+}
+
+bool BedPresenceEngine::apply_baseline(float mu, float sigma) {
+  if (!std::isfinite(mu) || !std::isfinite(sigma) || sigma <= 0.001f) {
+    ESP_LOGW(TAG, "Rejecting baseline (mu=%.2f, sigma=%.2f), nothing changed", mu, sigma);
+    return false;
+  }
+  ESP_LOGI(TAG, "Baseline applied: mu=%.2f, sigma=%.2f", mu, sigma);
+  this->store_baseline(mu, sigma);
+
+  char summary[96];
+  snprintf(summary, sizeof(summary), "Baseline applied: μ=%.2f, σ=%.2f", mu, sigma);
+  this->publish_reason(summary);
+  this->publish_change_reason("calibration:applied");
+  return true;
+}
+
+void BedPresenceEngine::store_baseline(float mu, float sigma) {
+  this->mu_still_ = mu;
+  this->sigma_still_ = sigma;
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  // A calibration is the new reference; tracking continues from it
+  if (this->baseline_tracking_) {
+    this->baseline_tracker_.set_reference(mu, sigma);
+    this->publish_drift();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  this->threshold_learner_.clear();
+#endif
+  this->rebuild_model();
+  this->schedule_persist();
+}
+
+bool BedPresenceEngine::store_parameters(const PresenceProfile &profile) {
+  bool valid = std::isfinite(profile.k_on) && std::isfinite(profile.k_off) && profile.k_off <= profile.k_on &&
+               std::isfinite(profile.d_min_cm) && std::isfinite(profile.d_max_cm) &&
+               profile.d_min_cm <= profile.d_max_cm;
+  if (!valid) {
+    ESP_LOGW(TAG, "Rejecting parameters (k_on=%.2f, k_off=%.2f, window [%.1fcm, %.1fcm]), nothing changed",
+             profile.k_on, profile.k_off, profile.d_min_cm, profile.d_max_cm);
+    return false;
+  }
+
+  this->k_on_ = profile.k_on;
+  this->k_off_ = profile.k_off;
+  this->on_debounce_ms_ = profile.on_debounce_ms;
+  this->off_debounce_ms_ = profile.off_debounce_ms;
+  this->abs_clear_delay_ms_ = profile.abs_clear_delay_ms;
+  this->d_min_cm_ = profile.d_min_cm;
+  this->d_max_cm_ = profile.d_max_cm;
+  this->rebuild_model();
+  this->schedule_persist();
+  ESP_LOGI(TAG, "Applied parameters: k_on=%.2f, k_off=%.2f, debounce on=%ums off=%ums, abs_clear=%ums, "
+           "window [%.1fcm, %.1fcm]", profile.k_on, profile.k_off, static_cast<unsigned>(profile.on_debounce_ms),
+           static_cast<unsigned>(profile.off_debounce_ms), static_cast<unsigned>(profile.abs_clear_delay_ms),
+           profile.d_min_cm, profile.d_max_cm);
+  return true;
+}
+
+bool BedPresenceEngine::apply_profile(const std::string &name) {
+  for (const auto &named : this->profiles_) {
+    if (named.name != name) {
+      continue;
+    }
+    ESP_LOGI(TAG, "Switching to profile '%s'", name.c_str());
+    // The profile's own name is the only active-profile publish, with no "custom" in between
+    if (!this->store_parameters(named.profile)) {
+      return false;
+    }
+    this->publish_active_profile(name.c_str());
+    return true;
+  }
+  ESP_LOGW(TAG, "Unknown profile '%s'", name.c_str());
+  return false;
+}
+
+void BedPresenceEngine::publish_active_profile(const char *name) {
+  if (this->active_profile_sensor_ == nullptr) {
+    return;
+  }
+  if (this->active_profile_sensor_->has_state() && this->active_profile_sensor_->state == name) {
+    return;
+  }
+  this->active_profile_sensor_->publish_state(name);
 }
 
 void BedPresenceEngine::start_baseline_calibration(uint32_t duration_s) {
@@ -203,9 +1015,21 @@ void BedPresenceEngine::start_baseline_calibration(uint32_t duration_s) {
 
   uint32_t clamped = std::min<uint32_t>(duration_s, 600);  // Hard cap at 10 minutes
   this->calibrating_ = true;
-  this->calibration_samples_.clear();
-  size_t expected_samples = static_cast<size_t>(clamped) * 50;  // assume up to 50 frames/sec
-  this->calibration_samples_.reserve(std::min(expected_samples, MAX_CALIBRATION_SAMPLES));
+  this->calibration_until_converged_ = false;
+  this->calibration_histogram_.clear();
+#ifdef USE_BED_PRESENCE_FUSION
+  this->moving_calibration_histogram_.clear();
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_) {
+    this->gate_baselines_.start_calibration();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    zone->start_calibration();
+  }
+#endif
   this->calibration_end_time_ = millis() + clamped * 1000UL;
 
   ESP_LOGI(TAG, "Starting baseline calibration for %us (collecting samples within distance window)", clamped);
@@ -213,6 +1037,22 @@ void BedPresenceEngine::start_baseline_calibration(uint32_t duration_s) {
   this->publish_change_reason("calibration:started");
 }
 
+void BedPresenceEngine::start_converging_calibration(uint32_t max_duration_s) {
+  if (max_duration_s == 0) {
+    ESP_LOGW(TAG, "Ignoring calibration request with 0s maximum duration");
+    return;
+  }
+
+  this->start_baseline_calibration(max_duration_s);
+  this->calibration_until_converged_ = true;
+  this->calibration_stable_count_ = 0;
+  this->calibration_last_mu_ = NAN;
+  this->calibration_last_sigma_ = NAN;
+  ESP_LOGI(TAG, "Calibration stops early once SE(μ) <= %.2f, SE(σ) <= %.2f and stable for %u checks",
+           this->calibration_mu_tolerance_, this->calibration_sigma_tolerance_,
+           static_cast<unsigned>(this->calibration_stable_checks_));
+}
+
 void BedPresenceEngine::stop_baseline_calibration() {
   if (!this->calibrating_) {
     ESP_LOGW(TAG, "Calibration stop requested, but no calibration in progress");
@@ -225,6 +1065,8 @@ void BedPresenceEngine::reset_to_defaults() {
   ESP_LOGI(TAG, "Resetting engine parameters to known-good defaults");
   this->mu_still_ = 6.7f;
   this->sigma_still_ = 3.5f;
+  this->mu_stat_ = 6.7f;
+  this->sigma_stat_ = 3.5f;
   this->k_on_ = 9.0f;
   this->k_off_ = 4.0f;
   this->on_debounce_ms_ = 3000;
@@ -232,9 +1074,34 @@ void BedPresenceEngine::reset_to_defaults() {
   this->abs_clear_delay_ms_ = 30000;
   this->d_min_cm_ = 0.0f;
   this->d_max_cm_ = 600.0f;
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    zone->reset_baseline(6.7f, 3.5f);
+    zone->reset();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  this->gate_baselines_.clear();
+#endif
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  if (this->baseline_tracking_) {
+    this->baseline_tracker_.set_reference(this->mu_still_, this->sigma_still_);
+    this->idle_since_ = millis();
+    this->publish_drift();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  this->threshold_learner_.clear();
+#endif
+  this->rebuild_model();
+  this->schedule_persist();
 
   this->calibrating_ = false;
-  this->calibration_samples_.clear();
+  this->calibration_until_converged_ = false;
+  this->calibration_histogram_.clear();
+#ifdef USE_BED_PRESENCE_FUSION
+  this->moving_calibration_histogram_.clear();
+#endif
 
   this->current_state_ = IDLE;
   this->publish_state(false);
@@ -242,82 +1109,293 @@ void BedPresenceEngine::reset_to_defaults() {
   this->publish_change_reason("off:reset_to_defaults");
 }
 
-void BedPresenceEngine::handle_calibration_sample(float energy) {
+void BedPresenceEngine::handle_calibration_sample(float energy, float moving_energy) {
   if (!this->calibrating_) {
     return;
   }
 
-  if (this->calibration_samples_.size() >= MAX_CALIBRATION_SAMPLES) {
-    ESP_LOGW(TAG, "Calibration sample buffer full (%u samples), finalizing early",
-             static_cast<unsigned>(this->calibration_samples_.size()));
-    this->finalize_calibration();
-    return;
+  this->calibration_histogram_.add(energy);
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  this->calibration_peak_samples_ = std::max(this->calibration_peak_samples_, this->calibration_histogram_.count());
+#endif
+#ifdef USE_BED_PRESENCE_FUSION
+  if (!std::isnan(moving_energy)) {
+    this->moving_calibration_histogram_.add(moving_energy);
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_) {
+    this->gate_baselines_.add_calibration_sample(this->gate_energies_);
   }
+#endif
 
-  this->calibration_samples_.push_back(energy);
+  if (this->calibration_until_converged_ && this->calibration_histogram_.count() % CALIBRATION_CHECK_INTERVAL == 0 &&
+      this->calibration_converged()) {
+    this->finalize_calibration("calibration:converged");
+    return;
+  }
 
   if (millis() >= this->calibration_end_time_) {
     this->finalize_calibration();
   }
 }
 
-static float compute_median(std::vector<float> values) {
-  if (values.empty()) {
-    return 0.0f;
-  }
+bool BedPresenceEngine::calibration_converged() {
+  uint32_t n = this->calibration_histogram_.count();
+  float mu, sigma;
+  compute_median_sigma(this->calibration_histogram_, &mu, &sigma);
 
-  size_t mid = values.size() / 2;
-  std::nth_element(values.begin(), values.begin() + mid, values.end());
-  float median = values[mid];
+  // Asymptotic standard errors for Gaussian data: SE(median) ≈ 1.2533σ/√n, SE(1.4826·MAD) ≈ 1.1627σ/√n
+  float root_n = std::sqrt(static_cast<float>(n));
+  float se_mu = 1.2533f * sigma / root_n;
+  float se_sigma = 1.1627f * sigma / root_n;
 
-  if (values.size() % 2 == 0) {
-    std::nth_element(values.begin(), values.begin() + mid - 1, values.end());
-    median = (median + values[mid - 1]) / 2.0f;
-  }
-  return median;
+  bool settled = std::fabs(mu - this->calibration_last_mu_) <= this->calibration_mu_tolerance_ &&
+                 std::fabs(sigma - this->calibration_last_sigma_) <= this->calibration_sigma_tolerance_;
+  this->calibration_last_mu_ = mu;
+  this->calibration_last_sigma_ = sigma;
+
+  bool precise = se_mu <= this->calibration_mu_tolerance_ && se_sigma <= this->calibration_sigma_tolerance_;
+  this->calibration_stable_count_ = (settled && precise) ? this->calibration_stable_count_ + 1 : 0;
+
+  ESP_LOGD(TAG, "Calibration check n=%u: mu=%.2f (SE %.3f), sigma=%.2f (SE %.3f), stable %u/%u",
+           static_cast<unsigned>(n), mu, se_mu, sigma, se_sigma, static_cast<unsigned>(this->calibration_stable_count_),
+           static_cast<unsigned>(this->calibration_stable_checks_));
+
+  return n >= this->calibration_min_samples_ && this->calibration_stable_count_ >= this->calibration_stable_checks_;
 }
 
-void BedPresenceEngine::finalize_calibration() {
+void BedPresenceEngine::finalize_calibration(const char *change_reason) {
   if (!this->calibrating_) {
     return;
   }
 
   this->calibrating_ = false;
+  this->calibration_until_converged_ = false;
+
+#ifdef USE_BED_PRESENCE_ZONES
+  // Zones calibrate from their own in-window frames of the same run
+  for (auto *zone : this->zones_) {
+    if (zone->finish_calibration()) {
+      this->schedule_persist();
+    }
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  // So do the gates; gates without frames keep their previous baseline
+  if (this->gates_enabled_) {
+    size_t gates = this->gate_baselines_.finish_calibration();
+    ESP_LOGI(TAG, "Gate baselines: %u of %u gates calibrated", static_cast<unsigned>(gates),
+             static_cast<unsigned>(GATE_COUNT));
+    if (gates > 0) {
+      this->schedule_persist();
+    }
+  }
+#endif
 
-  if (this->calibration_samples_.empty()) {
+  if (this->calibration_histogram_.count() == 0) {
     ESP_LOGW(TAG, "Calibration finished with no samples collected");
     this->publish_reason("Calibration failed: no samples");
     this->publish_change_reason("calibration:insufficient_samples");
     return;
   }
 
-  auto samples = this->calibration_samples_;
-  this->calibration_samples_.clear();
+  uint32_t n = this->calibration_histogram_.count();
+  float median, sigma;
+  compute_median_sigma(this->calibration_histogram_, &median, &sigma);
+  this->calibration_histogram_.clear();
 
-  float median = compute_median(samples);
-  std::vector<float> deviations(samples.size());
-  for (size_t i = 0; i < samples.size(); ++i) {
-    deviations[i] = std::fabs(samples[i] - median);
-  }
-  float mad = compute_median(deviations);
-  float sigma = mad * 1.4826f;
-  if (sigma < 0.05f) {
-    sigma = 0.05f;
-  }
+  ESP_LOGI(TAG, "Calibration complete: mu=%.2f, sigma=%.2f (samples=%u, %s)", median, sigma,
+           static_cast<unsigned>(n), change_reason);
 
-  this->mu_still_ = median;
-  this->sigma_still_ = sigma;
-
-  ESP_LOGI(TAG, "Calibration complete: mu=%.2f, sigma=%.2f (samples=%u)", median, sigma,
-           static_cast<unsigned>(samples.size()));
+#ifdef USE_BED_PRESENCE_FUSION
+  // The moving channel is calibrated from the same frames; convergence is judged on still energy alone
+  if (this->moving_calibration_histogram_.count() > 0) {
+    compute_median_sigma(this->moving_calibration_histogram_, &this->mu_stat_, &this->sigma_stat_);
+    ESP_LOGI(TAG, "Moving energy baseline: mu=%.2f, sigma=%.2f (samples=%u)", this->mu_stat_, this->sigma_stat_,
+             static_cast<unsigned>(this->moving_calibration_histogram_.count()));
+    this->moving_calibration_histogram_.clear();
+  }
+#endif
+  this->store_baseline(median, sigma);
 
   char summary[96];
   snprintf(summary, sizeof(summary), "Calibration complete: μ=%.2f, σ=%.2f, n=%u", median, sigma,
-           static_cast<unsigned>(samples.size()));
+           static_cast<unsigned>(n));
   this->publish_reason(summary);
-  this->publish_change_reason("calibration:completed");
+  this->publish_change_reason(change_reason);
+}
+
+PersistedConfig BedPresenceEngine::snapshot_config() const {
+  PersistedConfig config{};
+  config.mu_still = this->mu_still_;
+  config.sigma_still = this->sigma_still_;
+  config.k_on = this->k_on_;
+  config.k_off = this->k_off_;
+  config.on_debounce_ms = this->on_debounce_ms_;
+  config.off_debounce_ms = this->off_debounce_ms_;
+  config.abs_clear_delay_ms = this->abs_clear_delay_ms_;
+  config.d_min_cm = this->d_min_cm_;
+  config.d_max_cm = this->d_max_cm_;
+  config.mu_moving = this->mu_stat_;
+  config.sigma_moving = this->sigma_stat_;
+  return config;
+}
+
+void BedPresenceEngine::apply_config(const PersistedConfig &config) {
+  this->mu_still_ = config.mu_still;
+  this->sigma_still_ = config.sigma_still;
+  this->k_on_ = config.k_on;
+  this->k_off_ = config.k_off;
+  this->on_debounce_ms_ = config.on_debounce_ms;
+  this->off_debounce_ms_ = config.off_debounce_ms;
+  this->abs_clear_delay_ms_ = config.abs_clear_delay_ms;
+  this->d_min_cm_ = config.d_min_cm;
+  this->d_max_cm_ = config.d_max_cm;
+  this->mu_stat_ = config.mu_moving;
+  this->sigma_stat_ = config.sigma_moving;
 }
 
+void BedPresenceEngine::restore_config() {
+  this->config_pref_ = global_preferences->make_preference<PersistedConfig>(
+      this->get_object_id_hash() ^ PERSISTED_CONFIG_VERSION, true);
+  // Until something changes, the compiled configuration is what flash would hold
+  this->persisted_config_ = this->snapshot_config();
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    zone->restore_baseline();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  if (this->gates_enabled_) {
+    this->gate_baselines_.restore(this->get_object_id_hash() ^ GATE_BASELINES_PREF_SALT ^
+                                  GateBaselines::PERSISTED_VERSION);
+  }
+#endif
+
+  PersistedConfig stored{};
+  if (!this->config_pref_.load(&stored)) {
+    ESP_LOGCONFIG(TAG, "  No persisted parameters, using configured values");
+    return;
+  }
+
+  bool valid = std::isfinite(stored.mu_still) && std::isfinite(stored.sigma_still) && stored.sigma_still > 0.001f &&
+               std::isfinite(stored.k_on) && std::isfinite(stored.k_off) && std::isfinite(stored.d_min_cm) &&
+               std::isfinite(stored.d_max_cm) && stored.d_min_cm <= stored.d_max_cm &&
+               std::isfinite(stored.mu_moving) && std::isfinite(stored.sigma_moving) && stored.sigma_moving > 0.001f;
+  if (!valid) {
+    ESP_LOGW(TAG, "Ignoring invalid persisted parameters (mu=%.2f, sigma=%.2f)", stored.mu_still, stored.sigma_still);
+    return;
+  }
+
+  this->apply_config(stored);
+  this->persisted_config_ = stored;
+  ESP_LOGCONFIG(TAG, "  Restored persisted parameters");
+}
+
+void BedPresenceEngine::schedule_persist() {
+  if (!this->persist_parameters_) {
+    return;
+  }
+  // Every change restarts the quiet period
+  this->persist_pending_ = true;
+  this->persist_requested_time_ = millis();
+}
+
+void BedPresenceEngine::persist_config_if_due() {
+  if (!this->persist_pending_ || (millis() - this->persist_requested_time_) < PERSIST_DELAY_MS) {
+    return;
+  }
+  this->persist_pending_ = false;
+
+#ifdef USE_BED_PRESENCE_ZONES
+  for (auto *zone : this->zones_) {
+    zone->persist_baseline();
+  }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  this->gate_baselines_.persist();
+#endif
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  this->baseline_tracker_.persist();
+#endif
+
+  PersistedConfig config = this->snapshot_config();
+  if (std::memcmp(&config, &this->persisted_config_, sizeof(config)) == 0) {
+    ESP_LOGD(TAG, "Persisted parameters unchanged, skipping flash write");
+    return;
+  }
+
+  if (this->config_pref_.save(&config)) {
+    this->persisted_config_ = config;
+    ESP_LOGI(TAG, "Persisted parameters: mu=%.2f, sigma=%.2f, k_on=%.2f, k_off=%.2f", config.mu_still,
+             config.sigma_still, config.k_on, config.k_off);
+  } else {
+    ESP_LOGW(TAG, "Failed to persist parameters");
+  }
+}
+
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+bool BedPresenceEngine::load_warm_restart_snapshot() {
+  const WarmRestartSnapshot snapshot = rtc_snapshot;
+  if (snapshot.magic != WARM_RESTART_MAGIC || snapshot.checksum != snapshot_checksum(snapshot)) {
+    ESP_LOGCONFIG(TAG, "  Warm restart: no snapshot (power-on reset), cold start");
+    return false;
+  }
+  if (snapshot.state != PRESENT && snapshot.state != DEBOUNCING_OFF) {
+    ESP_LOGCONFIG(TAG, "  Warm restart: bed was vacant, cold start");
+    return false;
+  }
+
+  int64_t age_ms = wall_clock_ms() - snapshot.saved_at_ms;
+  if (age_ms < 0 || age_ms > static_cast<int64_t>(this->warm_restart_max_age_ms_)) {
+    ESP_LOGCONFIG(TAG, "  Warm restart: snapshot is stale (%lldms old), cold start", static_cast<long long>(age_ms));
+    return false;
+  }
+
+  this->warm_restart_high_confidence_age_ms_ = snapshot.high_confidence_age_ms + static_cast<unsigned long>(age_ms);
+  ESP_LOGCONFIG(TAG, "  Warm restart: occupied %lldms ago, waiting for the first frame", static_cast<long long>(age_ms));
+  return true;
+}
+
+void BedPresenceEngine::resolve_warm_restart(float z_hold) {
+  this->warm_restart_pending_ = false;
+
+  if (z_hold < this->model_->z_thresholds.k_off) {
+    ESP_LOGI(TAG, "Warm restart rejected (z=%.2f < k_off=%.2f), cold start", z_hold, this->model_->z_thresholds.k_off);
+    this->publish_initial_state();
+    return;
+  }
+
+  // Carry the pre-reboot age of the last high-confidence frame so the absolute clear delay keeps counting
+  this->current_state_ = PRESENT;
+  this->last_high_confidence_time_ = this->warm_restart_boot_time_ - this->warm_restart_high_confidence_age_ms_;
+  this->publish_state(true);
+
+  char reason[64];
+  snprintf(reason, sizeof(reason), "ON: warm restart, z=%.2f", z_hold);
+  this->publish_reason(reason);
+  this->publish_change_reason("on:warm_restart");
+  ESP_LOGI(TAG, "Warm restart → PRESENT: %s", reason);
+}
+
+void BedPresenceEngine::save_warm_restart_snapshot(unsigned long now) {
+  if (this->current_state_ == this->last_snapshot_state_ && (now - this->last_snapshot_time_) < SNAPSHOT_INTERVAL_MS) {
+    return;
+  }
+
+  WarmRestartSnapshot snapshot{};
+  snapshot.magic = WARM_RESTART_MAGIC;
+  snapshot.state = this->current_state_;
+  snapshot.saved_at_ms = wall_clock_ms();
+  snapshot.high_confidence_age_ms = now - this->last_high_confidence_time_;
+  snapshot.checksum = snapshot_checksum(snapshot);
+  rtc_snapshot = snapshot;
+
+  this->last_snapshot_time_ = now;
+  this->last_snapshot_state_ = this->current_state_;
+}
+#endif
 
 }  // namespace bed_presence_engine
 }  // namespace esphome
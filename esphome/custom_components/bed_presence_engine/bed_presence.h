@@ -1,21 +1,105 @@
 #pragma once
 
 #include "esphome/core/component.h"
+#include "esphome/core/defines.h"
+#include "esphome/core/preferences.h"
 #include "esphome/components/binary_sensor/binary_sensor.h"
 #include "esphome/components/sensor/sensor.h"
 #include "esphome/components/text_sensor/text_sensor.h"
+#include "baseline_tracker.h"
+#include "flight_recorder.h"
+#include "frame_stream.h"
+#include "gate_baselines.h"
+#include "prefilter.h"
+#include "publish_scheduler.h"
+#include "state_machine.h"
+#include "streaming_stats.h"
+#include "threshold_learner.h"
+#include "threshold_model.h"
+#include "zone.h"
+#include <cmath>
 #include <string>
 #include <vector>
 
 namespace esphome {
 namespace bed_presence_engine {
 
-// Phase 2: State machine states
-enum State {
-  IDLE,           // No presence detected (binary sensor: OFF)
-  DEBOUNCING_ON,  // High signal detected, timer running (binary sensor: OFF)
-  PRESENT,        // Confirmed presence (binary sensor: ON)
-  DEBOUNCING_OFF  // Low signal detected, timer running (binary sensor: ON)
+// How the still and moving energy z-scores drive the state machine. The
+// vacant states (IDLE, DEBOUNCING_ON) compare the "arm" score against k_on;
+// the occupied states (PRESENT, DEBOUNCING_OFF) use the "hold" score.
+enum FusionMode : uint8_t {
+  FUSION_STILL,        // Still energy only (Phase 2 behaviour)
+  FUSION_MAX,          // max(z_still, z_moving) for both
+  FUSION_WEIGHTED,     // w·z_moving + (1 - w)·z_still for both
+  FUSION_MOVING_ARMS,  // Arm on max(z_still, z_moving), hold on z_still
+};
+
+// Diagnostic sensors published once per telemetry window
+enum TelemetryStat : uint8_t {
+  TELEMETRY_FRAMES,
+  TELEMETRY_ENERGY_MIN,
+  TELEMETRY_ENERGY_MEAN,
+  TELEMETRY_ENERGY_MAX,
+  TELEMETRY_ENERGY_P95,
+  TELEMETRY_Z_MIN,
+  TELEMETRY_Z_MEAN,
+  TELEMETRY_Z_MAX,
+  TELEMETRY_Z_P95,
+  TELEMETRY_Z_P95_CLAMPED,  // 1 when z_p95 is only the edge of the z histogram (-10 to 40) and the true p95 lies beyond
+  TELEMETRY_BASELINE_MU,
+  TELEMETRY_BASELINE_SIGMA,
+  TELEMETRY_STAT_COUNT,
+};
+
+// Diagnostic sensors describing the engine's own load, published once per instrumentation window
+enum InstrumentationStat : uint8_t {
+  INSTRUMENTATION_FRAMES_RECEIVED,           // Energy readings delivered by the radar, per second
+  INSTRUMENTATION_FRAMES_PROCESSED,          // Frames run through the engine (new and held), per second
+  INSTRUMENTATION_FRAMES_DROPPED,            // Energy readings replaced before loop() processed them
+  INSTRUMENTATION_LOOP_TIME_MEAN,            // µs per loop() call
+  INSTRUMENTATION_LOOP_TIME_MAX,
+  INSTRUMENTATION_PROCESS_TIME_MEAN,         // µs per process_energy_reading() call
+  INSTRUMENTATION_PROCESS_TIME_MAX,
+  INSTRUMENTATION_CALIBRATION_PEAK_SAMPLES,  // Largest calibration run since boot (samples)
+  INSTRUMENTATION_PUBLISHES,                 // Occupancy changes plus reason text publishes
+  INSTRUMENTATION_STAT_COUNT,
+};
+
+// Baseline and tunables persisted to flash. Bump PERSISTED_CONFIG_VERSION
+// whenever the layout changes so stale records are ignored instead of misread.
+struct PersistedConfig {
+  float mu_still;
+  float sigma_still;
+  float k_on;
+  float k_off;
+  uint32_t on_debounce_ms;
+  uint32_t off_debounce_ms;
+  uint32_t abs_clear_delay_ms;
+  float d_min_cm;
+  float d_max_cm;
+  float mu_moving;
+  float sigma_moving;
+};
+
+// The runtime-tunable knobs (the HA number entities), applied together by
+// apply_parameters() and stored as named profiles
+struct PresenceProfile {
+  float k_on;
+  float k_off;
+  uint32_t on_debounce_ms;
+  uint32_t off_debounce_ms;
+  uint32_t abs_clear_delay_ms;
+  float d_min_cm;
+  float d_max_cm;
+};
+
+// State machine snapshot kept in RTC memory for warm restarts
+struct WarmRestartSnapshot {
+  uint32_t magic;
+  uint32_t state;
+  int64_t saved_at_ms;               // Wall-clock time (RTC-backed, survives software resets)
+  uint32_t high_confidence_age_ms;   // Time since the last high-confidence frame when saved
+  uint32_t checksum;
 };
 
 /**
@@ -36,18 +120,123 @@ class BedPresenceEngine : public Component, public binary_sensor::BinarySensor {
 
   // Configuration setters
   void set_energy_sensor(sensor::Sensor *sensor) { energy_sensor_ = sensor; }
+  void set_mu_still(float mu) { mu_still_ = mu; }
+  void set_sigma_still(float sigma) { sigma_still_ = sigma; }
+  void set_mu_moving(float mu) { mu_stat_ = mu; }
+  void set_sigma_moving(float sigma) { sigma_stat_ = sigma; }
+#ifdef USE_BED_PRESENCE_FUSION
+  void set_moving_energy_sensor(sensor::Sensor *sensor) { moving_energy_sensor_ = sensor; }
+  void set_fusion_mode(FusionMode mode) { fusion_mode_ = mode; }
+  void set_fusion_moving_weight(float weight) { fusion_moving_weight_ = weight; }
+#endif
+#ifdef USE_BED_PRESENCE_PREFILTER
+  // Sliding-window pre-filter on still energy (window: odd number of frames, threshold: Hampel MADs)
+  void set_prefilter_mode(PrefilterMode mode) { prefilter_mode_ = mode; }
+  void set_prefilter_window(uint32_t frames) { prefilter_window_ = frames; }
+  void set_prefilter_threshold(float threshold) { prefilter_threshold_ = threshold; }
+#endif
   void set_k_on(float k) { k_on_ = k; }
   void set_k_off(float k) { k_off_ = k; }
   void set_on_debounce_ms(unsigned long ms) { on_debounce_ms_ = ms; }
   void set_off_debounce_ms(unsigned long ms) { off_debounce_ms_ = ms; }
   void set_abs_clear_delay_ms(unsigned long ms) { abs_clear_delay_ms_ = ms; }
-  void set_state_reason_sensor(text_sensor::TextSensor *sensor) { state_reason_sensor_ = sensor; }
-  void set_last_change_reason_sensor(text_sensor::TextSensor *sensor) { last_change_reason_sensor_ = sensor; }
+  void set_state_reason_sensor(text_sensor::TextSensor *sensor) { state_reason_publisher_.set_sensor(sensor); }
+  void set_last_change_reason_sensor(text_sensor::TextSensor *sensor) { change_reason_publisher_.set_sensor(sensor); }
+  void set_reason_publish_window_ms(uint32_t ms) {
+    state_reason_publisher_.set_window_ms(ms);
+    change_reason_publisher_.set_window_ms(ms);
+  }
   void set_distance_sensor(sensor::Sensor *sensor) { distance_sensor_ = sensor; }
   void set_d_min_cm(float value) { d_min_cm_ = value; }
   void set_d_max_cm(float value) { d_max_cm_ = value; }
+  void set_calibration_mu_tolerance(float value) { calibration_mu_tolerance_ = value; }
+  void set_calibration_sigma_tolerance(float value) { calibration_sigma_tolerance_ = value; }
+  void set_calibration_min_samples(uint32_t value) { calibration_min_samples_ = value; }
+  void set_calibration_stable_checks(uint32_t value) { calibration_stable_checks_ = value; }
+  void set_persist_parameters(bool persist) { persist_parameters_ = persist; }
+  void set_frame_hold_ms(unsigned long ms) { frame_hold_ms_ = ms; }
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  void set_flight_recorder_capacity(uint32_t frames) { flight_recorder_capacity_ = frames; }
+  void set_flight_recorder_auto_dump(bool auto_dump) { flight_recorder_auto_dump_ = auto_dump; }
+  void set_flight_recorder_sensor(text_sensor::TextSensor *sensor) { flight_recorder_sensor_ = sensor; }
+#endif
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+  // Full-rate capture: every processed frame, batched into "FS1 ..." lines (frame_stream.h)
+  void set_frame_stream_frames_per_batch(uint32_t frames) {
+    frame_stream_.set_frames_per_batch(frames);
+    frame_stream_enabled_ = true;
+  }
+  void set_frame_stream_sensor(text_sensor::TextSensor *sensor) { frame_stream_sensor_ = sensor; }
+#endif
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  void set_telemetry_window_ms(uint32_t ms) { telemetry_window_ms_ = ms; }
+  void set_telemetry_sensor(TelemetryStat stat, sensor::Sensor *sensor) {
+    telemetry_sensors_[stat] = sensor;
+    telemetry_enabled_ = true;
+  }
+#endif
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  void set_instrumentation_window_ms(uint32_t ms) { instrumentation_window_ms_ = ms; }
+  void set_instrumentation_sensor(InstrumentationStat stat, sensor::Sensor *sensor) {
+    instrumentation_sensors_[stat] = sensor;
+    instrumentation_enabled_ = true;
+  }
+#endif
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  void set_warm_restart(bool enabled) { warm_restart_ = enabled; }
+  void set_warm_restart_max_age_ms(unsigned long ms) { warm_restart_max_age_ms_ = ms; }
+#endif
+#ifdef USE_BED_PRESENCE_GATES
+  // Per-gate baselines (LD2410 engineering mode): still energy of gate 0-8 and the gates covering the bed
+  void set_gate_energy_sensor(size_t gate, sensor::Sensor *sensor) {
+    gate_energy_sensors_[gate] = sensor;
+    gates_enabled_ = true;
+  }
+  void set_gate_mask(uint16_t mask) { gate_baselines_.set_mask(mask); }
+#endif
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  // Background μ/σ tracking on confidently empty frames (baseline_tracker.h)
+  void set_baseline_tracking_time_constant_ms(uint32_t ms) {
+    baseline_tracker_.set_time_constant_ms(ms);
+    baseline_tracking_ = true;
+  }
+  void set_baseline_tracking_max_drift_per_day(float drift) { baseline_tracker_.set_max_drift_per_day(drift); }
+  void set_baseline_tracking_min_idle_ms(uint32_t ms) { baseline_tracking_min_idle_ms_ = ms; }
+  void set_mu_drift_sensor(sensor::Sensor *sensor) { mu_drift_sensor_ = sensor; }
+  void set_sigma_drift_sensor(sensor::Sensor *sensor) { sigma_drift_sensor_ = sensor; }
+#endif
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  // k_on/k_off learned from confirmed-IDLE and confirmed-occupied z-scores (threshold_learner.h)
+  void set_adaptive_threshold_mode(AdaptiveThresholdMode mode) {
+    adaptive_mode_ = mode;
+    adaptive_thresholds_ = true;
+  }
+  void set_adaptive_update_interval_ms(uint32_t ms) { adaptive_update_interval_ms_ = ms; }
+  void set_adaptive_min_state_ms(uint32_t ms) { adaptive_min_state_ms_ = ms; }
+  void set_adaptive_min_samples(uint32_t samples) { threshold_learner_.set_min_samples(samples); }
+  void set_adaptive_k_on_range(float lo, float hi) { threshold_learner_.set_k_on_range(lo, hi); }
+  void set_adaptive_k_off_min(float k) { threshold_learner_.set_k_off_min(k); }
+  void set_adaptive_min_hysteresis(float hysteresis) { threshold_learner_.set_min_hysteresis(hysteresis); }
+  void set_adaptive_max_step(float step) { threshold_learner_.set_max_step(step); }
+  void set_adaptive_half_life_ms(uint32_t ms) { threshold_learner_.set_half_life_ms(ms); }
+  void set_suggested_k_on_sensor(sensor::Sensor *sensor) { suggested_k_on_sensor_ = sensor; }
+  void set_suggested_k_off_sensor(sensor::Sensor *sensor) { suggested_k_off_sensor_ = sensor; }
+#endif
+#ifdef USE_BED_PRESENCE_ZONES
+  // Multi-zone: evaluate each frame for every zone whose distance window contains it
+  void add_zone(PresenceZone *zone) { zones_.push_back(zone); }
+#endif
+
+  // Named parameter profiles (e.g. "night", "day") for apply_profile()
+  void add_profile(const std::string &name, const PresenceProfile &profile) { profiles_.push_back({name, profile}); }
+  void set_active_profile_sensor(text_sensor::TextSensor *sensor) { active_profile_sensor_ = sensor; }
+
+  // Radar frames processed since boot (new publishes plus held frames)
+  uint32_t get_frame_count() const { return frame_count_; }
+  // Current values of the runtime-tunable knobs
+  PresenceProfile get_parameters() const;
 
-  // Public methods for runtime updates from HA
+  // Public methods for runtime updates from HA; a k_on below k_off (or k_off above k_on) is rejected
   void update_k_on(float k);
   void update_k_off(float k);
   void update_on_debounce_ms(unsigned long ms);
@@ -55,16 +244,34 @@ class BedPresenceEngine : public Component, public binary_sensor::BinarySensor {
   void update_abs_clear_delay_ms(unsigned long ms);
   void update_d_min_cm(float value);
   void update_d_max_cm(float value);
+  // Set every knob at once: one model swap, one log line, one flash write. Rejects the whole
+  // set (and changes nothing) if a value is not finite, k_off > k_on or d_min > d_max.
+  bool apply_parameters(const PresenceProfile &profile);
+  // Apply a profile from the profiles: list; false if there is no profile with that name
+  bool apply_profile(const std::string &name);
+  // Set the empty-bed baseline measured off-device (scripts/collect_baseline.py) as a calibration
+  // would; rejects a non-finite μ/σ or σ <= 0.001 and changes nothing
+  bool apply_baseline(float mu, float sigma);
 
   // Calibration + reset services
   void start_baseline_calibration(uint32_t duration_s);
+  void start_converging_calibration(uint32_t max_duration_s);
   void stop_baseline_calibration();
   void reset_to_defaults();
+  // Logs a warning when the flight recorder is not configured (or compiled out), so the service always exists
+  void dump_flight_recorder();
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  // Suggest (and in apply mode, apply) thresholds from the histograms now instead of at the next interval
+  void update_adaptive_thresholds();
+#endif
 
  protected:
   // Input sensor
   sensor::Sensor *energy_sensor_{nullptr};
   sensor::Sensor *distance_sensor_{nullptr};
+#ifdef USE_BED_PRESENCE_FUSION
+  sensor::Sensor *moving_energy_sensor_{nullptr};
+#endif
 
   // Baseline calibration collected on 2025-11-06 18:39:42
   // Location: New sensor position looking at bed
@@ -73,8 +280,24 @@ class BedPresenceEngine : public Component, public binary_sensor::BinarySensor {
   // Phase 2: Renamed from mu_move_/sigma_move_ for semantic correctness (measures still_energy)
   float mu_still_{6.7f};    // Mean still energy (empty bed)
   float sigma_still_{3.5f}; // Std dev still energy (empty bed)
-  float mu_stat_{6.7f};     // Reserved for Phase 3 (moving energy fusion)
-  float sigma_stat_{3.5f};  // Reserved for Phase 3 (moving energy fusion)
+  float mu_stat_{6.7f};     // Mean moving energy (empty bed), fusion channel
+  float sigma_stat_{3.5f};  // Std dev moving energy (empty bed), fusion channel
+
+#ifdef USE_BED_PRESENCE_FUSION
+  // Phase 3: Still + moving energy fusion (opt-in; FUSION_STILL ignores the moving channel)
+  FusionMode fusion_mode_{FUSION_STILL};
+  float fusion_moving_weight_{0.5f};  // w for FUSION_WEIGHTED
+#endif
+
+#ifdef USE_BED_PRESENCE_PREFILTER
+  // Robust pre-filter between the radar and everything downstream (opt-in). New frames go through
+  // the filter once; held frames reuse the last output so re-processing does not refill the window.
+  PrefilterMode prefilter_mode_{PREFILTER_NONE};
+  uint32_t prefilter_window_{5};
+  float prefilter_threshold_{3.0f};
+  SlidingPrefilter prefilter_;
+  float prefiltered_energy_{NAN};
+#endif
 
   // Threshold multipliers (k_on > k_off for hysteresis)
   float k_on_{9.0f};   // Turn ON when z > k_on (default: 9 std deviations)
@@ -84,6 +307,146 @@ class BedPresenceEngine : public Component, public binary_sensor::BinarySensor {
   float d_min_cm_{0.0f};
   float d_max_cm_{600.0f};
 
+  // Event-driven input: the still energy callback flags a new frame and loop()
+  // processes it once, pairing the energy with the latest distance. The LD2410
+  // only publishes readings that changed, so an unchanged reading is
+  // re-processed as a held frame every frame_hold_ms_ (0 disables) to keep
+  // timers moving. Calibration and the statistics count held frames too, so a
+  // reading weighs in proportion to how long it stood (at frame_hold_ms_ steps).
+  bool frame_pending_{false};
+  uint32_t frame_count_{0};
+  unsigned long last_frame_time_{0};
+  unsigned long frame_hold_ms_{1000};
+
+  // Windowed telemetry: aggregates of the in-window frames (new and held) fed
+  // to the state machine. The z summaries are of the score each frame was
+  // judged on (fused or per-gate where configured), under the baseline of
+  // that moment, so a recalibration mid-window does not rescale earlier frames.
+#ifdef USE_BED_PRESENCE_TELEMETRY
+  void publish_telemetry_if_due(unsigned long now);
+  bool telemetry_enabled_{false};
+  uint32_t telemetry_window_ms_{60000};
+  unsigned long telemetry_window_start_{0};
+  EnergyWindow telemetry_window_;
+  EnergyWindow telemetry_z_window_{-10.0f, 0.25f};  // Same range as ZHistogram
+  sensor::Sensor *telemetry_sensors_[TELEMETRY_STAT_COUNT]{};
+#endif
+
+  struct NamedProfile {
+    std::string name;
+    PresenceProfile profile;
+  };
+  // apply_parameters() without the active-profile publish, so apply_profile() can publish the name alone
+  bool store_parameters(const PresenceProfile &profile);
+  void publish_active_profile(const char *name);
+  // A new still-energy baseline: becomes the drift reference, restarts the threshold learner, persists
+  void store_baseline(float mu, float sigma);
+  std::vector<NamedProfile> profiles_;
+  text_sensor::TextSensor *active_profile_sensor_{nullptr};
+
+  // Instrumentation: frame rates and drops, loop()/process_energy_reading()
+  // cost and publish counts over a window (all counters reset per window
+  // except the calibration peak). loop() times run_loop() when enabled.
+  void run_loop();
+#ifdef USE_BED_PRESENCE_INSTRUMENTATION
+  void publish_instrumentation_if_due(unsigned long now);
+  bool instrumentation_enabled_{false};
+  uint32_t instrumentation_window_ms_{60000};
+  unsigned long instrumentation_window_start_{0};
+  sensor::Sensor *instrumentation_sensors_[INSTRUMENTATION_STAT_COUNT]{};
+  bool energy_pending_{false};  // An energy reading arrived that loop() has not processed yet
+  uint32_t frames_received_{0};
+  uint32_t frames_processed_{0};
+  uint32_t frames_dropped_{0};
+  uint32_t state_publishes_{0};
+  uint32_t reason_publishes_at_window_start_{0};
+  uint32_t calibration_peak_samples_{0};
+  DurationStats loop_time_;
+  DurationStats process_time_;
+#endif
+
+  // Flight recorder: the last flight_recorder_capacity_ frames, frozen around
+  // transitions and dumped as "FR1 ..." lines to the logger and optional text sensor.
+  // Both it and the frame stream keep the radar's still energy (raw_energy) and the
+  // z-score of the energy the engine scored (after the pre-filter).
+  void record_frame(unsigned long now, float raw_energy, float energy, float moving_energy, float distance,
+                    uint8_t flags);
+#ifdef USE_BED_PRESENCE_FLIGHT_RECORDER
+  void emit_flight_recorder_line(const char *line);
+  void dump_flight_recorder_chunk();
+  FlightRecorder flight_recorder_;
+  uint32_t flight_recorder_capacity_{0};
+  bool flight_recorder_auto_dump_{false};
+  uint32_t flight_recorder_chunk_seq_{0};
+  text_sensor::TextSensor *flight_recorder_sensor_{nullptr};
+#endif
+
+#ifdef USE_BED_PRESENCE_FRAME_STREAM
+  void flush_frame_stream();
+  FrameStream frame_stream_;
+  bool frame_stream_enabled_{false};
+  text_sensor::TextSensor *frame_stream_sensor_{nullptr};
+#endif
+
+#ifdef USE_BED_PRESENCE_GATES
+  // Per-gate scoring: once calibrated, the largest z over the masked gates
+  // replaces the aggregate still energy z (gate_baselines.h). gate_energies_
+  // holds the current frame's readings (NaN when a gate has not published).
+  void read_gate_energies();
+  sensor::Sensor *gate_energy_sensors_[GATE_COUNT]{};
+  bool gates_enabled_{false};
+  float gate_energies_[GATE_COUNT]{NAN, NAN, NAN, NAN, NAN, NAN, NAN, NAN, NAN};
+  GateBaselines gate_baselines_;
+#endif
+
+#ifdef USE_BED_PRESENCE_BASELINE_TRACKING
+  // Baseline drift tracking: once the engine has been IDLE for baseline_tracking_min_idle_ms_, every
+  // in-window frame feeds the tracker, and μ/σ follow its estimate at a bounded rate.
+  // Drifted values are persisted at most once per DRIFT_PERSIST_INTERVAL_MS.
+  void track_baseline(float energy, unsigned long now, bool held);
+  void publish_drift();
+  bool baseline_tracking_{false};
+  BaselineTracker baseline_tracker_;
+  unsigned long baseline_tracking_min_idle_ms_{600000};
+  unsigned long idle_since_{0};
+  unsigned long last_drift_persist_time_{0};
+  sensor::Sensor *mu_drift_sensor_{nullptr};
+  sensor::Sensor *sigma_drift_sensor_{nullptr};
+  static constexpr unsigned long DRIFT_PERSIST_INTERVAL_MS = 3600000;
+#endif
+
+#ifdef USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+  // Adaptive thresholds: frames count once the engine has been vacant (IDLE, DEBOUNCING_ON) or occupied
+  // (PRESENT, DEBOUNCING_OFF) for adaptive_min_state_ms_; vacant frames only once the bed is seen to stay
+  // empty (ThresholdLearner::add_vacant). Calibration runs never count.
+  // Calibrations and resets clear the histograms, since their z-scores belong to the old baseline.
+  void learn_thresholds(float energy, float moving_energy, unsigned long now);
+  bool adaptive_thresholds_{false};
+  AdaptiveThresholdMode adaptive_mode_{ADAPTIVE_SUGGEST};
+  ThresholdLearner threshold_learner_;
+  uint32_t adaptive_update_interval_ms_{86400000};
+  uint32_t adaptive_min_state_ms_{600000};
+  unsigned long adaptive_last_update_{0};
+  bool learning_occupied_{false};
+  unsigned long learning_since_{0};
+  sensor::Sensor *suggested_k_on_sensor_{nullptr};
+  sensor::Sensor *suggested_k_off_sensor_{nullptr};
+#endif
+
+#ifdef USE_BED_PRESENCE_ZONES
+  // Additional occupancy zones sharing this engine's frames, calibration runs and thresholds (zone.h)
+  void process_zones(float energy, float distance, unsigned long now);
+  std::vector<PresenceZone *> zones_;
+#endif
+
+  // The fields above are the editable parameters (HA updates, calibration,
+  // flash); frames only read the model built from them (threshold_model.h).
+  // rebuild_model() fills the inactive buffer and then swaps it in.
+  void rebuild_model();
+  bool scores_need_z(float moving_energy) const;
+  ThresholdModel models_[2];
+  const ThresholdModel *model_{&models_[0]};
+
   // Phase 2: State machine (replaces simple boolean)
   State current_state_{IDLE};
 
@@ -94,24 +457,79 @@ class BedPresenceEngine : public Component, public binary_sensor::BinarySensor {
   unsigned long off_debounce_ms_{5000};        // Default: 5 seconds
   unsigned long abs_clear_delay_ms_{30000};    // Default: 30 seconds
 
-  // Output sensors
-  text_sensor::TextSensor *state_reason_sensor_{nullptr};
-  text_sensor::TextSensor *last_change_reason_sensor_{nullptr};
+  // Output sensors (deduplicated and coalesced, see publish_scheduler.h)
+  CoalescingTextPublisher state_reason_publisher_;
+  CoalescingTextPublisher change_reason_publisher_;
 
   // Internal methods
-  float calculate_z_score(float energy, float mu, float sigma);
-  void process_energy_reading(float energy);
-  void publish_reason(const std::string &reason);
-  void publish_change_reason(const std::string &reason);
+  void fuse_z_scores(float energy, float moving_energy, float *z_arm, float *z_hold);
+  // Returns the z-score the state machine compared (arm while vacant, hold once occupied), or NaN when
+  // still energy alone was compared as energy and nothing needed the z-score
+  float process_energy_reading(float energy, float moving_energy = NAN);
+  void publish_reason(const char *reason);
+  void publish_change_reason(const char *reason);
+  void publish_initial_state();
 
   // Calibration helpers
-  void handle_calibration_sample(float energy);
-  void finalize_calibration();
+  void handle_calibration_sample(float energy, float moving_energy);
+  bool calibration_converged();
+  void finalize_calibration(const char *change_reason = "calibration:completed");
 
   bool calibrating_{false};
   unsigned long calibration_end_time_{0};
-  std::vector<float> calibration_samples_;
-  static constexpr size_t MAX_CALIBRATION_SAMPLES = 4096;
+  EnergyHistogram calibration_histogram_{0.0f, 0.5f};  // Constant-memory median/MAD (no sample buffer)
+#ifdef USE_BED_PRESENCE_FUSION
+  EnergyHistogram moving_calibration_histogram_{0.0f, 0.5f};  // Same pass, moving channel (when configured)
+#endif
+
+  // Convergence-driven calibration: stop once the standard errors of μ/σ are
+  // within tolerance and the estimates have settled across consecutive checks
+  bool calibration_until_converged_{false};
+  float calibration_mu_tolerance_{0.25f};     // Max SE(μ) and change in μ between checks (%)
+  float calibration_sigma_tolerance_{0.25f};  // Max SE(σ) and change in σ between checks (%)
+  uint32_t calibration_min_samples_{50};
+  uint32_t calibration_stable_checks_{3};
+  uint32_t calibration_stable_count_{0};
+  float calibration_last_mu_{NAN};
+  float calibration_last_sigma_{NAN};
+  static constexpr size_t CALIBRATION_CHECK_INTERVAL = 25;  // Samples between convergence checks
+
+  // Flash persistence of μ/σ and the update_* tunables. Changes are written
+  // once they have been quiet for PERSIST_DELAY_MS (a slider drag becomes one
+  // write) and only if they differ from the stored record.
+  PersistedConfig snapshot_config() const;
+  void apply_config(const PersistedConfig &config);
+  void restore_config();
+  void schedule_persist();
+  void persist_config_if_due();
+
+  bool persist_parameters_{false};
+  ESPPreferenceObject config_pref_;
+  PersistedConfig persisted_config_{};  // Last record written to (or restored from) flash
+  bool persist_pending_{false};
+  unsigned long persist_requested_time_{0};
+  static constexpr uint32_t PERSISTED_CONFIG_VERSION = 2;
+  static constexpr unsigned long PERSIST_DELAY_MS = 10000;
+
+  // Warm restart: after a software reset (OTA, crash, watchdog) with a fresh
+  // PRESENT/DEBOUNCING_OFF snapshot, the first in-window frame with z >= k_off
+  // resumes PRESENT instead of re-running the on-debounce from IDLE. The
+  // pending flag stays false when compiled out, so the learners need no guard.
+  bool warm_restart_pending_{false};      // Fresh snapshot found, waiting for the first frame
+#ifdef USE_BED_PRESENCE_WARM_RESTART
+  bool load_warm_restart_snapshot();
+  void resolve_warm_restart(float z_hold);
+  void save_warm_restart_snapshot(unsigned long now);
+
+  bool warm_restart_{false};
+  unsigned long warm_restart_max_age_ms_{120000};
+  unsigned long warm_restart_high_confidence_age_ms_{0};  // As of warm_restart_boot_time_
+  unsigned long warm_restart_boot_time_{0};
+  unsigned long last_snapshot_time_{0};
+  State last_snapshot_state_{IDLE};
+  static constexpr unsigned long WARM_RESTART_FRAME_TIMEOUT_MS = 5000;  // Cold start if no frame arrives
+  static constexpr unsigned long SNAPSHOT_INTERVAL_MS = 1000;
+#endif
 };
 
 }  // namespace bed_presence_engine
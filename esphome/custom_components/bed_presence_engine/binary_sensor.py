@@ -2,9 +2,16 @@
 import esphome.codegen as cg
 import esphome.config_validation as cv
 from esphome.components import sensor, binary_sensor, text_sensor
-from esphome.const import CONF_ID, DEVICE_CLASS_OCCUPANCY
+from esphome.const import (
+    CONF_ID,
+    CONF_NAME,
+    DEVICE_CLASS_OCCUPANCY,
+    ENTITY_CATEGORY_DIAGNOSTIC,
+    STATE_CLASS_MEASUREMENT,
+    UNIT_PERCENT,
+)
 
-from . import bed_presence_engine_ns, BedPresenceEngine
+from . import bed_presence_engine_ns, BedPresenceEngine, PresenceZone
 
 # Configuration keys
 CONF_ENERGY_SENSOR = "energy_sensor"
@@ -18,8 +25,449 @@ CONF_DISTANCE_MIN = "distance_min_cm"
 CONF_DISTANCE_MAX = "distance_max_cm"
 CONF_STATE_REASON = "state_reason"
 CONF_LAST_CHANGE_REASON = "last_change_reason"
+CONF_REASON_PUBLISH_WINDOW_MS = "reason_publish_window_ms"
+CONF_CALIBRATION_MU_TOLERANCE = "calibration_mu_tolerance"
+CONF_CALIBRATION_SIGMA_TOLERANCE = "calibration_sigma_tolerance"
+CONF_CALIBRATION_MIN_SAMPLES = "calibration_min_samples"
+CONF_CALIBRATION_STABLE_CHECKS = "calibration_stable_checks"
+CONF_PERSIST_PARAMETERS = "persist_parameters"
+CONF_FRAME_HOLD_MS = "frame_hold_ms"
+CONF_TELEMETRY = "telemetry"
+CONF_INSTRUMENTATION = "instrumentation"
+CONF_FLIGHT_RECORDER = "flight_recorder"
+CONF_CAPACITY = "capacity"
+CONF_AUTO_DUMP = "auto_dump"
+CONF_DUMP = "dump"
+CONF_FRAME_STREAM = "frame_stream"
+CONF_FRAMES_PER_BATCH = "frames_per_batch"
+CONF_BATCHES = "batches"
+CONF_WINDOW_S = "window_s"
+CONF_BASELINE_TRACKING = "baseline_tracking"
+CONF_TIME_CONSTANT_H = "time_constant_h"
+CONF_MAX_DRIFT_PER_DAY = "max_drift_per_day"
+CONF_MIN_IDLE_S = "min_idle_s"
+CONF_MU_DRIFT = "mu_drift"
+CONF_SIGMA_DRIFT = "sigma_drift"
+CONF_ADAPTIVE_THRESHOLDS = "adaptive_thresholds"
+CONF_UPDATE_INTERVAL_H = "update_interval_h"
+CONF_MIN_STATE_S = "min_state_s"
+CONF_MIN_SAMPLES = "min_samples"
+CONF_K_ON_MIN = "k_on_min"
+CONF_K_ON_MAX = "k_on_max"
+CONF_K_OFF_MIN = "k_off_min"
+CONF_MIN_HYSTERESIS = "min_hysteresis"
+CONF_MAX_STEP = "max_step"
+CONF_HALF_LIFE_H = "half_life_h"
+CONF_SUGGESTED_K_ON = "suggested_k_on"
+CONF_SUGGESTED_K_OFF = "suggested_k_off"
+CONF_FUSION = "fusion"
+CONF_MOVING_ENERGY_SENSOR = "moving_energy_sensor"
+CONF_MODE = "mode"
+CONF_MOVING_WEIGHT = "moving_weight"
+CONF_PREFILTER = "prefilter"
+CONF_WINDOW = "window"
+CONF_THRESHOLD = "threshold"
+CONF_ZONES = "zones"
+CONF_PROFILES = "profiles"
+CONF_ACTIVE_PROFILE = "active_profile"
+CONF_GATES = "gates"
+CONF_STILL_ENERGY_SENSORS = "still_energy_sensors"
+CONF_BED_GATES = "bed_gates"
+CONF_PIPELINE = "pipeline"
 
-CONFIG_SCHEMA = binary_sensor.binary_sensor_schema(
+PresenceProfile = bed_presence_engine_ns.struct("PresenceProfile")
+
+FusionMode = bed_presence_engine_ns.enum("FusionMode")
+FUSION_MODES = {
+    "still": FusionMode.FUSION_STILL,
+    "max": FusionMode.FUSION_MAX,
+    "weighted": FusionMode.FUSION_WEIGHTED,
+    "moving_arms": FusionMode.FUSION_MOVING_ARMS,
+}
+
+PrefilterMode = bed_presence_engine_ns.enum("PrefilterMode")
+PREFILTER_MODES = {
+    "median": PrefilterMode.PREFILTER_MEDIAN,
+    "hampel": PrefilterMode.PREFILTER_HAMPEL,
+}
+
+
+def _validate_odd_window(value):
+    value = cv.int_range(min=3, max=31)(value)
+    if value % 2 == 0:
+        raise cv.Invalid("window must be an odd number of frames")
+    return value
+
+
+TelemetryStat = bed_presence_engine_ns.enum("TelemetryStat")
+
+# Telemetry sensor key -> (TelemetryStat, unit, accuracy)
+TELEMETRY_SENSORS = {
+    "frames": (TelemetryStat.TELEMETRY_FRAMES, None, 0),
+    "energy_min": (TelemetryStat.TELEMETRY_ENERGY_MIN, UNIT_PERCENT, 1),
+    "energy_mean": (TelemetryStat.TELEMETRY_ENERGY_MEAN, UNIT_PERCENT, 2),
+    "energy_max": (TelemetryStat.TELEMETRY_ENERGY_MAX, UNIT_PERCENT, 1),
+    "energy_p95": (TelemetryStat.TELEMETRY_ENERGY_P95, UNIT_PERCENT, 1),
+    "z_min": (TelemetryStat.TELEMETRY_Z_MIN, None, 2),
+    "z_mean": (TelemetryStat.TELEMETRY_Z_MEAN, None, 2),
+    "z_max": (TelemetryStat.TELEMETRY_Z_MAX, None, 2),
+    "z_p95": (TelemetryStat.TELEMETRY_Z_P95, None, 2),
+    "z_p95_clamped": (TelemetryStat.TELEMETRY_Z_P95_CLAMPED, None, 0),
+    "baseline_mu": (TelemetryStat.TELEMETRY_BASELINE_MU, UNIT_PERCENT, 2),
+    "baseline_sigma": (TelemetryStat.TELEMETRY_BASELINE_SIGMA, UNIT_PERCENT, 2),
+}
+
+TELEMETRY_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_WINDOW_S, default=60): cv.int_range(min=5, max=3600),
+        **{
+            cv.Optional(key): sensor.sensor_schema(
+                unit_of_measurement=unit,
+                accuracy_decimals=accuracy,
+                state_class=STATE_CLASS_MEASUREMENT,
+                entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+            )
+            for key, (_, unit, accuracy) in TELEMETRY_SENSORS.items()
+        },
+    }
+)
+InstrumentationStat = bed_presence_engine_ns.enum("InstrumentationStat")
+
+UNIT_FRAMES_PER_SECOND = "frames/s"
+UNIT_MICROSECONDS = "µs"
+
+# Instrumentation sensor key -> (InstrumentationStat, unit, accuracy)
+INSTRUMENTATION_SENSORS = {
+    "frames_received": (InstrumentationStat.INSTRUMENTATION_FRAMES_RECEIVED, UNIT_FRAMES_PER_SECOND, 2),
+    "frames_processed": (InstrumentationStat.INSTRUMENTATION_FRAMES_PROCESSED, UNIT_FRAMES_PER_SECOND, 2),
+    "frames_dropped": (InstrumentationStat.INSTRUMENTATION_FRAMES_DROPPED, None, 0),
+    "loop_time_mean": (InstrumentationStat.INSTRUMENTATION_LOOP_TIME_MEAN, UNIT_MICROSECONDS, 1),
+    "loop_time_max": (InstrumentationStat.INSTRUMENTATION_LOOP_TIME_MAX, UNIT_MICROSECONDS, 0),
+    "process_time_mean": (InstrumentationStat.INSTRUMENTATION_PROCESS_TIME_MEAN, UNIT_MICROSECONDS, 1),
+    "process_time_max": (InstrumentationStat.INSTRUMENTATION_PROCESS_TIME_MAX, UNIT_MICROSECONDS, 0),
+    "calibration_peak_samples": (InstrumentationStat.INSTRUMENTATION_CALIBRATION_PEAK_SAMPLES, None, 0),
+    "publishes": (InstrumentationStat.INSTRUMENTATION_PUBLISHES, None, 0),
+}
+
+INSTRUMENTATION_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_WINDOW_S, default=300): cv.int_range(min=10, max=3600),
+        **{
+            cv.Optional(key): sensor.sensor_schema(
+                unit_of_measurement=unit,
+                accuracy_decimals=accuracy,
+                state_class=STATE_CLASS_MEASUREMENT,
+                entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+            )
+            for key, (_, unit, accuracy) in INSTRUMENTATION_SENSORS.items()
+        },
+    }
+)
+
+_DRIFT_SENSOR_SCHEMA = sensor.sensor_schema(
+    unit_of_measurement=UNIT_PERCENT,
+    accuracy_decimals=2,
+    state_class=STATE_CLASS_MEASUREMENT,
+    entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+)
+
+BASELINE_TRACKING_SCHEMA = cv.Schema(
+    {
+        cv.Optional(CONF_TIME_CONSTANT_H, default=6.0): cv.float_range(min=0.5, max=168.0),
+        cv.Optional(CONF_MAX_DRIFT_PER_DAY, default=1.0): cv.float_range(min=0.05, max=10.0),
+        cv.Optional(CONF_MIN_IDLE_S, default=600): cv.int_range(min=60, max=86400),
+        cv.Optional(CONF_MU_DRIFT): _DRIFT_SENSOR_SCHEMA,
+        cv.Optional(CONF_SIGMA_DRIFT): _DRIFT_SENSOR_SCHEMA,
+    }
+)
+
+AdaptiveThresholdMode = bed_presence_engine_ns.enum("AdaptiveThresholdMode")
+ADAPTIVE_THRESHOLD_MODES = {
+    "suggest": AdaptiveThresholdMode.ADAPTIVE_SUGGEST,
+    "apply": AdaptiveThresholdMode.ADAPTIVE_APPLY,
+}
+
+
+def _validate_adaptive_bounds(config):
+    if config[CONF_K_ON_MIN] >= config[CONF_K_ON_MAX]:
+        raise cv.Invalid(f"{CONF_K_ON_MIN} must be below {CONF_K_ON_MAX}")
+    if config[CONF_K_OFF_MIN] + config[CONF_MIN_HYSTERESIS] > config[CONF_K_ON_MAX]:
+        raise cv.Invalid(f"{CONF_K_OFF_MIN} + {CONF_MIN_HYSTERESIS} must not exceed {CONF_K_ON_MAX}")
+    return config
+
+
+_SUGGESTED_K_SCHEMA = sensor.sensor_schema(
+    accuracy_decimals=2,
+    state_class=STATE_CLASS_MEASUREMENT,
+    entity_category=ENTITY_CATEGORY_DIAGNOSTIC,
+)
+
+ADAPTIVE_THRESHOLDS_SCHEMA = cv.All(
+    cv.Schema(
+        {
+            cv.Optional(CONF_MODE, default="suggest"): cv.enum(ADAPTIVE_THRESHOLD_MODES, lower=True),
+            cv.Optional(CONF_UPDATE_INTERVAL_H, default=24.0): cv.float_range(min=1.0, max=168.0),
+            cv.Optional(CONF_MIN_STATE_S, default=600): cv.int_range(min=60, max=86400),
+            cv.Optional(CONF_MIN_SAMPLES, default=3000): cv.int_range(min=200, max=1000000),
+            cv.Optional(CONF_K_ON_MIN, default=3.0): cv.float_range(min=0.5, max=15.0),
+            cv.Optional(CONF_K_ON_MAX, default=15.0): cv.float_range(min=0.5, max=15.0),
+            cv.Optional(CONF_K_OFF_MIN, default=1.5): cv.float_range(min=0.0, max=15.0),
+            cv.Optional(CONF_MIN_HYSTERESIS, default=1.0): cv.float_range(min=0.1, max=10.0),
+            cv.Optional(CONF_MAX_STEP, default=1.0): cv.float_range(min=0.1, max=15.0),
+            # Kept below millis() wrap-around (49.7 days)
+            cv.Optional(CONF_HALF_LIFE_H, default=168.0): cv.float_range(min=1.0, max=720.0),
+            cv.Optional(CONF_SUGGESTED_K_ON): _SUGGESTED_K_SCHEMA,
+            cv.Optional(CONF_SUGGESTED_K_OFF): _SUGGESTED_K_SCHEMA,
+        }
+    ),
+    _validate_adaptive_bounds,
+)
+
+CONF_WARM_RESTART = "warm_restart"
+CONF_WARM_RESTART_MAX_AGE_MS = "warm_restart_max_age_ms"
+
+
+def _validate_zone_window(config):
+    if config[CONF_DISTANCE_MIN] >= config[CONF_DISTANCE_MAX]:
+        raise cv.Invalid(f"{CONF_DISTANCE_MIN} must be below {CONF_DISTANCE_MAX}")
+    return config
+
+
+ZONE_SCHEMA = cv.All(
+    binary_sensor.binary_sensor_schema(
+        PresenceZone,
+        device_class=DEVICE_CLASS_OCCUPANCY
+    ).extend(
+        {
+            cv.Required(CONF_DISTANCE_MIN): cv.float_range(min=0.0, max=1000.0),
+            cv.Required(CONF_DISTANCE_MAX): cv.float_range(min=0.0, max=1000.0),
+        }
+    ),
+    _validate_zone_window,
+)
+
+
+def _validate_bed_gates(config):
+    for gate in config.get(CONF_BED_GATES, []):
+        if gate >= len(config[CONF_STILL_ENERGY_SENSORS]):
+            raise cv.Invalid(f"Gate {gate} in {CONF_BED_GATES} has no entry in {CONF_STILL_ENERGY_SENSORS}")
+    return config
+
+
+# LD2410 engineering mode: still energy of gates 0-8 (0.75 m each), in gate order
+GATES_SCHEMA = cv.All(
+    cv.Schema(
+        {
+            cv.Required(CONF_STILL_ENERGY_SENSORS): cv.All(
+                cv.ensure_list(cv.use_id(sensor.Sensor)), cv.Length(min=1, max=9)
+            ),
+            cv.Optional(CONF_BED_GATES): cv.All(cv.ensure_list(cv.int_range(min=0, max=8)), cv.Length(min=1)),
+        }
+    ),
+    _validate_bed_gates,
+)
+
+
+# Profile fields left out take the value configured on the binary sensor itself
+PROFILE_SCHEMA = cv.Schema(
+    {
+        cv.Required(CONF_NAME): cv.string_strict,
+        cv.Optional(CONF_K_ON): cv.float_range(min=0.0, max=15.0),
+        cv.Optional(CONF_K_OFF): cv.float_range(min=0.0, max=15.0),
+        cv.Optional(CONF_ON_DEBOUNCE_MS): cv.positive_int,
+        cv.Optional(CONF_OFF_DEBOUNCE_MS): cv.positive_int,
+        cv.Optional(CONF_ABS_CLEAR_DELAY_MS): cv.positive_int,
+        cv.Optional(CONF_DISTANCE_MIN): cv.float_range(min=0.0, max=1000.0),
+        cv.Optional(CONF_DISTANCE_MAX): cv.float_range(min=0.0, max=1000.0),
+    }
+)
+
+PROFILE_KEYS = (
+    CONF_K_ON,
+    CONF_K_OFF,
+    CONF_ON_DEBOUNCE_MS,
+    CONF_OFF_DEBOUNCE_MS,
+    CONF_ABS_CLEAR_DELAY_MS,
+    CONF_DISTANCE_MIN,
+    CONF_DISTANCE_MAX,
+)
+
+
+def _resolve_profiles(config):
+    names = set()
+    for profile in config.get(CONF_PROFILES, []):
+        if profile[CONF_NAME] in names:
+            raise cv.Invalid(f"Duplicate profile name '{profile[CONF_NAME]}'")
+        names.add(profile[CONF_NAME])
+        for key in PROFILE_KEYS:
+            profile.setdefault(key, config[key])
+        if profile[CONF_K_OFF] > profile[CONF_K_ON]:
+            raise cv.Invalid(f"Profile '{profile[CONF_NAME]}': {CONF_K_OFF} must not exceed {CONF_K_ON}")
+        if profile[CONF_DISTANCE_MIN] > profile[CONF_DISTANCE_MAX]:
+            raise cv.Invalid(
+                f"Profile '{profile[CONF_NAME]}': {CONF_DISTANCE_MIN} must not exceed {CONF_DISTANCE_MAX}"
+            )
+    return config
+
+
+# Declarative pipeline: a list of stages, each a single-key mapping, expanded into the flat options
+# below. The engine runs its stages in a fixed order (source, filter, distance window, gate scorer,
+# fusion, decision), and a list in any other order is rejected rather than silently reordered. The
+# filter, gate scorer and fusion stages compile out when left out; source, distance window and
+# decision are always part of the engine.
+CONF_SOURCE = "source"
+CONF_STILL_ENERGY = "still_energy"
+CONF_DISTANCE = "distance"
+CONF_MOVING_ENERGY = "moving_energy"
+CONF_GATE_STILL_ENERGY = "gate_still_energy"
+CONF_MEDIAN = "median"
+CONF_HAMPEL = "hampel"
+CONF_DISTANCE_WINDOW = "distance_window"
+CONF_MIN_CM = "min_cm"
+CONF_MAX_CM = "max_cm"
+CONF_GATE_SCORER = "gate_scorer"
+CONF_DECISION = "decision"
+
+PIPELINE_STAGES = {
+    CONF_SOURCE: cv.Schema(
+        {
+            cv.Required(CONF_STILL_ENERGY): cv.valid,
+            cv.Optional(CONF_DISTANCE): cv.valid,
+            cv.Optional(CONF_MOVING_ENERGY): cv.valid,
+            cv.Optional(CONF_GATE_STILL_ENERGY): cv.ensure_list(cv.valid),
+        }
+    ),
+    CONF_MEDIAN: cv.Schema({cv.Optional(CONF_WINDOW, default=5): _validate_odd_window}),
+    CONF_HAMPEL: cv.Schema(
+        {
+            cv.Optional(CONF_WINDOW, default=5): _validate_odd_window,
+            cv.Optional(CONF_THRESHOLD, default=3.0): cv.float_range(min=0.5, max=10.0),
+        }
+    ),
+    CONF_DISTANCE_WINDOW: cv.Schema(
+        {
+            cv.Required(CONF_MIN_CM): cv.float_range(min=0.0, max=1000.0),
+            cv.Required(CONF_MAX_CM): cv.float_range(min=0.0, max=1000.0),
+        }
+    ),
+    CONF_GATE_SCORER: cv.Schema(
+        {cv.Optional(CONF_BED_GATES): cv.All(cv.ensure_list(cv.int_range(min=0, max=8)), cv.Length(min=1))}
+    ),
+    CONF_FUSION: cv.Schema(
+        {
+            cv.Optional(CONF_MODE, default="moving_arms"): cv.one_of(*FUSION_MODES, lower=True),
+            cv.Optional(CONF_MOVING_WEIGHT, default=0.5): cv.float_range(min=0.0, max=1.0),
+        }
+    ),
+    CONF_DECISION: cv.Schema(
+        {
+            cv.Optional(CONF_K_ON): cv.float_range(min=0.0, max=15.0),
+            cv.Optional(CONF_K_OFF): cv.float_range(min=0.0, max=15.0),
+            cv.Optional(CONF_ON_DEBOUNCE_MS): cv.positive_int,
+            cv.Optional(CONF_OFF_DEBOUNCE_MS): cv.positive_int,
+            cv.Optional(CONF_ABS_CLEAR_DELAY_MS): cv.positive_int,
+        }
+    ),
+}
+
+# Position of each stage in the engine's fixed order; median and hampel are the same (filter) stage
+PIPELINE_ORDER = {
+    CONF_SOURCE: 0,
+    CONF_MEDIAN: 1,
+    CONF_HAMPEL: 1,
+    CONF_DISTANCE_WINDOW: 2,
+    CONF_GATE_SCORER: 3,
+    CONF_FUSION: 4,
+    CONF_DECISION: 5,
+}
+
+# Flat options a pipeline sets; giving both would leave it unclear which one wins
+PIPELINE_KEYS = (
+    CONF_ENERGY_SENSOR,
+    CONF_DISTANCE_SENSOR,
+    CONF_DISTANCE_MIN,
+    CONF_DISTANCE_MAX,
+    CONF_PREFILTER,
+    CONF_GATES,
+    CONF_FUSION,
+    CONF_K_ON,
+    CONF_K_OFF,
+    CONF_ON_DEBOUNCE_MS,
+    CONF_OFF_DEBOUNCE_MS,
+    CONF_ABS_CLEAR_DELAY_MS,
+)
+
+
+def _validate_pipeline_stages(value):
+    stages = {}
+    previous = None
+    for index, item in enumerate(cv.ensure_list()(value)):
+        if not isinstance(item, dict) or len(item) != 1 or next(iter(item)) not in PIPELINE_STAGES:
+            raise cv.Invalid(f"Each pipeline stage is one of: {', '.join(PIPELINE_STAGES)}", path=[index])
+        name, options = next(iter(item.items()))
+        if name in stages:
+            raise cv.Invalid(f"Duplicate pipeline stage '{name}'", path=[index])
+        if previous is not None and PIPELINE_ORDER[name] < PIPELINE_ORDER[previous]:
+            raise cv.Invalid(
+                f"Pipeline stage '{name}' must come before '{previous}'; "
+                f"the engine runs its stages in the order: {', '.join(PIPELINE_STAGES)}",
+                path=[index],
+            )
+        previous = name
+        stages[name] = PIPELINE_STAGES[name](options or {})
+    if CONF_SOURCE not in stages:
+        raise cv.Invalid(f"A pipeline needs a '{CONF_SOURCE}' stage")
+    if CONF_MEDIAN in stages and CONF_HAMPEL in stages:
+        raise cv.Invalid(f"Use either '{CONF_MEDIAN}' or '{CONF_HAMPEL}', not both")
+    return stages
+
+
+def _expand_pipeline(config):
+    if CONF_PIPELINE not in config:
+        return config
+    for key in PIPELINE_KEYS:
+        if key in config:
+            raise cv.Invalid(f"{key} is set by the {CONF_PIPELINE}; remove one of them", path=[key])
+
+    config = dict(config)
+    with cv.prepend_path(CONF_PIPELINE):
+        stages = _validate_pipeline_stages(config.pop(CONF_PIPELINE))
+    source = stages[CONF_SOURCE]
+    config[CONF_ENERGY_SENSOR] = source[CONF_STILL_ENERGY]
+    if CONF_DISTANCE in source:
+        config[CONF_DISTANCE_SENSOR] = source[CONF_DISTANCE]
+
+    for mode in (CONF_MEDIAN, CONF_HAMPEL):
+        if mode in stages:
+            config[CONF_PREFILTER] = {CONF_MODE: mode, **stages[mode]}
+
+    if CONF_DISTANCE_WINDOW in stages:
+        if CONF_DISTANCE not in source:
+            raise cv.Invalid(f"'{CONF_DISTANCE_WINDOW}' needs a '{CONF_DISTANCE}' source")
+        config[CONF_DISTANCE_MIN] = stages[CONF_DISTANCE_WINDOW][CONF_MIN_CM]
+        config[CONF_DISTANCE_MAX] = stages[CONF_DISTANCE_WINDOW][CONF_MAX_CM]
+
+    if (CONF_GATE_STILL_ENERGY in source) != (CONF_GATE_SCORER in stages):
+        raise cv.Invalid(f"'{CONF_GATE_SCORER}' and a '{CONF_GATE_STILL_ENERGY}' source go together")
+    if CONF_GATE_SCORER in stages:
+        config[CONF_GATES] = {CONF_STILL_ENERGY_SENSORS: source[CONF_GATE_STILL_ENERGY], **stages[CONF_GATE_SCORER]}
+
+    if (CONF_MOVING_ENERGY in source) != (CONF_FUSION in stages):
+        raise cv.Invalid(f"'{CONF_FUSION}' and a '{CONF_MOVING_ENERGY}' source go together")
+    if CONF_FUSION in stages:
+        config[CONF_FUSION] = {CONF_MOVING_ENERGY_SENSOR: source[CONF_MOVING_ENERGY], **stages[CONF_FUSION]}
+
+    config.update(stages.get(CONF_DECISION, {}))
+    return config
+
+
+def _validate_zones(config):
+    if config.get(CONF_ZONES) and CONF_DISTANCE_SENSOR not in config:
+        raise cv.Invalid(f"{CONF_ZONES} need a {CONF_DISTANCE_SENSOR}")
+    return config
+
+
+CONFIG_SCHEMA = cv.All(_expand_pipeline, binary_sensor.binary_sensor_schema(
     BedPresenceEngine,
     device_class=DEVICE_CLASS_OCCUPANCY
 ).extend(
@@ -33,11 +481,75 @@ CONFIG_SCHEMA = binary_sensor.binary_sensor_schema(
         cv.Optional(CONF_ABS_CLEAR_DELAY_MS, default=30000): cv.positive_int,
         cv.Optional(CONF_STATE_REASON): text_sensor.text_sensor_schema(),
         cv.Optional(CONF_LAST_CHANGE_REASON): text_sensor.text_sensor_schema(),
+        # Reason updates within this window are coalesced into one publish of the latest value
+        cv.Optional(CONF_REASON_PUBLISH_WINDOW_MS, default=1000): cv.int_range(min=0, max=60000),
         cv.Optional(CONF_DISTANCE_SENSOR): cv.use_id(sensor.Sensor),
         cv.Optional(CONF_DISTANCE_MIN, default=0.0): cv.float_range(min=0.0, max=1000.0),
         cv.Optional(CONF_DISTANCE_MAX, default=600.0): cv.float_range(min=0.0, max=1000.0),
+        # Named sets of the runtime knobs, switched as a whole with apply_profile("<name>")
+        cv.Optional(CONF_PROFILES): cv.ensure_list(PROFILE_SCHEMA),
+        cv.Optional(CONF_ACTIVE_PROFILE): text_sensor.text_sensor_schema(),
+        # Distance windows with their own baseline and occupancy, fed from the same radar frames
+        cv.Optional(CONF_ZONES): cv.ensure_list(ZONE_SCHEMA),
+        # Per-gate baselines; once calibrated, the largest z over the bed gates replaces the aggregate z
+        cv.Optional(CONF_GATES): GATES_SCHEMA,
+        # Convergence-driven calibration (start_converging_calibration)
+        cv.Optional(CONF_CALIBRATION_MU_TOLERANCE, default=0.25): cv.float_range(min=0.01, max=10.0),
+        cv.Optional(CONF_CALIBRATION_SIGMA_TOLERANCE, default=0.25): cv.float_range(min=0.01, max=10.0),
+        cv.Optional(CONF_CALIBRATION_MIN_SAMPLES, default=50): cv.int_range(min=25, max=4096),
+        cv.Optional(CONF_CALIBRATION_STABLE_CHECKS, default=3): cv.int_range(min=1, max=20),
+        # Re-process an unchanged reading after this long without a publish (0 = only on new frames)
+        cv.Optional(CONF_FRAME_HOLD_MS, default=1000): cv.int_range(min=0, max=60000),
+        # Still + moving energy fusion; the moving baseline is calibrated in the same pass as still energy
+        cv.Optional(CONF_FUSION): cv.Schema(
+            {
+                cv.Required(CONF_MOVING_ENERGY_SENSOR): cv.use_id(sensor.Sensor),
+                cv.Optional(CONF_MODE, default="moving_arms"): cv.enum(FUSION_MODES, lower=True),
+                cv.Optional(CONF_MOVING_WEIGHT, default=0.5): cv.float_range(min=0.0, max=1.0),
+            }
+        ),
+        # Sliding median / Hampel filter on still energy ahead of calibration, zones and the state machine
+        cv.Optional(CONF_PREFILTER): cv.Schema(
+            {
+                cv.Optional(CONF_MODE, default="hampel"): cv.enum(PREFILTER_MODES, lower=True),
+                cv.Optional(CONF_WINDOW, default=5): _validate_odd_window,
+                cv.Optional(CONF_THRESHOLD, default=3.0): cv.float_range(min=0.5, max=10.0),
+            }
+        ),
+        # Let μ/σ follow slow changes of the empty bed (HVAC seasons, moved furniture) while confidently IDLE
+        cv.Optional(CONF_BASELINE_TRACKING): BASELINE_TRACKING_SCHEMA,
+        # Suggest or apply k_on/k_off from the z-scores of confirmed IDLE and confirmed occupied stretches
+        cv.Optional(CONF_ADAPTIVE_THRESHOLDS): ADAPTIVE_THRESHOLDS_SCHEMA,
+        # Per-window aggregates of the frames fed to the state machine
+        cv.Optional(CONF_TELEMETRY): TELEMETRY_SCHEMA,
+        # Frame rates, drops, loop()/processing cost and publish counts of the engine itself
+        cv.Optional(CONF_INSTRUMENTATION): INSTRUMENTATION_SCHEMA,
+        # Ring buffer of recent frames (6 bytes each), frozen around transitions for post-mortems
+        cv.Optional(CONF_FLIGHT_RECORDER): cv.Schema(
+            {
+                cv.Optional(CONF_CAPACITY, default=3000): cv.int_range(min=100, max=20000),
+                cv.Optional(CONF_AUTO_DUMP, default=False): cv.boolean,
+                cv.Optional(CONF_DUMP): text_sensor.text_sensor_schema(
+                    entity_category=ENTITY_CATEGORY_DIAGNOSTIC
+                ),
+            }
+        ),
+        # Every processed frame, packed into "FS1" lines of up to 12 frames (decode with scripts/frame_stream.py)
+        cv.Optional(CONF_FRAME_STREAM): cv.Schema(
+            {
+                cv.Optional(CONF_FRAMES_PER_BATCH, default=12): cv.int_range(min=1, max=12),
+                cv.Optional(CONF_BATCHES): text_sensor.text_sensor_schema(
+                    entity_category=ENTITY_CATEGORY_DIAGNOSTIC
+                ),
+            }
+        ),
+        # Keep calibrated μ/σ and runtime-tuned parameters across reboots and OTA updates
+        cv.Optional(CONF_PERSIST_PARAMETERS, default=True): cv.boolean,
+        # Resume PRESENT after a software reset when the RTC snapshot is fresh and the first frame agrees
+        cv.Optional(CONF_WARM_RESTART, default=False): cv.boolean,
+        cv.Optional(CONF_WARM_RESTART_MAX_AGE_MS, default=120000): cv.int_range(min=1000, max=3600000),
     }
-).extend(cv.COMPONENT_SCHEMA)
+).extend(cv.COMPONENT_SCHEMA), _validate_zones, _resolve_profiles)
 
 
 async def to_code(config):
@@ -52,9 +564,42 @@ async def to_code(config):
         distance_sensor = await cg.get_variable(config[CONF_DISTANCE_SENSOR])
         cg.add(var.set_distance_sensor(distance_sensor))
 
+    # Stages and diagnostics that are not configured are compiled out of the engine (#ifdef in bed_presence.h)
+    if CONF_FUSION in config:
+        cg.add_define("USE_BED_PRESENCE_FUSION")
+        fusion = config[CONF_FUSION]
+        moving_energy_sensor = await cg.get_variable(fusion[CONF_MOVING_ENERGY_SENSOR])
+        cg.add(var.set_moving_energy_sensor(moving_energy_sensor))
+        cg.add(var.set_fusion_mode(fusion[CONF_MODE]))
+        cg.add(var.set_fusion_moving_weight(fusion[CONF_MOVING_WEIGHT]))
+
+    if CONF_PREFILTER in config:
+        cg.add_define("USE_BED_PRESENCE_PREFILTER")
+        prefilter = config[CONF_PREFILTER]
+        cg.add(var.set_prefilter_mode(prefilter[CONF_MODE]))
+        cg.add(var.set_prefilter_window(prefilter[CONF_WINDOW]))
+        cg.add(var.set_prefilter_threshold(prefilter[CONF_THRESHOLD]))
+
     cg.add(var.set_d_min_cm(config[CONF_DISTANCE_MIN]))
     cg.add(var.set_d_max_cm(config[CONF_DISTANCE_MAX]))
 
+    if CONF_GATES in config:
+        cg.add_define("USE_BED_PRESENCE_GATES")
+        gates = config[CONF_GATES]
+        for gate, sensor_id in enumerate(gates[CONF_STILL_ENERGY_SENSORS]):
+            gate_sensor = await cg.get_variable(sensor_id)
+            cg.add(var.set_gate_energy_sensor(gate, gate_sensor))
+        bed_gates = gates.get(CONF_BED_GATES, range(len(gates[CONF_STILL_ENERGY_SENSORS])))
+        cg.add(var.set_gate_mask(sum(1 << gate for gate in set(bed_gates))))
+
+    if config.get(CONF_ZONES):
+        cg.add_define("USE_BED_PRESENCE_ZONES")
+    for zone_config in config.get(CONF_ZONES, []):
+        zone = await binary_sensor.new_binary_sensor(zone_config)
+        cg.add(zone.set_d_min_cm(zone_config[CONF_DISTANCE_MIN]))
+        cg.add(zone.set_d_max_cm(zone_config[CONF_DISTANCE_MAX]))
+        cg.add(var.add_zone(zone))
+
     cg.add(var.set_k_on(config[CONF_K_ON]))
     cg.add(var.set_k_off(config[CONF_K_OFF]))
 
@@ -63,6 +608,37 @@ async def to_code(config):
     cg.add(var.set_off_debounce_ms(config[CONF_OFF_DEBOUNCE_MS]))
     cg.add(var.set_abs_clear_delay_ms(config[CONF_ABS_CLEAR_DELAY_MS]))
 
+    cg.add(var.set_calibration_mu_tolerance(config[CONF_CALIBRATION_MU_TOLERANCE]))
+    cg.add(var.set_calibration_sigma_tolerance(config[CONF_CALIBRATION_SIGMA_TOLERANCE]))
+    cg.add(var.set_calibration_min_samples(config[CONF_CALIBRATION_MIN_SAMPLES]))
+    cg.add(var.set_calibration_stable_checks(config[CONF_CALIBRATION_STABLE_CHECKS]))
+    cg.add(var.set_frame_hold_ms(config[CONF_FRAME_HOLD_MS]))
+    cg.add(var.set_persist_parameters(config[CONF_PERSIST_PARAMETERS]))
+    if config[CONF_WARM_RESTART]:
+        cg.add_define("USE_BED_PRESENCE_WARM_RESTART")
+        cg.add(var.set_warm_restart(True))
+        cg.add(var.set_warm_restart_max_age_ms(config[CONF_WARM_RESTART_MAX_AGE_MS]))
+
+    for profile in config.get(CONF_PROFILES, []):
+        cg.add(
+            var.add_profile(
+                profile[CONF_NAME],
+                cg.StructInitializer(
+                    PresenceProfile,
+                    ("k_on", profile[CONF_K_ON]),
+                    ("k_off", profile[CONF_K_OFF]),
+                    ("on_debounce_ms", profile[CONF_ON_DEBOUNCE_MS]),
+                    ("off_debounce_ms", profile[CONF_OFF_DEBOUNCE_MS]),
+                    ("abs_clear_delay_ms", profile[CONF_ABS_CLEAR_DELAY_MS]),
+                    ("d_min_cm", profile[CONF_DISTANCE_MIN]),
+                    ("d_max_cm", profile[CONF_DISTANCE_MAX]),
+                ),
+            )
+        )
+    if CONF_ACTIVE_PROFILE in config:
+        active_profile_sensor = await text_sensor.new_text_sensor(config[CONF_ACTIVE_PROFILE])
+        cg.add(var.set_active_profile_sensor(active_profile_sensor))
+
     if CONF_STATE_REASON in config:
         reason_sensor = await text_sensor.new_text_sensor(config[CONF_STATE_REASON])
         cg.add(var.set_state_reason_sensor(reason_sensor))
@@ -70,3 +646,72 @@ async def to_code(config):
     if CONF_LAST_CHANGE_REASON in config:
         change_reason_sensor = await text_sensor.new_text_sensor(config[CONF_LAST_CHANGE_REASON])
         cg.add(var.set_last_change_reason_sensor(change_reason_sensor))
+
+    cg.add(var.set_reason_publish_window_ms(config[CONF_REASON_PUBLISH_WINDOW_MS]))
+
+    if CONF_BASELINE_TRACKING in config:
+        cg.add_define("USE_BED_PRESENCE_BASELINE_TRACKING")
+        tracking = config[CONF_BASELINE_TRACKING]
+        cg.add(var.set_baseline_tracking_time_constant_ms(int(tracking[CONF_TIME_CONSTANT_H] * 3600000)))
+        cg.add(var.set_baseline_tracking_max_drift_per_day(tracking[CONF_MAX_DRIFT_PER_DAY]))
+        cg.add(var.set_baseline_tracking_min_idle_ms(tracking[CONF_MIN_IDLE_S] * 1000))
+        if CONF_MU_DRIFT in tracking:
+            mu_drift_sensor = await sensor.new_sensor(tracking[CONF_MU_DRIFT])
+            cg.add(var.set_mu_drift_sensor(mu_drift_sensor))
+        if CONF_SIGMA_DRIFT in tracking:
+            sigma_drift_sensor = await sensor.new_sensor(tracking[CONF_SIGMA_DRIFT])
+            cg.add(var.set_sigma_drift_sensor(sigma_drift_sensor))
+
+    if CONF_ADAPTIVE_THRESHOLDS in config:
+        cg.add_define("USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS")
+        adaptive = config[CONF_ADAPTIVE_THRESHOLDS]
+        cg.add(var.set_adaptive_threshold_mode(adaptive[CONF_MODE]))
+        cg.add(var.set_adaptive_update_interval_ms(int(adaptive[CONF_UPDATE_INTERVAL_H] * 3600000)))
+        cg.add(var.set_adaptive_min_state_ms(adaptive[CONF_MIN_STATE_S] * 1000))
+        cg.add(var.set_adaptive_min_samples(adaptive[CONF_MIN_SAMPLES]))
+        cg.add(var.set_adaptive_k_on_range(adaptive[CONF_K_ON_MIN], adaptive[CONF_K_ON_MAX]))
+        cg.add(var.set_adaptive_k_off_min(adaptive[CONF_K_OFF_MIN]))
+        cg.add(var.set_adaptive_min_hysteresis(adaptive[CONF_MIN_HYSTERESIS]))
+        cg.add(var.set_adaptive_max_step(adaptive[CONF_MAX_STEP]))
+        cg.add(var.set_adaptive_half_life_ms(int(adaptive[CONF_HALF_LIFE_H] * 3600000)))
+        if CONF_SUGGESTED_K_ON in adaptive:
+            suggested_k_on_sensor = await sensor.new_sensor(adaptive[CONF_SUGGESTED_K_ON])
+            cg.add(var.set_suggested_k_on_sensor(suggested_k_on_sensor))
+        if CONF_SUGGESTED_K_OFF in adaptive:
+            suggested_k_off_sensor = await sensor.new_sensor(adaptive[CONF_SUGGESTED_K_OFF])
+            cg.add(var.set_suggested_k_off_sensor(suggested_k_off_sensor))
+
+    if CONF_TELEMETRY in config:
+        cg.add_define("USE_BED_PRESENCE_TELEMETRY")
+        telemetry = config[CONF_TELEMETRY]
+        cg.add(var.set_telemetry_window_ms(telemetry[CONF_WINDOW_S] * 1000))
+        for key, (stat, _, _) in TELEMETRY_SENSORS.items():
+            if key in telemetry:
+                sens = await sensor.new_sensor(telemetry[key])
+                cg.add(var.set_telemetry_sensor(stat, sens))
+
+    if CONF_INSTRUMENTATION in config:
+        cg.add_define("USE_BED_PRESENCE_INSTRUMENTATION")
+        instrumentation = config[CONF_INSTRUMENTATION]
+        cg.add(var.set_instrumentation_window_ms(instrumentation[CONF_WINDOW_S] * 1000))
+        for key, (stat, _, _) in INSTRUMENTATION_SENSORS.items():
+            if key in instrumentation:
+                sens = await sensor.new_sensor(instrumentation[key])
+                cg.add(var.set_instrumentation_sensor(stat, sens))
+
+    if CONF_FLIGHT_RECORDER in config:
+        cg.add_define("USE_BED_PRESENCE_FLIGHT_RECORDER")
+        recorder = config[CONF_FLIGHT_RECORDER]
+        cg.add(var.set_flight_recorder_capacity(recorder[CONF_CAPACITY]))
+        cg.add(var.set_flight_recorder_auto_dump(recorder[CONF_AUTO_DUMP]))
+        if CONF_DUMP in recorder:
+            dump_sensor = await text_sensor.new_text_sensor(recorder[CONF_DUMP])
+            cg.add(var.set_flight_recorder_sensor(dump_sensor))
+
+    if CONF_FRAME_STREAM in config:
+        cg.add_define("USE_BED_PRESENCE_FRAME_STREAM")
+        stream = config[CONF_FRAME_STREAM]
+        cg.add(var.set_frame_stream_frames_per_batch(stream[CONF_FRAMES_PER_BATCH]))
+        if CONF_BATCHES in stream:
+            batches_sensor = await text_sensor.new_text_sensor(stream[CONF_BATCHES])
+            cg.add(var.set_frame_stream_sensor(batches_sensor))
@@ -0,0 +1,153 @@
+#pragma once
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <new>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+/**
+ * Fixed-size ring buffer of recent radar frames for post-mortem analysis.
+ *
+ * Each frame is packed into 6 bytes (little-endian):
+ *   u16 dt_ms     time since the previous recorded frame (saturates at 65535)
+ *   u8  energy    still energy % (0-100, 255 = NaN)
+ *   u8  distance  still distance in 4 cm steps (0-254, 255 = none)
+ *   i8  z         z-score in 0.5 steps (clamped to ±127)
+ *   u8  flags     bits 0-1 state machine state, FLAG_HELD, FLAG_GATED
+ *
+ * After trigger() (a binary sensor transition) the recorder keeps a quarter
+ * of its capacity of post-trigger frames and then freezes, so the lead-up
+ * is kept until the buffer is dumped. A dump streams the frames oldest first
+ * as hex chunks; finishing it clears and re-arms the recorder. Transitions
+ * while frozen are counted in missed(). scripts/flight_recorder.py decodes
+ * dumps back into traces.
+ */
+class FlightRecorder {
+ public:
+  static constexpr size_t RECORD_SIZE = 6;
+  static constexpr size_t RECORDS_PER_CHUNK = 16;
+  static constexpr size_t CHUNK_TEXT_SIZE = RECORDS_PER_CHUNK * RECORD_SIZE * 2 + 1;
+  static constexpr uint8_t FLAG_HELD = 0x04;   // Re-processed unchanged reading (no new publish)
+  static constexpr uint8_t FLAG_GATED = 0x08;  // Outside the distance window, not fed to the state machine
+
+  ~FlightRecorder() { delete[] this->buffer_; }
+
+  // Allocate the ring once (normally from setup()); returns false if out of memory
+  bool allocate(size_t capacity) {
+    if (this->buffer_ != nullptr || capacity == 0)
+      return this->buffer_ != nullptr;
+    this->buffer_ = new (std::nothrow) uint8_t[capacity * RECORD_SIZE];
+    this->capacity_ = this->buffer_ != nullptr ? capacity : 0;
+    return this->buffer_ != nullptr;
+  }
+
+  size_t capacity() const { return this->capacity_; }
+  size_t size() const { return this->count_; }
+  bool frozen() const { return this->frozen_; }
+  bool dumping() const { return this->dumping_; }
+  uint32_t missed() const { return this->missed_; }
+  uint32_t last_time() const { return this->last_time_; }
+
+  void record(uint32_t now, float energy, float distance, float z, uint8_t state, uint8_t flags) {
+    if (this->buffer_ == nullptr || this->frozen_ || this->dumping_)
+      return;
+
+    uint32_t dt = this->count_ > 0 ? now - this->last_time_ : 0;
+    if (dt > 0xFFFF)
+      dt = 0xFFFF;
+    uint8_t *out = this->buffer_ + this->head_ * RECORD_SIZE;
+    out[0] = static_cast<uint8_t>(dt & 0xFF);
+    out[1] = static_cast<uint8_t>(dt >> 8);
+    out[2] = std::isnan(energy) ? 255 : static_cast<uint8_t>(clamp_round(energy, 0.0f, 100.0f));
+    out[3] = std::isnan(distance) ? 255 : static_cast<uint8_t>(clamp_round(distance / 4.0f, 0.0f, 254.0f));
+    out[4] = static_cast<uint8_t>(static_cast<int8_t>(std::isnan(z) ? 0.0f : clamp_round(z * 2.0f, -127.0f, 127.0f)));
+    out[5] = static_cast<uint8_t>((state & 0x03) | flags);
+
+    this->head_ = (this->head_ + 1) % this->capacity_;
+    if (this->count_ < this->capacity_)
+      this->count_++;
+    this->last_time_ = now;
+
+    if (this->post_trigger_remaining_ > 0 && --this->post_trigger_remaining_ == 0)
+      this->frozen_ = true;
+  }
+
+  // Call after recording the frame that changed the binary sensor output
+  void trigger() {
+    if (this->buffer_ == nullptr)
+      return;
+    if (this->frozen_ || this->dumping_) {
+      this->missed_++;
+      return;
+    }
+    if (this->post_trigger_remaining_ == 0)
+      this->post_trigger_remaining_ = this->capacity_ / 4 > 0 ? this->capacity_ / 4 : 1;
+  }
+
+  // Begin streaming the buffer; recording pauses until the dump completes
+  void start_dump() {
+    if (this->buffer_ == nullptr)
+      return;
+    this->dumping_ = true;
+    this->dump_pos_ = 0;
+  }
+
+  /**
+   * Hex-encode the next chunk of up to RECORDS_PER_CHUNK frames into `out`
+   * (CHUNK_TEXT_SIZE bytes). Returns false, and re-arms the recorder, once
+   * every frame has been emitted.
+   */
+  bool next_chunk(char *out) {
+    static const char HEX[] = "0123456789abcdef";
+    if (!this->dumping_)
+      return false;
+    if (this->dump_pos_ >= this->count_) {
+      this->rearm();
+      return false;
+    }
+
+    size_t oldest = (this->head_ + this->capacity_ - this->count_) % this->capacity_;
+    char *p = out;
+    for (size_t n = 0; n < RECORDS_PER_CHUNK && this->dump_pos_ < this->count_; n++, this->dump_pos_++) {
+      const uint8_t *record = this->buffer_ + ((oldest + this->dump_pos_) % this->capacity_) * RECORD_SIZE;
+      for (size_t i = 0; i < RECORD_SIZE; i++) {
+        *p++ = HEX[record[i] >> 4];
+        *p++ = HEX[record[i] & 0x0F];
+      }
+    }
+    *p = '\0';
+    return true;
+  }
+
+ protected:
+  static float clamp_round(float value, float lo, float hi) {
+    float rounded = std::round(value);
+    return rounded < lo ? lo : (rounded > hi ? hi : rounded);
+  }
+
+  void rearm() {
+    this->dumping_ = false;
+    this->frozen_ = false;
+    this->post_trigger_remaining_ = 0;
+    this->missed_ = 0;
+    this->count_ = 0;
+    this->head_ = 0;
+  }
+
+  uint8_t *buffer_{nullptr};
+  size_t capacity_{0};
+  size_t head_{0};  // Next slot to write
+  size_t count_{0};
+  uint32_t last_time_{0};
+  size_t post_trigger_remaining_{0};
+  bool frozen_{false};
+  bool dumping_{false};
+  size_t dump_pos_{0};
+  uint32_t missed_{0};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,113 @@
+#pragma once
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <cstdio>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+/**
+ * Batches every processed radar frame into compact "FS1" lines for
+ * full-rate capture without one Home Assistant state update per frame.
+ *
+ * Up to MAX_FRAMES_PER_BATCH frames are packed, 9 bytes each
+ * (little-endian), and sent as one line:
+ *   u16 dt_ms         time since the previous frame of the batch (0 for the first)
+ *   u8  still energy  % (0-100, 255 = NaN)
+ *   u8  moving energy % (0-100, 255 = NaN)
+ *   u16 distance      cm (65535 = none)
+ *   i16 z             z-score x 100 (clamped to ±32767)
+ *   u8  flags         bits 0-1 state machine state, FLAG_HELD, FLAG_GATED
+ *
+ *   FS1 <seq> <t_first_ms> <hex>
+ *
+ * LD2410 energies and distances are integers, so the radar's readings
+ * survive unchanged; timestamps are the device's millis(). seq counts
+ * batches since boot (mod 65536) so a decoder can tell lost lines apart
+ * from a quiet radar. A partly filled batch is sent once its first frame
+ * is MAX_BATCH_AGE_MS old. scripts/frame_stream.py turns captured lines
+ * into traces.
+ */
+class FrameStream {
+ public:
+  static constexpr size_t RECORD_SIZE = 9;
+  // A full line stays within Home Assistant's 255 character text sensor state
+  static constexpr size_t MAX_FRAMES_PER_BATCH = 12;
+  static constexpr size_t LINE_SIZE = 24 + MAX_FRAMES_PER_BATCH * RECORD_SIZE * 2;
+  static constexpr uint32_t MAX_BATCH_AGE_MS = 5000;
+
+  void set_frames_per_batch(size_t frames) {
+    this->frames_per_batch_ = frames < 1 ? 1 : (frames > MAX_FRAMES_PER_BATCH ? MAX_FRAMES_PER_BATCH : frames);
+  }
+  size_t get_frames_per_batch() const { return this->frames_per_batch_; }
+  size_t pending() const { return this->count_; }
+  uint16_t get_sequence() const { return this->seq_; }
+
+  // Append one frame; returns true once the batch is full and should be flushed
+  bool add(uint32_t now, float still_energy, float moving_energy, float distance, float z, uint8_t flags) {
+    if (this->count_ == 0)
+      this->first_time_ = now;
+    uint32_t dt = this->count_ > 0 ? now - this->last_time_ : 0;
+    if (dt > 0xFFFF)
+      dt = 0xFFFF;
+    uint16_t distance_cm = std::isnan(distance) ? 0xFFFF : static_cast<uint16_t>(clamp_round(distance, 0.0f, 65534.0f));
+    int16_t z_centi = static_cast<int16_t>(std::isnan(z) ? 0.0f : clamp_round(z * 100.0f, -32767.0f, 32767.0f));
+
+    uint8_t *out = this->buffer_ + this->count_ * RECORD_SIZE;
+    out[0] = static_cast<uint8_t>(dt & 0xFF);
+    out[1] = static_cast<uint8_t>(dt >> 8);
+    out[2] = encode_energy(still_energy);
+    out[3] = encode_energy(moving_energy);
+    out[4] = static_cast<uint8_t>(distance_cm & 0xFF);
+    out[5] = static_cast<uint8_t>(distance_cm >> 8);
+    out[6] = static_cast<uint8_t>(static_cast<uint16_t>(z_centi) & 0xFF);
+    out[7] = static_cast<uint8_t>(static_cast<uint16_t>(z_centi) >> 8);
+    out[8] = flags;
+
+    this->count_++;
+    this->last_time_ = now;
+    return this->count_ >= this->frames_per_batch_;
+  }
+
+  // A partly filled batch that should go out now
+  bool due(uint32_t now) const { return this->count_ > 0 && now - this->first_time_ >= MAX_BATCH_AGE_MS; }
+
+  // Format the pending frames into `out` (LINE_SIZE bytes) and start the next batch; false if there are none
+  bool flush(char *out) {
+    static const char HEX[] = "0123456789abcdef";
+    if (this->count_ == 0)
+      return false;
+    int written = snprintf(out, LINE_SIZE, "FS1 %05u %u ", static_cast<unsigned>(this->seq_),
+                           static_cast<unsigned>(this->first_time_));
+    char *p = out + written;
+    for (size_t i = 0; i < this->count_ * RECORD_SIZE; i++) {
+      *p++ = HEX[this->buffer_[i] >> 4];
+      *p++ = HEX[this->buffer_[i] & 0x0F];
+    }
+    *p = '\0';
+    this->count_ = 0;
+    this->seq_++;
+    return true;
+  }
+
+ protected:
+  static float clamp_round(float value, float lo, float hi) {
+    float rounded = std::round(value);
+    return rounded < lo ? lo : (rounded > hi ? hi : rounded);
+  }
+  static uint8_t encode_energy(float energy) {
+    return std::isnan(energy) ? 255 : static_cast<uint8_t>(clamp_round(energy, 0.0f, 100.0f));
+  }
+
+  uint8_t buffer_[MAX_FRAMES_PER_BATCH * RECORD_SIZE]{};
+  size_t frames_per_batch_{MAX_FRAMES_PER_BATCH};
+  size_t count_{0};
+  uint32_t first_time_{0};
+  uint32_t last_time_{0};
+  uint16_t seq_{0};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,157 @@
+#pragma once
+
+#include "esphome/core/preferences.h"
+#include "streaming_stats.h"
+#include "threshold_model.h"
+#include <array>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+// LD2410 engineering mode reports one still energy per 0.75 m distance gate (gates 0-8)
+static constexpr size_t GATE_COUNT = 9;
+
+// Per-gate baseline persisted to flash (one record per engine)
+struct PersistedGateBaselines {
+  float mu[GATE_COUNT];
+  float sigma[GATE_COUNT];
+};
+
+/**
+ * Per-gate still energy baselines for LD2410 engineering mode.
+ *
+ * Each gate gets its own μ/σ, learned in the engine's calibration run. A
+ * frame's score is the largest z over the gates in the bed mask, so a fan
+ * or a person walking past in a gate outside the mask does not count, no
+ * matter how loud it is. Until a calibration (or persisted record) has
+ * provided the baselines, score() returns NaN and the engine keeps using
+ * the aggregate still energy.
+ */
+class GateBaselines {
+ public:
+  void set_mask(uint16_t mask) { this->mask_ = mask & ((1u << GATE_COUNT) - 1); }
+  uint16_t get_mask() const { return this->mask_; }
+  bool is_calibrated() const { return this->calibrated_; }
+  float get_mu(size_t gate) const { return this->mu_[gate]; }
+  float get_sigma(size_t gate) const { return this->sigma_[gate]; }
+
+  void set_baseline(size_t gate, float mu, float sigma) {
+    this->mu_[gate] = mu;
+    this->sigma_[gate] = sigma;
+    this->inv_sigma_[gate] = ThresholdModel::inverse_sigma(sigma);  // Unusable σ scores 0, as for the aggregate
+  }
+
+  // Forget the baselines; the engine falls back to the aggregate until the next calibration
+  void clear() {
+    this->calibrated_ = false;
+    for (size_t gate = 0; gate < GATE_COUNT; gate++)
+      this->set_baseline(gate, 0.0f, 0.0f);
+    for (auto &histogram : this->histograms_)
+      histogram.clear();
+  }
+
+  // Largest z over the masked gates with a reading (energies[gate], NaN when missing)
+  float score(const float *energies) const {
+    if (!this->calibrated_)
+      return NAN;
+    float best = NAN;
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      if (!(this->mask_ & (1u << gate)) || std::isnan(energies[gate]))
+        continue;
+      float z = (energies[gate] - this->mu_[gate]) * this->inv_sigma_[gate];
+      if (!(z <= best))  // Also takes the first z over NaN
+        best = z;
+    }
+    return best;
+  }
+
+  // Calibration collects every gate with a reading, so the mask can change without recalibrating
+  void start_calibration() {
+    for (auto &histogram : this->histograms_)
+      histogram.clear();
+  }
+
+  void add_calibration_sample(const float *energies) {
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      if (!std::isnan(energies[gate]))
+        this->histograms_[gate].add(energies[gate]);
+    }
+  }
+
+  // Adopt the gates that saw frames; returns how many were calibrated
+  size_t finish_calibration() {
+    size_t calibrated = 0;
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      EnergyHistogram &histogram = this->histograms_[gate];
+      if (histogram.count() == 0)
+        continue;
+      float mu, sigma;
+      compute_median_sigma(histogram, &mu, &sigma);
+      this->set_baseline(gate, mu, sigma);
+      histogram.clear();
+      calibrated++;
+    }
+    if (calibrated > 0)
+      this->calibrated_ = true;
+    return calibrated;
+  }
+
+  // Flash persistence (see BedPresenceEngine::restore_config)
+  void restore(uint32_t key) {
+    this->persist_ = true;
+    this->pref_ = global_preferences->make_preference<PersistedGateBaselines>(key, true);
+    PersistedGateBaselines stored{};
+    if (!this->pref_.load(&stored))
+      return;
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      if (!std::isfinite(stored.mu[gate]) || !std::isfinite(stored.sigma[gate]) || stored.sigma[gate] < 0.0f)
+        return;  // Reject the whole record rather than mixing gates from two calibrations
+    }
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      this->set_baseline(gate, stored.mu[gate], stored.sigma[gate]);
+      if (stored.sigma[gate] > 0.001f)
+        this->calibrated_ = true;  // An all-zero record is a reset_to_defaults
+    }
+    this->persisted_ = stored;
+  }
+
+  void persist() {
+    if (!this->persist_)
+      return;
+    PersistedGateBaselines record{};
+    for (size_t gate = 0; gate < GATE_COUNT; gate++) {
+      record.mu[gate] = this->mu_[gate];
+      record.sigma[gate] = this->sigma_[gate];
+    }
+    if (std::memcmp(&record, &this->persisted_, sizeof(record)) == 0)
+      return;
+    if (this->pref_.save(&record))
+      this->persisted_ = record;
+  }
+
+  static constexpr uint32_t PERSISTED_VERSION = 1;
+
+ protected:
+  uint16_t mask_{(1u << GATE_COUNT) - 1};
+  bool calibrated_{false};
+  // A gate that saw no calibration frames keeps σ = 0 (1/σ = 0), so it scores z = 0
+  float mu_[GATE_COUNT]{};
+  float sigma_[GATE_COUNT]{};
+  float inv_sigma_[GATE_COUNT]{};
+
+  // Fixed storage (9 x 804 bytes); the engine only has a GateBaselines member with USE_BED_PRESENCE_GATES
+  std::array<EnergyHistogram, GATE_COUNT> histograms_{{
+      {0.0f, 0.5f}, {0.0f, 0.5f}, {0.0f, 0.5f}, {0.0f, 0.5f}, {0.0f, 0.5f},
+      {0.0f, 0.5f}, {0.0f, 0.5f}, {0.0f, 0.5f}, {0.0f, 0.5f},
+  }};
+
+  bool persist_{false};
+  ESPPreferenceObject pref_;
+  PersistedGateBaselines persisted_{};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,127 @@
+#pragma once
+
+#include <algorithm>
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+enum PrefilterMode : uint8_t {
+  PREFILTER_NONE = 0,    // Still energy goes to the state machine as reported
+  PREFILTER_MEDIAN = 1,  // Sliding median of the last W frames
+  PREFILTER_HAMPEL = 2,  // Frame as reported unless it is an outlier against the window, then the median
+};
+
+/**
+ * Sliding-window median / Hampel filter over the last W still energy frames.
+ *
+ * A single-frame spike (multipath, a reflection off a passing car) can
+ * arm the state machine on its own when k_on is tight; a median over a few
+ * frames removes it at the cost of (W - 1) / 2 frames of lag on real
+ * steps. The Hampel variant keeps every frame that is consistent with the
+ * window and only replaces outliers (|x - median| > t·1.4826·MAD), so a
+ * sustained change passes once it is no longer an outlier. The LD2410
+ * reports whole percent, so a quiet window often has MAD = 0, which would
+ * make the Hampel filter a plain median filter; the MAD is floored at
+ * MIN_MAD (one energy unit) so a one-percent wobble still passes.
+ *
+ * Memory is fixed: a ring buffer for arrival order and a sorted copy of the
+ * same values. Each frame removes the oldest value and inserts the newest:
+ * a binary search finds the slot and a memmove of up to W floats makes room,
+ * so a frame costs O(W). For W <= 31 that is cheaper than a tree or a
+ * two-heap median, and it keeps the exact values, so the host replay and its
+ * Python mirror agree bit for bit.
+ * Until W frames have arrived the window is whatever has been seen (lower
+ * median for an even count).
+ */
+class SlidingPrefilter {
+ public:
+  static constexpr size_t MAX_WINDOW = 31;
+  static constexpr float MIN_MAD = 1.0f;  // Energy %, the LD2410's resolution
+
+  void configure(PrefilterMode mode, size_t window, float threshold) {
+    this->mode_ = mode;
+    // Compared rather than passed to std::min, which would ODR-use MAX_WINDOW (no out-of-line definition in C++14)
+    this->window_ = window < 1 ? 1 : (window > MAX_WINDOW ? MAX_WINDOW : window);
+    this->threshold_ = threshold;
+    this->reset();
+  }
+
+  bool enabled() const { return this->mode_ != PREFILTER_NONE; }
+  PrefilterMode get_mode() const { return this->mode_; }
+  size_t get_window() const { return this->window_; }
+  float get_threshold() const { return this->threshold_; }
+  size_t size() const { return this->count_; }
+
+  void reset() {
+    this->count_ = 0;
+    this->head_ = 0;
+  }
+
+  // Add one frame to the window and return the filtered value
+  float filter(float value) {
+    if (this->mode_ == PREFILTER_NONE || std::isnan(value))
+      return value;
+    this->push(value);
+    float median = this->sorted_[(this->count_ - 1) / 2];
+    if (this->mode_ == PREFILTER_MEDIAN)
+      return median;
+    float mad = this->median_absolute_deviation(median);
+    if (mad < MIN_MAD)
+      mad = MIN_MAD;
+    float limit = this->threshold_ * 1.4826f * mad;
+    return std::fabs(value - median) > limit ? median : value;
+  }
+
+ protected:
+  void push(float value) {
+    if (this->count_ == this->window_) {
+      // Drop the oldest value from the sorted copy (any equal entry will do)
+      float oldest = this->ring_[this->head_];
+      float *slot = std::lower_bound(this->sorted_, this->sorted_ + this->count_, oldest);
+      std::memmove(slot, slot + 1, (this->sorted_ + this->count_ - slot - 1) * sizeof(float));
+      this->count_--;
+    }
+    this->ring_[this->head_] = value;
+    this->head_ = (this->head_ + 1) % this->window_;
+    float *slot = std::upper_bound(this->sorted_, this->sorted_ + this->count_, value);
+    std::memmove(slot + 1, slot, (this->sorted_ + this->count_ - slot) * sizeof(float));
+    *slot = value;
+    this->count_++;
+  }
+
+  // Lower median of |x - median| over the window: the deviations are merged in increasing order by walking
+  // outward from the median in the sorted copy, so no second buffer or sort is needed
+  float median_absolute_deviation(float median) const {
+    size_t target = (this->count_ - 1) / 2;
+    size_t mid = (this->count_ - 1) / 2;
+    // lo walks down from the median, hi walks up; the median itself is the first (zero) deviation
+    size_t lo = mid + 1, hi = mid + 1;
+    float deviation = 0.0f;
+    for (size_t taken = 0; taken <= target; taken++) {
+      bool take_low = lo > 0 && (hi >= this->count_ || median - this->sorted_[lo - 1] <= this->sorted_[hi] - median);
+      if (take_low) {
+        lo--;
+        deviation = median - this->sorted_[lo];
+      } else {
+        deviation = this->sorted_[hi] - median;
+        hi++;
+      }
+    }
+    return deviation;
+  }
+
+  PrefilterMode mode_{PREFILTER_NONE};
+  size_t window_{5};
+  float threshold_{3.0f};
+  float ring_[MAX_WINDOW]{};    // Arrival order; head_ is the oldest once the window is full
+  float sorted_[MAX_WINDOW]{};  // Same values, ascending
+  size_t count_{0};
+  size_t head_{0};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
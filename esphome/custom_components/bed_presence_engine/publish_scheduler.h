@@ -0,0 +1,86 @@
+#pragma once
+
+#include "esphome/components/text_sensor/text_sensor.h"
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+/**
+ * Deduplicating, rate-limited publisher for one text sensor.
+ *
+ * - A value equal to the last published one is dropped.
+ * - The first value after a quiet period goes out immediately. Values that
+ *   follow within `window_ms` replace each other, and only the latest is
+ *   published when the window closes (call loop() to flush it). A burst that
+ *   ends on the value already published sends nothing.
+ * - Values are held in fixed buffers (longer values are truncated). The only
+ *   allocation is the std::string TextSensor::publish_state() takes.
+ *
+ * A window of 0 disables coalescing but keeps deduplication.
+ */
+class CoalescingTextPublisher {
+ public:
+  static constexpr size_t MAX_LENGTH = 95;
+
+  void set_sensor(text_sensor::TextSensor *sensor) { this->sensor_ = sensor; }
+  void set_window_ms(uint32_t ms) { this->window_ms_ = ms; }
+  bool has_sensor() const { return this->sensor_ != nullptr; }
+
+  void publish(const char *value, uint32_t now) {
+    if (this->sensor_ == nullptr)
+      return;
+    bool same_as_published = this->has_published_ && std::strncmp(value, this->published_, MAX_LENGTH) == 0;
+    if (same_as_published) {
+      // Either a plain repeat, or a burst that returned to the published value
+      if (this->has_pending_)
+        this->suppressed_++;
+      this->has_pending_ = false;
+      this->suppressed_++;
+      return;
+    }
+
+    if (this->has_pending_)
+      this->suppressed_++;  // Replaced before it was sent
+    copy_value(this->pending_, value);
+    this->has_pending_ = true;
+    this->loop(now);
+  }
+
+  // Publish a coalesced value once its window has closed
+  void loop(uint32_t now) {
+    if (!this->has_pending_)
+      return;
+    if (this->has_published_ && (now - this->last_publish_time_) < this->window_ms_)
+      return;
+    std::memcpy(this->published_, this->pending_, sizeof(this->published_));
+    this->has_published_ = true;
+    this->has_pending_ = false;
+    this->last_publish_time_ = now;
+    this->published_count_++;
+    this->sensor_->publish_state(this->published_);
+  }
+
+  uint32_t get_published_count() const { return this->published_count_; }
+  uint32_t get_suppressed_count() const { return this->suppressed_; }
+
+ protected:
+  static void copy_value(char *dest, const char *value) {
+    std::strncpy(dest, value, MAX_LENGTH);
+    dest[MAX_LENGTH] = '\0';
+  }
+
+  text_sensor::TextSensor *sensor_{nullptr};
+  uint32_t window_ms_{0};
+  char published_[MAX_LENGTH + 1]{};
+  char pending_[MAX_LENGTH + 1]{};
+  bool has_published_{false};
+  bool has_pending_{false};
+  uint32_t last_publish_time_{0};
+  uint32_t published_count_{0};
+  uint32_t suppressed_{0};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,104 @@
+#pragma once
+
+#include <cstdint>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+// Phase 2: State machine states
+enum State {
+  IDLE,           // No presence detected (binary sensor: OFF)
+  DEBOUNCING_ON,  // High signal detected, timer running (binary sensor: OFF)
+  PRESENT,        // Confirmed presence (binary sensor: ON)
+  DEBOUNCING_OFF  // Low signal detected, timer running (binary sensor: ON)
+};
+
+// Thresholds and timers shared by every state machine of one engine. k_on/k_off
+// are in the units of the scores they are compared with: z-scores, or still
+// energies for ThresholdModel::energy_thresholds.
+struct PresenceThresholds {
+  float k_on;
+  float k_off;
+  unsigned long on_debounce_ms;
+  unsigned long off_debounce_ms;
+  unsigned long abs_clear_delay_ms;
+};
+
+// Transition taken by one step of the state machine
+enum Transition : uint8_t {
+  TRANSITION_NONE,
+  TRANSITION_DEBOUNCE_ON,   // IDLE → DEBOUNCING_ON
+  TRANSITION_ON,            // DEBOUNCING_ON → PRESENT (binary sensor turns ON)
+  TRANSITION_ABORT_ON,      // DEBOUNCING_ON → IDLE
+  TRANSITION_DEBOUNCE_OFF,  // PRESENT → DEBOUNCING_OFF
+  TRANSITION_OFF,           // DEBOUNCING_OFF → IDLE (binary sensor turns OFF)
+  TRANSITION_ABORT_OFF,     // DEBOUNCING_OFF → PRESENT
+};
+
+/**
+ * One frame of the Phase 2 4-state machine with debouncing, shared by the
+ * engine and its zones. z_arm is compared against k_on while vacant (IDLE,
+ * DEBOUNCING_ON); z_hold decides once occupied (PRESENT, DEBOUNCING_OFF).
+ * Publishing and logging are left to the caller.
+ */
+inline Transition step_state_machine(State &state, unsigned long &debounce_start_time,
+                                     unsigned long &last_high_confidence_time, float z_arm, float z_hold,
+                                     unsigned long now, const PresenceThresholds &thresholds) {
+  switch (state) {
+    case IDLE:
+      if (z_arm >= thresholds.k_on) {
+        debounce_start_time = now;
+        state = DEBOUNCING_ON;
+        return TRANSITION_DEBOUNCE_ON;
+      }
+      break;
+
+    case DEBOUNCING_ON:
+      if (z_arm >= thresholds.k_on) {
+        // Condition still holds, check timer
+        if ((now - debounce_start_time) >= thresholds.on_debounce_ms) {
+          state = PRESENT;
+          last_high_confidence_time = now;
+          return TRANSITION_ON;
+        }
+      } else {
+        // Condition lost, abort debounce
+        state = IDLE;
+        return TRANSITION_ABORT_ON;
+      }
+      break;
+
+    case PRESENT:
+      // Update high confidence timestamp whenever strong signal detected
+      if (z_hold > thresholds.k_on) {
+        last_high_confidence_time = now;
+      }
+
+      // Low signal only starts the off-debounce once the absolute clear delay has passed
+      if (z_hold < thresholds.k_off && (now - last_high_confidence_time) >= thresholds.abs_clear_delay_ms) {
+        debounce_start_time = now;
+        state = DEBOUNCING_OFF;
+        return TRANSITION_DEBOUNCE_OFF;
+      }
+      break;
+
+    case DEBOUNCING_OFF:
+      if (z_hold < thresholds.k_off) {
+        // Condition still holds, check timer
+        if ((now - debounce_start_time) >= thresholds.off_debounce_ms) {
+          state = IDLE;
+          return TRANSITION_OFF;
+        }
+      } else if (z_hold >= thresholds.k_on) {
+        // High signal returned, abort debounce
+        state = PRESENT;
+        last_high_confidence_time = now;
+        return TRANSITION_ABORT_OFF;
+      }
+      break;
+  }
+  return TRANSITION_NONE;
+}
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
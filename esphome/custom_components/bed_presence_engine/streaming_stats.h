@@ -0,0 +1,261 @@
+#pragma once
+
+#include <cmath>
+#include <cstddef>
+#include <cstdint>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+/**
+ * Fixed-memory histogram for robust statistics over a bounded range.
+ *
+ * Bin i is centred on lo + i * width and covers half a bin either side, so
+ * samples on the grid (LD2410 energies are whole percentages) are stored
+ * exactly and the median/MAD below match the sorted-vector results. Other
+ * values are quantized to the nearest bin centre; values outside the range
+ * are clamped to the end bins.
+ *
+ * Memory is BINS * 4 bytes regardless of how many samples are added. When a
+ * bin or the total would overflow, every bin is halved, which keeps the shape
+ * of the distribution (and therefore, approximately, the median/MAD).
+ */
+template<size_t BINS> class StreamingHistogram {
+ public:
+  static constexpr size_t BIN_COUNT = BINS;
+
+  StreamingHistogram(float lo, float width) : lo_(lo), width_(width) {}
+
+  void add(float value) {
+    size_t bin = this->bin_of(value);
+    if (this->bins_[bin] == UINT32_MAX || this->count_ == UINT32_MAX)
+      this->halve();
+    this->bins_[bin]++;
+    this->count_++;
+  }
+
+  void clear() {
+    for (size_t i = 0; i < BINS; i++)
+      this->bins_[i] = 0;
+    this->count_ = 0;
+  }
+
+  uint32_t count() const { return this->count_; }
+  float center(size_t bin) const { return this->lo_ + static_cast<float>(bin) * this->width_; }
+  // Values below low_edge() / above high_edge() are counted in the end bins
+  float low_edge() const { return this->lo_ - this->width_ / 2.0f; }
+  float high_edge() const { return this->center(BINS - 1) + this->width_ / 2.0f; }
+
+  // Add the samples of another histogram with the same range and bin width
+  void merge(const StreamingHistogram &other) {
+    if (this->count_ > UINT32_MAX - other.count_)
+      this->halve();
+    for (size_t i = 0; i < BINS; i++)
+      this->bins_[i] += other.bins_[i];
+    this->count_ += other.count_;
+  }
+
+  // Halve every bin (also used to age out old samples while keeping the shape)
+  void halve() {
+    this->count_ = 0;
+    for (size_t i = 0; i < BINS; i++) {
+      this->bins_[i] = this->bins_[i] / 2 + (this->bins_[i] & 1);  // Round up so occupied bins stay occupied
+      this->count_ += this->bins_[i];
+    }
+  }
+
+  // Median, averaging the two middle samples for an even count (0 when empty)
+  float median() const {
+    if (this->count_ == 0)
+      return 0.0f;
+    uint32_t upper = this->count_ / 2;
+    if (this->count_ % 2 == 1)
+      return this->value_at_rank(upper);
+    return (this->value_at_rank(upper - 1) + this->value_at_rank(upper)) / 2.0f;
+  }
+
+  // Nearest-rank quantile, q in [0, 1] (0 when empty)
+  float quantile(float q) const {
+    if (this->count_ == 0)
+      return 0.0f;
+    float rank = std::ceil(q * static_cast<float>(this->count_));
+    uint32_t k = rank < 1.0f ? 0 : static_cast<uint32_t>(rank) - 1;
+    return this->value_at_rank(k < this->count_ ? k : this->count_ - 1);
+  }
+
+  /**
+   * Median absolute deviation from `center` (normally median()).
+   *
+   * Walks the bins outward from the centre in order of increasing distance,
+   * which yields the deviations already sorted, so no scratch buffer is needed.
+   */
+  float mad(float center) const {
+    if (this->count_ == 0)
+      return 0.0f;
+    uint32_t upper = this->count_ / 2;
+    float lower_value = 0.0f;
+    float upper_value = 0.0f;
+    this->deviations_at(center, upper == 0 ? 0 : upper - 1, &lower_value, &upper_value);
+    if (this->count_ % 2 == 1)
+      return upper_value;
+    return (lower_value + upper_value) / 2.0f;
+  }
+
+ protected:
+  size_t bin_of(float value) const {
+    float pos = std::floor((value - this->lo_) / this->width_ + 0.5f);
+    if (!(pos > 0.0f))  // Also catches NaN
+      return 0;
+    if (pos >= static_cast<float>(BINS - 1))
+      return BINS - 1;
+    return static_cast<size_t>(pos);
+  }
+
+  // k-th smallest sample (0-based, k < count)
+  float value_at_rank(uint32_t k) const {
+    uint32_t seen = 0;
+    for (size_t i = 0; i < BINS; i++) {
+      seen += this->bins_[i];
+      if (seen > k)
+        return this->center(i);
+    }
+    return this->center(BINS - 1);
+  }
+
+  // Deviations |x - center| at ranks k and k + 1 (the latter clamped to the last rank)
+  void deviations_at(float center, uint32_t k, float *at_k, float *at_next) const {
+    // Bins left of (or at) the centre walk down, the rest walk up
+    long left = static_cast<long>(this->bin_of(center));
+    if (this->center(static_cast<size_t>(left)) > center)
+      left--;
+    long right = left + 1;
+    uint32_t seen = 0;
+    bool have_k = false;
+
+    while (left >= 0 || right < static_cast<long>(BINS)) {
+      float d_left = left >= 0 ? center - this->center(static_cast<size_t>(left)) : INFINITY;
+      float d_right = right < static_cast<long>(BINS) ? this->center(static_cast<size_t>(right)) - center : INFINITY;
+      float deviation;
+      uint32_t n;
+      if (d_left <= d_right) {
+        deviation = std::fabs(d_left);
+        n = this->bins_[left--];
+      } else {
+        deviation = std::fabs(d_right);
+        n = this->bins_[right++];
+      }
+      if (n == 0)
+        continue;
+      seen += n;
+      if (!have_k && seen > k) {
+        *at_k = deviation;
+        have_k = true;
+      }
+      if (seen > k + 1 || (have_k && seen == this->count_)) {
+        *at_next = deviation;
+        return;
+      }
+    }
+  }
+
+  float lo_;
+  float width_;
+  uint32_t bins_[BINS]{};
+  uint32_t count_{0};
+};
+
+// LD2410 energy histogram: 0–100 % in 0.5 % bins (804 bytes)
+using EnergyHistogram = StreamingHistogram<201>;
+
+// Calibration baseline: median and MAD-based σ (floored at 0.05) of a histogram
+inline void compute_median_sigma(const EnergyHistogram &histogram, float *median_out, float *sigma_out) {
+  float median = histogram.median();
+  float sigma = histogram.mad(median) * 1.4826f;
+  if (sigma < 0.05f) {
+    sigma = 0.05f;
+  }
+  *median_out = median;
+  *sigma_out = sigma;
+}
+
+/**
+ * Count/min/mean/max and approximate quantiles of the values in one reporting
+ * window (energies by default). Min, max and mean are exact; quantiles come
+ * from the histogram and are quantized to its bin width (0.5 % for energies).
+ * A quantile that lands in an end bin holding values beyond the range is only
+ * that bin's centre; quantile_clamped() says so. Statistics of an empty window
+ * are NaN.
+ */
+class EnergyWindow {
+ public:
+  explicit EnergyWindow(float lo = 0.0f, float width = 0.5f) : histogram_(lo, width) {}
+
+  void add(float value) {
+    this->histogram_.add(value);
+    this->sum_ += value;
+    if (this->count_ == 0 || value < this->min_)
+      this->min_ = value;
+    if (this->count_ == 0 || value > this->max_)
+      this->max_ = value;
+    this->count_++;
+  }
+
+  void clear() {
+    this->histogram_.clear();
+    this->count_ = 0;
+    this->sum_ = 0.0;
+  }
+
+  uint32_t count() const { return this->count_; }
+  float min() const { return this->count_ ? this->min_ : NAN; }
+  float max() const { return this->count_ ? this->max_ : NAN; }
+  float mean() const { return this->count_ ? static_cast<float>(this->sum_ / this->count_) : NAN; }
+  float quantile(float q) const { return this->count_ ? this->histogram_.quantile(q) : NAN; }
+  // quantile(q) sits in an end bin that holds values outside the histogram's range
+  bool quantile_clamped(float q) const {
+    if (this->count_ == 0)
+      return false;
+    float value = this->histogram_.quantile(q);
+    float top = this->histogram_.center(EnergyHistogram::BIN_COUNT - 1);
+    return (value == this->histogram_.center(0) && this->min_ < this->histogram_.low_edge()) ||
+           (value == top && this->max_ > this->histogram_.high_edge());
+  }
+
+ protected:
+  EnergyHistogram histogram_;
+  uint32_t count_{0};
+  double sum_{0.0};
+  float min_{0.0f};
+  float max_{0.0f};
+};
+
+/**
+ * Count, mean and max of durations (µs) over one reporting window; the
+ * statistics of an empty window are NaN.
+ */
+class DurationStats {
+ public:
+  void add(uint32_t us) {
+    this->sum_ += us;
+    if (this->count_ == 0 || us > this->max_)
+      this->max_ = us;
+    this->count_++;
+  }
+
+  void clear() {
+    this->count_ = 0;
+    this->sum_ = 0;
+  }
+
+  uint32_t count() const { return this->count_; }
+  float mean() const { return this->count_ ? static_cast<float>(this->sum_) / this->count_ : NAN; }
+  float max() const { return this->count_ ? static_cast<float>(this->max_) : NAN; }
+
+ protected:
+  uint32_t count_{0};
+  uint64_t sum_{0};
+  uint32_t max_{0};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,166 @@
+#pragma once
+
+#include "streaming_stats.h"
+#include <cmath>
+#include <cstdint>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+// z-score histogram: -10 to 40 in 0.25 bins (804 bytes); scores beyond either end count in the end bins
+using ZHistogram = StreamingHistogram<201>;
+
+enum AdaptiveThresholdMode : uint8_t {
+  ADAPTIVE_SUGGEST,  // Publish the suggested k_on/k_off, leave the engine's alone
+  ADAPTIVE_APPLY,    // Apply them (one apply_parameters() per update)
+};
+
+// Outcome of one ThresholdLearner::suggest() call
+struct ThresholdSuggestion {
+  bool valid;
+  float k_on;
+  float k_off;
+  float empty_high;    // EMPTY_QUANTILE of the confirmed-empty z-scores
+  float occupied_low;  // OCCUPIED_QUANTILE of the confirmed-PRESENT z-scores
+};
+
+/**
+ * Learns k_on/k_off from the z-scores the engine actually sees.
+ *
+ * The engine feeds frames from stretches it is sure about (vacant, and
+ * occupied, for a while) into two fixed histograms. Vacant frames wait in a
+ * pending window first, including frames that armed the state machine and
+ * aborted: the empty bed's upper tail lies above k_on, and leaving it out
+ * would bias EMPTY_QUANTILE low and pull k_on back toward its current value.
+ * A window of at least the minimum state length moves into the empty
+ * histogram once the engine is back in IDLE; an arrival (the state machine
+ * turning ON) discards it, since its last frames were the sleeper. An update
+ * compares the
+ * top of the empty distribution (EMPTY_QUANTILE) with the bottom of the
+ * occupied one (OCCUPIED_QUANTILE). When the occupied low end lies above the
+ * empty high end, the gap between them is where thresholds belong:
+ *
+ *   k_on  = empty_high + gap / 2   (maximum margin to both distributions)
+ *   k_off = empty_high + gap / 4   (hysteresis of a quarter gap, still above the empty bed)
+ *
+ * A sleeper who shows up strongly gets a lower, faster k_on than the static
+ * default; one who barely clears the empty bed gets the thresholds centred in
+ * the little gap there is. If the distributions overlap, nothing is
+ * suggested. Results are clamped to [k_on_min, k_on_max] and k_off >=
+ * k_off_min, keep at least min_hysteresis between them, and move at most
+ * max_step per update, so a bad night cannot swing the thresholds.
+ *
+ * age() halves both histograms once per half-life (default a week), so
+ * older nights fade out on a time base however often updates run, and the
+ * counts settle at about 1.44 half-lives' worth of frames.
+ */
+class ThresholdLearner {
+ public:
+  static constexpr float EMPTY_QUANTILE = 0.999f;
+  static constexpr float OCCUPIED_QUANTILE = 0.05f;
+
+  void set_min_samples(uint32_t samples) { this->min_samples_ = samples; }
+  void set_k_on_range(float lo, float hi) {
+    this->k_on_min_ = lo;
+    this->k_on_max_ = hi;
+  }
+  void set_k_off_min(float k) { this->k_off_min_ = k; }
+  void set_min_hysteresis(float hysteresis) { this->min_hysteresis_ = hysteresis; }
+  void set_max_step(float step) { this->max_step_ = step; }
+  void set_half_life_ms(uint32_t ms) { this->half_life_ms_ = ms > 0 ? ms : 1; }
+  uint32_t get_min_samples() const { return this->min_samples_; }
+  float get_k_on_min() const { return this->k_on_min_; }
+  float get_k_on_max() const { return this->k_on_max_; }
+
+  void add_empty(float z) { this->empty_.add(z); }
+  void add_occupied(float z) { this->occupied_.add(z); }
+  uint32_t empty_count() const { return this->empty_.count(); }
+  uint32_t occupied_count() const { return this->occupied_.count(); }
+  uint32_t vacant_count() const { return this->vacant_.count(); }
+
+  // A frame of a vacant stretch, held back until the stretch is confirmed empty
+  void add_vacant(float z, uint32_t now) {
+    if (this->vacant_.count() == 0)
+      this->vacant_since_ = now;
+    this->vacant_.add(z);
+  }
+  // The bed is still empty: pending frames spanning at least min_ms count as empty; true if they were moved
+  bool commit_vacant(uint32_t now, uint32_t min_ms) {
+    if (this->vacant_.count() == 0 || now - this->vacant_since_ < min_ms)
+      return false;
+    this->empty_.merge(this->vacant_);
+    this->vacant_.clear();
+    return true;
+  }
+  // The pending frames led up to an arrival
+  void discard_vacant() { this->vacant_.clear(); }
+
+  // Scores from an older baseline mean nothing against a new one
+  void clear() {
+    this->empty_.clear();
+    this->occupied_.clear();
+    this->vacant_.clear();
+  }
+
+  // Halve both histograms for every half-life elapsed since the last halving (the first call starts the clock)
+  void age(uint32_t now) {
+    if (!this->aged_) {
+      this->aged_ = true;
+      this->last_aged_ = now;
+      return;
+    }
+    while (now - this->last_aged_ >= this->half_life_ms_) {
+      this->empty_.halve();
+      this->occupied_.halve();
+      this->last_aged_ += this->half_life_ms_;
+    }
+  }
+
+  ThresholdSuggestion suggest(float k_on, float k_off) const {
+    ThresholdSuggestion suggestion{false, k_on, k_off, NAN, NAN};
+    if (this->empty_.count() < this->min_samples_ || this->occupied_.count() < this->min_samples_)
+      return suggestion;
+    suggestion.empty_high = this->empty_.quantile(EMPTY_QUANTILE);
+    suggestion.occupied_low = this->occupied_.quantile(OCCUPIED_QUANTILE);
+    float gap = suggestion.occupied_low - suggestion.empty_high;
+    if (!(gap > 0.0f))
+      return suggestion;
+
+    float target_on = clamp(suggestion.empty_high + gap / 2.0f, this->k_on_min_, this->k_on_max_);
+    float target_off = suggestion.empty_high + gap / 4.0f;
+    float next_on = clamp(target_on, k_on - this->max_step_, k_on + this->max_step_);
+    float next_off = clamp(target_off, k_off - this->max_step_, k_off + this->max_step_);
+    // Bounds win over the step limit: hysteresis first, then the k_off floor
+    if (next_off > next_on - this->min_hysteresis_)
+      next_off = next_on - this->min_hysteresis_;
+    if (next_off < this->k_off_min_)
+      next_off = this->k_off_min_;
+    if (next_on < next_off + this->min_hysteresis_)
+      next_on = next_off + this->min_hysteresis_;
+
+    suggestion.valid = true;
+    suggestion.k_on = next_on;
+    suggestion.k_off = next_off;
+    return suggestion;
+  }
+
+ protected:
+  static float clamp(float value, float lo, float hi) { return value < lo ? lo : (value > hi ? hi : value); }
+
+  ZHistogram empty_{-10.0f, 0.25f};
+  ZHistogram occupied_{-10.0f, 0.25f};
+  ZHistogram vacant_{-10.0f, 0.25f};  // Pending vacant frames (see add_vacant)
+  uint32_t vacant_since_{0};
+  uint32_t half_life_ms_{7 * 86400000u};
+  bool aged_{false};
+  uint32_t last_aged_{0};
+  uint32_t min_samples_{3000};
+  float k_on_min_{3.0f};
+  float k_on_max_{15.0f};
+  float k_off_min_{1.5f};
+  float min_hysteresis_{1.0f};
+  float max_step_{1.0f};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
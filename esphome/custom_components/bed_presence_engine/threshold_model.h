@@ -0,0 +1,53 @@
+#pragma once
+
+#include "state_machine.h"
+
+namespace esphome {
+namespace bed_presence_engine {
+
+/**
+ * Everything the per-frame path needs, derived once from the engine's
+ * parameters. The engine never edits a model in place: each update or
+ * calibration builds a new one and swaps it in whole, so a frame sees
+ * either the old or the new configuration and never a mix of the two.
+ *
+ * With still energy as the only input, z >= k is the same test as
+ * energy >= μ + kσ, so energy_thresholds lets the state machine compare
+ * raw energies without computing a z-score at all.
+ */
+struct ThresholdModel {
+  float mu_still{0.0f};
+  float inv_sigma_still{0.0f};  // 0 when σ is unusable, which makes every z-score 0
+  float mu_moving{0.0f};
+  float inv_sigma_moving{0.0f};
+  float d_min_cm{0.0f};
+  float d_max_cm{0.0f};
+  PresenceThresholds z_thresholds{};       // k_on/k_off against z-scores
+  PresenceThresholds energy_thresholds{};  // μ + k_on·σ, μ + k_off·σ against still energy
+  bool energy_domain{false};               // energy_thresholds are usable (σ valid)
+
+  float z_still(float energy) const { return (energy - this->mu_still) * this->inv_sigma_still; }
+  float z_moving(float energy) const { return (energy - this->mu_moving) * this->inv_sigma_moving; }
+
+  static float inverse_sigma(float sigma) { return sigma > 0.001f ? 1.0f / sigma : 0.0f; }
+
+  static ThresholdModel build(float mu_still, float sigma_still, float mu_moving, float sigma_moving,
+                              float d_min_cm, float d_max_cm, const PresenceThresholds &thresholds) {
+    ThresholdModel model;
+    model.mu_still = mu_still;
+    model.inv_sigma_still = inverse_sigma(sigma_still);
+    model.mu_moving = mu_moving;
+    model.inv_sigma_moving = inverse_sigma(sigma_moving);
+    model.d_min_cm = d_min_cm;
+    model.d_max_cm = d_max_cm;
+    model.z_thresholds = thresholds;
+    model.energy_thresholds = thresholds;
+    model.energy_thresholds.k_on = mu_still + thresholds.k_on * sigma_still;
+    model.energy_thresholds.k_off = mu_still + thresholds.k_off * sigma_still;
+    model.energy_domain = model.inv_sigma_still > 0.0f;
+    return model;
+  }
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,103 @@
+#include "zone.h"
+#include "esphome/core/log.h"
+#include <cmath>
+#include <cstring>
+
+namespace esphome {
+namespace bed_presence_engine {
+
+static const char *const TAG = "bed_presence_engine.zone";
+
+void PresenceZone::reset() {
+  this->current_state_ = IDLE;
+  this->publish_state(false);
+}
+
+void PresenceZone::rebuild_model() {
+  this->model_ = ThresholdModel::build(this->mu_still_, this->sigma_still_, 0.0f, 0.0f, this->d_min_cm_,
+                                       this->d_max_cm_, this->thresholds_);
+}
+
+void PresenceZone::process(float energy, bool in_window, unsigned long now) {
+  // Zones evaluate still energy only, so the arm and hold scores are the same. With a usable σ the score is
+  // the energy itself against μ + kσ; a frame elsewhere (or without a distance) is scored below any threshold.
+  const PresenceThresholds &thresholds =
+      this->model_.energy_domain ? this->model_.energy_thresholds : this->model_.z_thresholds;
+  float score = -INFINITY;
+  if (in_window && !std::isnan(energy)) {
+    score = this->model_.energy_domain ? energy : this->model_.z_still(energy);
+  }
+
+  Transition transition = step_state_machine(this->current_state_, this->debounce_start_time_,
+                                             this->last_high_confidence_time_, score, score, now, thresholds);
+  if (transition == TRANSITION_ON) {
+    this->publish_state(true);
+    ESP_LOGI(TAG, "Zone [%.0fcm, %.0fcm] → PRESENT (z=%.2f)", this->d_min_cm_, this->d_max_cm_,
+             this->model_.z_still(energy));
+  } else if (transition == TRANSITION_OFF) {
+    this->publish_state(false);
+    ESP_LOGI(TAG, "Zone [%.0fcm, %.0fcm] → IDLE (%s)", this->d_min_cm_, this->d_max_cm_,
+             in_window ? "low energy" : "no frames in window");
+  }
+}
+
+bool PresenceZone::finish_calibration() {
+  uint32_t n = this->calibration_histogram_.count();
+  if (n == 0) {
+    ESP_LOGW(TAG, "Zone [%.0fcm, %.0fcm]: no frames during calibration, keeping μ=%.2f, σ=%.2f", this->d_min_cm_,
+             this->d_max_cm_, this->mu_still_, this->sigma_still_);
+    return false;
+  }
+  compute_median_sigma(this->calibration_histogram_, &this->mu_still_, &this->sigma_still_);
+  this->calibration_histogram_.clear();
+  this->rebuild_model();
+  ESP_LOGI(TAG, "Zone [%.0fcm, %.0fcm] calibrated: mu=%.2f, sigma=%.2f (samples=%u)", this->d_min_cm_,
+           this->d_max_cm_, this->mu_still_, this->sigma_still_, static_cast<unsigned>(n));
+  return true;
+}
+
+void PresenceZone::reset_baseline(float mu, float sigma) {
+  this->mu_still_ = mu;
+  this->sigma_still_ = sigma;
+  this->calibration_histogram_.clear();
+  this->rebuild_model();
+}
+
+void PresenceZone::restore_baseline() {
+  this->persist_ = true;
+  this->baseline_pref_ = global_preferences->make_preference<PersistedZoneBaseline>(
+      this->get_object_id_hash() ^ PERSISTED_BASELINE_VERSION, true);
+  this->persisted_baseline_ = PersistedZoneBaseline{this->mu_still_, this->sigma_still_};
+
+  PersistedZoneBaseline stored{};
+  if (!this->baseline_pref_.load(&stored)) {
+    return;
+  }
+  if (!std::isfinite(stored.mu_still) || !std::isfinite(stored.sigma_still) || stored.sigma_still <= 0.001f) {
+    ESP_LOGW(TAG, "Ignoring invalid persisted zone baseline (mu=%.2f, sigma=%.2f)", stored.mu_still,
+             stored.sigma_still);
+    return;
+  }
+  this->mu_still_ = stored.mu_still;
+  this->sigma_still_ = stored.sigma_still;
+  this->persisted_baseline_ = stored;
+  this->rebuild_model();
+}
+
+void PresenceZone::persist_baseline() {
+  if (!this->persist_) {
+    return;
+  }
+  PersistedZoneBaseline baseline{this->mu_still_, this->sigma_still_};
+  if (std::memcmp(&baseline, &this->persisted_baseline_, sizeof(baseline)) == 0) {
+    return;
+  }
+  if (this->baseline_pref_.save(&baseline)) {
+    this->persisted_baseline_ = baseline;
+  } else {
+    ESP_LOGW(TAG, "Failed to persist zone baseline");
+  }
+}
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
@@ -0,0 +1,100 @@
+#pragma once
+
+#include "esphome/core/preferences.h"
+#include "esphome/components/binary_sensor/binary_sensor.h"
+#include "state_machine.h"
+#include "streaming_stats.h"
+#include "threshold_model.h"
+
+namespace esphome {
+namespace bed_presence_engine {
+
+// Zone baseline persisted to flash (one record per zone, keyed by its object id)
+struct PersistedZoneBaseline {
+  float mu_still;
+  float sigma_still;
+};
+
+/**
+ * One distance window of a multi-zone BedPresenceEngine (e.g. the near and
+ * far side of a bed).
+ *
+ * The engine reads each radar frame once and hands it to every zone. A zone
+ * scores a frame whose distance lies in its window by its still energy, and
+ * any other frame as vacant, so a zone whose frames move elsewhere clears
+ * after the absolute clear delay and off debounce like an empty bed would.
+ * Each zone keeps its own baseline, calibration histogram and state machine
+ * and publishes its own occupancy; thresholds and debounce timers are the
+ * engine's, so the HA tuning numbers apply to every zone.
+ *
+ * The LD2410 reports a single still distance per frame, so only one zone
+ * sees a given frame. Two occupied sides both stay ON only while the
+ * reported distance alternates between them within the absolute clear delay.
+ */
+class PresenceZone : public binary_sensor::BinarySensor {
+ public:
+  void set_d_min_cm(float value) { d_min_cm_ = value; }
+  void set_d_max_cm(float value) { d_max_cm_ = value; }
+  void set_mu_still(float mu) {
+    mu_still_ = mu;
+    this->rebuild_model();
+  }
+  void set_sigma_still(float sigma) {
+    sigma_still_ = sigma;
+    this->rebuild_model();
+  }
+  // The engine's thresholds and timers, set whenever the engine rebuilds its own model
+  void set_thresholds(const PresenceThresholds &thresholds) {
+    this->thresholds_ = thresholds;
+    this->rebuild_model();
+  }
+
+  bool contains(float distance) const { return distance >= this->d_min_cm_ && distance <= this->d_max_cm_; }
+  float get_d_min_cm() const { return this->d_min_cm_; }
+  float get_d_max_cm() const { return this->d_max_cm_; }
+  State get_state() const { return this->current_state_; }
+  float get_mu_still() const { return this->mu_still_; }
+  float get_sigma_still() const { return this->sigma_still_; }
+
+  // Publish OFF and start from IDLE (boot, reset)
+  void reset();
+  // Run one frame through the zone's state machine; frames outside the window count as vacant
+  void process(float energy, bool in_window, unsigned long now);
+
+  // Calibration runs alongside the engine's: samples are the zone's in-window frames
+  void start_calibration() { this->calibration_histogram_.clear(); }
+  void add_calibration_sample(float energy) { this->calibration_histogram_.add(energy); }
+  // Adopt the calibrated baseline; false (baseline unchanged) if the zone saw no frames
+  bool finish_calibration();
+  void reset_baseline(float mu, float sigma);
+
+  // Flash persistence of the baseline (see BedPresenceEngine::restore_config)
+  void restore_baseline();
+  void persist_baseline();
+
+  static constexpr uint32_t PERSISTED_BASELINE_VERSION = 1;
+
+ protected:
+  float d_min_cm_{0.0f};
+  float d_max_cm_{600.0f};
+  float mu_still_{6.7f};
+  float sigma_still_{3.5f};
+
+  // Energy thresholds precomputed from the baseline, like the engine's (threshold_model.h)
+  void rebuild_model();
+  PresenceThresholds thresholds_{};
+  ThresholdModel model_{};
+
+  State current_state_{IDLE};
+  unsigned long debounce_start_time_{0};
+  unsigned long last_high_confidence_time_{0};
+
+  EnergyHistogram calibration_histogram_{0.0f, 0.5f};
+
+  bool persist_{false};
+  ESPPreferenceObject baseline_pref_;
+  PersistedZoneBaseline persisted_baseline_{};
+};
+
+}  // namespace bed_presence_engine
+}  // namespace esphome
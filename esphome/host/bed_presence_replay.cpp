@@ -0,0 +1,169 @@
+// Batch replay entry point for the host build of BedPresenceEngine.
+
+#include "bed_presence_replay.h"
+
+#include <cmath>
+
+#include "bed_presence.h"
+
+using esphome::bed_presence_engine::BedPresenceEngine;
+using esphome::bed_presence_engine::FusionMode;
+using esphome::bed_presence_engine::PrefilterMode;
+
+namespace {
+
+// Exposes the calibrated baseline and state machine, which the ESPHome build keeps protected
+class ReplayEngine : public BedPresenceEngine {
+ public:
+  using BedPresenceEngine::current_state_;
+  using BedPresenceEngine::mu_stat_;
+  using BedPresenceEngine::mu_still_;
+  using BedPresenceEngine::sigma_stat_;
+  using BedPresenceEngine::sigma_still_;
+};
+
+void apply_params(BedPresenceEngine &engine, const bpe_params_t &params) {
+  engine.set_mu_still(params.mu_still);
+  engine.set_sigma_still(params.sigma_still);
+  engine.set_k_on(params.k_on);
+  engine.set_k_off(params.k_off);
+  engine.set_on_debounce_ms(params.on_debounce_ms);
+  engine.set_off_debounce_ms(params.off_debounce_ms);
+  engine.set_abs_clear_delay_ms(params.abs_clear_delay_ms);
+  engine.set_d_min_cm(params.d_min_cm);
+  engine.set_d_max_cm(params.d_max_cm);
+  engine.set_mu_moving(params.mu_moving);
+  engine.set_sigma_moving(params.sigma_moving);
+  engine.set_fusion_mode(static_cast<FusionMode>(params.fusion_mode));
+  engine.set_fusion_moving_weight(params.fusion_moving_weight);
+  engine.set_prefilter_mode(static_cast<PrefilterMode>(params.prefilter_mode));
+  engine.set_prefilter_window(params.prefilter_window);
+  engine.set_prefilter_threshold(params.prefilter_threshold);
+}
+
+}  // namespace
+
+struct bpe_engine {
+  esphome::sensor::Sensor energy_sensor;
+  esphome::sensor::Sensor moving_energy_sensor;
+  esphome::sensor::Sensor distance_sensor;
+  ReplayEngine engine;
+};
+
+extern "C" {
+
+int bpe_abi_version(void) { return BPE_ABI_VERSION; }
+
+void bpe_default_params(bpe_params_t *out) {
+  if (out == nullptr)
+    return;
+  *out = bpe_params_t{6.7f, 3.5f, 9.0f, 4.0f, 3000, 5000, 30000, 0.0f, 600.0f, 6.7f, 3.5f, 0, 0.5f, 0, 5, 3.0f};
+}
+
+long bpe_replay(const bpe_params_t *params, const uint32_t *timestamps_ms, const float *energies,
+                const float *moving_energies, const float *distances, size_t n, uint8_t *states_out,
+                bpe_transition_t *transitions_out, size_t max_transitions) {
+  if (params == nullptr || (n > 0 && (timestamps_ms == nullptr || energies == nullptr)))
+    return -1;
+
+  esphome::sensor::Sensor energy_sensor;
+  esphome::sensor::Sensor moving_energy_sensor;
+  esphome::sensor::Sensor distance_sensor;
+  BedPresenceEngine engine;
+  engine.set_energy_sensor(&energy_sensor);
+  if (moving_energies != nullptr)
+    engine.set_moving_energy_sensor(&moving_energy_sensor);
+  if (distances != nullptr)
+    engine.set_distance_sensor(&distance_sensor);
+  apply_params(engine, *params);
+
+  esphome::host::set_millis(n > 0 ? timestamps_ms[0] : 0);
+  engine.setup();
+
+  long transitions = 0;
+  bool previous = engine.state;
+  for (size_t i = 0; i < n; i++) {
+    esphome::host::set_millis(timestamps_ms[i]);
+    if (distances != nullptr && !std::isnan(distances[i]))
+      distance_sensor.publish_state(distances[i]);
+    if (moving_energies != nullptr && !std::isnan(moving_energies[i]))
+      moving_energy_sensor.publish_state(moving_energies[i]);
+    energy_sensor.publish_state(energies[i]);
+    engine.loop();
+
+    bool current = engine.state;
+    if (states_out != nullptr)
+      states_out[i] = current ? 1 : 0;
+    if (current != previous) {
+      if (transitions_out != nullptr && static_cast<size_t>(transitions) < max_transitions)
+        transitions_out[transitions] = bpe_transition_t{timestamps_ms[i], current ? 1u : 0u};
+      transitions++;
+      previous = current;
+    }
+  }
+  return transitions;
+}
+
+bpe_engine_t *bpe_engine_create(const bpe_params_t *params, int use_distance) {
+  if (params == nullptr)
+    return nullptr;
+  auto *handle = new bpe_engine;
+  handle->engine.set_energy_sensor(&handle->energy_sensor);
+  handle->engine.set_moving_energy_sensor(&handle->moving_energy_sensor);
+  if (use_distance)
+    handle->engine.set_distance_sensor(&handle->distance_sensor);
+  apply_params(handle->engine, *params);
+  esphome::host::set_millis(0);
+  handle->engine.setup();
+  return handle;
+}
+
+int bpe_engine_feed(bpe_engine_t *engine, uint32_t t_ms, float energy, float moving_energy, float distance) {
+  esphome::host::set_millis(t_ms);
+  if (!std::isnan(distance))
+    engine->distance_sensor.publish_state(distance);
+  if (!std::isnan(moving_energy))
+    engine->moving_energy_sensor.publish_state(moving_energy);
+  engine->energy_sensor.publish_state(energy);
+  engine->engine.loop();
+  return engine->engine.state ? 1 : 0;
+}
+
+int bpe_engine_state(const bpe_engine_t *engine) { return static_cast<int>(engine->engine.current_state_); }
+
+void bpe_engine_destroy(bpe_engine_t *engine) { delete engine; }
+
+int bpe_calibrate(const float *samples, const float *moving_samples, size_t n, float *mu_out, float *sigma_out,
+                  float *mu_moving_out, float *sigma_moving_out) {
+  if (samples == nullptr || n == 0)
+    return -1;
+
+  esphome::sensor::Sensor energy_sensor;
+  esphome::sensor::Sensor moving_energy_sensor;
+  ReplayEngine engine;
+  engine.set_energy_sensor(&energy_sensor);
+  if (moving_samples != nullptr)
+    engine.set_moving_energy_sensor(&moving_energy_sensor);
+  esphome::host::set_millis(0);
+  engine.setup();
+  engine.start_baseline_calibration(600);
+  for (size_t i = 0; i < n; i++) {
+    if (moving_samples != nullptr)
+      moving_energy_sensor.publish_state(moving_samples[i]);
+    energy_sensor.publish_state(samples[i]);
+    engine.loop();
+  }
+  engine.stop_baseline_calibration();
+
+  if (mu_out != nullptr)
+    *mu_out = engine.mu_still_;
+  if (sigma_out != nullptr)
+    *sigma_out = engine.sigma_still_;
+  if (mu_moving_out != nullptr)
+    *mu_moving_out = engine.mu_stat_;
+  if (sigma_moving_out != nullptr)
+    *sigma_moving_out = engine.sigma_stat_;
+  return 0;
+}
+
+}  // extern "C"
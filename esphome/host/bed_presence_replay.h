@@ -0,0 +1,97 @@
+#pragma once
+
+/**
+ * C ABI for replaying radar traces through the production BedPresenceEngine.
+ *
+ * The library is built from the unmodified bed_presence.cpp against the host
+ * stand-ins in this directory (see Makefile). Python binds to it through
+ * ctypes in scripts/engine_replay.py; keep the structs below in sync with the
+ * ctypes definitions there and bump BPE_ABI_VERSION on any layout change.
+ */
+
+#include <stddef.h>
+#include <stdint.h>
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+#define BPE_ABI_VERSION 5
+
+typedef struct {
+  float mu_still;
+  float sigma_still;
+  float k_on;
+  float k_off;
+  uint32_t on_debounce_ms;
+  uint32_t off_debounce_ms;
+  uint32_t abs_clear_delay_ms;
+  float d_min_cm;
+  float d_max_cm;
+  float mu_moving;
+  float sigma_moving;
+  uint32_t fusion_mode;  // enum FusionMode in bed_presence.h (0 = still energy only)
+  float fusion_moving_weight;
+  uint32_t prefilter_mode;  // enum PrefilterMode in prefilter.h (0 = off)
+  uint32_t prefilter_window;
+  float prefilter_threshold;
+} bpe_params_t;
+
+typedef struct {
+  uint32_t t_ms;
+  uint32_t state;  // Binary sensor output after the transition (0 = vacant, 1 = occupied)
+} bpe_transition_t;
+
+int bpe_abi_version(void);
+
+// Fill `out` with the engine's compiled defaults.
+void bpe_default_params(bpe_params_t *out);
+
+/**
+ * Replay n frames and report binary sensor transitions.
+ *
+ * timestamps_ms: frame times, non-decreasing
+ * energies:      still energy per frame (%)
+ * moving_energies: moving energy per frame (%); NULL disables the moving
+ *                channel, NaN entries leave the previous value in place
+ * distances:     still distance per frame (cm); NULL disables the distance
+ *                window, NaN entries leave the previous distance in place
+ * states_out:    optional per-frame binary sensor output (NULL to skip)
+ * transitions_out / max_transitions: optional transition buffer
+ *
+ * Returns the total number of transitions (which may exceed max_transitions,
+ * in which case only the first max_transitions were written), or -1 if the
+ * arguments are invalid.
+ */
+long bpe_replay(const bpe_params_t *params, const uint32_t *timestamps_ms, const float *energies,
+                const float *moving_energies, const float *distances, size_t n, uint8_t *states_out, bpe_transition_t *transitions_out,
+                size_t max_transitions);
+
+// Opaque engine handle for frame-at-a-time use (simulated devices, per-frame benchmarks)
+typedef struct bpe_engine bpe_engine_t;
+
+// Create an engine; use_distance != 0 enables the distance window. Returns NULL on bad arguments.
+bpe_engine_t *bpe_engine_create(const bpe_params_t *params, int use_distance);
+
+// Deliver one frame (moving energy / distance NaN keep the previous value) and return the binary sensor output.
+int bpe_engine_feed(bpe_engine_t *engine, uint32_t t_ms, float energy, float moving_energy, float distance);
+
+// Current state machine state (enum State in bed_presence.h: IDLE, DEBOUNCING_ON, PRESENT, DEBOUNCING_OFF).
+int bpe_engine_state(const bpe_engine_t *engine);
+
+void bpe_engine_destroy(bpe_engine_t *engine);
+
+/**
+ * Run the firmware's baseline calibration (start_baseline_calibration →
+ * frames → stop_baseline_calibration) over n still-energy samples, and over
+ * the matching moving-energy samples when moving_samples is not NULL.
+ *
+ * Returns 0 and writes μ/σ (and the moving μ/σ, when requested) on success,
+ * -1 if no samples were given.
+ */
+int bpe_calibrate(const float *samples, const float *moving_samples, size_t n, float *mu_out, float *sigma_out,
+                  float *mu_moving_out, float *sigma_moving_out);
+
+#ifdef __cplusplus
+}
+#endif
@@ -0,0 +1,45 @@
+#pragma once
+
+// Host stand-in for esphome/components/binary_sensor/binary_sensor.h.
+
+#include <cstdint>
+#include <functional>
+#include <utility>
+#include <vector>
+
+namespace esphome {
+namespace binary_sensor {
+
+class BinarySensor {
+ public:
+  virtual ~BinarySensor() = default;
+  void publish_state(bool state) {
+    bool changed = !this->has_state_ || this->state != state;
+    this->state = state;
+    this->has_state_ = true;
+    this->publish_count_++;
+    if (!changed)
+      return;  // Like ESPHome, callbacks only see state changes
+    for (auto &callback : this->callbacks_)
+      callback(state);
+  }
+  void add_on_state_callback(std::function<void(bool)> &&callback) {
+    this->callbacks_.push_back(std::move(callback));
+  }
+  bool has_state() const { return this->has_state_; }
+  uint32_t get_publish_count() const { return this->publish_count_; }
+  // ESPHome derives this from the entity's object id; on the host it is fixed unless a test sets it
+  uint32_t get_object_id_hash() { return this->object_id_hash_; }
+  void set_object_id_hash(uint32_t hash) { this->object_id_hash_ = hash; }
+
+  bool state{false};
+
+ protected:
+  bool has_state_{false};
+  uint32_t publish_count_{0};
+  uint32_t object_id_hash_{0x6b1d2f4eUL};
+  std::vector<std::function<void(bool)>> callbacks_;
+};
+
+}  // namespace binary_sensor
+}  // namespace esphome
@@ -0,0 +1,34 @@
+#pragma once
+
+// Host stand-in for esphome/components/sensor/sensor.h.
+
+#include <cmath>
+#include <functional>
+#include <utility>
+#include <vector>
+
+namespace esphome {
+namespace sensor {
+
+class Sensor {
+ public:
+  void publish_state(float state) {
+    this->state = state;
+    this->has_state_ = true;
+    for (auto &callback : this->callbacks_)
+      callback(state);
+  }
+  void add_on_state_callback(std::function<void(float)> &&callback) {
+    this->callbacks_.push_back(std::move(callback));
+  }
+  bool has_state() const { return this->has_state_; }
+
+  float state{NAN};
+
+ protected:
+  bool has_state_{false};
+  std::vector<std::function<void(float)>> callbacks_;
+};
+
+}  // namespace sensor
+}  // namespace esphome
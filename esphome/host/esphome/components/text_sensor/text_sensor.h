@@ -0,0 +1,38 @@
+#pragma once
+
+// Host stand-in for esphome/components/text_sensor/text_sensor.h.
+
+#include <cstdint>
+#include <functional>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace esphome {
+namespace text_sensor {
+
+class TextSensor {
+ public:
+  void publish_state(const std::string &state) {
+    this->state = state;
+    this->has_state_ = true;
+    this->publish_count_++;
+    for (auto &callback : this->callbacks_)
+      callback(state);
+  }
+  void add_on_state_callback(std::function<void(std::string)> &&callback) {
+    this->callbacks_.push_back(std::move(callback));
+  }
+  bool has_state() const { return this->has_state_; }
+  uint32_t get_publish_count() const { return this->publish_count_; }
+
+  std::string state;
+
+ protected:
+  bool has_state_{false};
+  uint32_t publish_count_{0};
+  std::vector<std::function<void(std::string)>> callbacks_;
+};
+
+}  // namespace text_sensor
+}  // namespace esphome
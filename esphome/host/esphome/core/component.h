@@ -0,0 +1,22 @@
+#pragma once
+
+// Host stand-in for esphome/core/component.h. Only the surface used by the
+// bed_presence_engine component is provided.
+
+#include "esphome/core/hal.h"
+
+namespace esphome {
+
+namespace setup_priority {
+const float DATA = 600.0f;
+}  // namespace setup_priority
+
+class Component {
+ public:
+  virtual ~Component() = default;
+  virtual void setup() {}
+  virtual void loop() {}
+  virtual float get_setup_priority() const { return setup_priority::DATA; }
+};
+
+}  // namespace esphome
@@ -0,0 +1,17 @@
+#pragma once
+
+// Host stand-in for the defines.h that ESPHome generates from cg.add_define().
+// The host build compiles every optional engine stage so the replay library
+// and the tests cover all of them.
+
+#define USE_BED_PRESENCE_ADAPTIVE_THRESHOLDS
+#define USE_BED_PRESENCE_BASELINE_TRACKING
+#define USE_BED_PRESENCE_FLIGHT_RECORDER
+#define USE_BED_PRESENCE_FRAME_STREAM
+#define USE_BED_PRESENCE_FUSION
+#define USE_BED_PRESENCE_GATES
+#define USE_BED_PRESENCE_INSTRUMENTATION
+#define USE_BED_PRESENCE_PREFILTER
+#define USE_BED_PRESENCE_TELEMETRY
+#define USE_BED_PRESENCE_WARM_RESTART
+#define USE_BED_PRESENCE_ZONES
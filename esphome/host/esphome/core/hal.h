@@ -0,0 +1,18 @@
+#pragma once
+
+// Host stand-in for esphome/core/hal.h: a settable millisecond clock so replays
+// can drive the engine with recorded frame timestamps instead of wall time.
+
+#include <cstdint>
+
+namespace esphome {
+
+uint32_t millis();
+// Derived from the millisecond clock, so durations measured within one step are 0
+uint32_t micros();
+
+namespace host {
+void set_millis(uint32_t now);
+}  // namespace host
+
+}  // namespace esphome
@@ -0,0 +1,21 @@
+#pragma once
+
+// Host stand-in for esphome/core/log.h. Logging is compiled out so replays run
+// at full speed; build with -DBPE_HOST_LOG to print messages to stderr.
+
+#ifdef BPE_HOST_LOG
+#include <cstdio>
+#define BPE_HOST_LOG_(level, tag, fmt, ...) std::fprintf(stderr, "[" level "][%s] " fmt "\n", tag, ##__VA_ARGS__)
+#else
+#define BPE_HOST_LOG_(level, tag, fmt, ...) \
+  do { \
+  } while (0)
+#endif
+
+#define ESP_LOGE(tag, ...) BPE_HOST_LOG_("E", tag, __VA_ARGS__)
+#define ESP_LOGW(tag, ...) BPE_HOST_LOG_("W", tag, __VA_ARGS__)
+#define ESP_LOGI(tag, ...) BPE_HOST_LOG_("I", tag, __VA_ARGS__)
+#define ESP_LOGD(tag, ...) BPE_HOST_LOG_("D", tag, __VA_ARGS__)
+#define ESP_LOGCONFIG(tag, ...) BPE_HOST_LOG_("C", tag, __VA_ARGS__)
+#define ESP_LOGV(tag, ...) BPE_HOST_LOG_("V", tag, __VA_ARGS__)
+#define ESP_LOGVV(tag, ...) BPE_HOST_LOG_("VV", tag, __VA_ARGS__)
@@ -0,0 +1,53 @@
+#pragma once
+
+// Host stand-in for esphome/core/preferences.h: an in-memory key/value store
+// with the same save/load surface, so persistence can be exercised (and a
+// "reboot" simulated by constructing a fresh engine) without flash.
+
+#include <cstddef>
+#include <cstdint>
+#include <cstring>
+
+namespace esphome {
+
+class ESPPreferenceObject {
+ public:
+  ESPPreferenceObject() = default;
+  ESPPreferenceObject(uint32_t type, size_t length) : type_(type), length_(length) {}
+
+  template<typename T> bool save(const T *src) {
+    return this->length_ == sizeof(T) && this->save_(reinterpret_cast<const uint8_t *>(src));
+  }
+  template<typename T> bool load(T *dest) {
+    return this->length_ == sizeof(T) && this->load_(reinterpret_cast<uint8_t *>(dest));
+  }
+
+ protected:
+  bool save_(const uint8_t *data);
+  bool load_(uint8_t *data);
+
+  uint32_t type_{0};
+  size_t length_{0};
+};
+
+class ESPPreferences {
+ public:
+  ESPPreferenceObject make_preference(size_t length, uint32_t type, bool in_flash) {
+    return ESPPreferenceObject(type, length);
+  }
+  template<typename T> ESPPreferenceObject make_preference(uint32_t type, bool in_flash) {
+    return this->make_preference(sizeof(T), type, in_flash);
+  }
+  bool sync() { return true; }
+};
+
+extern ESPPreferences *global_preferences;
+
+namespace host {
+// Forget every stored preference (a factory-fresh flash)
+void preferences_clear();
+// Number of save() calls that reached the store since the last clear
+uint32_t preferences_write_count();
+}  // namespace host
+
+}  // namespace esphome
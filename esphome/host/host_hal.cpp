@@ -0,0 +1,49 @@
+// Host implementation of the ESPHome clock and preferences used by the replay build.
+
+#include "esphome/core/hal.h"
+#include "esphome/core/preferences.h"
+
+#include <map>
+#include <vector>
+
+namespace esphome {
+
+// Each replay owns its thread's clock, so concurrent replays stay independent.
+static thread_local uint32_t host_now_ms = 0;
+
+uint32_t millis() { return host_now_ms; }
+uint32_t micros() { return host_now_ms * 1000u; }
+
+// Preferences live in process memory; replays never enable persistence, so
+// only tests touch this store.
+static std::map<uint32_t, std::vector<uint8_t>> host_preferences;
+static uint32_t host_preference_writes = 0;
+static ESPPreferences host_global_preferences;
+ESPPreferences *global_preferences = &host_global_preferences;
+
+bool ESPPreferenceObject::save_(const uint8_t *data) {
+  host_preferences[this->type_].assign(data, data + this->length_);
+  host_preference_writes++;
+  return true;
+}
+
+bool ESPPreferenceObject::load_(uint8_t *data) {
+  auto it = host_preferences.find(this->type_);
+  if (it == host_preferences.end() || it->second.size() != this->length_)
+    return false;
+  std::memcpy(data, it->second.data(), this->length_);
+  return true;
+}
+
+namespace host {
+void set_millis(uint32_t now) { host_now_ms = now; }
+
+void preferences_clear() {
+  host_preferences.clear();
+  host_preference_writes = 0;
+}
+
+uint32_t preferences_write_count() { return host_preference_writes; }
+}  // namespace host
+
+}  // namespace esphome
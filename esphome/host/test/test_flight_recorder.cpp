@@ -0,0 +1,102 @@
+/**
+ * Tests for the flight recorder ring buffer and its dump protocol.
+ *
+ * Run: make -C esphome/host test
+ */
+
+#include <gtest/gtest.h>
+
+#include <cmath>
+#include <string>
+#include <vector>
+
+#include "bed_presence.h"
+#include "flight_recorder.h"
+
+using esphome::bed_presence_engine::BedPresenceEngine;
+using esphome::bed_presence_engine::FlightRecorder;
+
+static std::vector<std::string> dump_all(FlightRecorder &recorder) {
+  std::vector<std::string> chunks;
+  char chunk[FlightRecorder::CHUNK_TEXT_SIZE];
+  recorder.start_dump();
+  while (recorder.next_chunk(chunk))
+    chunks.push_back(chunk);
+  return chunks;
+}
+
+TEST(FlightRecorderTest, PacksFramesIntoSixBytes) {
+  FlightRecorder recorder;
+  ASSERT_TRUE(recorder.allocate(8));
+  recorder.record(1000, 42.4f, 150.0f, 10.26f, 2, 0);
+  recorder.record(1300, NAN, NAN, -3.0f, 3, FlightRecorder::FLAG_HELD | FlightRecorder::FLAG_GATED);
+
+  std::vector<std::string> chunks = dump_all(recorder);
+  ASSERT_EQ(chunks.size(), 1u);
+  // dt=0, energy 42, distance 150/4 → 38, z 10.26*2 → 21, state 2
+  // dt=300 (0x012c), energy/distance missing, z -6, state 3 | held | gated
+  EXPECT_EQ(chunks[0], "00002a261502" "2c01fffffa0f");
+}
+
+TEST(FlightRecorderTest, KeepsNewestFramesWhenFull) {
+  FlightRecorder recorder;
+  ASSERT_TRUE(recorder.allocate(4));
+  for (uint32_t i = 0; i < 10; i++)
+    recorder.record(i * 100, static_cast<float>(i), NAN, 0.0f, 0, 0);
+  EXPECT_EQ(recorder.size(), 4u);
+
+  std::vector<std::string> chunks = dump_all(recorder);
+  ASSERT_EQ(chunks.size(), 1u);
+  EXPECT_EQ(chunks[0].substr(4, 2), "06");  // Oldest kept frame
+  EXPECT_EQ(chunks[0].substr(3 * 12 + 4, 2), "09");
+  EXPECT_EQ(recorder.size(), 0u);  // Dumping re-arms with an empty buffer
+}
+
+TEST(FlightRecorderTest, FreezesAfterPostTriggerFrames) {
+  FlightRecorder recorder;
+  ASSERT_TRUE(recorder.allocate(40));
+  for (uint32_t i = 0; i < 100; i++) {
+    recorder.record(i * 100, 10.0f, NAN, 0.0f, 0, 0);
+    if (i == 50)
+      recorder.trigger();
+  }
+  EXPECT_TRUE(recorder.frozen());
+  EXPECT_EQ(recorder.last_time(), 6000u);  // Transition at 5.0s + 10 post-trigger frames
+
+  recorder.trigger();
+  EXPECT_EQ(recorder.missed(), 1u);
+  dump_all(recorder);
+  EXPECT_FALSE(recorder.frozen());
+  EXPECT_EQ(recorder.missed(), 0u);
+}
+
+TEST(FlightRecorderTest, EngineDumpsLinesAroundTransition) {
+  esphome::sensor::Sensor energy;
+  esphome::text_sensor::TextSensor dump;
+  std::vector<std::string> lines;
+  dump.add_on_state_callback([&lines](std::string line) { lines.push_back(line); });
+
+  BedPresenceEngine engine;
+  engine.set_energy_sensor(&energy);
+  engine.set_flight_recorder_capacity(100);
+  engine.set_flight_recorder_auto_dump(true);
+  engine.set_flight_recorder_sensor(&dump);
+  esphome::host::set_millis(0);
+  engine.setup();
+
+  uint32_t t = 0;
+  for (; t < 20000; t += 100) {
+    esphome::host::set_millis(t);
+    energy.publish_state(t >= 5000 ? 50.0f : 6.0f);
+    engine.loop();
+  }
+
+  // ON at 8.0s freezes the ring after 25 more frames; the auto dump then
+  // streams the last 100 frames (0.6s-10.5s) in 7 chunks and re-arms
+  ASSERT_GE(lines.size(), 9u);
+  EXPECT_EQ(lines[0], "FR1 begin frames=100 capacity=100 t_last_ms=10500 frozen=1 missed=0");
+  EXPECT_EQ(lines[1].substr(0, 9), "FR1 0000 ");
+  EXPECT_EQ(lines[7].substr(0, 9), "FR1 0006 ");
+  EXPECT_EQ(lines[8], "FR1 end");
+  EXPECT_EQ(lines.size(), 9u);  // No further transition, so nothing else is dumped
+}
@@ -0,0 +1,1323 @@
+/**
+ * Host Tests for the Production BedPresenceEngine
+ *
+ * Unlike esphome/test/test_presence_engine.cpp (which documents the algorithm
+ * with a simplified model), these tests compile the shipping bed_presence.cpp
+ * against the host stand-ins and drive it through its public ESPHome surface:
+ * sensor publishes, loop() and a settable millis() clock.
+ *
+ * Run: make -C esphome/host test
+ */
+
+#include <gtest/gtest.h>
+
+#include <cmath>
+#include <vector>
+
+#include "bed_presence.h"
+#include "bed_presence_replay.h"
+#include "esphome/core/preferences.h"
+
+using esphome::bed_presence_engine::BedPresenceEngine;
+using esphome::bed_presence_engine::FrameStream;
+using esphome::bed_presence_engine::ThresholdLearner;
+using esphome::bed_presence_engine::ThresholdSuggestion;
+
+// Exposes internals that the ESPHome build keeps protected
+class TestableEngine : public BedPresenceEngine {
+ public:
+  using BedPresenceEngine::baseline_tracker_;
+  using BedPresenceEngine::current_state_;
+  using BedPresenceEngine::k_off_;
+  using BedPresenceEngine::k_on_;
+  using BedPresenceEngine::mu_stat_;
+  using BedPresenceEngine::mu_still_;
+  using BedPresenceEngine::sigma_stat_;
+  using BedPresenceEngine::sigma_still_;
+  using BedPresenceEngine::threshold_learner_;
+};
+
+class HostEngineTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    engine_.set_energy_sensor(&energy_);
+    engine_.set_distance_sensor(&distance_);
+    engine_.set_state_reason_sensor(&reason_);
+    engine_.set_last_change_reason_sensor(&change_reason_);
+    esphome::host::set_millis(0);
+    engine_.setup();
+  }
+
+  // Deliver one LD2410 frame at time t_ms and run the component loop
+  void frame(uint32_t t_ms, float energy, float distance = 100.0f) {
+    esphome::host::set_millis(t_ms);
+    distance_.publish_state(distance);
+    energy_.publish_state(energy);
+    engine_.loop();
+  }
+
+  TestableEngine engine_;
+  esphome::sensor::Sensor energy_;
+  esphome::sensor::Sensor distance_;
+  esphome::text_sensor::TextSensor reason_;
+  esphome::text_sensor::TextSensor change_reason_;
+};
+
+// Defaults: μ=6.7, σ=3.5, k_on=9 (ON above 38.2%), k_off=4 (OFF below 20.7%)
+
+TEST_F(HostEngineTest, StartsIdleAndPublishesOff) {
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::IDLE);
+  EXPECT_TRUE(engine_.has_state());
+  EXPECT_FALSE(engine_.state);
+  EXPECT_EQ(change_reason_.state, "idle:init");
+}
+
+TEST_F(HostEngineTest, DebouncedOnThenAbsoluteClearOff) {
+  frame(0, 50.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_ON);
+  frame(2999, 50.0f);
+  EXPECT_FALSE(engine_.state);
+  frame(3000, 50.0f);
+  EXPECT_TRUE(engine_.state);
+  EXPECT_EQ(change_reason_.state, "on:threshold_exceeded");
+
+  // Low signal inside the absolute clear delay keeps the bed occupied
+  frame(20000, 5.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::PRESENT);
+
+  frame(33000, 5.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_OFF);
+  frame(38000, 5.0f);
+  EXPECT_FALSE(engine_.state);
+  EXPECT_EQ(change_reason_.state, "off:abs_clear_delay");
+}
+
+TEST_F(HostEngineTest, DistanceWindowIgnoresFrames) {
+  engine_.update_d_max_cm(150.0f);
+  frame(0, 80.0f, 300.0f);
+  frame(5000, 80.0f, 300.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::IDLE);
+  EXPECT_FALSE(engine_.state);
+}
+
+TEST_F(HostEngineTest, CalibrationUsesMedianAndMad) {
+  engine_.start_baseline_calibration(60);
+  const float samples[] = {5.0f, 6.0f, 7.0f, 8.0f, 60.0f};
+  uint32_t t = 0;
+  for (float sample : samples)
+    frame(t += 100, sample);
+  engine_.stop_baseline_calibration();
+
+  // Median of the samples is 7; deviations [2,1,0,1,53] → MAD 1 → σ = 1.4826
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 7.0f);
+  EXPECT_NEAR(engine_.sigma_still_, 1.4826f, 1e-4f);
+  EXPECT_EQ(change_reason_.state, "calibration:completed");
+}
+
+TEST_F(HostEngineTest, ApplyBaselineActsLikeACalibration) {
+  EXPECT_FALSE(engine_.apply_baseline(NAN, 2.0f));
+  EXPECT_FALSE(engine_.apply_baseline(8.0f, 0.0f));
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 6.7f);
+
+  EXPECT_TRUE(engine_.apply_baseline(10.0f, 2.0f));
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 10.0f);
+  EXPECT_FLOAT_EQ(engine_.sigma_still_, 2.0f);
+  EXPECT_EQ(change_reason_.state, "calibration:applied");
+
+  // ON above 10 + 9·2 = 28%
+  frame(0, 30.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_ON);
+}
+
+TEST_F(HostEngineTest, ExtraLoopsDoNotReprocessFrames) {
+  engine_.start_baseline_calibration(60);
+  const float samples[] = {5.0f, 6.0f, 7.0f, 8.0f, 60.0f};
+  uint32_t t = 0;
+  for (float sample : samples) {
+    frame(t += 100, sample);
+    for (int i = 0; i < 10; i++)
+      engine_.loop();  // Main loop spinning between radar frames
+  }
+  engine_.stop_baseline_calibration();
+
+  EXPECT_EQ(engine_.get_frame_count(), 5u);  // Energy + distance of one frame count once
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 7.0f);
+  EXPECT_EQ(reason_.state, "Calibration complete: μ=7.00, σ=1.48, n=5");
+}
+
+TEST_F(HostEngineTest, UnchangedReadingIsHeldToAdvanceDebounce) {
+  // The LD2410 stops publishing while the reading is constant
+  frame(0, 50.0f);
+  for (uint32_t t = 100; t <= 3000; t += 100) {
+    esphome::host::set_millis(t);
+    engine_.loop();
+  }
+  EXPECT_EQ(engine_.get_frame_count(), 4u);  // The real frame plus holds at 1s, 2s, 3s
+  EXPECT_TRUE(engine_.state);
+}
+
+TEST_F(HostEngineTest, DistanceOnlyUpdateWaitsForTheNextFrame) {
+  engine_.update_d_max_cm(150.0f);
+  frame(0, 50.0f, 100.0f);
+  esphome::host::set_millis(500);
+  distance_.publish_state(300.0f);
+  engine_.loop();
+  EXPECT_EQ(engine_.get_frame_count(), 1u);
+
+  // The next held frame pairs the unchanged energy with the new distance
+  esphome::host::set_millis(1000);
+  engine_.loop();
+  EXPECT_EQ(engine_.get_frame_count(), 2u);
+  esphome::host::set_millis(3000);
+  engine_.loop();
+  EXPECT_FALSE(engine_.state);
+}
+
+TEST_F(HostEngineTest, CalibrationWeightsReadingsByHowLongTheyStood) {
+  // The LD2410 publishes only changes: per 10 s, 4% stands 2 s, 5% 4 s, 7% 1 s and 9% 3 s
+  const float values[] = {4.0f, 4.0f, 5.0f, 5.0f, 5.0f, 5.0f, 7.0f, 9.0f, 9.0f, 9.0f};
+  distance_.publish_state(100.0f);
+  engine_.start_baseline_calibration(120);
+  float last = NAN;
+  for (uint32_t t = 0; t < 100000; t += 1000) {
+    esphome::host::set_millis(t);
+    float value = values[(t / 1000) % 10];
+    if (value != last)
+      energy_.publish_state(value);
+    last = value;
+    engine_.loop();  // Otherwise the standing reading is held
+  }
+  esphome::host::set_millis(99500);
+  engine_.stop_baseline_calibration();
+
+  // Time-weighted truth: 20% 4, 40% 5, 10% 7, 30% 9 → median 5; deviations 0 (40%), 1 (20%) → MAD 1.
+  // One sample per change would give median 6 and MAD 1.5.
+  EXPECT_EQ(engine_.get_frame_count(), 100u);
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 5.0f);
+  EXPECT_NEAR(engine_.sigma_still_, 1.4826f, 1e-4f);
+}
+
+TEST_F(HostEngineTest, TelemetryPublishesWindowAggregates) {
+  esphome::sensor::Sensor frames, z_mean, z_max, energy_p95, mu;
+  engine_.set_telemetry_window_ms(10000);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_FRAMES, &frames);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_Z_MEAN, &z_mean);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_Z_MAX, &z_max);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_ENERGY_P95, &energy_p95);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_BASELINE_MU, &mu);
+
+  // 100 frames: energies 1..100 in shuffled order
+  for (uint32_t i = 0; i < 100; i++)
+    frame(i * 99, static_cast<float>((i * 37) % 100 + 1));
+  EXPECT_FALSE(frames.has_state());
+
+  esphome::host::set_millis(10000);
+  engine_.loop();
+  EXPECT_FLOAT_EQ(frames.state, 100.0f);
+  EXPECT_NEAR(z_mean.state, (50.5f - 6.7f) / 3.5f, 1e-4f);
+  EXPECT_NEAR(z_max.state, (100.0f - 6.7f) / 3.5f, 1e-4f);
+  EXPECT_FLOAT_EQ(energy_p95.state, 95.0f);
+  EXPECT_FLOAT_EQ(mu.state, 6.7f);
+
+  // An empty window reports no frames and unknown statistics
+  esphome::host::set_millis(20000);
+  engine_.loop();
+  EXPECT_FLOAT_EQ(frames.state, 0.0f);
+  EXPECT_TRUE(std::isnan(z_mean.state));
+
+  // σ = 0.5: frames at 40% score z = 66.6, beyond the z histogram; the p95 is flagged as clamped
+  esphome::sensor::Sensor z_p95, z_p95_clamped;
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_Z_P95, &z_p95);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_Z_P95_CLAMPED, &z_p95_clamped);
+  engine_.apply_baseline(6.7f, 0.5f);
+  for (uint32_t t = 20100; t < 21000; t += 100)
+    frame(t, 40.0f);
+  esphome::host::set_millis(30000);
+  engine_.loop();
+  EXPECT_FLOAT_EQ(z_p95.state, 40.0f);
+  EXPECT_FLOAT_EQ(z_p95_clamped.state, 1.0f);
+  EXPECT_NEAR(z_max.state, (40.0f - 6.7f) / 0.5f, 1e-3f);
+}
+
+// Deterministic noise in [-1, 1] (a fixed LCG keeps the tests reproducible)
+static float noise(uint32_t &seed) {
+  seed = seed * 1664525u + 1013904223u;
+  return static_cast<float>(seed >> 8) / static_cast<float>(1u << 23) - 1.0f;
+}
+
+TEST_F(HostEngineTest, ConvergingCalibrationStopsEarlyInQuietRoom) {
+  engine_.start_converging_calibration(600);
+  uint32_t seed = 1;
+  uint32_t t = 0;
+  while (t < 600000 && change_reason_.state == "calibration:started")
+    frame(t += 100, 6.0f + noise(seed));
+
+  EXPECT_EQ(change_reason_.state, "calibration:converged");
+  EXPECT_LT(t, 60000u);  // Seconds, not the 10 minute maximum
+  EXPECT_NEAR(engine_.mu_still_, 6.0f, 0.25f);
+}
+
+TEST_F(HostEngineTest, ConvergingCalibrationNeedsMoreSamplesWhenNoisy) {
+  auto frames_until_done = [this](float amplitude) {
+    engine_.start_converging_calibration(600);
+    uint32_t seed = 7;
+    uint32_t t = 0;
+    unsigned frames = 0;
+    while (change_reason_.state == "calibration:started") {
+      frame(t += 100, 10.0f + amplitude * noise(seed));
+      frames++;
+    }
+    return frames;
+  };
+
+  unsigned quiet = frames_until_done(1.0f);
+  unsigned noisy = frames_until_done(8.0f);
+  EXPECT_GT(noisy, 2 * quiet);
+}
+
+TEST_F(HostEngineTest, ConvergingCalibrationHonoursMaximumDuration) {
+  engine_.set_calibration_mu_tolerance(0.01f);
+  engine_.set_calibration_sigma_tolerance(0.01f);
+  engine_.start_converging_calibration(20);
+  uint32_t seed = 3;
+  for (uint32_t t = 100; t <= 20000; t += 100)
+    frame(t, 6.0f + 4.0f * noise(seed));
+
+  EXPECT_EQ(change_reason_.state, "calibration:completed");
+}
+
+// Persistence: each test starts from empty flash and "reboots" by building a
+// fresh engine against the same preference store
+class PersistenceTest : public ::testing::Test {
+ protected:
+  void SetUp() override { esphome::host::preferences_clear(); }
+
+  void boot(TestableEngine &engine) {
+    energy_ = esphome::sensor::Sensor();  // A reboot starts with fresh sensors (and no callbacks)
+    engine.set_energy_sensor(&energy_);
+    engine.set_persist_parameters(true);
+    esphome::host::set_millis(0);
+    engine.setup();
+  }
+
+  void idle_frame(TestableEngine &engine, uint32_t t_ms) {
+    esphome::host::set_millis(t_ms);
+    energy_.publish_state(6.0f);
+    engine.loop();
+  }
+
+  esphome::sensor::Sensor energy_;
+};
+
+TEST_F(PersistenceTest, CalibrationAndTuningSurviveReboot) {
+  {
+    TestableEngine engine;
+    boot(engine);
+    engine.start_baseline_calibration(60);
+    const float samples[] = {11.0f, 12.0f, 13.0f};
+    uint32_t t = 0;
+    for (float sample : samples) {
+      esphome::host::set_millis(t += 100);
+      energy_.publish_state(sample);
+      engine.loop();
+    }
+    engine.stop_baseline_calibration();
+    engine.update_k_on(7.5f);
+    idle_frame(engine, 20000);
+  }
+
+  TestableEngine rebooted;
+  boot(rebooted);
+  EXPECT_FLOAT_EQ(rebooted.mu_still_, 12.0f);
+  EXPECT_NEAR(rebooted.sigma_still_, 1.4826f, 1e-4f);
+  EXPECT_FLOAT_EQ(rebooted.k_on_, 7.5f);
+}
+
+TEST_F(PersistenceTest, WritesAreDebouncedAndCoalesced) {
+  TestableEngine engine;
+  boot(engine);
+  for (uint32_t t = 0; t < 3000; t += 100) {
+    esphome::host::set_millis(t);
+    engine.update_k_on(5.0f + t / 1000.0f);  // A slider drag
+    engine.loop();
+  }
+  idle_frame(engine, 12000);  // Only 9.9s after the last change
+  EXPECT_EQ(esphome::host::preferences_write_count(), 0u);
+
+  idle_frame(engine, 13000);
+  idle_frame(engine, 60000);
+  EXPECT_EQ(esphome::host::preferences_write_count(), 1u);
+}
+
+TEST_F(PersistenceTest, UnchangedParametersAreNotRewritten) {
+  TestableEngine engine;
+  boot(engine);
+  engine.update_k_on(9.0f);  // Same as the configured default
+  idle_frame(engine, 20000);
+  EXPECT_EQ(esphome::host::preferences_write_count(), 0u);
+
+  engine.update_k_on(8.0f);
+  idle_frame(engine, 40000);
+  engine.update_k_on(8.0f);
+  idle_frame(engine, 60000);
+  EXPECT_EQ(esphome::host::preferences_write_count(), 1u);
+}
+
+TEST_F(PersistenceTest, DisabledPersistenceIgnoresStoredValues) {
+  {
+    TestableEngine engine;
+    boot(engine);
+    engine.update_k_on(7.0f);
+    idle_frame(engine, 20000);
+  }
+
+  TestableEngine engine;
+  energy_ = esphome::sensor::Sensor();
+  engine.set_energy_sensor(&energy_);
+  engine.setup();
+  EXPECT_FLOAT_EQ(engine.k_on_, 9.0f);
+  engine.update_k_on(6.0f);
+  idle_frame(engine, 40000);
+  EXPECT_EQ(esphome::host::preferences_write_count(), 1u);
+}
+
+// Warm restart: the host keeps the RTC snapshot in process memory and uses
+// millis() as the wall clock, so a "reboot" is a fresh engine at a later time
+class WarmRestartTest : public ::testing::Test {
+ protected:
+  void boot(TestableEngine &engine, uint32_t t_ms, bool warm_restart = true) {
+    energy_ = esphome::sensor::Sensor();  // A reboot starts with fresh sensors (and no callbacks)
+    engine.set_energy_sensor(&energy_);
+    engine.set_last_change_reason_sensor(&change_reason_);
+    engine.set_warm_restart(warm_restart);
+    esphome::host::set_millis(t_ms);
+    engine.setup();
+  }
+
+  void frame(TestableEngine &engine, uint32_t t_ms, float energy) {
+    esphome::host::set_millis(t_ms);
+    energy_.publish_state(energy);
+    engine.loop();
+  }
+
+  // Run a first boot until the bed is occupied; the last frame is at 20s
+  void occupy_then_reset() {
+    TestableEngine engine;
+    boot(engine, 0);
+    for (uint32_t t = 0; t <= 20000; t += 500)
+      frame(engine, t, 50.0f);
+    ASSERT_EQ(engine.current_state_, esphome::bed_presence_engine::PRESENT);
+  }
+
+  esphome::sensor::Sensor energy_;
+  esphome::text_sensor::TextSensor change_reason_;
+};
+
+TEST_F(WarmRestartTest, FreshSnapshotResumesPresentOnFirstFrame) {
+  occupy_then_reset();
+
+  TestableEngine engine;
+  boot(engine, 30000);
+  EXPECT_FALSE(engine.has_state());  // No OFF blip while the snapshot is pending
+
+  frame(engine, 30100, 25.0f);  // Between k_off and k_on
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::PRESENT);
+  EXPECT_TRUE(engine.state);
+  EXPECT_EQ(change_reason_.state, "on:warm_restart");
+
+  // The absolute clear delay keeps counting from the last high frame before the reset (20s)
+  frame(engine, 45000, 5.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::PRESENT);
+  frame(engine, 50000, 5.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::DEBOUNCING_OFF);
+}
+
+TEST_F(WarmRestartTest, DisagreeingFirstFrameFallsBackToColdStart) {
+  occupy_then_reset();
+
+  TestableEngine engine;
+  boot(engine, 30000);
+  frame(engine, 30100, 5.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+  EXPECT_TRUE(engine.has_state());
+  EXPECT_FALSE(engine.state);
+  EXPECT_EQ(change_reason_.state, "idle:init");
+}
+
+TEST_F(WarmRestartTest, StaleSnapshotIsIgnored) {
+  occupy_then_reset();
+
+  TestableEngine engine;
+  boot(engine, 20000 + 121000);
+  EXPECT_TRUE(engine.has_state());
+  EXPECT_FALSE(engine.state);
+  frame(engine, 20000 + 121100, 25.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+}
+
+TEST_F(WarmRestartTest, DisabledOrSilentSensorStartsCold) {
+  occupy_then_reset();
+  {
+    TestableEngine engine;
+    boot(engine, 30000, false);
+    EXPECT_TRUE(engine.has_state());
+    EXPECT_FALSE(engine.state);
+  }
+
+  TestableEngine engine;
+  boot(engine, 30000);
+  esphome::host::set_millis(35000);
+  engine.loop();  // No frame within the timeout
+  EXPECT_TRUE(engine.has_state());
+  EXPECT_FALSE(engine.state);
+  EXPECT_EQ(change_reason_.state, "idle:init");
+}
+
+class FusionTest : public ::testing::Test {
+ protected:
+  // Moving baseline μ=2, σ=2: z_moving reaches k_on=9 at 20%
+  void start(esphome::bed_presence_engine::FusionMode mode, float moving_weight = 0.5f) {
+    engine_.set_energy_sensor(&energy_);
+    engine_.set_moving_energy_sensor(&moving_);
+    engine_.set_mu_moving(2.0f);
+    engine_.set_sigma_moving(2.0f);
+    engine_.set_fusion_mode(mode);
+    engine_.set_fusion_moving_weight(moving_weight);
+    esphome::host::set_millis(0);
+    engine_.setup();
+  }
+
+  void frame(uint32_t t_ms, float still, float moving) {
+    esphome::host::set_millis(t_ms);
+    moving_.publish_state(moving);
+    energy_.publish_state(still);
+    engine_.loop();
+  }
+
+  TestableEngine engine_;
+  esphome::sensor::Sensor energy_;
+  esphome::sensor::Sensor moving_;
+};
+
+TEST_F(FusionTest, StillOnlyIgnoresMovingEnergy) {
+  start(esphome::bed_presence_engine::FUSION_STILL);
+  frame(0, 10.0f, 60.0f);
+  frame(3000, 10.0f, 60.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::IDLE);
+}
+
+TEST_F(FusionTest, MovingArmsAndStillHolds) {
+  start(esphome::bed_presence_engine::FUSION_MOVING_ARMS);
+  // Climbing into bed: moving energy arms before still energy rises
+  frame(0, 10.0f, 60.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_ON);
+  frame(3000, 12.0f, 50.0f);
+  EXPECT_TRUE(engine_.state);
+  frame(4000, 45.0f, 5.0f);  // Settled: still energy refreshes the absolute clear delay
+
+  // Moving energy alone (a fan, a pet) does not keep the bed occupied
+  frame(40000, 5.0f, 60.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_OFF);
+  frame(45000, 5.0f, 60.0f);
+  EXPECT_FALSE(engine_.state);
+}
+
+TEST_F(FusionTest, WeightedModeBlendsScores) {
+  // z_still = 6 at 27.7%, z_moving = 12 at 26%
+  start(esphome::bed_presence_engine::FUSION_WEIGHTED, 0.5f);
+  frame(0, 27.7f, 26.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::DEBOUNCING_ON);  // 0.5·12 + 0.5·6 = 9
+}
+
+TEST_F(FusionTest, WeightedModeBelowThresholdStaysIdle) {
+  start(esphome::bed_presence_engine::FUSION_WEIGHTED, 0.25f);
+  frame(0, 27.7f, 26.0f);
+  EXPECT_EQ(engine_.current_state_, esphome::bed_presence_engine::IDLE);  // 0.25·12 + 0.75·6 = 7.5
+}
+
+TEST_F(FusionTest, TelemetryReportsTheFusedScore) {
+  esphome::sensor::Sensor frames, z_max, energy_max;
+  engine_.set_telemetry_window_ms(10000);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_FRAMES, &frames);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_Z_MAX, &z_max);
+  engine_.set_telemetry_sensor(esphome::bed_presence_engine::TELEMETRY_ENERGY_MAX, &energy_max);
+  start(esphome::bed_presence_engine::FUSION_MAX);
+  frame(100, 6.7f, 2.0f);
+  frame(200, 10.2f, 14.0f);  // z_still = 1, z_moving = 6
+  for (uint32_t t = 1200; t < 10000; t += 1000) {
+    esphome::host::set_millis(t);
+    engine_.loop();  // 10.2% stands on as nine held frames
+  }
+
+  esphome::host::set_millis(10000);
+  engine_.loop();
+  EXPECT_FLOAT_EQ(frames.state, 11.0f);
+  EXPECT_FLOAT_EQ(energy_max.state, 10.2f);
+  EXPECT_FLOAT_EQ(z_max.state, 6.0f);
+}
+
+TEST_F(FusionTest, CalibrationCoversBothChannels) {
+  start(esphome::bed_presence_engine::FUSION_MAX);
+  engine_.start_baseline_calibration(60);
+  const float still[] = {5.0f, 6.0f, 7.0f, 8.0f, 60.0f};
+  const float moving[] = {1.0f, 3.0f, 3.0f, 5.0f, 90.0f};
+  for (int i = 0; i < 5; i++)
+    frame(100 * (i + 1), still[i], moving[i]);
+  engine_.stop_baseline_calibration();
+
+  EXPECT_FLOAT_EQ(engine_.mu_still_, 7.0f);
+  EXPECT_FLOAT_EQ(engine_.mu_stat_, 3.0f);  // Deviations [2,0,0,2,87] → MAD 2 → σ = 2.9652
+  EXPECT_NEAR(engine_.sigma_stat_, 2.9652f, 1e-4f);
+}
+
+TEST(ThresholdModelTest, EnergyThresholdsAreMuPlusKSigma) {
+  using esphome::bed_presence_engine::ThresholdModel;
+  ThresholdModel model = ThresholdModel::build(6.7f, 3.5f, 2.0f, 1.0f, 0.0f, 600.0f, {9.0f, 4.0f, 3000, 5000, 30000});
+  EXPECT_TRUE(model.energy_domain);
+  EXPECT_FLOAT_EQ(model.energy_thresholds.k_on, 38.2f);
+  EXPECT_FLOAT_EQ(model.energy_thresholds.k_off, 20.7f);
+  EXPECT_EQ(model.energy_thresholds.off_debounce_ms, 5000u);
+  EXPECT_FLOAT_EQ(model.z_still(13.7f), 2.0f);
+  EXPECT_FLOAT_EQ(model.z_moving(5.0f), 3.0f);
+
+  // An unusable σ scores every frame z=0 and keeps the state machine on z-scores
+  ThresholdModel degenerate = ThresholdModel::build(6.7f, 0.0f, 2.0f, 1.0f, 0.0f, 600.0f, {9.0f, 4.0f, 0, 0, 0});
+  EXPECT_FALSE(degenerate.energy_domain);
+  EXPECT_FLOAT_EQ(degenerate.z_still(50.0f), 0.0f);
+}
+
+TEST_F(HostEngineTest, ParameterUpdatesTakeEffectOnTheNextFrame) {
+  frame(0, 30.0f);  // z = 6.66, below k_on = 9
+  frame(3000, 30.0f);
+  EXPECT_FALSE(engine_.state);
+
+  engine_.update_k_on(6.0f);
+  engine_.update_on_debounce_ms(1000);
+  frame(3100, 30.0f);
+  frame(4100, 30.0f);
+  EXPECT_TRUE(engine_.state);
+}
+
+TEST(ProfileTest, ApplyParametersAndNamedProfiles) {
+  using esphome::bed_presence_engine::PresenceProfile;
+  esphome::host::preferences_clear();
+  TestableEngine engine;
+  esphome::sensor::Sensor energy;
+  esphome::text_sensor::TextSensor active;
+  engine.set_energy_sensor(&energy);
+  engine.set_persist_parameters(true);
+  engine.set_active_profile_sensor(&active);
+  engine.add_profile("day", PresenceProfile{9.0f, 4.0f, 3000, 5000, 30000, 0.0f, 600.0f});
+  engine.add_profile("night", PresenceProfile{6.0f, 3.0f, 1000, 10000, 60000, 20.0f, 250.0f});
+  esphome::host::set_millis(0);
+  engine.setup();
+  EXPECT_EQ(active.state, "day");  // The compiled defaults match the "day" profile
+
+  uint32_t publishes = active.get_publish_count();
+  ASSERT_TRUE(engine.apply_profile("night"));
+  EXPECT_EQ(active.state, "night");
+  EXPECT_EQ(active.get_publish_count(), publishes + 1);  // Straight to the name, no "custom" in between
+  PresenceProfile applied = engine.get_parameters();
+  EXPECT_FLOAT_EQ(applied.k_on, 6.0f);
+  EXPECT_EQ(applied.off_debounce_ms, 10000u);
+  EXPECT_FLOAT_EQ(applied.d_max_cm, 250.0f);
+
+  // Re-syncing the HA number entities with the same values changes nothing
+  engine.update_k_on(6.0f);
+  engine.update_d_min_cm(20.0f);
+  EXPECT_EQ(active.state, "night");
+
+  // All seven knobs land in one flash write once the quiet period has passed
+  esphome::host::set_millis(20000);
+  engine.loop();
+  EXPECT_EQ(esphome::host::preferences_write_count(), 1u);
+
+  // Inconsistent sets and unknown names are rejected without touching anything
+  EXPECT_FALSE(engine.apply_parameters(PresenceProfile{3.0f, 5.0f, 0, 0, 0, 0.0f, 600.0f}));
+  EXPECT_FALSE(engine.apply_parameters(PresenceProfile{9.0f, 4.0f, 0, 0, 0, 300.0f, 100.0f}));
+  EXPECT_FALSE(engine.apply_profile("weekend"));
+  EXPECT_FLOAT_EQ(engine.get_parameters().k_on, 6.0f);
+  EXPECT_EQ(active.state, "night");
+
+  // Single-knob updates keep k_off <= k_on too
+  engine.update_k_on(2.0f);
+  engine.update_k_off(7.0f);
+  EXPECT_FLOAT_EQ(engine.get_parameters().k_on, 6.0f);
+  EXPECT_FLOAT_EQ(engine.get_parameters().k_off, 3.0f);
+  EXPECT_EQ(active.state, "night");
+
+  engine.update_k_off(2.5f);
+  EXPECT_EQ(active.state, "custom");
+}
+
+TEST(InstrumentationTest, PublishesFrameRatesDropsAndPublishCounts) {
+  using namespace esphome::bed_presence_engine;
+  TestableEngine engine;
+  esphome::sensor::Sensor energy, received, processed, dropped, publishes, calibration_peak, process_max;
+  esphome::text_sensor::TextSensor reason;
+  engine.set_energy_sensor(&energy);
+  engine.set_state_reason_sensor(&reason);
+  engine.set_frame_hold_ms(0);
+  engine.set_instrumentation_window_ms(10000);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_FRAMES_RECEIVED, &received);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_FRAMES_PROCESSED, &processed);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_FRAMES_DROPPED, &dropped);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_PUBLISHES, &publishes);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_CALIBRATION_PEAK_SAMPLES, &calibration_peak);
+  engine.set_instrumentation_sensor(INSTRUMENTATION_PROCESS_TIME_MAX, &process_max);
+  esphome::host::set_millis(0);
+  engine.setup();
+
+  engine.start_baseline_calibration(5);
+  for (uint32_t t = 100; t <= 4000; t += 100) {
+    esphome::host::set_millis(t);
+    energy.publish_state(5.0f + (t / 100) % 3);
+    if (t % 1000 == 0) {
+      energy.publish_state(6.0f);  // Second reading before loop() runs: the first one is lost
+    }
+    engine.loop();
+  }
+  esphome::host::set_millis(5000);
+  engine.loop();  // Calibration ends
+  EXPECT_FALSE(received.has_state());
+
+  esphome::host::set_millis(10000);
+  engine.loop();
+  ASSERT_TRUE(received.has_state());
+  EXPECT_FLOAT_EQ(received.state, 4.4f);   // 44 readings in 10 s
+  EXPECT_FLOAT_EQ(processed.state, 4.0f);  // 40 loop() passes consumed them
+  EXPECT_FLOAT_EQ(dropped.state, 4.0f);
+  EXPECT_FLOAT_EQ(calibration_peak.state, 40.0f);
+  EXPECT_FLOAT_EQ(process_max.state, 0.0f);  // The host clock does not advance within a step
+  // Initial state (occupancy + reason), then the calibration start and summary reasons
+  EXPECT_FLOAT_EQ(publishes.state, 4.0f);
+
+  // Counters restart each window; the calibration peak is kept
+  esphome::host::set_millis(20000);
+  engine.loop();
+  EXPECT_FLOAT_EQ(received.state, 0.0f);
+  EXPECT_FLOAT_EQ(publishes.state, 0.0f);
+  EXPECT_TRUE(std::isnan(process_max.state));
+  EXPECT_FLOAT_EQ(calibration_peak.state, 40.0f);
+}
+
+class ZoneTest : public ::testing::Test {
+ protected:
+  void SetUp() override {
+    esphome::host::preferences_clear();
+    near_.set_d_min_cm(0.0f);
+    near_.set_d_max_cm(150.0f);
+    near_.set_object_id_hash(0x1001);
+    far_.set_d_min_cm(150.0f);
+    far_.set_d_max_cm(300.0f);
+    far_.set_object_id_hash(0x2002);
+  }
+
+  void boot(TestableEngine &engine) {
+    energy_ = esphome::sensor::Sensor();  // A reboot starts with fresh sensors (and no callbacks)
+    distance_ = esphome::sensor::Sensor();
+    engine.set_energy_sensor(&energy_);
+    engine.set_distance_sensor(&distance_);
+    engine.add_zone(&near_);
+    engine.add_zone(&far_);
+    esphome::host::set_millis(0);
+    engine.setup();
+  }
+
+  void frame(TestableEngine &engine, uint32_t t_ms, float energy, float distance) {
+    esphome::host::set_millis(t_ms);
+    distance_.publish_state(distance);
+    energy_.publish_state(energy);
+    engine.loop();
+  }
+
+  esphome::sensor::Sensor energy_;
+  esphome::sensor::Sensor distance_;
+  esphome::bed_presence_engine::PresenceZone near_;
+  esphome::bed_presence_engine::PresenceZone far_;
+};
+
+TEST_F(ZoneTest, EachZoneRunsItsOwnStateMachine) {
+  TestableEngine engine;
+  boot(engine);
+  EXPECT_TRUE(near_.has_state());
+  EXPECT_FALSE(far_.state);
+
+  frame(engine, 0, 50.0f, 100.0f);
+  frame(engine, 3000, 50.0f, 100.0f);
+  EXPECT_TRUE(near_.state);
+  EXPECT_FALSE(far_.state);
+  EXPECT_TRUE(engine.state);  // The engine's own window covers the whole bed
+
+  // Frames from the far side only reach the far zone; the near zone's absolute clear delay keeps it occupied
+  frame(engine, 4000, 50.0f, 200.0f);
+  frame(engine, 7000, 50.0f, 200.0f);
+  EXPECT_TRUE(far_.state);
+  EXPECT_TRUE(near_.state);
+  EXPECT_EQ(far_.get_state(), esphome::bed_presence_engine::PRESENT);
+}
+
+TEST_F(ZoneTest, ZoneWithoutFramesInItsWindowClears) {
+  TestableEngine engine;
+  boot(engine);
+  frame(engine, 0, 50.0f, 100.0f);
+  frame(engine, 3000, 50.0f, 100.0f);
+  ASSERT_TRUE(near_.state);
+
+  // The sleeper rolls to the far side; its frames no longer reach the near zone's window
+  frame(engine, 4000, 50.0f, 200.0f);
+  for (uint32_t t = 5000; t <= 33000; t += 1000) {
+    esphome::host::set_millis(t);
+    engine.loop();
+  }
+  EXPECT_TRUE(near_.state);  // Absolute clear delay since the last in-window frame
+  EXPECT_EQ(near_.get_state(), esphome::bed_presence_engine::DEBOUNCING_OFF);
+  for (uint32_t t = 34000; t <= 38000; t += 1000) {
+    esphome::host::set_millis(t);
+    engine.loop();
+  }
+  EXPECT_FALSE(near_.state);
+  EXPECT_TRUE(far_.state);
+}
+
+TEST_F(ZoneTest, ZonesUseTheEngineThresholds) {
+  TestableEngine engine;
+  boot(engine);
+  engine.update_k_on(12.0f);  // 6.7 + 12 * 3.5 = 48.7
+  frame(engine, 0, 45.0f, 100.0f);
+  frame(engine, 3000, 45.0f, 100.0f);
+  EXPECT_FALSE(near_.state);
+  frame(engine, 4000, 50.0f, 100.0f);
+  frame(engine, 7000, 50.0f, 100.0f);
+  EXPECT_TRUE(near_.state);
+}
+
+TEST_F(ZoneTest, CalibrationAndPersistencePerZone) {
+  {
+    TestableEngine engine;
+    engine.set_persist_parameters(true);
+    boot(engine);
+    engine.start_baseline_calibration(60);
+    uint32_t t = 0;
+    for (float sample : {4.0f, 5.0f, 6.0f})
+      frame(engine, t += 100, sample, 100.0f);
+    for (float sample : {10.0f, 12.0f, 14.0f})
+      frame(engine, t += 100, sample, 200.0f);
+    engine.stop_baseline_calibration();
+
+    EXPECT_FLOAT_EQ(near_.get_mu_still(), 5.0f);
+    EXPECT_FLOAT_EQ(far_.get_mu_still(), 12.0f);
+    EXPECT_FLOAT_EQ(engine.mu_still_, 8.0f);  // Median of all six frames
+
+    esphome::host::set_millis(t + 10000);
+    engine.loop();  // Quiet period elapsed, write to flash
+  }
+
+  near_.set_mu_still(6.7f);
+  far_.set_mu_still(6.7f);
+  TestableEngine rebooted;
+  rebooted.set_persist_parameters(true);
+  boot(rebooted);
+  EXPECT_FLOAT_EQ(near_.get_mu_still(), 5.0f);
+  EXPECT_FLOAT_EQ(far_.get_mu_still(), 12.0f);
+}
+
+class GateTest : public ::testing::Test {
+ protected:
+  void SetUp() override { esphome::host::preferences_clear(); }
+
+  void boot(TestableEngine &engine) {
+    energy_ = esphome::sensor::Sensor();  // A reboot starts with fresh sensors (and no callbacks)
+    for (size_t gate = 0; gate < 3; gate++) {
+      gates_[gate] = esphome::sensor::Sensor();
+      engine.set_gate_energy_sensor(gate, &gates_[gate]);
+    }
+    engine.set_energy_sensor(&energy_);
+    engine.set_gate_mask(0b011);  // Bed covers gates 0 and 1, a fan sits in gate 2
+    esphome::host::set_millis(0);
+    engine.setup();
+  }
+
+  void frame(TestableEngine &engine, uint32_t t_ms, float energy, float g0, float g1, float g2) {
+    esphome::host::set_millis(t_ms);
+    gates_[0].publish_state(g0);
+    gates_[1].publish_state(g1);
+    gates_[2].publish_state(g2);
+    energy_.publish_state(energy);
+    engine.loop();
+  }
+
+  // Empty-bed calibration: gate 0 ≈ 10, gate 1 ≈ 20, gate 2 (fan) ≈ 30, each σ ≈ 1.48
+  void calibrate(TestableEngine &engine) {
+    engine.start_baseline_calibration(60);
+    uint32_t t = 0;
+    for (float offset : {-1.0f, 0.0f, 1.0f})
+      frame(engine, t += 100, 7.0f + offset, 10.0f + offset, 20.0f + offset, 30.0f + offset);
+    engine.stop_baseline_calibration();
+  }
+
+  esphome::sensor::Sensor energy_;
+  esphome::sensor::Sensor gates_[3];
+};
+
+TEST_F(GateTest, UncalibratedGatesFallBackToAggregateEnergy) {
+  TestableEngine engine;
+  boot(engine);
+  frame(engine, 0, 50.0f, 10.0f, 20.0f, 30.0f);
+  frame(engine, 3000, 50.0f, 10.0f, 20.0f, 30.0f);
+  EXPECT_TRUE(engine.state);
+}
+
+TEST_F(GateTest, OnlyMaskedGatesDrivePresence) {
+  TestableEngine engine;
+  boot(engine);
+  calibrate(engine);
+
+  // The fan spins up: aggregate and gate 2 energy jump, the bed gates stay at baseline
+  frame(engine, 1000, 50.0f, 10.0f, 20.0f, 90.0f);
+  frame(engine, 4000, 50.0f, 10.0f, 20.0f, 90.0f);
+  EXPECT_FALSE(engine.state);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+
+  frame(engine, 5000, 50.0f, 10.0f, 60.0f, 90.0f);
+  frame(engine, 8000, 50.0f, 10.0f, 60.0f, 90.0f);
+  EXPECT_TRUE(engine.state);
+}
+
+TEST_F(GateTest, BaselinesPersistAndResetToDefaultsForgetsThem) {
+  {
+    TestableEngine engine;
+    engine.set_persist_parameters(true);
+    boot(engine);
+    calibrate(engine);
+    esphome::host::set_millis(20000);
+    engine.loop();  // Quiet period elapsed, write to flash
+  }
+
+  TestableEngine rebooted;
+  rebooted.set_persist_parameters(true);
+  boot(rebooted);
+  frame(rebooted, 0, 50.0f, 10.0f, 20.0f, 90.0f);
+  frame(rebooted, 3000, 50.0f, 10.0f, 20.0f, 90.0f);
+  EXPECT_FALSE(rebooted.state);
+
+  // Without gate baselines the aggregate energy decides again
+  rebooted.reset_to_defaults();
+  frame(rebooted, 4000, 50.0f, 10.0f, 20.0f, 90.0f);
+  frame(rebooted, 7000, 50.0f, 10.0f, 20.0f, 90.0f);
+  EXPECT_TRUE(rebooted.state);
+}
+
+TEST(PrefilterTest, SlidingMedianAndHampel) {
+  using esphome::bed_presence_engine::SlidingPrefilter;
+  const float input[] = {5.0f, 6.0f, 90.0f, 5.0f, 7.0f, 6.0f, 40.0f, 40.0f, 40.0f};
+
+  SlidingPrefilter median;
+  median.configure(esphome::bed_presence_engine::PREFILTER_MEDIAN, 5, 3.0f);
+  const float median_expected[] = {5.0f, 5.0f, 6.0f, 5.0f, 6.0f, 6.0f, 7.0f, 7.0f, 40.0f};
+  for (size_t i = 0; i < 9; i++)
+    EXPECT_FLOAT_EQ(median.filter(input[i]), median_expected[i]) << "frame " << i;
+  EXPECT_EQ(median.size(), 5u);
+
+  // Only outliers (|x - median| > 3·1.4826·MAD) are replaced; the step passes once it is the majority
+  SlidingPrefilter hampel;
+  hampel.configure(esphome::bed_presence_engine::PREFILTER_HAMPEL, 5, 3.0f);
+  const float hampel_expected[] = {5.0f, 6.0f, 6.0f, 5.0f, 7.0f, 6.0f, 7.0f, 7.0f, 40.0f};
+  for (size_t i = 0; i < 9; i++)
+    EXPECT_FLOAT_EQ(hampel.filter(input[i]), hampel_expected[i]) << "frame " << i;
+
+  // A flat window of whole percents has MAD = 0; the floor lets a one-unit step through
+  SlidingPrefilter flat;
+  flat.configure(esphome::bed_presence_engine::PREFILTER_HAMPEL, 5, 3.0f);
+  for (float value : {7.0f, 7.0f, 7.0f, 7.0f})
+    flat.filter(value);
+  EXPECT_FLOAT_EQ(flat.filter(8.0f), 8.0f);
+  EXPECT_FLOAT_EQ(flat.filter(20.0f), 7.0f);
+}
+
+TEST(PrefilterTest, SpikesDoNotArmAndHeldFramesDoNotRefillTheWindow) {
+  esphome::sensor::Sensor energy;
+  TestableEngine engine;
+  engine.set_energy_sensor(&energy);
+  engine.set_on_debounce_ms(0);
+  engine.set_prefilter_mode(esphome::bed_presence_engine::PREFILTER_MEDIAN);
+  engine.set_prefilter_window(5);
+  esphome::host::set_millis(0);
+  engine.setup();
+
+  uint32_t t = 0;
+  for (int i = 0; i < 5; i++) {
+    esphome::host::set_millis(t += 100);
+    energy.publish_state(6.0f);
+    engine.loop();
+  }
+  // A two-frame spike, then the radar goes quiet and the last reading is held
+  for (int i = 0; i < 2; i++) {
+    esphome::host::set_millis(t += 100);
+    energy.publish_state(80.0f + i);
+    engine.loop();
+  }
+  for (int i = 0; i < 5; i++) {
+    esphome::host::set_millis(t += 1000);
+    engine.loop();
+  }
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+
+  // A third new frame makes the high reading the window's median
+  esphome::host::set_millis(t += 100);
+  energy.publish_state(82.0f);
+  engine.loop();
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::DEBOUNCING_ON);
+}
+
+class BaselineTrackingTest : public PersistenceTest {
+ protected:
+  void boot_tracking(TestableEngine &engine) {
+    engine.set_baseline_tracking_time_constant_ms(3600000);
+    engine.set_baseline_tracking_max_drift_per_day(2.0f);
+    engine.set_baseline_tracking_min_idle_ms(600000);
+    engine.set_mu_drift_sensor(&mu_drift_);
+    engine.set_sigma_drift_sensor(&sigma_drift_);
+    boot(engine);
+  }
+
+  // One frame per second from t_start_ms to t_end_ms, alternating energy ± 1 (σ estimate 1.2533)
+  void run(TestableEngine &engine, uint32_t t_start_ms, uint32_t t_end_ms, float energy) {
+    for (uint32_t t = t_start_ms; t < t_end_ms; t += 1000) {
+      esphome::host::set_millis(t);
+      energy_.publish_state(energy + ((t / 1000) % 2 == 0 ? -1.0f : 1.0f));
+      engine.loop();
+    }
+  }
+
+  esphome::sensor::Sensor mu_drift_;
+  esphome::sensor::Sensor sigma_drift_;
+};
+
+static constexpr uint32_t HOUR_MS = 3600000;
+
+TEST_F(BaselineTrackingTest, FollowsDriftAtABoundedRateAndPersistsIt) {
+  {
+    TestableEngine engine;
+    boot_tracking(engine);
+    EXPECT_FLOAT_EQ(mu_drift_.state, 0.0f);
+
+    // The empty bed now reads ~10% instead of 6.7%: after 12 h the baseline has moved by at most 2%/day
+    run(engine, 0, 12 * HOUR_MS, 10.0f);
+    EXPECT_LE(engine.mu_still_, 6.7f + 1.0f);
+    EXPECT_GT(engine.mu_still_, 6.7f + 0.95f);
+    EXPECT_GE(engine.sigma_still_, 3.5f - 1.0f);
+    EXPECT_NEAR(mu_drift_.state, engine.mu_still_ - 6.7f, 1e-5f);
+    EXPECT_NEAR(sigma_drift_.state, engine.sigma_still_ - 3.5f, 1e-5f);
+
+    // ...and settles on the new baseline
+    run(engine, 12 * HOUR_MS, 48 * HOUR_MS, 10.0f);
+    EXPECT_NEAR(engine.mu_still_, 10.0f, 0.1f);
+    EXPECT_NEAR(engine.sigma_still_, 1.2533f, 0.1f);
+    // Drifted values are written at most hourly, not once per step
+    EXPECT_LE(esphome::host::preferences_write_count(), 50u);
+  }
+
+  // The drifted baseline survives a reboot, and drift is still reported against the original one
+  TestableEngine rebooted;
+  boot_tracking(rebooted);
+  EXPECT_NEAR(rebooted.mu_still_, 10.0f, 0.1f);
+  EXPECT_NEAR(mu_drift_.state, rebooted.mu_still_ - 6.7f, 1e-5f);
+}
+
+TEST_F(BaselineTrackingTest, QuietRoomReadingCountsForTheTimeItStands) {
+  TestableEngine engine;
+  boot_tracking(engine);
+
+  // One reading, then the radar goes quiet: held frames add no samples, but the reading still counts
+  esphome::host::set_millis(0);
+  energy_.publish_state(10.0f);
+  engine.loop();
+  for (uint32_t t = 1000; t < 12 * HOUR_MS; t += 1000) {
+    esphome::host::set_millis(t);
+    engine.loop();
+  }
+  EXPECT_GT(engine.mu_still_, 6.7f + 0.9f);
+  EXPECT_LE(engine.mu_still_, 6.7f + 1.0f);
+}
+
+TEST_F(BaselineTrackingTest, OnlyConfidentlyEmptyFramesCountAndCalibrationResetsDrift) {
+  TestableEngine engine;
+  boot_tracking(engine);
+
+  // Not long enough IDLE yet, then occupied for hours: the baseline does not move
+  run(engine, 0, 9 * 60000, 10.0f);
+  run(engine, 9 * 60000, 6 * HOUR_MS, 50.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::PRESENT);
+  EXPECT_FLOAT_EQ(engine.mu_still_, 6.7f);
+
+  // Right after the bed empties, IDLE is not yet confident
+  run(engine, 6 * HOUR_MS, 6 * HOUR_MS + 5 * 60000, 10.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+  EXPECT_FLOAT_EQ(engine.mu_still_, 6.7f);
+
+  // Once it is, frames between k_off and k_on count as well: the whole empty-bed distribution is tracked
+  engine.update_k_off(0.5f);  // Off below 8.45%, so every frame at 9-11% lies above k_off
+  run(engine, 6 * HOUR_MS + 5 * 60000, 10 * HOUR_MS, 10.0f);
+  EXPECT_EQ(engine.current_state_, esphome::bed_presence_engine::IDLE);
+  EXPECT_GT(engine.mu_still_, 6.7f);
+  EXPECT_NEAR(engine.baseline_tracker_.estimated_mu(), 10.0f, 0.1f);
+
+  // A calibration becomes the new reference
+  engine.start_baseline_calibration(60);
+  run(engine, 10 * HOUR_MS, 10 * HOUR_MS + 30000, 12.0f);
+  engine.stop_baseline_calibration();
+  EXPECT_FLOAT_EQ(engine.mu_still_, 12.0f);
+  EXPECT_FLOAT_EQ(mu_drift_.state, 0.0f);
+  EXPECT_FLOAT_EQ(sigma_drift_.state, 0.0f);
+}
+
+TEST(ThresholdLearnerTest, CentresThresholdsInTheGapWithinSafetyBounds) {
+  ThresholdLearner learner;
+  learner.set_min_samples(1000);
+  for (int i = 0; i < 1000; i++) {
+    learner.add_empty(i % 2 == 0 ? -0.5f : 0.5f);
+    learner.add_occupied(i % 2 == 0 ? 12.0f : 14.0f);
+  }
+  // Gap from 0.5 to 12: k_on at its middle, k_off a quarter of the way up, reached in steps of at most 1
+  ThresholdSuggestion suggestion = learner.suggest(9.0f, 4.0f);
+  ASSERT_TRUE(suggestion.valid);
+  EXPECT_FLOAT_EQ(suggestion.empty_high, 0.5f);
+  EXPECT_FLOAT_EQ(suggestion.occupied_low, 12.0f);
+  EXPECT_FLOAT_EQ(suggestion.k_on, 8.0f);
+  EXPECT_FLOAT_EQ(suggestion.k_off, 3.375f);
+  suggestion = learner.suggest(6.5f, 3.375f);
+  EXPECT_FLOAT_EQ(suggestion.k_on, 6.25f);
+  EXPECT_FLOAT_EQ(suggestion.k_off, 3.375f);
+
+  // The k_on range and the minimum hysteresis override the gap
+  learner.set_k_on_range(7.0f, 15.0f);
+  learner.set_min_hysteresis(4.0f);
+  suggestion = learner.suggest(6.5f, 3.375f);
+  EXPECT_FLOAT_EQ(suggestion.k_on, 7.0f);
+  EXPECT_FLOAT_EQ(suggestion.k_off, 3.0f);
+
+  // Overlapping distributions suggest nothing
+  for (int i = 0; i < 100; i++) {
+    learner.add_occupied(0.0f);
+  }
+  EXPECT_FALSE(learner.suggest(9.0f, 4.0f).valid);
+
+  // Ageing halves once per half-life and keeps the shape; too few samples suggest nothing
+  learner.set_half_life_ms(1000);
+  learner.age(0);
+  learner.age(1500);
+  EXPECT_EQ(learner.empty_count(), 500u);
+  EXPECT_EQ(learner.occupied_count(), 550u);
+  learner.age(1999);
+  EXPECT_EQ(learner.empty_count(), 500u);
+  learner.age(3000);
+  EXPECT_EQ(learner.empty_count(), 126u);  // Two more halvings, each bin rounded up
+  EXPECT_FALSE(learner.suggest(9.0f, 4.0f).valid);
+}
+
+TEST(ThresholdLearnerTest, VacantFramesCountOnlyOnceTheBedStaysEmpty) {
+  ThresholdLearner learner;
+  learner.add_vacant(0.0f, 1000);
+  learner.add_vacant(10.0f, 1500);  // Above k_on: the empty bed's upper tail
+  EXPECT_FALSE(learner.commit_vacant(1500, 1000));
+  EXPECT_EQ(learner.empty_count(), 0u);
+  EXPECT_TRUE(learner.commit_vacant(2000, 1000));
+  EXPECT_EQ(learner.empty_count(), 2u);
+  EXPECT_EQ(learner.vacant_count(), 0u);
+
+  // An arrival discards what was pending
+  learner.add_vacant(12.0f, 3000);
+  learner.discard_vacant();
+  EXPECT_FALSE(learner.commit_vacant(9000, 1000));
+  EXPECT_EQ(learner.empty_count(), 2u);
+}
+
+class AdaptiveThresholdTest : public PersistenceTest {
+ protected:
+  void boot_adaptive(TestableEngine &engine, esphome::bed_presence_engine::AdaptiveThresholdMode mode) {
+    engine.set_adaptive_threshold_mode(mode);
+    engine.set_adaptive_update_interval_ms(HOUR_MS);
+    engine.set_adaptive_min_state_ms(60000);
+    engine.set_adaptive_min_samples(500);
+    engine.set_suggested_k_on_sensor(&suggested_k_on_);
+    engine.set_suggested_k_off_sensor(&suggested_k_off_);
+    boot(engine);
+  }
+
+  // One frame per second from t_start_ms to t_end_ms, alternating between two energies
+  void run(TestableEngine &engine, uint32_t t_start_ms, uint32_t t_end_ms, float low, float high) {
+    for (uint32_t t = t_start_ms; t < t_end_ms; t += 1000) {
+      esphome::host::set_millis(t);
+      energy_.publish_state((t / 1000) % 2 == 0 ? low : high);
+      engine.loop();
+    }
+  }
+
+  esphome::sensor::Sensor suggested_k_on_;
+  esphome::sensor::Sensor suggested_k_off_;
+};
+
+// Empty bed at 6-8% (z -0.2..0.37), sleeper at 45-50% (z 10.9..12.4) against μ=6.7, σ=3.5
+
+TEST_F(AdaptiveThresholdTest, ApplyModeMovesThresholdsTowardTheGap) {
+  TestableEngine engine;
+  boot_adaptive(engine, esphome::bed_presence_engine::ADAPTIVE_APPLY);
+  run(engine, 0, 30 * 60000, 6.0f, 8.0f);
+  run(engine, 30 * 60000, HOUR_MS + 1000, 45.0f, 50.0f);
+  EXPECT_TRUE(engine.state);
+
+  // Gap 0.25..11: targets k_on=5.6, k_off=2.9, one step of at most 1 per update
+  EXPECT_FLOAT_EQ(engine.k_on_, 8.0f);
+  EXPECT_FLOAT_EQ(engine.k_off_, 3.0f);
+  EXPECT_FLOAT_EQ(suggested_k_on_.state, 8.0f);
+  EXPECT_FLOAT_EQ(suggested_k_off_.state, 3.0f);
+
+  // The next update continues from the applied values
+  run(engine, HOUR_MS + 1000, 2 * HOUR_MS + 1000, 45.0f, 50.0f);
+  EXPECT_FLOAT_EQ(engine.k_on_, 7.0f);
+  EXPECT_NEAR(engine.k_off_, 2.9375f, 1e-5f);
+}
+
+TEST_F(AdaptiveThresholdTest, SuggestModeLeavesThresholdsAndCalibrationStartsOver) {
+  TestableEngine engine;
+  boot_adaptive(engine, esphome::bed_presence_engine::ADAPTIVE_SUGGEST);
+  run(engine, 0, 30 * 60000, 6.0f, 8.0f);
+  run(engine, 30 * 60000, 50 * 60000, 45.0f, 50.0f);
+
+  // A calibration invalidates the scores collected so far: not enough samples at the hourly update
+  engine.start_baseline_calibration(10);
+  run(engine, 50 * 60000, 50 * 60000 + 12000, 45.0f, 50.0f);
+  run(engine, 50 * 60000 + 12000, HOUR_MS + 1000, 45.0f, 50.0f);
+  EXPECT_FALSE(suggested_k_on_.has_state());
+
+  engine.update_adaptive_thresholds();
+  EXPECT_FALSE(suggested_k_on_.has_state());
+  EXPECT_FLOAT_EQ(engine.k_on_, 9.0f);
+}
+
+TEST_F(AdaptiveThresholdTest, EmptyBedSpikesAboveKOnCountAsEmpty) {
+  TestableEngine engine;
+  boot_adaptive(engine, esphome::bed_presence_engine::ADAPTIVE_SUGGEST);
+  // One 40% frame a minute (z 9.5, above k_on) arms a debounce that aborts on the next frame
+  for (uint32_t t = 0; t < 30 * 60000; t += 1000) {
+    esphome::host::set_millis(t);
+    energy_.publish_state(t % 60000 == 30000 ? 40.0f : 7.0f);
+    engine.loop();
+  }
+  EXPECT_FALSE(engine.state);
+  EXPECT_GT(engine.threshold_learner_.empty_count(), 1500u);
+
+  // The frames pending when the sleeper arrives are dropped rather than counted as empty
+  uint32_t empty = engine.threshold_learner_.empty_count();
+  run(engine, 30 * 60000, 45 * 60000, 45.0f, 50.0f);
+  EXPECT_TRUE(engine.state);
+  EXPECT_EQ(engine.threshold_learner_.empty_count(), empty);
+  EXPECT_EQ(engine.threshold_learner_.vacant_count(), 0u);
+
+  // The empty bed's p99.9 is the spikes, not the quiet frames below k_on
+  ThresholdSuggestion suggestion = engine.threshold_learner_.suggest(9.0f, 4.0f);
+  ASSERT_TRUE(suggestion.valid);
+  EXPECT_FLOAT_EQ(suggestion.empty_high, 9.5f);
+}
+
+TEST_F(AdaptiveThresholdTest, SuggestModePublishesWithoutApplying) {
+  TestableEngine engine;
+  boot_adaptive(engine, esphome::bed_presence_engine::ADAPTIVE_SUGGEST);
+  run(engine, 0, 30 * 60000, 6.0f, 8.0f);
+  run(engine, 30 * 60000, HOUR_MS + 1000, 45.0f, 50.0f);
+  EXPECT_FLOAT_EQ(suggested_k_on_.state, 8.0f);
+  EXPECT_FLOAT_EQ(engine.k_on_, 9.0f);
+  EXPECT_FLOAT_EQ(engine.k_off_, 4.0f);
+}
+
+TEST(FrameStreamTest, BatchesFramesIntoLinesWithDeviceTimestamps) {
+  esphome::sensor::Sensor energy;
+  esphome::sensor::Sensor distance;
+  esphome::text_sensor::TextSensor batches;
+  TestableEngine engine;
+  engine.set_energy_sensor(&energy);
+  engine.set_distance_sensor(&distance);
+  engine.set_d_max_cm(300.0f);
+  engine.set_frame_stream_frames_per_batch(3);
+  engine.set_frame_stream_sensor(&batches);
+  esphome::host::set_millis(1000);
+  engine.setup();
+
+  const uint32_t times[] = {1000, 1100, 1230, 1300, 1400};
+  const float distances[] = {120.0f, 121.0f, 400.0f, 122.0f, 123.0f};
+  for (size_t i = 0; i < 5; i++) {
+    esphome::host::set_millis(times[i]);
+    distance.publish_state(distances[i]);
+    energy.publish_state(7.0f);
+    engine.loop();
+  }
+  // One full batch of three: 9 bytes per frame, the third frame outside the distance window
+  EXPECT_EQ(batches.get_publish_count(), 1u);
+  EXPECT_EQ(batches.state, "FS1 00000 1000 "
+                           "000007ff7800090000"
+                           "640007ff7900090000"
+                           "820007ff9001090008");
+
+  // The remaining two frames go out once the batch is MAX_BATCH_AGE_MS old, ahead of any later frame
+  esphome::host::set_millis(1300 + FrameStream::MAX_BATCH_AGE_MS);
+  engine.loop();
+  EXPECT_EQ(batches.get_publish_count(), 2u);
+  EXPECT_EQ(batches.state.substr(0, 15), "FS1 00001 1300 ");
+  EXPECT_EQ(batches.state.size(), 15u + 2 * 2 * FrameStream::RECORD_SIZE);
+}
+
+TEST(FrameStreamTest, PartialBatchIsDueAfterMaxAgeAndEncodingSaturates) {
+  FrameStream stream;
+  stream.set_frames_per_batch(4);
+  EXPECT_FALSE(stream.add(100, NAN, 150.0f, NAN, 500.0f, 0x02));
+  EXPECT_FALSE(stream.add(100 + 70000, 3.4f, -2.0f, 80.6f, -400.0f, 0x00));
+  EXPECT_FALSE(stream.due(100 + FrameStream::MAX_BATCH_AGE_MS - 1));
+  EXPECT_TRUE(stream.due(100 + FrameStream::MAX_BATCH_AGE_MS));
+
+  char line[FrameStream::LINE_SIZE];
+  ASSERT_TRUE(stream.flush(line));
+  // NaN energy/distance use the reserved codes, dt and z saturate, energies clamp to 0-100
+  EXPECT_STREQ(line, "FS1 00000 100 "
+                     "0000ff64ffffff7f02"
+                     "ffff03005100018000");
+  EXPECT_EQ(stream.pending(), 0u);
+  EXPECT_FALSE(stream.due(100000));
+  EXPECT_FALSE(stream.flush(line));
+  EXPECT_EQ(stream.get_sequence(), 1u);
+}
+
+TEST(HostReplayTest, ReplayMatchesFrameByFrameDriving) {
+  std::vector<uint32_t> t;
+  std::vector<float> energy;
+  for (uint32_t i = 0; i < 1200; i++) {
+    t.push_back(i * 100);
+    energy.push_back(i >= 100 && i < 700 ? 55.0f : 6.0f);
+  }
+
+  bpe_params_t params;
+  bpe_default_params(&params);
+  std::vector<uint8_t> states(t.size());
+  bpe_transition_t transitions[4];
+  long count = bpe_replay(&params, t.data(), energy.data(), nullptr, nullptr, t.size(), states.data(), transitions, 4);
+
+  ASSERT_EQ(count, 2);
+  EXPECT_EQ(transitions[0].t_ms, 13000u);  // 10.0s high + 3s on-debounce
+  EXPECT_EQ(transitions[0].state, 1u);
+  EXPECT_EQ(transitions[1].t_ms, 104900u);  // last high at 69.9s + 30s abs clear + 5s off-debounce
+  EXPECT_EQ(transitions[1].state, 0u);
+  EXPECT_EQ(states[129], 0);
+  EXPECT_EQ(states[130], 1);
+}
+
+TEST(HostReplayTest, RejectsMissingInputs) {
+  bpe_params_t params;
+  bpe_default_params(&params);
+  EXPECT_EQ(bpe_replay(&params, nullptr, nullptr, nullptr, nullptr, 10, nullptr, nullptr, 0), -1);
+  EXPECT_EQ(bpe_replay(nullptr, nullptr, nullptr, nullptr, nullptr, 0, nullptr, nullptr, 0), -1);
+}
+
+int main(int argc, char **argv) {
+  ::testing::InitGoogleTest(&argc, argv);
+  return RUN_ALL_TESTS();
+}
@@ -0,0 +1,95 @@
+/**
+ * Tests for the deduplicating, coalescing text sensor publisher.
+ *
+ * Run: make -C esphome/host test
+ */
+
+#include <gtest/gtest.h>
+
+#include <string>
+
+#include "bed_presence.h"
+#include "publish_scheduler.h"
+
+using esphome::bed_presence_engine::BedPresenceEngine;
+using esphome::bed_presence_engine::CoalescingTextPublisher;
+
+TEST(PublishSchedulerTest, DropsRepeatedValues) {
+  esphome::text_sensor::TextSensor sensor;
+  CoalescingTextPublisher publisher;
+  publisher.set_sensor(&sensor);
+
+  publisher.publish("on:threshold_exceeded", 0);
+  publisher.publish("on:threshold_exceeded", 5000);
+  EXPECT_EQ(sensor.get_publish_count(), 1u);
+  EXPECT_EQ(publisher.get_suppressed_count(), 1u);
+}
+
+TEST(PublishSchedulerTest, CoalescesBurstIntoLatestValue) {
+  esphome::text_sensor::TextSensor sensor;
+  CoalescingTextPublisher publisher;
+  publisher.set_sensor(&sensor);
+  publisher.set_window_ms(1000);
+
+  publisher.publish("a", 0);  // Quiet before: immediate
+  publisher.publish("b", 100);
+  publisher.publish("c", 200);
+  publisher.loop(999);
+  EXPECT_EQ(sensor.state, "a");
+  publisher.loop(1000);
+  EXPECT_EQ(sensor.state, "c");
+  EXPECT_EQ(sensor.get_publish_count(), 2u);
+
+  // A burst that ends on the published value sends nothing
+  publisher.publish("d", 1500);
+  publisher.publish("c", 1600);
+  publisher.loop(5000);
+  EXPECT_EQ(sensor.get_publish_count(), 2u);
+}
+
+TEST(PublishSchedulerTest, TruncatesLongValues) {
+  esphome::text_sensor::TextSensor sensor;
+  CoalescingTextPublisher publisher;
+  publisher.set_sensor(&sensor);
+
+  std::string long_value(200, 'x');
+  publisher.publish(long_value.c_str(), 0);
+  size_t max_length = CoalescingTextPublisher::MAX_LENGTH;
+  EXPECT_EQ(sensor.state.size(), max_length);
+}
+
+class FlappingEngine : public BedPresenceEngine {
+ public:
+  using BedPresenceEngine::current_state_;
+};
+
+TEST(PublishSchedulerTest, FlappingEngineStaysWithinWindowBudget) {
+  esphome::sensor::Sensor energy;
+  esphome::text_sensor::TextSensor change_reason;
+  FlappingEngine engine;
+  engine.set_energy_sensor(&energy);
+  engine.set_last_change_reason_sensor(&change_reason);
+  engine.set_on_debounce_ms(0);
+  engine.set_off_debounce_ms(0);
+  engine.set_abs_clear_delay_ms(0);
+  engine.set_reason_publish_window_ms(5000);
+  esphome::host::set_millis(0);
+  engine.setup();
+
+  // Occupied/vacant every 100ms for a minute
+  uint32_t transitions = 0;
+  bool previous = false;
+  for (uint32_t t = 100; t <= 60000; t += 100) {
+    esphome::host::set_millis(t);
+    energy.publish_state((t / 100) % 4 < 2 ? 60.0f : 5.0f);
+    engine.loop();
+    transitions += engine.state != previous;
+    previous = engine.state;
+  }
+  esphome::host::set_millis(70000);
+  engine.loop();
+
+  EXPECT_GT(transitions, 200u);
+  EXPECT_LE(change_reason.get_publish_count(), 1u + 60000 / 5000 + 1);
+  EXPECT_TRUE(change_reason.state == "on:threshold_exceeded" || change_reason.state == "off:abs_clear_delay");
+}
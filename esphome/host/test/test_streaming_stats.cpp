@@ -0,0 +1,90 @@
+/**
+ * Tests for the constant-memory histogram behind on-device calibration.
+ *
+ * Run: make -C esphome/host test
+ */
+
+#include <gtest/gtest.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <vector>
+
+#include "streaming_stats.h"
+
+using esphome::bed_presence_engine::EnergyHistogram;
+using esphome::bed_presence_engine::StreamingHistogram;
+
+// Reference: sorted-vector median (even counts average the middle pair)
+static float reference_median(std::vector<float> values) {
+  std::sort(values.begin(), values.end());
+  size_t mid = values.size() / 2;
+  return values.size() % 2 ? values[mid] : (values[mid - 1] + values[mid]) / 2.0f;
+}
+
+static float reference_mad(const std::vector<float> &values) {
+  float median = reference_median(values);
+  std::vector<float> deviations;
+  for (float v : values)
+    deviations.push_back(std::fabs(v - median));
+  return reference_median(deviations);
+}
+
+TEST(StreamingStatsTest, EmptyHistogramReportsZero) {
+  EnergyHistogram histogram(0.0f, 0.5f);
+  EXPECT_EQ(histogram.count(), 0u);
+  EXPECT_EQ(histogram.median(), 0.0f);
+  EXPECT_EQ(histogram.mad(0.0f), 0.0f);
+}
+
+TEST(StreamingStatsTest, MatchesSortedVectorOnWholePercentages) {
+  uint32_t seed = 11;
+  for (size_t n : {1u, 2u, 5u, 6u, 99u, 1000u, 4097u}) {
+    EnergyHistogram histogram(0.0f, 0.5f);
+    std::vector<float> values;
+    for (size_t i = 0; i < n; i++) {
+      seed = seed * 1664525u + 1013904223u;
+      float v = static_cast<float>((seed >> 16) % 23 + (i % 7 == 0 ? 40 : 0));  // Skewed, with outliers
+      values.push_back(v);
+      histogram.add(v);
+    }
+    float median = histogram.median();
+    EXPECT_FLOAT_EQ(median, reference_median(values)) << "n=" << n;
+    EXPECT_FLOAT_EQ(histogram.mad(median), reference_mad(values)) << "n=" << n;
+  }
+}
+
+TEST(StreamingStatsTest, QuantizesToHalfPercentAndClamps) {
+  EnergyHistogram histogram(0.0f, 0.5f);
+  histogram.add(7.2f);    // → 7.0
+  histogram.add(7.3f);    // → 7.5
+  histogram.add(-4.0f);   // → 0
+  histogram.add(250.0f);  // → 100
+  histogram.add(NAN);     // → 0
+  EXPECT_EQ(histogram.count(), 5u);
+  EXPECT_FLOAT_EQ(histogram.median(), 7.0f);
+  EXPECT_FLOAT_EQ(histogram.quantile(1.0f), 100.0f);
+  EXPECT_FLOAT_EQ(histogram.quantile(0.0f), 0.0f);
+  EXPECT_FLOAT_EQ(histogram.quantile(0.8f), 7.5f);
+}
+
+TEST(StreamingStatsTest, HalvingOnOverflowKeepsShape) {
+  // Tiny histogram whose counters are pushed to the limit by hand
+  class Saturated : public StreamingHistogram<4> {
+   public:
+    Saturated() : StreamingHistogram<4>(0.0f, 1.0f) {
+      bins_[1] = UINT32_MAX;
+      bins_[3] = 1;
+      count_ = UINT32_MAX;
+    }
+    uint32_t bin(size_t i) const { return bins_[i]; }
+  };
+
+  Saturated histogram;
+  histogram.add(1.0f);
+  EXPECT_EQ(histogram.bin(1), (UINT32_MAX / 2 + 1) + 1);
+  EXPECT_EQ(histogram.bin(3), 1u);  // Occupied bins survive halving
+  EXPECT_EQ(histogram.count(), histogram.bin(1) + histogram.bin(3));
+  EXPECT_FLOAT_EQ(histogram.median(), 1.0f);
+}
@@ -3,32 +3,67 @@
 Baseline Data Collection Script for Bed Presence Sensor (Phase 1)
 
 This script collects LD2410 still energy readings from an empty bed to calculate
-baseline statistics (mean μ and standard deviation σ) for z-score based presence detection.
+baseline statistics for z-score based presence detection: μ = median and
+σ = 1.4826·MAD, as the on-device calibration computes them.
 
 Usage:
     1. Ensure bed is completely empty (no people, pets, or objects)
     2. Close bedroom door to minimize external movement
     3. Run this script:
-       python3 collect_baseline.py
+       python3 collect_baseline.py [--duration 60] [--output-dir DIR] [--yes]
 
     The script will:
-    - Collect 30 samples over 60 seconds (one sample every 2 seconds)
-    - Calculate mean (μ) and standard deviation (σ)
-    - Display results ready to paste into bed_presence.h
+    - Subscribe to Home Assistant state changes for the collection period
+      (default: 60 seconds) and rebuild the frame sequence from them
+    - Calculate mean, standard deviation, median and MAD
+    - Display the apply_baseline service call that sets μ/σ on the device
+      (persisted in flash, no reflash)
+    - Save the summary (baseline_results.txt) and the rebuilt frame trace
+      (baseline_trace_<timestamp>.csv.gz, presence_trace.py format)
+
+    Frames are synthesized, not recorded: Home Assistant only reports changed
+    readings, so each event time becomes a frame and an unchanged reading is
+    repeated every --frame-interval-ms. Counts and timing therefore follow that
+    assumption, not the radar's real frame rate. For the device's real frames,
+    enable the `frame_stream:` option and decode its log with frame_stream.py.
+
+Options:
+    --duration SECONDS       Collection time (default: 60)
+    --frame-interval-ms MS   Sensor publish interval; unchanged readings are
+                             held at this rate (default: 1000, the ESPHome
+                             LD2410 throttle)
+    --entity ENTITY_ID       Still energy entity
+    --output-dir DIR         Where to write results (default: repository root)
+    --yes                    Start without waiting for ENTER
+    --until-converged        Stop as soon as the median/MAD estimates are stable
+                             (--mu-tolerance, --sigma-tolerance, --min-samples,
+                             --stable-checks); --duration becomes the maximum
+                             (default 600 s in this mode)
 
 Environment Variables:
     HA_URL: Home Assistant URL (default: http://localhost:8123)
     HA_TOKEN: Long-lived access token (required)
 """
 
+import argparse
+import asyncio
+import math
 import os
 import sys
-import time
-import requests
 import statistics
-from typing import List, Tuple
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'e2e'))
+
+from hass_ws import HomeAssistantClient  # noqa: E402
+from presence_trace import TraceColumns, TraceFrame, write_trace  # noqa: E402
+
+STILL_ENTITY = "sensor.bed_presence_detector_ld2410_still_energy"
+MOVING_ENTITY = "sensor.bed_presence_detector_ld2410_moving_energy"
+DISTANCE_ENTITY = "sensor.bed_presence_detector_ld2410_still_distance"
+
 # ANSI color codes for better output
 class Colors:
     HEADER = '\033[95m'
@@ -73,83 +108,252 @@ def get_ha_config() -> Tuple[str, str]:
     return ha_url, ha_token
 
 
-def get_sensor_value(ha_url: str, ha_token: str, entity_id: str) -> float:
-    """Get the current value of a sensor."""
-    headers = {
-        'Authorization': f'Bearer {ha_token}',
-        'Content-Type': 'application/json',
-    }
-
+def parse_state(state: Optional[Dict[str, Any]]) -> float:
+    """Numeric value of an HA state object (NaN when unavailable/unknown)."""
+    if not state:
+        return math.nan
     try:
-        response = requests.get(
-            f'{ha_url}/api/states/{entity_id}',
-            headers=headers,
-            timeout=5
-        )
+        return float(state.get('state'))
+    except (TypeError, ValueError):
+        return math.nan
 
-        if response.status_code == 200:
-            data = response.json()
-            state = data.get('state')
 
-            # Convert to float, handling 'unavailable' or 'unknown' states
-            if state in ['unavailable', 'unknown', 'None']:
-                raise ValueError(f"Sensor returned invalid state: {state}")
-
-            return float(state)
-        else:
-            raise ConnectionError(f"HTTP {response.status_code}: {response.text}")
+class BaselineRecorder:
+    """
+    Rebuilds the LD2410 frame stream from Home Assistant state changes.
+
+    HA only emits `state_changed` when a value changes, so an unchanged reading
+    produces no event. Between events the last value is held and emitted once
+    per `frame_interval_ms` (the ESPHome LD2410 sensor throttle), so repeated
+    readings still count towards the statistics. Every real event is kept as
+    its own frame. Moving energy and distance ride along with the latest value
+    seen for each.
+    """
 
-    except requests.exceptions.RequestException as e:
-        raise ConnectionError(f"Failed to connect to Home Assistant: {e}")
+    def __init__(self, still_entity: str, moving_entity: str = MOVING_ENTITY,
+                 distance_entity: str = DISTANCE_ENTITY, frame_interval_ms: int = 1000):
+        self.still_entity = still_entity
+        self.moving_entity = moving_entity
+        self.distance_entity = distance_entity
+        self.frame_interval_ms = frame_interval_ms
+        self.frames = TraceColumns()
+        self.events = 0
+        self.duration_s = 0.0
+        self.converged = False
+        self._still = math.nan
+        self._moving = math.nan
+        self._distance = math.nan
+        self._last_t: Optional[int] = None
+
+    def seed(self, still: float, moving: float = math.nan, distance: float = math.nan) -> None:
+        """Initial held values (current entity states) at t=0."""
+        self._moving, self._distance = moving, distance
+        if not math.isnan(still):
+            self._append(0, still)
+
+    def handle(self, entity_id: str, value: float, t_ms: int) -> None:
+        """Apply one state change observed `t_ms` after collection start."""
+        if entity_id == self.moving_entity:
+            self._moving = value
+        elif entity_id == self.distance_entity:
+            self._distance = value
+        elif entity_id == self.still_entity:
+            self.events += 1
+            t_ms = max(t_ms, self._last_t or 0)
+            self._fill_until(t_ms)
+            if math.isnan(value):
+                self._still = value  # Sensor unavailable: stop holding the old value
+                return
+            self._append(t_ms, value)
+
+    def advance(self, t_ms: int) -> None:
+        """Hold the last value up to `t_ms` (inclusive); a quiet room produces no events to do it."""
+        self._fill_until(t_ms + 1)
+
+    def finish(self, t_ms: int) -> None:
+        """Hold the last value up to the end of collection."""
+        self.advance(t_ms)
+
+    @property
+    def samples(self) -> List[float]:
+        return list(self.frames.still_energy)
+
+    def _append(self, t_ms: int, value: float) -> None:
+        self._still = value
+        self._last_t = t_ms
+        self.frames.append(TraceFrame(t_ms, value, self._moving, self._distance))
+
+    def _fill_until(self, t_ms: int) -> None:
+        if self._last_t is None or math.isnan(self._still):
+            return
+        t = self._last_t + self.frame_interval_ms
+        while t < t_ms:
+            self._append(t, self._still)
+            t += self.frame_interval_ms
+
+
+@dataclass
+class ConvergenceCriteria:
+    """Stopping rule for convergence-driven collection (defaults match the firmware)."""
+    mu_tolerance: float = 0.25     # Max SE(μ) and change in μ between checks (%)
+    sigma_tolerance: float = 0.25  # Max SE(σ) and change in σ between checks (%)
+    min_samples: int = 50
+    stable_checks: int = 3
+
+
+class ConvergenceMonitor:
+    """
+    Decides when the median/MAD baseline has converged.
 
+    Mirrors BedPresenceEngine::calibration_converged(): the Gaussian standard
+    errors SE(median) ≈ 1.2533σ/√n and SE(1.4826·MAD) ≈ 1.1627σ/√n must be
+    within tolerance, and μ/σ must have moved less than the tolerance for
+    `stable_checks` consecutive checks. Like the firmware, callers check once
+    per CHECK_INTERVAL samples (see check_due), not once per wall-clock tick.
+    """
 
-def collect_samples(ha_url: str, ha_token: str, entity_id: str, num_samples: int = 30, total_time: int = 60) -> List[float]:
+    CHECK_INTERVAL = 25  # Samples between checks (CALIBRATION_CHECK_INTERVAL in bed_presence.h)
+
+    def __init__(self, criteria: Optional[ConvergenceCriteria] = None):
+        self.criteria = criteria or ConvergenceCriteria()
+        self.mu = math.nan
+        self.sigma = math.nan
+        self.se_mu = math.inf
+        self.se_sigma = math.inf
+        self.stable_count = 0
+        self.checked = 0  # Samples covered by the last check
+
+    def check_due(self, samples: List[float]) -> bool:
+        """Run every check that `samples` has reached (each on the samples up to its boundary); True once converged."""
+        while len(samples) - self.checked >= self.CHECK_INTERVAL:
+            self.checked += self.CHECK_INTERVAL
+            if self.check(samples[:self.checked]):
+                return True
+        return False
+
+    def check(self, samples: List[float]) -> bool:
+        """Update the estimates from all samples so far; True once converged."""
+        n = len(samples)
+        if n < 2:
+            return False
+        c = self.criteria
+        median = statistics.median(samples)
+        sigma = max(statistics.median([abs(x - median) for x in samples]) * 1.4826, 0.05)
+
+        settled = abs(median - self.mu) <= c.mu_tolerance and abs(sigma - self.sigma) <= c.sigma_tolerance
+        self.mu, self.sigma = median, sigma
+        self.se_mu = 1.2533 * sigma / math.sqrt(n)
+        self.se_sigma = 1.1627 * sigma / math.sqrt(n)
+        precise = self.se_mu <= c.mu_tolerance and self.se_sigma <= c.sigma_tolerance
+        self.stable_count = self.stable_count + 1 if settled and precise else 0
+        return n >= c.min_samples and self.stable_count >= c.stable_checks
+
+
+def print_progress(recorder: BaselineRecorder, elapsed: float, duration: float,
+                   convergence: Optional[ConvergenceMonitor] = None) -> None:
+    """Single-line progress bar with running statistics."""
+    fraction = min(1.0, elapsed / duration) if duration > 0 else 1.0
+    bar_length = 40
+    filled = int(bar_length * fraction)
+    bar = '█' * filled + '-' * (bar_length - filled)
+    samples = recorder.frames.still_energy
+    stats = ''
+    if convergence is not None and not math.isnan(convergence.mu):
+        stats = (f" | μ={convergence.mu:.2f}±{convergence.se_mu:.2f}% σ={convergence.sigma:.2f}±"
+                 f"{convergence.se_sigma:.2f}% stable {convergence.stable_count}/"
+                 f"{convergence.criteria.stable_checks}")
+    elif len(samples) > 1:
+        stats = f" | μ={statistics.fmean(samples):.2f}% σ={statistics.stdev(samples):.2f}%"
+    print(f"\r[{bar}] {fraction * 100:5.1f}% | {len(samples)} frames, {recorder.events} changes{stats}  ",
+          end='', flush=True)
+
+
+async def collect_samples(client: HomeAssistantClient, entity_id: str, duration: float = 60,
+                          frame_interval_ms: int = 1000, progress_interval: float = 0.5,
+                          convergence: Optional[ConvergenceMonitor] = None) -> BaselineRecorder:
     """
-    Collect sensor readings over a specified time period.
+    Rebuild the still-energy frames of the next `duration` seconds from HA state changes.
+
+    Subscribes to `state_changed` events (so no reading is skipped between
+    polls) while a progress task reports the running statistics.
 
     Args:
-        ha_url: Home Assistant URL
-        ha_token: Authentication token
-        entity_id: Sensor entity ID to monitor
-        num_samples: Number of samples to collect (default: 30)
-        total_time: Total collection time in seconds (default: 60)
+        client: connected Home Assistant WebSocket client
+        entity_id: still energy sensor entity ID
+        duration: collection time in seconds (default: 60); the maximum when
+            `convergence` is given
+        frame_interval_ms: sensor publish interval used to hold unchanged readings
+        progress_interval: seconds between progress updates; convergence is checked at
+            every 25th frame, with held frames filled in up to the current time first
+        convergence: stop as soon as this monitor reports convergence
 
     Returns:
-        List of sensor readings
+        BaselineRecorder holding the reconstructed frame trace
     """
-    samples = []
-    interval = total_time / num_samples
-
-    print(f"\n{Colors.OKBLUE}📊 Collecting {num_samples} samples over {total_time} seconds...{Colors.ENDC}")
+    recorder = BaselineRecorder(entity_id, frame_interval_ms=frame_interval_ms)
+    watched = {recorder.still_entity, recorder.moving_entity, recorder.distance_entity}
+
+    if convergence is not None:
+        print(f"\n{Colors.OKBLUE}📊 Capturing frames until μ/σ converge (at most {duration:.0f} seconds)..."
+              f"{Colors.ENDC}")
+    else:
+        print(f"\n{Colors.OKBLUE}📊 Capturing frames for {duration:.0f} seconds...{Colors.ENDC}")
     print(f"{Colors.WARNING}⏰ Please remain away from the sensor. Keep the bed empty.{Colors.ENDC}\n")
 
-    for i in range(num_samples):
-        try:
-            value = get_sensor_value(ha_url, ha_token, entity_id)
-            samples.append(value)
-
-            # Progress indicator
-            progress = (i + 1) / num_samples * 100
-            bar_length = 40
-            filled = int(bar_length * (i + 1) / num_samples)
-            bar = '█' * filled + '-' * (bar_length - filled)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
 
-            print(f"\r[{bar}] {progress:.1f}% | Sample {i+1}/{num_samples}: {value:.1f}%  ", end='', flush=True)
+    def on_event(event: Dict[str, Any]) -> None:
+        data = event.get('data', {})
+        entity = data.get('entity_id')
+        if entity in watched:
+            t_ms = int(round((loop.time() - start) * 1000))
+            recorder.handle(entity, parse_state(data.get('new_state')), t_ms)
 
-            # Sleep until next sample (except after last sample)
-            if i < num_samples - 1:
-                time.sleep(interval)
+    subscription = await client.subscribe_events(on_event)
+    recorder.seed(parse_state(await client.get_state(recorder.still_entity)),
+                  parse_state(await client.get_state(recorder.moving_entity)),
+                  parse_state(await client.get_state(recorder.distance_entity)))
 
-        except (ValueError, ConnectionError) as e:
-            print(f"\n{Colors.FAIL}❌ Error reading sensor: {e}{Colors.ENDC}")
-            print(f"{Colors.WARNING}⚠️  Retrying in 2 seconds...{Colors.ENDC}")
-            time.sleep(2)
-            # Retry this sample
-            i -= 1
-            continue
-
-    print(f"\n\n{Colors.OKGREEN}✅ Collection complete!{Colors.ENDC}\n")
-    return samples
+    try:
+        while (elapsed := loop.time() - start) < duration:
+            if convergence is not None:
+                recorder.advance(int(elapsed * 1000))
+                if convergence.check_due(recorder.samples):
+                    recorder.converged = True
+                    break
+            print_progress(recorder, elapsed, duration, convergence)
+            await asyncio.sleep(min(progress_interval, duration - elapsed))
+    finally:
+        await client.unsubscribe_events(subscription)
+
+    recorder.duration_s = min(loop.time() - start, duration)
+    recorder.finish(int(recorder.duration_s * 1000))
+    print_progress(recorder, duration if not recorder.converged else recorder.duration_s, duration, convergence)
+    if recorder.converged:
+        print(f"\n\n{Colors.OKGREEN}✅ Converged after {recorder.duration_s:.1f} seconds!{Colors.ENDC}\n")
+    else:
+        print(f"\n\n{Colors.OKGREEN}✅ Collection complete!{Colors.ENDC}\n")
+    return recorder
+
+
+def baseline_from_samples(median: float, mad: float) -> Tuple[float, float]:
+    """μ/σ the way the on-device calibration derives them (compute_median_sigma: σ = 1.4826·MAD, at least 0.05)."""
+    return median, max(mad * 1.4826, 0.05)
+
+
+def frame_note(recorder: BaselineRecorder) -> str:
+    """How the frames were obtained; they are rebuilt from HA events, not the device's real frames."""
+    return (f"synthesized from {recorder.events} HA state changes, unchanged readings repeated every "
+            f"{recorder.frame_interval_ms} ms (not the radar's real frame timing)")
+
+
+def service_call(mu: float, sigma: float) -> str:
+    """Home Assistant action that applies the baseline to the device."""
+    return (f"action: esphome.bed_presence_detector_apply_baseline\n"
+            f"data:\n"
+            f"  mu: {mu:.2f}\n"
+            f"  sigma: {sigma:.2f}\n")
 
 
 def calculate_statistics(samples: List[float]) -> Tuple[float, float, float, float]:
@@ -174,48 +378,102 @@ def calculate_statistics(samples: List[float]) -> Tuple[float, float, float, flo
     return mean, stdev, median, mad
 
 
+async def run_collection(ha_url: str, ha_token: str, entity_id: str, duration: float,
+                         frame_interval_ms: int, confirm: bool,
+                         convergence: Optional[ConvergenceMonitor] = None) -> BaselineRecorder:
+    """Pre-flight check, confirmation and collection over one WebSocket connection."""
+    client = HomeAssistantClient(ha_url, ha_token)
+    await client.connect()
+    try:
+        # Pre-flight check: verify sensor is accessible
+        print(f"\n{Colors.OKBLUE}🔍 Performing pre-flight check...{Colors.ENDC}")
+        initial_value = parse_state(await client.get_state(entity_id))
+        if math.isnan(initial_value):
+            print(f"{Colors.FAIL}❌ Cannot read sensor {entity_id}{Colors.ENDC}")
+            print(f"\nPlease ensure:")
+            print(f"  1. The M5Stack device is powered on and connected to Home Assistant")
+            print(f"  2. The entity ID is correct: {entity_id}")
+            print(f"  3. Your HA_TOKEN is valid")
+            sys.exit(1)
+        print(f"{Colors.OKGREEN}✅ Sensor is accessible. Current value: {initial_value:.1f}%{Colors.ENDC}")
+
+        # Final confirmation
+        print(f"\n{Colors.WARNING}{Colors.BOLD}⚠️  IMPORTANT: Before starting collection:{Colors.ENDC}")
+        print(f"{Colors.WARNING}   • Ensure the bed is COMPLETELY EMPTY (no people, pets, objects)")
+        print(f"   • Close the bedroom door to minimize external movement")
+        print(f"   • Keep the environment still for {'up to ' if convergence else ''}the next "
+              f"{duration:.0f} seconds{Colors.ENDC}")
+        if confirm:
+            await asyncio.get_running_loop().run_in_executor(
+                None, input, f"\n{Colors.OKBLUE}Press ENTER when ready to start collection...{Colors.ENDC}")
+
+        return await collect_samples(client, entity_id, duration, frame_interval_ms, convergence=convergence)
+    finally:
+        await client.disconnect()
+
+
 def main():
+    parser = argparse.ArgumentParser(description='Collect an empty-bed baseline from Home Assistant state changes')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='Collection time in seconds (default: 60, or 600 with --until-converged)')
+    parser.add_argument('--frame-interval-ms', type=int, default=1000,
+                        help='Sensor publish interval for held readings (default: 1000)')
+    parser.add_argument('--entity', default=STILL_ENTITY, help='Still energy entity ID')
+    parser.add_argument('--output-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'),
+                        help='Directory for baseline_results.txt and the trace (default: repository root)')
+    parser.add_argument('--yes', '-y', action='store_true', help='Start without waiting for ENTER')
+    parser.add_argument('--until-converged', action='store_true',
+                        help='Stop once μ/σ are stable (--duration becomes the maximum)')
+    defaults = ConvergenceCriteria()
+    parser.add_argument('--mu-tolerance', type=float, default=defaults.mu_tolerance,
+                        help=f'Convergence tolerance for μ in %% (default: {defaults.mu_tolerance})')
+    parser.add_argument('--sigma-tolerance', type=float, default=defaults.sigma_tolerance,
+                        help=f'Convergence tolerance for σ in %% (default: {defaults.sigma_tolerance})')
+    parser.add_argument('--min-samples', type=int, default=defaults.min_samples,
+                        help=f'Minimum frames before stopping (default: {defaults.min_samples})')
+    parser.add_argument('--stable-checks', type=int, default=defaults.stable_checks,
+                        help=f'Consecutive stable checks required (default: {defaults.stable_checks})')
+    args = parser.parse_args()
+    if args.duration is None:
+        args.duration = 600 if args.until_converged else 60  # 600 s is the firmware's hard cap too
+
+    convergence = None
+    if args.until_converged:
+        convergence = ConvergenceMonitor(ConvergenceCriteria(args.mu_tolerance, args.sigma_tolerance,
+                                                             args.min_samples, args.stable_checks))
+
     print(f"{Colors.HEADER}{Colors.BOLD}")
     print("=" * 80)
-    print("  BED PRESENCE SENSOR - BASELINE DATA COLLECTION (Phase 1)")
+    print("  BED PRESENCE SENSOR - BASELINE DATA COLLECTION")
     print("=" * 80)
     print(f"{Colors.ENDC}")
 
     # Get configuration
     ha_url, ha_token = get_ha_config()
     print(f"🔗 Connected to: {Colors.OKCYAN}{ha_url}{Colors.ENDC}")
-
-    # Entity ID for LD2410 still energy sensor (with device prefix)
-    entity_id = "sensor.bed_presence_detector_ld2410_still_energy"
+    entity_id = args.entity
     print(f"📡 Monitoring: {Colors.OKCYAN}{entity_id}{Colors.ENDC}")
 
-    # Pre-flight check: verify sensor is accessible
-    print(f"\n{Colors.OKBLUE}🔍 Performing pre-flight check...{Colors.ENDC}")
-    try:
-        initial_value = get_sensor_value(ha_url, ha_token, entity_id)
-        print(f"{Colors.OKGREEN}✅ Sensor is accessible. Current value: {initial_value:.1f}%{Colors.ENDC}")
-    except (ValueError, ConnectionError) as e:
-        print(f"{Colors.FAIL}❌ Cannot access sensor: {e}{Colors.ENDC}")
-        print(f"\nPlease ensure:")
-        print(f"  1. The M5Stack device is powered on and connected to Home Assistant")
-        print(f"  2. The entity ID is correct: {entity_id}")
-        print(f"  3. Your HA_TOKEN is valid")
-        sys.exit(1)
-
-    # Final confirmation
-    print(f"\n{Colors.WARNING}{Colors.BOLD}⚠️  IMPORTANT: Before starting collection:{Colors.ENDC}")
-    print(f"{Colors.WARNING}   • Ensure the bed is COMPLETELY EMPTY (no people, pets, objects)")
-    print(f"   • Close the bedroom door to minimize external movement")
-    print(f"   • Keep the environment still for the next 60 seconds{Colors.ENDC}")
-
-    input(f"\n{Colors.OKBLUE}Press ENTER when ready to start collection...{Colors.ENDC}")
-
     # Collect samples
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    samples = collect_samples(ha_url, ha_token, entity_id, num_samples=30, total_time=60)
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    recorder = asyncio.run(run_collection(ha_url, ha_token, entity_id, args.duration,
+                                          args.frame_interval_ms, confirm=not args.yes, convergence=convergence))
+    samples = recorder.samples
+    if len(samples) < 2:
+        print(f"{Colors.FAIL}❌ Only {len(samples)} frame(s) captured; is the sensor publishing?{Colors.ENDC}")
+        sys.exit(1)
 
     # Calculate statistics
     mean, stdev, median, mad = calculate_statistics(samples)
+    mu, sigma = baseline_from_samples(median, mad)
+
+    # Store the full trace next to the summary
+    os.makedirs(args.output_dir, exist_ok=True)
+    trace_file = os.path.join(args.output_dir, f"baseline_trace_{now.strftime('%Y%m%d_%H%M%S')}.csv.gz")
+    write_trace(trace_file, (TraceFrame(*row) for row in zip(recorder.frames.t_ms, recorder.frames.still_energy,
+                                                               recorder.frames.moving_energy,
+                                                               recorder.frames.still_distance)))
 
     # Display results
     print(f"{Colors.HEADER}{Colors.BOLD}")
@@ -224,67 +482,64 @@ def main():
     print("=" * 80)
     print(f"{Colors.ENDC}")
 
-    print(f"{Colors.OKGREEN}Collected {len(samples)} samples{Colors.ENDC}")
+    stop_reason = 'converged' if recorder.converged else 'maximum duration' if convergence else 'fixed duration'
+    print(f"{Colors.OKGREEN}Collected {len(samples)} frames over {recorder.duration_s:.0f} seconds "
+          f"({stop_reason}){Colors.ENDC}")
+    print(f"{Colors.WARNING}Frames: {frame_note(recorder)}{Colors.ENDC}")
     print(f"Timestamp: {timestamp}")
     print(f"\n{Colors.OKBLUE}Statistical Analysis:{Colors.ENDC}")
-    print(f"  Mean (μ):                 {mean:.2f}%")
-    print(f"  Standard Deviation (σ):   {stdev:.2f}%")
+    print(f"  Baseline μ (median):      {mu:.2f}%")
+    print(f"  Baseline σ (1.4826·MAD):  {sigma:.2f}%")
+    print(f"  Mean:                     {mean:.2f}%")
+    print(f"  Standard Deviation:       {stdev:.2f}%")
     print(f"  Median:                   {median:.2f}%")
-    print(f"  MAD (for Phase 3):        {mad:.2f}%")
+    print(f"  MAD:                      {mad:.2f}%")
     print(f"  Min value:                {min(samples):.2f}%")
     print(f"  Max value:                {max(samples):.2f}%")
     print(f"  Range:                    {max(samples) - min(samples):.2f}%")
 
-    # Generate code snippet
+    # Apply on the device through the ESPHome API service
     print(f"\n{Colors.HEADER}{Colors.BOLD}")
     print("=" * 80)
-    print("  CODE TO PASTE INTO bed_presence.h")
+    print("  APPLY THE BASELINE (Developer Tools → Actions, YAML mode)")
     print("=" * 80)
     print(f"{Colors.ENDC}")
-
-    print(f"{Colors.OKCYAN}")
-    print(f"// Baseline calibration collected on {timestamp}")
-    print(f"// Location: [Describe your sensor placement here]")
-    print(f"// Conditions: Empty bed, door closed, minimal movement")
-    print(f"// Statistics: mean={mean:.2f}%, stdev={stdev:.2f}%, n={len(samples)} samples")
-    print(f"float mu_move_{{{mean:.1f}f}};      // Mean still energy (empty bed)")
-    print(f"float sigma_move_{{{stdev:.1f}f}};  // Std dev still energy (empty bed)")
-    print(f"float mu_stat_{{{mean:.1f}f}};      // Same as mu_move_ for Phase 1")
-    print(f"float sigma_stat_{{{stdev:.1f}f}};  // Same as sigma_move_ for Phase 1")
-    print(f"{Colors.ENDC}")
+    print(f"{Colors.OKCYAN}{service_call(mu, sigma)}{Colors.ENDC}")
 
     print(f"\n{Colors.OKBLUE}📝 Next Steps:{Colors.ENDC}")
-    print(f"  1. Copy the code snippet above")
-    print(f"  2. Open: esphome/custom_components/bed_presence_engine/bed_presence.h")
-    print(f"  3. Replace lines 43-46 with the new baseline values")
-    print(f"  4. Recompile and flash the firmware")
-    print(f"  5. Test presence detection with person in bed")
+    print(f"  1. Run the action above in Home Assistant (adjust the device name if yours differs)")
+    print(f"  2. Check that Presence Change Reason reports calibration:applied")
+    print(f"  3. Test presence detection with person in bed")
+    print(f"  (The device stores μ/σ in flash like an on-device calibration; no recompile or reflash.")
+    print(f"   Use apply_parameters for k_on/k_off, debounce timers and the distance window.)")
 
     # Save results to file
-    results_file = os.path.join(os.path.dirname(__file__), '..', 'baseline_results.txt')
+    results_file = os.path.join(args.output_dir, 'baseline_results.txt')
     with open(results_file, 'w') as f:
         f.write(f"Baseline Calibration Results\n")
         f.write(f"{'=' * 80}\n")
         f.write(f"Timestamp: {timestamp}\n")
         f.write(f"Entity: {entity_id}\n")
-        f.write(f"Samples collected: {len(samples)}\n\n")
+        f.write(f"Duration: {recorder.duration_s:.0f} s ({stop_reason})\n")
+        f.write(f"Frames collected: {len(samples)}\n")
+        f.write(f"Frames: {frame_note(recorder)}\n")
+        f.write(f"Trace: {os.path.basename(trace_file)}\n\n")
         f.write(f"Statistics:\n")
-        f.write(f"  Mean (μ):                 {mean:.2f}%\n")
-        f.write(f"  Standard Deviation (σ):   {stdev:.2f}%\n")
+        f.write(f"  Baseline μ (median):      {mu:.2f}%\n")
+        f.write(f"  Baseline σ (1.4826·MAD):  {sigma:.2f}%\n")
+        f.write(f"  Mean:                     {mean:.2f}%\n")
+        f.write(f"  Standard Deviation:       {stdev:.2f}%\n")
         f.write(f"  Median:                   {median:.2f}%\n")
         f.write(f"  MAD:                      {mad:.2f}%\n")
         f.write(f"  Min:                      {min(samples):.2f}%\n")
         f.write(f"  Max:                      {max(samples):.2f}%\n")
         f.write(f"  Range:                    {max(samples) - min(samples):.2f}%\n\n")
-        f.write(f"Code for bed_presence.h:\n")
+        f.write(f"Apply on the device (Home Assistant action, no reflash):\n")
         f.write(f"{'=' * 80}\n")
-        f.write(f"// Baseline calibration collected on {timestamp}\n")
-        f.write(f"float mu_move_{{{mean:.1f}f}};\n")
-        f.write(f"float sigma_move_{{{stdev:.1f}f}};\n")
-        f.write(f"float mu_stat_{{{mean:.1f}f}};\n")
-        f.write(f"float sigma_stat_{{{stdev:.1f}f}};\n")
+        f.write(service_call(mu, sigma))
 
     print(f"\n{Colors.OKGREEN}💾 Results saved to: {results_file}{Colors.ENDC}")
+    print(f"{Colors.OKGREEN}💾 Frame trace saved to: {trace_file}{Colors.ENDC}")
     print()
 
 
@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+Replay Radar Traces Through the Production Presence Engine
+
+Binds (via ctypes) to the host build of the real `BedPresenceEngine`
+(`esphome/host`, built with `make -C esphome/host`) and exposes a batch
+`replay(timestamps, energies, distances, params)` call. A pure-Python
+reference model of the same state machine is included so parity between the
+shipping C++ and any Python model can be checked frame by frame.
+
+Build the library first:
+    make -C esphome/host
+
+Usage:
+    python3 engine_replay.py --session night.csv [--labels night_labels.csv] [--k-on 8 ...]
+    python3 engine_replay.py --trace night.csv.gz --labels night_labels.csv --fusion-mode 3
+    python3 engine_replay.py --trace night.csv.gz --labels night_labels.csv --prefilter-mode 2 --prefilter-window 7
+
+    `--session` takes a CSV written by `monitor_phase2.py --csv`; the recorded
+    still energy is replayed through both engines and the transitions are
+    printed (and scored when labels are given). `--trace` takes a
+    presence_trace file and also replays its moving energy and distance, so
+    the fusion modes (0 still only, 1 max, 2 weighted, 3 moving arms / still
+    holds) can be compared. `--prefilter-mode` (0 off, 1 median, 2 Hampel)
+    replays the still energy pre-filter.
+
+Environment Variables:
+    BPE_REPLAY_LIB: Path to libbed_presence_replay.so (default: esphome/host/build/)
+"""
+
+import argparse
+import bisect
+import ctypes
+import math
+import os
+import sys
+from array import array
+from collections import deque
+from dataclasses import dataclass, fields
+from typing import List, Optional, Sequence, Tuple
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+ABI_VERSION = 5
+DEFAULT_LIBRARY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esphome', 'host', 'build',
+                               'libbed_presence_replay.so')
+
+# State machine states (mirrors enum State in bed_presence.h)
+IDLE, DEBOUNCING_ON, PRESENT, DEBOUNCING_OFF = range(4)
+
+# Still/moving energy fusion modes (mirrors enum FusionMode in bed_presence.h)
+FUSION_STILL, FUSION_MAX, FUSION_WEIGHTED, FUSION_MOVING_ARMS = range(4)
+
+# Still energy pre-filters (mirrors enum PrefilterMode in prefilter.h)
+PREFILTER_NONE, PREFILTER_MEDIAN, PREFILTER_HAMPEL = range(3)
+
+
+@dataclass
+class EngineParams:
+    """Engine configuration for a replay (defaults match bed_presence.h)."""
+    mu_still: float = 6.7
+    sigma_still: float = 3.5
+    k_on: float = 9.0
+    k_off: float = 4.0
+    on_debounce_ms: int = 3000
+    off_debounce_ms: int = 5000
+    abs_clear_delay_ms: int = 30000
+    d_min_cm: float = 0.0
+    d_max_cm: float = 600.0
+    mu_moving: float = 6.7
+    sigma_moving: float = 3.5
+    fusion_mode: int = FUSION_STILL
+    fusion_moving_weight: float = 0.5
+    prefilter_mode: int = PREFILTER_NONE
+    prefilter_window: int = 5
+    prefilter_threshold: float = 3.0
+
+
+@dataclass
+class ReplayResult:
+    """Engine output for one replay."""
+    transitions: List[Tuple[int, bool]]   # (t_ms, occupied) after each binary sensor change
+    states: Optional[bytes] = None        # Per-frame binary sensor output, when requested
+
+
+class _Params(ctypes.Structure):
+    _fields_ = [
+        ('mu_still', ctypes.c_float),
+        ('sigma_still', ctypes.c_float),
+        ('k_on', ctypes.c_float),
+        ('k_off', ctypes.c_float),
+        ('on_debounce_ms', ctypes.c_uint32),
+        ('off_debounce_ms', ctypes.c_uint32),
+        ('abs_clear_delay_ms', ctypes.c_uint32),
+        ('d_min_cm', ctypes.c_float),
+        ('d_max_cm', ctypes.c_float),
+        ('mu_moving', ctypes.c_float),
+        ('sigma_moving', ctypes.c_float),
+        ('fusion_mode', ctypes.c_uint32),
+        ('fusion_moving_weight', ctypes.c_float),
+        ('prefilter_mode', ctypes.c_uint32),
+        ('prefilter_window', ctypes.c_uint32),
+        ('prefilter_threshold', ctypes.c_float),
+    ]
+
+
+class SlidingPrefilter:
+    """Sliding median / Hampel filter over the last W frames (mirrors SlidingPrefilter in prefilter.h)."""
+
+    MAX_WINDOW = 31
+    MIN_MAD = 1.0  # Energy %, the LD2410's resolution
+
+    def __init__(self, mode: int = PREFILTER_NONE, window: int = 5, threshold: float = 3.0):
+        self.mode = mode
+        self.window = min(max(window, 1), self.MAX_WINDOW)
+        self._threshold = _f32(threshold)
+        self._ring: deque = deque()
+        self._sorted: List[float] = []
+
+    def filter(self, value: float) -> float:
+        """Add one frame (float32) to the window and return the filtered value."""
+        if self.mode == PREFILTER_NONE or math.isnan(value):
+            return value
+        if len(self._ring) == self.window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._ring.popleft())]
+        self._ring.append(value)
+        bisect.insort_right(self._sorted, value)
+        median = self._sorted[(len(self._sorted) - 1) // 2]
+        if self.mode == PREFILTER_MEDIAN:
+            return median
+        deviations = sorted(abs(_f32(x - median)) for x in self._sorted)
+        mad = max(deviations[(len(deviations) - 1) // 2], self.MIN_MAD)
+        limit = _f32(_f32(self._threshold * _f32(1.4826)) * mad)
+        return median if abs(_f32(value - median)) > limit else value
+
+
+class _Transition(ctypes.Structure):
+    _fields_ = [('t_ms', ctypes.c_uint32), ('state', ctypes.c_uint32)]
+
+
+_library = None
+
+
+def load_library(path: Optional[str] = None) -> ctypes.CDLL:
+    """Load (once) and type the native replay library."""
+    global _library
+    if _library is not None and path is None:
+        return _library
+
+    path = path or os.getenv('BPE_REPLAY_LIB') or DEFAULT_LIBRARY
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Replay library not found at {path} (build it with: make -C esphome/host)")
+
+    lib = ctypes.CDLL(os.path.abspath(path))
+    lib.bpe_abi_version.restype = ctypes.c_int
+    if lib.bpe_abi_version() != ABI_VERSION:
+        raise RuntimeError(f"Replay library ABI {lib.bpe_abi_version()} does not match bindings ({ABI_VERSION}); "
+                           "rebuild with: make -C esphome/host")
+    lib.bpe_replay.restype = ctypes.c_long
+    lib.bpe_replay.argtypes = [
+        ctypes.POINTER(_Params),
+        ctypes.POINTER(ctypes.c_uint32),
+        ctypes.POINTER(ctypes.c_float),
+        ctypes.POINTER(ctypes.c_float),
+        ctypes.POINTER(ctypes.c_float),
+        ctypes.c_size_t,
+        ctypes.POINTER(ctypes.c_uint8),
+        ctypes.POINTER(_Transition),
+        ctypes.c_size_t,
+    ]
+    lib.bpe_engine_create.restype = ctypes.c_void_p
+    lib.bpe_engine_create.argtypes = [ctypes.POINTER(_Params), ctypes.c_int]
+    lib.bpe_engine_feed.restype = ctypes.c_int
+    lib.bpe_engine_feed.argtypes = [ctypes.c_void_p, ctypes.c_uint32, ctypes.c_float, ctypes.c_float, ctypes.c_float]
+    lib.bpe_engine_state.restype = ctypes.c_int
+    lib.bpe_engine_state.argtypes = [ctypes.c_void_p]
+    lib.bpe_engine_destroy.restype = None
+    lib.bpe_engine_destroy.argtypes = [ctypes.c_void_p]
+    lib.bpe_calibrate.restype = ctypes.c_int
+    lib.bpe_calibrate.argtypes = [ctypes.POINTER(ctypes.c_float), ctypes.POINTER(ctypes.c_float), ctypes.c_size_t,
+                                  ctypes.POINTER(ctypes.c_float), ctypes.POINTER(ctypes.c_float),
+                                  ctypes.POINTER(ctypes.c_float), ctypes.POINTER(ctypes.c_float)]
+    _library = lib
+    return lib
+
+
+def native_available() -> bool:
+    """True when the native replay library can be loaded."""
+    try:
+        load_library()
+        return True
+    except (OSError, RuntimeError):
+        return False
+
+
+def _c_params(params: EngineParams) -> _Params:
+    return _Params(**{f.name: getattr(params, f.name) for f in fields(EngineParams)})
+
+
+def _as_array(values, typecode: str) -> array:
+    if isinstance(values, array) and values.typecode == typecode:
+        return values
+    return array(typecode, values)
+
+
+def _pointer(buf: array, ctype):
+    if not len(buf):
+        return None
+    return (ctype * len(buf)).from_buffer(buf)
+
+
+def replay(timestamps: Sequence[int], energies: Sequence[float], distances: Optional[Sequence[float]] = None,
+           params: Optional[EngineParams] = None, *, moving_energies: Optional[Sequence[float]] = None,
+           per_frame: bool = False) -> ReplayResult:
+    """
+    Replay frames through the production engine (native library).
+
+    Args:
+        timestamps: frame times in ms (non-decreasing, fits in uint32)
+        energies: still energy per frame (%)
+        distances: still distance per frame (cm), or None to disable the window;
+            NaN keeps the previous distance
+        params: engine configuration (defaults match the firmware)
+        moving_energies: moving energy per frame (%), or None to leave the
+            moving channel unconfigured; NaN keeps the previous value
+        per_frame: also return per-frame binary sensor output
+
+    Passing `array('I')`/`array('f')` inputs avoids a conversion copy.
+    """
+    lib = load_library()
+    params = params or EngineParams()
+    t_buf = _as_array(timestamps, 'I')
+    e_buf = _as_array(energies, 'f')
+    m_buf = _as_array(moving_energies, 'f') if moving_energies is not None else None
+    d_buf = _as_array(distances, 'f') if distances is not None else None
+    n = len(t_buf)
+    if len(e_buf) != n or any(buf is not None and len(buf) != n for buf in (m_buf, d_buf)):
+        raise ValueError("timestamps, energies, moving energies and distances must have the same length")
+
+    c_params = _c_params(params)
+    states = bytearray(n) if per_frame else None
+    states_ptr = (ctypes.c_uint8 * n).from_buffer(states) if per_frame and n else None
+
+    capacity = 64
+    while True:
+        transitions = (_Transition * capacity)()
+        count = lib.bpe_replay(ctypes.byref(c_params), _pointer(t_buf, ctypes.c_uint32),
+                               _pointer(e_buf, ctypes.c_float),
+                               _pointer(m_buf, ctypes.c_float) if m_buf is not None else None,
+                               _pointer(d_buf, ctypes.c_float) if d_buf is not None else None,
+                               n, states_ptr, transitions, capacity)
+        if count < 0:
+            raise ValueError("Replay rejected its arguments")
+        if count <= capacity:
+            break
+        capacity = count
+
+    return ReplayResult(
+        transitions=[(transitions[i].t_ms, bool(transitions[i].state)) for i in range(count)],
+        states=bytes(states) if per_frame else None,
+    )
+
+
+class NativeEngine:
+    """
+    Frame-at-a-time handle on the production engine (for simulated devices).
+
+    Prefer `replay()` for whole traces; each `feed()` is a ctypes call.
+    """
+
+    def __init__(self, params: Optional[EngineParams] = None, use_distance: bool = True):
+        self._lib = load_library()
+        self.params = params or EngineParams()
+        self._handle = self._lib.bpe_engine_create(ctypes.byref(_c_params(self.params)), int(use_distance))
+        if not self._handle:
+            raise RuntimeError("bpe_engine_create failed")
+
+    def feed(self, t_ms: int, energy: float, distance: float = math.nan, moving_energy: float = math.nan) -> bool:
+        """Deliver one frame; returns the binary sensor output afterwards."""
+        return bool(self._lib.bpe_engine_feed(self._handle, t_ms, energy, moving_energy, distance))
+
+    @property
+    def state(self) -> int:
+        """State machine state (IDLE, DEBOUNCING_ON, PRESENT, DEBOUNCING_OFF)."""
+        return self._lib.bpe_engine_state(self._handle)
+
+    def close(self) -> None:
+        if self._handle:
+            self._lib.bpe_engine_destroy(self._handle)
+            self._handle = None
+
+    def __enter__(self) -> 'NativeEngine':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+def native_calibrate(samples: Sequence[float]) -> Tuple[float, float]:
+    """Run the firmware's MAD calibration over still-energy samples; returns (μ, σ)."""
+    lib = load_library()
+    buf = _as_array(samples, 'f')
+    if not len(buf):
+        raise ValueError("Calibration needs at least one sample")
+    mu, sigma = ctypes.c_float(), ctypes.c_float()
+    lib.bpe_calibrate(_pointer(buf, ctypes.c_float), None, len(buf), ctypes.byref(mu), ctypes.byref(sigma), None, None)
+    return mu.value, sigma.value
+
+
+def native_calibrate_channels(still: Sequence[float],
+                              moving: Sequence[float]) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """Calibrate still and moving energy in one pass, as the firmware does; returns ((μ, σ), (μ_moving, σ_moving))."""
+    lib = load_library()
+    still_buf = _as_array(still, 'f')
+    moving_buf = _as_array(moving, 'f')
+    if not len(still_buf) or len(still_buf) != len(moving_buf):
+        raise ValueError("Calibration needs the same number (at least one) of still and moving samples")
+    mu, sigma, mu_moving, sigma_moving = (ctypes.c_float() for _ in range(4))
+    lib.bpe_calibrate(_pointer(still_buf, ctypes.c_float), _pointer(moving_buf, ctypes.c_float), len(still_buf),
+                      ctypes.byref(mu), ctypes.byref(sigma), ctypes.byref(mu_moving), ctypes.byref(sigma_moving))
+    return (mu.value, sigma.value), (mu_moving.value, sigma_moving.value)
+
+
+class PythonEngine:
+    """
+    Pure-Python reference model of the BedPresenceEngine state machine.
+
+    Arithmetic is rounded to float32 at the same points as the firmware so
+    threshold ties resolve identically: still energy alone is compared
+    against μ + kσ (ThresholdModel::energy_thresholds), everything else as
+    z-scores computed with a precomputed 1/σ.
+    """
+
+    def __init__(self, params: Optional[EngineParams] = None):
+        self.params = params or EngineParams()
+        self.state = IDLE
+        self.output = False
+        self.debounce_start_time = 0
+        self.last_high_confidence_time = 0
+        self.distance: Optional[float] = None
+        self.moving_energy = math.nan
+        p = self.params
+        self.prefilter = SlidingPrefilter(p.prefilter_mode, p.prefilter_window, p.prefilter_threshold)
+        self._mu = _f32(p.mu_still)
+        self._sigma = _f32(p.sigma_still)
+        self._inv_sigma = self._inverse(self._sigma)
+        self._mu_moving = _f32(p.mu_moving)
+        self._inv_sigma_moving = self._inverse(_f32(p.sigma_moving))
+        self._weight = _f32(p.fusion_moving_weight)
+        self._k_on = _f32(p.k_on)
+        self._k_off = _f32(p.k_off)
+        self._energy_on = _f32(self._mu + _f32(self._k_on * self._sigma))
+        self._energy_off = _f32(self._mu + _f32(self._k_off * self._sigma))
+
+    @staticmethod
+    def _inverse(sigma: float) -> float:
+        return _f32(1.0 / sigma) if sigma > _f32(0.001) else 0.0
+
+    @staticmethod
+    def _z(energy: float, mu: float, inv_sigma: float) -> float:
+        return _f32(_f32(energy - mu) * inv_sigma)
+
+    def z_score(self, energy: float) -> float:
+        return self._z(energy, self._mu, self._inv_sigma)
+
+    def fused_z_scores(self, energy: float, moving_energy: float) -> Tuple[float, float]:
+        """(z_arm, z_hold) for one frame, as BedPresenceEngine::fuse_z_scores."""
+        z_still = self.z_score(energy)
+        mode = self.params.fusion_mode
+        if mode == FUSION_STILL or math.isnan(moving_energy):
+            return z_still, z_still
+        z_moving = self._z(moving_energy, self._mu_moving, self._inv_sigma_moving)
+        if mode == FUSION_MAX:
+            return max(z_still, z_moving), max(z_still, z_moving)
+        if mode == FUSION_WEIGHTED:
+            z = _f32(_f32(self._weight * z_moving) + _f32(_f32(1.0 - self._weight) * z_still))
+            return z, z
+        if mode == FUSION_MOVING_ARMS:
+            return max(z_still, z_moving), z_still
+        return z_still, z_still
+
+    def process(self, now: int, energy: float, distance: Optional[float] = None,
+                moving_energy: Optional[float] = None) -> bool:
+        """Feed one frame; returns the binary sensor output afterwards."""
+        p = self.params
+        # Every frame goes through the pre-filter, including those the distance window then ignores
+        energy = self.prefilter.filter(_f32(energy))
+        if distance is not None and not math.isnan(distance):
+            self.distance = distance
+        if moving_energy is not None and not math.isnan(moving_energy):
+            self.moving_energy = _f32(moving_energy)
+        if self.distance is not None and (self.distance < _f32(p.d_min_cm) or self.distance > _f32(p.d_max_cm)):
+            return self.output
+
+        # z_arm decides arming from vacancy, z_hold everything once occupied
+        if self._inv_sigma == 0.0 or (p.fusion_mode != FUSION_STILL and not math.isnan(self.moving_energy)):
+            z_arm, z_hold = self.fused_z_scores(energy, self.moving_energy)
+            k_on, k_off = self._k_on, self._k_off
+        else:
+            z_arm = z_hold = energy
+            k_on, k_off = self._energy_on, self._energy_off
+        if self.state == IDLE:
+            if z_arm >= k_on:
+                self.debounce_start_time = now
+                self.state = DEBOUNCING_ON
+        elif self.state == DEBOUNCING_ON:
+            if z_arm >= k_on:
+                if now - self.debounce_start_time >= p.on_debounce_ms:
+                    self.state = PRESENT
+                    self.last_high_confidence_time = now
+                    self.output = True
+            else:
+                self.state = IDLE
+        elif self.state == PRESENT:
+            if z_hold > k_on:
+                self.last_high_confidence_time = now
+            if z_hold < k_off and now - self.last_high_confidence_time >= p.abs_clear_delay_ms:
+                self.debounce_start_time = now
+                self.state = DEBOUNCING_OFF
+        elif self.state == DEBOUNCING_OFF:
+            if z_hold < k_off:
+                if now - self.debounce_start_time >= p.off_debounce_ms:
+                    self.state = IDLE
+                    self.output = False
+            elif z_hold >= k_on:
+                self.state = PRESENT
+                self.last_high_confidence_time = now
+        return self.output
+
+
+def _f32(value: float) -> float:
+    return array('f', (value,))[0]
+
+
+def python_replay(timestamps: Sequence[int], energies: Sequence[float],
+                  distances: Optional[Sequence[float]] = None, params: Optional[EngineParams] = None, *,
+                  moving_energies: Optional[Sequence[float]] = None, per_frame: bool = False) -> ReplayResult:
+    """Same contract as `replay`, computed with the Python reference model."""
+    engine = PythonEngine(params)
+    energies = _as_array(energies, 'f')
+    distances = _as_array(distances, 'f') if distances is not None else None
+    moving_energies = _as_array(moving_energies, 'f') if moving_energies is not None else None
+    transitions = []
+    states = bytearray(len(timestamps)) if per_frame else None
+    previous = False
+    for i, now in enumerate(timestamps):
+        output = engine.process(now, energies[i], distances[i] if distances is not None else None,
+                                moving_energies[i] if moving_energies is not None else None)
+        if per_frame:
+            states[i] = output
+        if output != previous:
+            transitions.append((now, output))
+            previous = output
+    return ReplayResult(transitions=transitions, states=bytes(states) if per_frame else None)
+
+
+def check_parity(timestamps: Sequence[int], energies: Sequence[float],
+                 distances: Optional[Sequence[float]] = None, params: Optional[EngineParams] = None,
+                 model=python_replay, *, moving_energies: Optional[Sequence[float]] = None) -> List[int]:
+    """
+    Compare a Python model against the production engine.
+
+    Returns:
+        Indices of frames where the binary sensor output differs (empty = parity)
+    """
+    native = replay(timestamps, energies, distances, params, moving_energies=moving_energies, per_frame=True).states
+    candidate = model(timestamps, energies, distances, params, moving_energies=moving_energies, per_frame=True).states
+    return [i for i, (a, b) in enumerate(zip(native, candidate)) if a != b]
+
+
+def main():
+    # Imported here so the replay API has no dependency on the scoring module
+    from night_scoring import load_labels, load_session, occupancy_from_transitions, print_summary, score_night, summarize
+    import csv
+
+    parser = argparse.ArgumentParser(description='Replay a recorded session through the production engine')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--session', help='CSV written by monitor_phase2.py --csv')
+    source.add_argument('--trace', help='presence_trace file (still + moving energy and distance)')
+    parser.add_argument('--labels', help='Labeled intervals CSV to score the replay against')
+    defaults = EngineParams()
+    for f in fields(EngineParams):
+        parser.add_argument('--' + f.name.replace('_', '-'), type=type(getattr(defaults, f.name)),
+                            default=getattr(defaults, f.name), help=f'(default: {getattr(defaults, f.name)})')
+    args = parser.parse_args()
+
+    params = EngineParams(**{f.name: getattr(args, f.name) for f in fields(EngineParams)})
+    if args.trace:
+        from presence_trace import load_trace
+        columns = load_trace(args.trace)
+        origin, timestamps, energies = None, columns.t_ms, columns.still_energy
+        moving, distances = columns.moving_energy, columns.still_distance
+    else:
+        origin, timestamps, _ = load_session(args.session)
+        with open(args.session, newline='') as f:
+            energies = [float(row['energy_%']) for row in csv.DictReader(f)]
+        moving, distances = None, None
+
+    result = replay(timestamps, energies, distances, params, moving_energies=moving)
+    mismatches = check_parity(timestamps, energies, distances, params, moving_energies=moving)
+
+    print(f"{Colors.OKBLUE}Replayed {len(timestamps)} frames from {args.session or args.trace}{Colors.ENDC}")
+    for t, occupied in result.transitions:
+        label = f"{Colors.OKGREEN}PRESENT{Colors.ENDC}" if occupied else f"{Colors.WARNING}VACANT{Colors.ENDC}"
+        print(f"  +{t / 1000:9.1f}s → {label}")
+    if mismatches:
+        print(f"{Colors.FAIL}❌ Python model diverges from firmware at {len(mismatches)} frames "
+              f"(first at frame {mismatches[0]}){Colors.ENDC}")
+    else:
+        print(f"{Colors.OKGREEN}✓ Python model matches firmware on every frame{Colors.ENDC}")
+
+    if args.labels:
+        end_ms = timestamps[-1] if timestamps else 0
+        spans = occupancy_from_transitions(result.transitions, end_ms)
+        print_summary(summarize([score_night(spans, load_labels(args.labels, origin))]))
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (OSError, RuntimeError, ValueError, KeyError) as e:
+        print(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+        sys.exit(1)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Flight Recorder Decoder
+
+Decodes the on-device flight recorder (the `flight_recorder:` option of the
+bed_presence_engine binary sensor) from its "FR1" dump lines and writes the
+frames as a replayable trace.
+
+The device emits a dump when the `dump_flight_recorder` service is called (or
+automatically after every transition with `auto_dump: true`). The dump is
+written to the ESPHome log and, if configured, to the flight recorder text
+sensor:
+
+    FR1 begin frames=<n> capacity=<c> t_last_ms=<millis> frozen=<0|1> missed=<k>
+    FR1 0000 <hex: 16 frames x 6 bytes>
+    ...
+    FR1 end
+
+Any text containing these lines works as input: `esphome logs` output, a copy
+of the Home Assistant log, or an export of the text sensor history. Log
+prefixes and colour codes around the lines are ignored.
+
+Frame layout (little-endian, see flight_recorder.h):
+    u16 dt_ms, u8 energy %, u8 distance / 4 cm, i8 z * 2, u8 flags
+    flags: bits 0-1 state, 0x04 held frame, 0x08 outside distance window
+
+Usage:
+    esphome logs esphome/bed-presence-detector.yaml | tee device.log
+    python3 flight_recorder.py device.log
+    python3 flight_recorder.py device.log --trace lead_up.csv.gz --frames frames.csv
+    python3 flight_recorder.py device.log --dump 0      # first dump in the file
+
+    The trace can be replayed with engine_replay.py / night_scoring.py. Energies
+    are whole percentages and distances are quantized to 4 cm.
+"""
+
+import argparse
+import csv
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, NamedTuple
+
+from presence_trace import TraceFrame, write_trace
+
+RECORD_SIZE = 6
+FLAG_HELD = 0x04
+FLAG_GATED = 0x08
+STATE_NAMES = ('IDLE', 'DEBOUNCING_ON', 'PRESENT', 'DEBOUNCING_OFF')
+
+_LINE_RE = re.compile(r'FR1 (begin(?: \w+=\d+)*|\d{4} [0-9a-f]+|end)')
+
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+class RecordedFrame(NamedTuple):
+    """One decoded flight recorder frame; t_ms is device millis()."""
+    t_ms: int
+    still_energy: float
+    still_distance: float
+    z: float
+    state: int
+    held: bool
+    gated: bool
+
+    @property
+    def occupied(self) -> bool:
+        return STATE_NAMES[self.state] in ('PRESENT', 'DEBOUNCING_OFF')
+
+
+@dataclass
+class Dump:
+    """One FR1 dump as it appeared in the input."""
+    header: Dict[str, int]
+    chunks: Dict[int, str] = field(default_factory=dict)
+    complete: bool = False
+
+
+def parse_dumps(lines: Iterable[str]) -> List[Dump]:
+    """Collect the FR1 dumps in `lines`, in order of appearance."""
+    dumps: List[Dump] = []
+    current = None
+    for line in lines:
+        match = _LINE_RE.search(line)
+        if not match:
+            continue
+        body = match.group(1)
+        if body.startswith('begin'):
+            header = dict((key, int(value)) for key, value in re.findall(r'(\w+)=(\d+)', body))
+            current = Dump(header)
+            dumps.append(current)
+        elif current is None:
+            continue  # Tail of a dump whose header is not in the input
+        elif body == 'end':
+            current.complete = True
+            current = None
+        else:
+            seq, data = body.split(' ', 1)
+            current.chunks[int(seq)] = data
+    return dumps
+
+
+def decode_dump(dump: Dump) -> List[RecordedFrame]:
+    """
+    Decode a complete dump into frames with absolute device times.
+
+    Raises:
+        ValueError: if the dump is incomplete or chunks are missing
+    """
+    if not dump.complete:
+        raise ValueError("dump has no 'FR1 end' line (truncated log?)")
+    missing = [seq for seq in range(len(dump.chunks)) if seq not in dump.chunks]
+    if missing:
+        raise ValueError(f"dump is missing chunk(s) {missing}")
+
+    data = bytes.fromhex(''.join(dump.chunks[seq] for seq in range(len(dump.chunks))))
+    expected = dump.header.get('frames', len(data) // RECORD_SIZE)
+    if len(data) != expected * RECORD_SIZE:
+        raise ValueError(f"dump holds {len(data)} bytes, expected {expected} frames of {RECORD_SIZE} bytes")
+    return decode_records(data, dump.header.get('t_last_ms', 0))
+
+
+def decode_records(data: bytes, t_last_ms: int) -> List[RecordedFrame]:
+    """Unpack packed records (oldest first); times are rebuilt back from the newest frame."""
+    count = len(data) // RECORD_SIZE
+    deltas = [data[i * RECORD_SIZE] | (data[i * RECORD_SIZE + 1] << 8) for i in range(count)]
+
+    frames = []
+    t = t_last_ms - sum(deltas[1:])
+    for i in range(count):
+        if i > 0:
+            t += deltas[i]
+        energy, distance, z, flags = data[i * RECORD_SIZE + 2:(i + 1) * RECORD_SIZE]
+        frames.append(RecordedFrame(
+            t_ms=t,
+            still_energy=float('nan') if energy == 255 else float(energy),
+            still_distance=float('nan') if distance == 255 else distance * 4.0,
+            z=(z - 256 if z > 127 else z) / 2.0,
+            state=flags & 0x03,
+            held=bool(flags & FLAG_HELD),
+            gated=bool(flags & FLAG_GATED),
+        ))
+    return frames
+
+
+def to_trace(frames: List[RecordedFrame]) -> List[TraceFrame]:
+    """Trace frames (t_ms from 0) suitable for presence_trace.write_trace."""
+    if not frames:
+        return []
+    t0 = frames[0].t_ms
+    return [TraceFrame(f.t_ms - t0, f.still_energy, float('nan'), f.still_distance) for f in frames]
+
+
+def write_frames_csv(path: str, frames: List[RecordedFrame]) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['t_ms', 'still_energy', 'still_distance', 'z', 'state', 'held', 'gated'])
+        for frame in frames:
+            writer.writerow([frame.t_ms, frame.still_energy, frame.still_distance, frame.z,
+                             STATE_NAMES[frame.state], int(frame.held), int(frame.gated)])
+
+
+def print_summary(dump: Dump, frames: List[RecordedFrame]):
+    header = dump.header
+    print(f"\n{Colors.HEADER}{Colors.BOLD}Flight recorder dump{Colors.ENDC}")
+    print(f"  Frames:       {len(frames)} of {header.get('capacity', '?')} "
+          f"({'frozen after a transition' if header.get('frozen') else 'live buffer'})")
+    if header.get('missed'):
+        print(f"  {Colors.WARNING}Transitions missed while frozen: {header['missed']}{Colors.ENDC}")
+    if not frames:
+        return
+
+    span_s = (frames[-1].t_ms - frames[0].t_ms) / 1000.0
+    print(f"  Device time:  {frames[0].t_ms} → {frames[-1].t_ms} ms ({span_s:.1f} s)")
+    print(f"  Held frames:  {sum(f.held for f in frames)}, outside distance window: {sum(f.gated for f in frames)}")
+    zs = [f.z for f in frames if not f.gated]
+    if zs:
+        print(f"  z range:      {min(zs):.1f} … {max(zs):.1f}")
+
+    print(f"\n{Colors.OKBLUE}Transitions:{Colors.ENDC}")
+    previous = frames[0]
+    for frame in frames[1:]:
+        if frame.occupied != previous.occupied:
+            arrow = f"{Colors.OKGREEN}ON {Colors.ENDC}" if frame.occupied else f"{Colors.OKCYAN}OFF{Colors.ENDC}"
+            offset = (frame.t_ms - frames[-1].t_ms) / 1000.0
+            print(f"  {arrow} at {frame.t_ms} ms ({offset:+.1f} s from end), energy={frame.still_energy:.0f}%, "
+                  f"z={frame.z:.1f}")
+        previous = frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode an on-device flight recorder dump')
+    parser.add_argument('input', help="log or text file containing 'FR1' dump lines ('-' for stdin)")
+    parser.add_argument('--dump', type=int, default=-1,
+                        help='which dump to decode when the input holds several (default: -1, the last)')
+    parser.add_argument('--trace', help='write the frames as a presence_trace file (.csv or .csv.gz)')
+    parser.add_argument('--frames', help='write decoded frames with z-score, state and flags to a CSV file')
+    args = parser.parse_args()
+
+    if args.input == '-':
+        dumps = parse_dumps(sys.stdin)
+    else:
+        with open(args.input, errors='replace') as f:
+            dumps = parse_dumps(f)
+
+    if not dumps:
+        print(f"{Colors.FAIL}❌ No 'FR1 begin' line found in {args.input}{Colors.ENDC}")
+        sys.exit(1)
+
+    dump = dumps[args.dump]
+    frames = decode_dump(dump)
+    print(f"{Colors.OKCYAN}Found {len(dumps)} dump(s); decoding #{dumps.index(dump)}{Colors.ENDC}")
+    print_summary(dump, frames)
+
+    if args.trace:
+        count = write_trace(args.trace, to_trace(frames))
+        print(f"\n{Colors.OKGREEN}💾 Trace ({count} frames) saved to: {args.trace}{Colors.ENDC}")
+    if args.frames:
+        write_frames_csv(args.frames, frames)
+        print(f"{Colors.OKGREEN}💾 Frames saved to: {args.frames}{Colors.ENDC}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}⚠️  Interrupted{Colors.ENDC}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n{Colors.FAIL}❌ Error: {e}{Colors.ENDC}")
+        sys.exit(1)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Frame Stream Decoder
+
+Decodes the batched full-rate frame stream (the `frame_stream:` option of the
+bed_presence_engine binary sensor) from its "FS1" lines and writes the frames
+as a replayable trace.
+
+The device packs every processed radar frame and sends one line per batch to
+the ESPHome log and, if configured, to the `batches` text sensor:
+
+    FS1 <seq> <t_first_ms> <hex: up to 12 frames x 9 bytes>
+
+Any text containing these lines works as input: `esphome logs` output, a copy
+of the Home Assistant log, an export of the text sensor history, or several
+of them concatenated (oldest first). A batch seen both in the log and in the
+text sensor is counted once. Log prefixes and colour codes around the lines
+are ignored.
+
+seq counts batches since boot (mod 65536), so a gap in seq is a lost batch
+and a seq that starts over (or device time that goes backwards) is a reboot.
+Each run of batches between reboots is decoded as a separate capture.
+
+Frame layout (little-endian, see frame_stream.h):
+    u16 dt_ms, u8 still energy %, u8 moving energy %, u16 distance cm, i16 z * 100, u8 flags
+    flags: bits 0-1 state, 0x04 held frame, 0x08 outside distance window
+
+Usage:
+    esphome logs esphome/bed-presence-detector.yaml | tee night.log
+    python3 frame_stream.py night.log
+    python3 frame_stream.py night.log --trace night.csv.gz --frames frames.csv
+    python3 frame_stream.py night.log --capture 0      # first capture in the file
+
+    The trace can be replayed with engine_replay.py / night_scoring.py. Held
+    frames (the engine repeating the last reading) are left out of the trace,
+    since the replayed engine holds frames itself.
+"""
+
+import argparse
+import csv
+import re
+import struct
+import sys
+from typing import Iterable, List, NamedTuple
+
+from presence_trace import TraceFrame, write_trace
+
+RECORD_SIZE = 9
+FLAG_HELD = 0x04
+FLAG_GATED = 0x08
+STATE_NAMES = ('IDLE', 'DEBOUNCING_ON', 'PRESENT', 'DEBOUNCING_OFF')
+SEQ_MODULO = 1 << 16
+
+_LINE_RE = re.compile(r'FS1 (\d{5}) (\d+) ((?:[0-9a-f]{18})+)\b')
+_RECORD = struct.Struct('<HBBHhB')
+
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+class StreamedFrame(NamedTuple):
+    """One decoded frame stream frame; t_ms is device millis()."""
+    t_ms: int
+    still_energy: float
+    moving_energy: float
+    still_distance: float
+    z: float
+    state: int
+    held: bool
+    gated: bool
+
+    @property
+    def occupied(self) -> bool:
+        return STATE_NAMES[self.state] in ('PRESENT', 'DEBOUNCING_OFF')
+
+
+class Batch(NamedTuple):
+    """One FS1 line."""
+    seq: int
+    t_first_ms: int
+    data: bytes
+
+
+class Capture(NamedTuple):
+    """Consecutive batches from one boot of the device."""
+    batches: List[Batch]
+    lost_batches: int
+
+
+def parse_batches(lines: Iterable[str]) -> List[Batch]:
+    """Collect the FS1 batches in `lines`, in order of appearance, dropping repeats of the same batch."""
+    batches: List[Batch] = []
+    seen = set()
+    for line in lines:
+        match = _LINE_RE.search(line)
+        if not match:
+            continue
+        batch = Batch(int(match.group(1)), int(match.group(2)), bytes.fromhex(match.group(3)))
+        key = (batch.seq, batch.t_first_ms)
+        if key in seen:
+            continue  # The same batch from the log and the text sensor
+        seen.add(key)
+        batches.append(batch)
+    return batches
+
+
+def split_captures(batches: List[Batch]) -> List[Capture]:
+    """Group batches by boot: a new capture starts when device time goes backwards or seq restarts at 0."""
+    captures: List[Capture] = []
+    current: List[Batch] = []
+    lost = 0
+    for batch in batches:
+        if current:
+            previous = current[-1]
+            rebooted = batch.t_first_ms < previous.t_first_ms or (batch.seq == 0 and previous.seq != SEQ_MODULO - 1)
+            if rebooted:
+                captures.append(Capture(current, lost))
+                current, lost = [], 0
+            else:
+                lost += (batch.seq - previous.seq - 1) % SEQ_MODULO
+        current.append(batch)
+    if current:
+        captures.append(Capture(current, lost))
+    return captures
+
+
+def decode_batch(batch: Batch) -> List[StreamedFrame]:
+    """Unpack one batch; times are rebuilt forward from the batch's first frame."""
+    if len(batch.data) % RECORD_SIZE:
+        raise ValueError(f"batch {batch.seq} holds {len(batch.data)} bytes, not a multiple of {RECORD_SIZE}")
+    frames = []
+    t = batch.t_first_ms
+    for offset in range(0, len(batch.data), RECORD_SIZE):
+        dt, still, moving, distance, z, flags = _RECORD.unpack_from(batch.data, offset)
+        if offset > 0:
+            t += dt
+        frames.append(StreamedFrame(
+            t_ms=t,
+            still_energy=float('nan') if still == 255 else float(still),
+            moving_energy=float('nan') if moving == 255 else float(moving),
+            still_distance=float('nan') if distance == 0xFFFF else float(distance),
+            z=z / 100.0,
+            state=flags & 0x03,
+            held=bool(flags & FLAG_HELD),
+            gated=bool(flags & FLAG_GATED),
+        ))
+    return frames
+
+
+def decode_capture(capture: Capture) -> List[StreamedFrame]:
+    frames: List[StreamedFrame] = []
+    for batch in capture.batches:
+        frames.extend(decode_batch(batch))
+    return frames
+
+
+def to_trace(frames: List[StreamedFrame], include_held: bool = False) -> List[TraceFrame]:
+    """Trace frames (t_ms from 0) suitable for presence_trace.write_trace."""
+    kept = [f for f in frames if include_held or not f.held]
+    if not kept:
+        return []
+    t0 = kept[0].t_ms
+    return [TraceFrame(f.t_ms - t0, f.still_energy, f.moving_energy, f.still_distance) for f in kept]
+
+
+def write_frames_csv(path: str, frames: List[StreamedFrame]) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['t_ms', 'still_energy', 'moving_energy', 'still_distance', 'z', 'state', 'held', 'gated'])
+        for frame in frames:
+            writer.writerow([frame.t_ms, frame.still_energy, frame.moving_energy, frame.still_distance, frame.z,
+                             STATE_NAMES[frame.state], int(frame.held), int(frame.gated)])
+
+
+def print_summary(capture: Capture, frames: List[StreamedFrame]):
+    print(f"\n{Colors.HEADER}{Colors.BOLD}Frame stream capture{Colors.ENDC}")
+    print(f"  Batches:      {len(capture.batches)} (seq {capture.batches[0].seq} → {capture.batches[-1].seq})")
+    if capture.lost_batches:
+        print(f"  {Colors.WARNING}Lost batches: {capture.lost_batches}{Colors.ENDC}")
+    if not frames:
+        return
+
+    span_s = (frames[-1].t_ms - frames[0].t_ms) / 1000.0
+    live = len(frames) - sum(f.held for f in frames)
+    rate = live / span_s if span_s > 0 else 0.0
+    print(f"  Device time:  {frames[0].t_ms} → {frames[-1].t_ms} ms ({span_s:.1f} s)")
+    print(f"  Frames:       {len(frames)} ({live} radar frames, {rate:.1f} Hz), "
+          f"outside distance window: {sum(f.gated for f in frames)}")
+
+    print(f"\n{Colors.OKBLUE}Transitions:{Colors.ENDC}")
+    previous = frames[0]
+    for frame in frames[1:]:
+        if frame.occupied != previous.occupied:
+            arrow = f"{Colors.OKGREEN}ON {Colors.ENDC}" if frame.occupied else f"{Colors.OKCYAN}OFF{Colors.ENDC}"
+            print(f"  {arrow} at {frame.t_ms} ms, energy={frame.still_energy:.0f}%, z={frame.z:.2f}")
+        previous = frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decode the batched full-rate frame stream')
+    parser.add_argument('input', help="log or text file containing 'FS1' lines ('-' for stdin)")
+    parser.add_argument('--capture', type=int, default=-1,
+                        help='which capture (boot) to decode when the input spans reboots (default: -1, the last)')
+    parser.add_argument('--trace', help='write the frames as a presence_trace file (.csv or .csv.gz)')
+    parser.add_argument('--frames', help='write decoded frames with z-score, state and flags to a CSV file')
+    args = parser.parse_args()
+
+    if args.input == '-':
+        batches = parse_batches(sys.stdin)
+    else:
+        with open(args.input, errors='replace') as f:
+            batches = parse_batches(f)
+
+    if not batches:
+        print(f"{Colors.FAIL}❌ No 'FS1' line found in {args.input}{Colors.ENDC}")
+        sys.exit(1)
+
+    captures = split_captures(batches)
+    capture = captures[args.capture]
+    frames = decode_capture(capture)
+    print(f"{Colors.OKCYAN}Found {len(batches)} batch(es) in {len(captures)} capture(s); "
+          f"decoding #{captures.index(capture)}{Colors.ENDC}")
+    print_summary(capture, frames)
+
+    if args.trace:
+        count = write_trace(args.trace, to_trace(frames))
+        print(f"\n{Colors.OKGREEN}💾 Trace ({count} frames) saved to: {args.trace}{Colors.ENDC}")
+    if args.frames:
+        write_frames_csv(args.frames, frames)
+        print(f"{Colors.OKGREEN}💾 Frames saved to: {args.frames}{Colors.ENDC}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}⚠️  Interrupted{Colors.ENDC}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n{Colors.FAIL}❌ Error: {e}{Colors.ENDC}")
+        sys.exit(1)
@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+End-to-End Detection Latency Profiler
+
+Timestamps every stage between a person lying down (or getting up) and a Home
+Assistant consumer seeing the bed occupancy change, so it is clear whether the
+engine's debounce, the device → HA hop or HA's event delivery dominates:
+
+    onset       ground truth: the person actually got in / out of bed
+    qualifying  first LD2410 frame of the run that satisfied the transition
+                condition (z >= k_on for ON, z < k_off for OFF)
+    debounce    frame where the engine started the debounce that succeeded
+    transition  engine publish_state() on the device
+    ha_event    Home Assistant `state_changed` (event time_fired)
+    received    consumer callback (an automation stand-in)
+
+Stage latencies reported (per direction, as distributions):
+    signal    onset → qualifying      (simulated runs with labels only)
+    hold      qualifying → debounce   (absolute clear delay on OFF)
+    debounce  debounce → transition
+    api       transition → ha_event
+    delivery  ha_event → received
+    total     onset (or qualifying) → received
+
+Simulated mode runs a synthetic night through the production engine (native
+host build, or the Python model) on a virtual device clock, then pushes each
+transition through a local Home Assistant stand-in to a subscribed
+`HomeAssistantClient` in real time. The device → HA hop can be modeled with
+`--api-delay-ms/--api-jitter-ms`.
+
+Live mode subscribes to a real Home Assistant instance. The device clock is
+not visible there, so frames are timed by their still-energy `state_changed`
+events: `frame→ha` covers hold + debounce + API, and the configured debounce is
+subtracted to leave the residual (sampling + API). Delivery assumes the
+profiling host's clock is synchronized with HA (run it on the HA host, or pass
+`--clock-offset-ms`).
+
+Usage:
+    python3 latency_profiler.py simulate [--nights 3] [--seed 1] [--api-delay-ms 40]
+    python3 latency_profiler.py live [--duration 3600]
+    python3 latency_profiler.py ... [--json report.json]
+
+Environment Variables (live mode):
+    HA_URL: Home Assistant URL (default: http://localhost:8123)
+    HA_TOKEN: Long-lived access token (required)
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(SCRIPT_DIR, '..', 'tests', 'e2e'))
+
+from engine_replay import (DEBOUNCING_OFF, DEBOUNCING_ON, EngineParams, NativeEngine,  # noqa: E402
+                           PythonEngine, native_available)
+from night_scoring import IntervalIndex, ScoringConfig  # noqa: E402
+from synth_trace import SceneConfig, SyntheticTrace, firmware_baseline  # noqa: E402
+
+PRESENCE_ENTITY = "binary_sensor.bed_presence_detector_bed_occupied"
+ENERGY_ENTITY = "sensor.bed_presence_detector_ld2410_still_energy"
+K_ON_ENTITY = "number.bed_presence_detector_k_on_on_threshold_multiplier"
+K_OFF_ENTITY = "number.bed_presence_detector_k_off_off_threshold_multiplier"
+ON_DEBOUNCE_ENTITY = "number.bed_presence_detector_on_debounce_timer_ms"
+OFF_DEBOUNCE_ENTITY = "number.bed_presence_detector_off_debounce_timer_ms"
+
+STAGES = ('signal', 'hold', 'debounce', 'api', 'delivery', 'total')
+LIVE_STAGES = ('frame_to_ha', 'residual', 'delivery', 'total')
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+@dataclass
+class TransitionTiming:
+    """Stage latencies (ms) for one occupancy change; None when not observable."""
+    occupied: bool
+    device_ms: Optional[int] = None   # transition time on the device clock (simulated)
+    signal: Optional[float] = None
+    hold: Optional[float] = None
+    debounce: Optional[float] = None
+    api: Optional[float] = None
+    delivery: Optional[float] = None
+    total: Optional[float] = None
+    frame_to_ha: Optional[float] = None
+    residual: Optional[float] = None
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of already-sorted values (q in 0..100)."""
+    if not sorted_values:
+        return math.nan
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """count/min/mean/p50/p90/p95/max summary of latencies in ms."""
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'min': ordered[0],
+        'mean': sum(ordered) / len(ordered),
+        'p50': percentile(ordered, 50),
+        'p90': percentile(ordered, 90),
+        'p95': percentile(ordered, 95),
+        'max': ordered[-1],
+    }
+
+
+def summarize(timings: List[TransitionTiming], stages: Tuple[str, ...]) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Per-direction, per-stage distributions."""
+    report = {}
+    for label, occupied in (('on', True), ('off', False)):
+        rows = [t for t in timings if t.occupied == occupied]
+        report[label] = {
+            stage: distribution([getattr(t, stage) for t in rows if getattr(t, stage) is not None])
+            for stage in stages
+        }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, Dict[str, float]]], stages: Tuple[str, ...]) -> None:
+    for label in ('on', 'off'):
+        print(f"\n{Colors.BOLD}{'Occupied (ON)' if label == 'on' else 'Vacant (OFF)'}{Colors.ENDC}")
+        print(f"  {'stage':<12} {'n':>5} {'p50 ms':>10} {'p90 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+        totals = report[label].get('total', {})
+        for stage in stages:
+            d = report[label][stage]
+            if not d.get('count'):
+                print(f"  {stage:<12} {0:>5} {'-':>10} {'-':>10} {'-':>10} {'-':>10}")
+                continue
+            share = ''
+            if stage != 'total' and totals.get('count'):
+                share = f"  ({d['p50'] / totals['p50']:.0%} of median total)" if totals['p50'] > 0 else ''
+            print(f"  {stage:<12} {d['count']:>5} {d['p50']:>10.1f} {d['p90']:>10.1f} {d['p95']:>10.1f} "
+                  f"{d['max']:>10.1f}{share}")
+
+
+def parse_ha_time(value: str) -> float:
+    """HA ISO-8601 timestamp → epoch seconds."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+class StreakTracker:
+    """Start time of the current unbroken run of frames satisfying each transition condition."""
+
+    def __init__(self, mu: float, sigma: float, k_on: float, k_off: float):
+        self.mu, self.sigma, self.k_on, self.k_off = mu, sigma, k_on, k_off
+        self.high_since: Optional[float] = None
+        self.low_since: Optional[float] = None
+
+    def update(self, t: float, energy: float) -> None:
+        z = (energy - self.mu) / self.sigma if self.sigma > 0 else 0.0
+        if z >= self.k_on:
+            self.high_since = t if self.high_since is None else self.high_since
+        else:
+            self.high_since = None
+        if z < self.k_off:
+            self.low_since = t if self.low_since is None else self.low_since
+        else:
+            self.low_since = None
+
+    def qualifying(self, occupied: bool) -> Optional[float]:
+        return self.high_since if occupied else self.low_since
+
+
+# ---------------------------------------------------------------------------
+# Simulated device + HA stand-in
+# ---------------------------------------------------------------------------
+
+async def profile_simulated(nights: int, seed: int, params: EngineParams, api_delay_ms: float,
+                            api_jitter_ms: float, use_native: bool) -> List[TransitionTiming]:
+    """
+    Run synthetic nights through the engine and a local HA round trip.
+
+    Returns:
+        One TransitionTiming per engine transition
+    """
+    from ha_standin import HomeAssistantStandIn
+    from hass_ws import HomeAssistantClient
+
+    mu, sigma = params.mu_still, params.sigma_still
+    trace = SyntheticTrace(nights, SceneConfig(empty_mu=mu, empty_sigma=sigma), seed=seed)
+    occupied_index = IntervalIndex((l.start_ms, l.end_ms) for l in trace.labels if l.occupied)
+    rng = random.Random(seed)
+
+    standin = HomeAssistantStandIn(token='profiler')
+    url = await standin.start()
+    client = HomeAssistantClient(url, 'profiler')
+    await client.connect()
+
+    received: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event):
+        if event['data']['entity_id'] == PRESENCE_ENTITY:
+            received.put_nowait((time.time(), event))
+
+    await client.subscribe_events(on_event)
+    await standin.async_set_state(PRESENCE_ENTITY, 'off')
+    await received.get()
+
+    engine = NativeEngine(params) if use_native else PythonEngine(params)
+    feed = engine.feed if use_native else engine.process
+    streaks = StreakTracker(mu, sigma, params.k_on, params.k_off)
+    timings: List[TransitionTiming] = []
+    output = False
+    prev_state = engine.state
+    debounce_start = 0
+
+    try:
+        for frame in trace:
+            t = frame.t_ms
+            streaks.update(t, frame.still_energy)
+            new_output = feed(t, frame.still_energy, frame.still_distance)
+            state = engine.state
+            if state != prev_state and state in (DEBOUNCING_ON, DEBOUNCING_OFF):
+                debounce_start = t
+            prev_state = state
+            if new_output == output:
+                continue
+            output = new_output
+
+            timing = TransitionTiming(occupied=output, device_ms=t)
+            qualifying = streaks.qualifying(output)
+            if qualifying is None or qualifying > debounce_start:
+                qualifying = debounce_start
+            timing.hold = float(debounce_start - qualifying)
+            timing.debounce = float(t - debounce_start)
+            onset = _label_onset(occupied_index, t, output)
+            if onset is not None and onset <= qualifying:
+                timing.signal = float(qualifying - onset)
+
+            published = time.time()
+            if api_delay_ms > 0 or api_jitter_ms > 0:
+                await asyncio.sleep(max(0.0, rng.gauss(api_delay_ms, api_jitter_ms)) / 1000.0)
+            await standin.async_set_state(PRESENCE_ENTITY, 'on' if output else 'off')
+            receipt, event = await asyncio.wait_for(received.get(), timeout=10)
+            fired = parse_ha_time(event['time_fired'])
+
+            timing.api = (fired - published) * 1000.0
+            timing.delivery = (receipt - fired) * 1000.0
+            start = onset if timing.signal is not None else qualifying
+            timing.total = (t - start) + timing.api + timing.delivery
+            timings.append(timing)
+    finally:
+        if use_native:
+            engine.close()
+        await client.disconnect()
+        await standin.stop()
+
+    return timings
+
+
+def _label_onset(index: IntervalIndex, t: int, occupied: bool,
+                 windows: ScoringConfig = ScoringConfig()) -> Optional[int]:
+    """
+    Ground-truth change this transition responds to, or None.
+
+    Transitions further from the latest label boundary than the scoring
+    grace windows (re-detections mid-sleep, late phantom clears) have no onset.
+    """
+    if occupied:
+        i = index.covering(t)
+        if i < 0 or t - index.starts[i] > windows.detect_window_ms:
+            return None
+        return index.starts[i]
+    if index.covering(t) >= 0:
+        return None
+    ends = index.ends_between(-1, t + 1)
+    if not len(ends) or t - index.ends[ends[-1]] > windows.clear_window_ms:
+        return None
+    return index.ends[ends[-1]]
+
+
+# ---------------------------------------------------------------------------
+# Live Home Assistant
+# ---------------------------------------------------------------------------
+
+def get_ha_config() -> Tuple[str, str]:
+    """Get Home Assistant URL and token from environment or .env.local file."""
+    ha_url = os.getenv('HA_URL')
+    ha_token = os.getenv('HA_TOKEN')
+
+    if not ha_url or not ha_token:
+        env_file = os.path.join(SCRIPT_DIR, '..', '.env.local')
+        if os.path.exists(env_file):
+            with open(env_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if line.startswith('HA_URL=') and not ha_url:
+                        ha_url = line.split('=', 1)[1].strip()
+                    elif line.startswith('HA_TOKEN=') and not ha_token:
+                        ha_token = line.split('=', 1)[1].strip()
+
+    if not ha_url:
+        ha_url = 'http://localhost:8123'
+    if not ha_token:
+        print(f"{Colors.FAIL}ERROR: HA_TOKEN not found in environment or .env.local{Colors.ENDC}")
+        sys.exit(1)
+    return ha_url, ha_token
+
+
+async def _number(client, entity_id: str, default: float) -> float:
+    state = await client.get_state(entity_id)
+    try:
+        return float(state['state']) if state else default
+    except (TypeError, ValueError):
+        return default
+
+
+async def profile_live(duration_s: float, mu: float, sigma: float,
+                       clock_offset_ms: float) -> Tuple[List[TransitionTiming], Dict[str, float]]:
+    """
+    Watch a live Home Assistant instance for `duration_s` seconds.
+
+    Returns:
+        (per-transition timings, delivery distribution of still-energy frames)
+    """
+    from hass_ws import HomeAssistantClient
+
+    ha_url, ha_token = get_ha_config()
+    client = HomeAssistantClient(ha_url, ha_token)
+    await client.connect()
+
+    k_on = await _number(client, K_ON_ENTITY, 9.0)
+    k_off = await _number(client, K_OFF_ENTITY, 4.0)
+    debounce_ms = {True: await _number(client, ON_DEBOUNCE_ENTITY, 3000.0),
+                   False: await _number(client, OFF_DEBOUNCE_ENTITY, 5000.0)}
+    print(f"Thresholds: k_on={k_on}, k_off={k_off}, μ={mu}, σ={sigma}; debounce "
+          f"{debounce_ms[True]:.0f}/{debounce_ms[False]:.0f} ms")
+
+    streaks = StreakTracker(mu, sigma, k_on, k_off)
+    timings: List[TransitionTiming] = []
+    frame_delivery: List[float] = []
+
+    def on_event(event):
+        receipt = time.time() + clock_offset_ms / 1000.0
+        data = event.get('data', {})
+        entity_id = data.get('entity_id')
+        new_state = data.get('new_state') or {}
+        if entity_id not in (ENERGY_ENTITY, PRESENCE_ENTITY):
+            return
+        fired = parse_ha_time(event['time_fired'])
+        delivery = (receipt - fired) * 1000.0
+
+        if entity_id == ENERGY_ENTITY:
+            try:
+                streaks.update(fired, float(new_state.get('state')))
+            except (TypeError, ValueError):
+                return
+            frame_delivery.append(delivery)
+            return
+
+        old = (data.get('old_state') or {}).get('state')
+        if new_state.get('state') not in ('on', 'off') or old == new_state.get('state'):
+            return
+        occupied = new_state['state'] == 'on'
+        timing = TransitionTiming(occupied=occupied, delivery=delivery)
+        qualifying = streaks.qualifying(occupied)
+        if qualifying is not None:
+            timing.frame_to_ha = (fired - qualifying) * 1000.0
+            timing.residual = timing.frame_to_ha - debounce_ms[occupied]
+            timing.total = timing.frame_to_ha + delivery
+        timings.append(timing)
+        print(f"  {datetime.now().strftime('%H:%M:%S')} {'ON ' if occupied else 'OFF'} "
+              f"frame→HA {timing.frame_to_ha or math.nan:8.0f} ms, delivery {delivery:6.1f} ms")
+
+    subscription = await client.subscribe_events(on_event)
+    try:
+        await asyncio.sleep(duration_s)
+    except asyncio.CancelledError:
+        pass  # Ctrl+C: report what was collected so far
+    finally:
+        await client.unsubscribe_events(subscription)
+        await client.disconnect()
+
+    return timings, distribution(frame_delivery)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile detection latency from radar frame to HA consumer')
+    sub = parser.add_subparsers(dest='mode', required=True)
+
+    sim = sub.add_parser('simulate', help='Synthetic device + local HA stand-in')
+    sim.add_argument('--nights', type=int, default=3, help='Synthetic nights to run (default: 3)')
+    sim.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+    sim.add_argument('--api-delay-ms', type=float, default=0.0, help='Modeled device → HA delay (mean)')
+    sim.add_argument('--api-jitter-ms', type=float, default=0.0, help='Modeled device → HA delay (std dev)')
+    sim.add_argument('--python', action='store_true', help='Use the Python engine model instead of the host build')
+    defaults = EngineParams()
+    for name in ('k_on', 'k_off'):
+        sim.add_argument(f"--{name.replace('_', '-')}", type=float, default=getattr(defaults, name))
+    for name in ('on_debounce_ms', 'off_debounce_ms', 'abs_clear_delay_ms'):
+        sim.add_argument(f"--{name.replace('_', '-')}", type=int, default=getattr(defaults, name))
+
+    live = sub.add_parser('live', help='Watch a real Home Assistant instance')
+    live.add_argument('--duration', type=float, default=3600, help='Seconds to watch (default: 3600)')
+    live.add_argument('--clock-offset-ms', type=float, default=0.0,
+                      help='Add to local receipt times to align with the HA clock')
+
+    for p in (sim, live):
+        p.add_argument('--json', help='Write the report to this file')
+
+    args = parser.parse_args()
+    mu, sigma = firmware_baseline()
+
+    try:
+        extra = {}
+        if args.mode == 'simulate':
+            params = EngineParams(mu_still=mu, sigma_still=sigma, k_on=args.k_on, k_off=args.k_off,
+                                  on_debounce_ms=args.on_debounce_ms, off_debounce_ms=args.off_debounce_ms,
+                                  abs_clear_delay_ms=args.abs_clear_delay_ms)
+            use_native = not args.python and native_available()
+            print(f"{Colors.HEADER}{Colors.BOLD}Simulated latency profile{Colors.ENDC}: {args.nights} night(s), "
+                  f"{'native engine' if use_native else 'Python engine model'}, "
+                  f"API delay {args.api_delay_ms:.0f}±{args.api_jitter_ms:.0f} ms")
+            timings = asyncio.run(profile_simulated(args.nights, args.seed, params, args.api_delay_ms,
+                                                    args.api_jitter_ms, use_native))
+            stages = STAGES
+        else:
+            print(f"{Colors.HEADER}{Colors.BOLD}Live latency profile{Colors.ENDC}: watching for "
+                  f"{args.duration:.0f} s (Ctrl+C to stop early)")
+            timings, frame_delivery = asyncio.run(profile_live(args.duration, mu, sigma, args.clock_offset_ms))
+            extra['energy_frame_delivery'] = frame_delivery
+            stages = LIVE_STAGES
+
+        report = summarize(timings, stages)
+        print_report(report, stages)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({'mode': args.mode, 'stages': report, **extra,
+                           'transitions': [asdict(t) for t in timings]}, f, indent=2)
+            print(f"\n{Colors.OKGREEN}✅ Report written to {args.json}{Colors.ENDC}")
+
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Interrupted{Colors.ENDC}")
+        sys.exit(130)
+    except Exception as e:
+        print(f"\n{Colors.FAIL}❌ Error: {e}{Colors.ENDC}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,9 @@ Real-Time Presence Detection Monitor
 
 This script monitors the bed presence sensor in real-time, displaying:
 - LD2410 still energy readings
-- Calculated z-score
+- Calculated z-score, using the baseline (μ/σ) the device reports through its
+  telemetry sensors (compiled defaults if those are not enabled)
+- The device's own windowed z-score summary (mean/p95/max), when available
 - Current presence state
 - Threshold values
 
@@ -90,6 +92,37 @@ def get_entity_state(ha_url: str, ha_token: str, entity_id: str) -> Optional[Dic
         return None
 
 
+# Compiled defaults in bed_presence.h, used when the device does not report its baseline
+DEFAULT_MU = 6.7
+DEFAULT_SIGMA = 3.5
+
+# Engine telemetry sensors (esphome/packages/presence_engine.yaml)
+BASELINE_MU = "sensor.bed_presence_detector_presence_baseline_mu"
+BASELINE_SIGMA = "sensor.bed_presence_detector_presence_baseline_sigma"
+WINDOW_Z_MEAN = "sensor.bed_presence_detector_presence_window_z_mean"
+WINDOW_Z_P95 = "sensor.bed_presence_detector_presence_window_z_p95"
+WINDOW_Z_MAX = "sensor.bed_presence_detector_presence_window_z_max"
+
+
+def parse_float(entity_state: Optional[Dict]) -> Optional[float]:
+    """Numeric value of an entity state, or None if missing/unknown/unavailable."""
+    if not entity_state:
+        return None
+    try:
+        return float(entity_state['state'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def get_baseline(ha_url: str, ha_token: str) -> tuple[float, float, str]:
+    """Return (μ, σ, source), preferring the baseline the device reports."""
+    mu = parse_float(get_entity_state(ha_url, ha_token, BASELINE_MU))
+    sigma = parse_float(get_entity_state(ha_url, ha_token, BASELINE_SIGMA))
+    if mu is None or sigma is None:
+        return DEFAULT_MU, DEFAULT_SIGMA, "compiled defaults"
+    return mu, sigma, "device"
+
+
 def calculate_z_score(energy: float, mu: float, sigma: float) -> float:
     """Calculate z-score: (energy - μ) / σ"""
     if sigma <= 0.001:
@@ -136,11 +169,14 @@ def print_header():
     print(f"{Colors.ENDC}")
 
 
-def print_baseline_info(mu: float, sigma: float):
+def print_baseline_info(mu: float, sigma: float, source: str):
     """Print baseline calibration info."""
-    print(f"{Colors.OKBLUE}Baseline Calibration:{Colors.ENDC}")
+    print(f"{Colors.OKBLUE}Baseline Calibration ({source}):{Colors.ENDC}")
     print(f"  Mean (μ):              {mu:.2f}%")
     print(f"  Std Dev (σ):           {sigma:.2f}%")
+    if source != "device":
+        print(f"  {Colors.WARNING}Enable the engine's baseline_mu/baseline_sigma telemetry sensors "
+              f"to track the device's calibration{Colors.ENDC}")
     print()
 
 
@@ -154,17 +190,26 @@ def print_thresholds(k_on: float, k_off: float):
 
 
 def print_sensor_data(still_energy: float, z_score: float, state: str,
-                      k_on: float, k_off: float, reason: str):
-    """Print current sensor readings."""
+                      k_on: float, k_off: float, reason: str,
+                      mu: float, sigma: float, window: Optional[tuple[float, float, float]]) -> int:
+    """Print current sensor readings and return the number of lines printed."""
     timestamp = datetime.now().strftime("%H:%M:%S")
 
     print(f"{Colors.BOLD}Current Readings ({timestamp}):{Colors.ENDC}")
     print(f"  Still Energy:          {still_energy:.1f}%")
     print(f"  Z-Score:               {format_z_score(z_score, k_on, k_off)} (k_on={k_on:.1f}, k_off={k_off:.1f})")
+    print(f"  Baseline:              μ={mu:.2f}%, σ={sigma:.2f}%")
     print(f"  Presence State:        {format_state(state)}")
+    lines = 6
+    if window:
+        z_mean, z_p95, z_max = window
+        print(f"  Window z (device):     mean={z_mean:.2f}, p95={z_p95:.2f}, max={z_max:.2f}")
+        lines += 1
     if reason:
         print(f"  State Reason:          {reason}")
+        lines += 1
     print()
+    return lines
 
 
 def print_legend():
@@ -180,10 +225,6 @@ def print_legend():
 
 def monitor_loop(ha_url: str, ha_token: str):
     """Main monitoring loop."""
-    # Hardcoded baseline from calibration
-    MU = 6.3
-    SIGMA = 2.6
-
     # Entity IDs
     STILL_ENERGY = "sensor.bed_presence_detector_ld2410_still_energy"
     BED_OCCUPIED = "binary_sensor.bed_presence_detector_bed_occupied"
@@ -192,7 +233,8 @@ def monitor_loop(ha_url: str, ha_token: str):
     STATE_REASON = "sensor.bed_presence_detector_presence_state_reason"
 
     print_header()
-    print_baseline_info(MU, SIGMA)
+    mu, sigma, source = get_baseline(ha_url, ha_token)
+    print_baseline_info(mu, sigma, source)
 
     # Get initial threshold values
     k_on_state = get_entity_state(ha_url, ha_token, K_ON)
@@ -236,8 +278,16 @@ def monitor_loop(ha_url: str, ha_token: str):
             k_off_val = float(k_off_state['state']) if k_off_state else last_thresholds[1]
             reason = reason_state['state'] if reason_state else ""
 
+            # Follow recalibrations on the device
+            if source == "device":
+                mu, sigma, source = get_baseline(ha_url, ha_token)
+            window = tuple(parse_float(get_entity_state(ha_url, ha_token, entity))
+                           for entity in (WINDOW_Z_MEAN, WINDOW_Z_P95, WINDOW_Z_MAX))
+            if None in window:
+                window = None
+
             # Calculate z-score
-            z_score = calculate_z_score(energy, MU, SIGMA)
+            z_score = calculate_z_score(energy, mu, sigma)
 
             # Check if thresholds changed
             current_thresholds = (k_on_val, k_off_val)
@@ -251,13 +301,13 @@ def monitor_loop(ha_url: str, ha_token: str):
                 last_thresholds = current_thresholds
 
             # Print sensor data
-            print_sensor_data(energy, z_score, state, k_on_val, k_off_val, reason)
+            lines = print_sensor_data(energy, z_score, state, k_on_val, k_off_val, reason, mu, sigma, window)
 
             # Wait before next update
             time.sleep(1)
 
             # Move cursor up to overwrite previous reading
-            print(f"\033[{7 if reason else 6}A", end='')
+            print(f"\033[{lines}A", end='')
 
         except KeyboardInterrupt:
             print(f"\n\n{Colors.OKGREEN}Monitoring stopped by user{Colors.ENDC}")
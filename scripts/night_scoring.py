@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Ground-Truth Scoring for Replayed Nights
+
+`monitor_phase2.py` can tell you how often the engine changed state, but not
+whether each change was right. This module scores engine output against
+hand-labeled in-bed / out-of-bed intervals and reports the numbers we tune for:
+
+- time-to-detect-on:  label says "in bed" → engine reports PRESENT
+- time-to-clear:      label says "out of bed" → engine reports VACANT
+- false clears:       engine reports VACANT while the sleeper is still in bed
+- phantom occupancy:  engine reports PRESENT while the bed is empty
+
+Both the labels and the engine output are reduced to sorted interval lists and
+queried with binary search, so scoring cost depends on the number of state
+changes rather than the number of radar frames. Scoring a night with a few
+dozen transitions takes microseconds, which keeps parameter sweeps over
+hundreds of nights practical.
+
+Label file format (CSV, one span per row, header required):
+    start_ms,end_ms,occupied
+    0,1800000,0
+    1800000,27000000,1
+    27000000,28800000,0
+
+`start_ms`/`end_ms` are offsets from the start of the session. Wall-clock
+timestamps (`2025-11-08 23:14:05`) are also accepted and are converted relative
+to the first row of the session CSV. Time not covered by any label is ignored.
+
+Usage:
+    python3 night_scoring.py --session night.csv --labels night_labels.csv [--json]
+
+    `--session` takes a CSV written by `monitor_phase2.py --csv`.
+"""
+
+import argparse
+import bisect
+import csv
+import json
+import statistics
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S")
+
+
+@dataclass(frozen=True)
+class LabeledInterval:
+    """Ground-truth span: the bed was (or was not) occupied in [start_ms, end_ms)."""
+    start_ms: int
+    end_ms: int
+    occupied: bool
+
+
+@dataclass(frozen=True)
+class ScoringConfig:
+    """Grace windows used when matching engine output to labels."""
+    detect_window_ms: int = 120_000   # Entry not detected within 2 min counts as missed
+    clear_window_ms: int = 300_000    # Exit not cleared within 5 min counts as missed
+
+
+@dataclass
+class NightScore:
+    """Accuracy metrics for one labeled night."""
+    labeled_occupied_ms: int = 0
+    labeled_vacant_ms: int = 0
+    entries: int = 0
+    missed_entries: int = 0
+    detect_latencies_ms: List[int] = field(default_factory=list)
+    exits: int = 0
+    missed_exits: int = 0
+    clear_latencies_ms: List[int] = field(default_factory=list)
+    false_clears: int = 0
+    false_clear_ms: int = 0
+    phantom_episodes: int = 0
+    phantom_ms: int = 0
+
+
+class IntervalIndex:
+    """
+    Sorted, non-overlapping [start, end) intervals with O(log n) lookups.
+
+    Used for the engine's occupied spans; the complement (vacant spans) is
+    answered from the same arrays.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]]):
+        ordered = sorted((s, e) for s, e in intervals if e > s)
+        self.starts: List[int] = [s for s, _ in ordered]
+        self.ends: List[int] = [e for _, e in ordered]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def covering(self, t: int) -> int:
+        """Index of the interval containing t, or -1."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.ends[i]:
+            return i
+        return -1
+
+    def first_inside_from(self, t: int) -> Optional[int]:
+        """Earliest time >= t that lies inside an interval."""
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.ends[i]:
+            return t
+        i += 1
+        return self.starts[i] if i < len(self.starts) else None
+
+    def first_outside_from(self, t: int) -> int:
+        """Earliest time >= t that lies outside every interval."""
+        i = self.covering(t)
+        return t if i < 0 else self.ends[i]
+
+    def starts_between(self, lo: int, hi: int) -> range:
+        """Indices of intervals whose start lies in (lo, hi)."""
+        return range(bisect.bisect_right(self.starts, lo), bisect.bisect_left(self.starts, hi))
+
+    def ends_between(self, lo: int, hi: int) -> range:
+        """Indices of intervals whose end lies in (lo, hi)."""
+        return range(bisect.bisect_right(self.ends, lo), bisect.bisect_left(self.ends, hi))
+
+
+def occupancy_from_transitions(transitions: Sequence[Tuple[int, bool]], end_ms: int,
+                               initial: bool = False) -> List[Tuple[int, int]]:
+    """
+    Convert engine state changes into occupied [start, end) spans.
+
+    Args:
+        transitions: (t_ms, occupied) pairs in time order, e.g. from a replay
+        end_ms: end of the session; an open occupied span is closed here
+        initial: engine output before the first transition
+
+    Returns:
+        List of occupied spans
+    """
+    spans = []
+    on_since = 0 if initial else None
+    for t, occupied in transitions:
+        if occupied and on_since is None:
+            on_since = t
+        elif not occupied and on_since is not None:
+            spans.append((on_since, t))
+            on_since = None
+    if on_since is not None and end_ms > on_since:
+        spans.append((on_since, end_ms))
+    return spans
+
+
+def occupancy_from_frames(timestamps_ms: Sequence[int], states: Sequence[bool]) -> List[Tuple[int, int]]:
+    """Run-length encode per-frame engine output into occupied spans."""
+    transitions = []
+    previous = False
+    for t, state in zip(timestamps_ms, states):
+        state = bool(state)
+        if state != previous:
+            transitions.append((t, state))
+            previous = state
+    end_ms = timestamps_ms[-1] if len(timestamps_ms) else 0
+    return occupancy_from_transitions(transitions, end_ms)
+
+
+def score_night(predicted: Sequence[Tuple[int, int]], labels: Sequence[LabeledInterval],
+                config: ScoringConfig = ScoringConfig()) -> NightScore:
+    """
+    Score engine output for one night against ground-truth labels.
+
+    Args:
+        predicted: occupied spans reported by the engine
+        labels: labeled spans, any order; gaps between labels are not scored
+        config: grace windows for matching entries/exits
+
+    Returns:
+        NightScore with latencies, misses, false clears and phantom occupancy
+    """
+    index = predicted if isinstance(predicted, IntervalIndex) else IntervalIndex(predicted)
+    ordered = sorted(labels, key=lambda label: label.start_ms)
+    score = NightScore()
+
+    for n, label in enumerate(ordered):
+        start, end = label.start_ms, label.end_ms
+        if end <= start:
+            continue
+        previous = ordered[n - 1] if n > 0 and ordered[n - 1].end_ms == start else None
+
+        if label.occupied:
+            score.labeled_occupied_ms += end - start
+            detected_at = start
+            if previous is not None and not previous.occupied:
+                # Entry: first moment the engine shows PRESENT after the sleeper lies down
+                score.entries += 1
+                deadline = min(end, start + config.detect_window_ms)
+                first_on = index.first_inside_from(start)
+                if first_on is None or first_on >= deadline:
+                    score.missed_entries += 1
+                    detected_at = deadline if first_on is None else min(first_on, end)
+                else:
+                    detected_at = first_on
+                    score.detect_latencies_ms.append(first_on - start)
+
+            # False clears: occupied spans ending while the sleeper is still in bed
+            for i in index.ends_between(detected_at, end):
+                score.false_clears += 1
+                next_on = index.first_inside_from(index.ends[i])
+                back_at = end if next_on is None else min(next_on, end)
+                score.false_clear_ms += back_at - index.ends[i]
+        else:
+            score.labeled_vacant_ms += end - start
+            cleared_at = start
+            if previous is not None and previous.occupied:
+                # Exit: first moment the engine shows VACANT after the sleeper gets up
+                score.exits += 1
+                first_off = index.first_outside_from(start)
+                if first_off - start > config.clear_window_ms or first_off >= end:
+                    score.missed_exits += 1
+                else:
+                    score.clear_latencies_ms.append(first_off - start)
+                cleared_at = min(first_off, end)
+            else:
+                # A span already in progress at the label start (an unlabeled gap or the night's first label
+                # before it, or the previous vacant label, which counted the episode) is clipped to the label
+                i = index.covering(start)
+                if i >= 0 and index.starts[i] < start:
+                    if previous is None:
+                        score.phantom_episodes += 1
+                    score.phantom_ms += min(index.ends[i], end) - start
+
+            # Phantom occupancy: occupied spans starting while the bed is empty
+            for i in index.starts_between(cleared_at - 1, end):
+                score.phantom_episodes += 1
+                score.phantom_ms += min(index.ends[i], end) - index.starts[i]
+
+    return score
+
+
+def _percentile(values: Sequence[int], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    lo = int(rank)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+def summarize(scores: Iterable[NightScore]) -> Dict[str, Optional[float]]:
+    """
+    Aggregate per-night scores into a flat dict suitable for ranking parameter sets.
+
+    Latencies are reported as median/p95 in seconds; counts are totals; phantom
+    and false-clear time are reported as a fraction of the labeled time.
+    """
+    detect: List[int] = []
+    clear: List[int] = []
+    totals = NightScore()
+    nights = 0
+    for s in scores:
+        nights += 1
+        detect.extend(s.detect_latencies_ms)
+        clear.extend(s.clear_latencies_ms)
+        for name in ("labeled_occupied_ms", "labeled_vacant_ms", "entries", "missed_entries", "exits",
+                     "missed_exits", "false_clears", "false_clear_ms", "phantom_episodes", "phantom_ms"):
+            setattr(totals, name, getattr(totals, name) + getattr(s, name))
+
+    def seconds(value: Optional[float]) -> Optional[float]:
+        return None if value is None else value / 1000.0
+
+    return {
+        "nights": nights,
+        "entries": totals.entries,
+        "missed_entries": totals.missed_entries,
+        "detect_median_s": seconds(statistics.median(detect)) if detect else None,
+        "detect_p95_s": seconds(_percentile(detect, 95)),
+        "exits": totals.exits,
+        "missed_exits": totals.missed_exits,
+        "clear_median_s": seconds(statistics.median(clear)) if clear else None,
+        "clear_p95_s": seconds(_percentile(clear, 95)),
+        "false_clears": totals.false_clears,
+        "false_clear_fraction": (totals.false_clear_ms / totals.labeled_occupied_ms
+                                 if totals.labeled_occupied_ms else None),
+        "phantom_episodes": totals.phantom_episodes,
+        "phantom_fraction": (totals.phantom_ms / totals.labeled_vacant_ms
+                             if totals.labeled_vacant_ms else None),
+    }
+
+
+def _parse_time(value: str, origin: Optional[datetime]) -> int:
+    """Parse a label boundary as a millisecond offset or a wall-clock timestamp."""
+    value = value.strip()
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    if origin is None:
+        raise ValueError(f"Wall-clock label '{value}' needs a session origin")
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return int((datetime.strptime(value, fmt) - origin).total_seconds() * 1000)
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized label time: {value}")
+
+
+def load_labels(path: str, origin: Optional[datetime] = None) -> List[LabeledInterval]:
+    """
+    Load labeled intervals from CSV (`start_ms,end_ms,occupied`).
+
+    Args:
+        path: label file
+        origin: session start, required only for wall-clock label times
+
+    Returns:
+        Labels sorted by start time
+    """
+    labels = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            occupied = row['occupied'].strip().lower() in ('1', 'true', 'yes', 'on', 'occupied', 'present')
+            labels.append(LabeledInterval(
+                start_ms=_parse_time(row['start_ms'], origin),
+                end_ms=_parse_time(row['end_ms'], origin),
+                occupied=occupied,
+            ))
+    labels.sort(key=lambda label: label.start_ms)
+    for prev, cur in zip(labels, labels[1:]):
+        if cur.start_ms < prev.end_ms:
+            raise ValueError(f"Overlapping labels at {cur.start_ms}ms")
+    return labels
+
+
+def save_labels(path: str, labels: Iterable[LabeledInterval]) -> None:
+    """Write labeled intervals in the format read by `load_labels`."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['start_ms', 'end_ms', 'occupied'])
+        for label in labels:
+            writer.writerow([label.start_ms, label.end_ms, int(label.occupied)])
+
+
+def load_session(path: str) -> Tuple[datetime, List[int], List[bool]]:
+    """
+    Load a `monitor_phase2.py --csv` session.
+
+    Returns:
+        (origin, timestamps relative to origin in ms, per-row presence)
+    """
+    origin = None
+    timestamps = []
+    states = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            stamp = datetime.strptime(row['timestamp'], TIMESTAMP_FORMATS[0])
+            if origin is None:
+                origin = stamp
+            timestamps.append(int((stamp - origin).total_seconds() * 1000))
+            states.append(row['presence_state'] == 'PRESENT')
+    if origin is None:
+        raise ValueError(f"Session file is empty: {path}")
+    return origin, timestamps, states
+
+
+def print_summary(summary: Dict[str, Optional[float]]):
+    """Display an aggregate score in the same style as the monitoring scripts."""
+
+    def fmt(value: Optional[float], unit: str = "s") -> str:
+        return "n/a" if value is None else f"{value:.1f}{unit}"
+
+    def pct(value: Optional[float]) -> str:
+        return "n/a" if value is None else f"{value * 100:.2f}%"
+
+    print(f"\n{Colors.HEADER}{Colors.BOLD}")
+    print("=" * 80)
+    print("  GROUND-TRUTH SCORE")
+    print("=" * 80)
+    print(f"{Colors.ENDC}")
+    print(f"{Colors.OKBLUE}Detection:{Colors.ENDC}")
+    print(f"  Entries detected:      {summary['entries'] - summary['missed_entries']}/{summary['entries']}")
+    print(f"  Time-to-detect:        median {fmt(summary['detect_median_s'])}, p95 {fmt(summary['detect_p95_s'])}")
+    print(f"\n{Colors.OKBLUE}Clearing:{Colors.ENDC}")
+    print(f"  Exits cleared:         {summary['exits'] - summary['missed_exits']}/{summary['exits']}")
+    print(f"  Time-to-clear:         median {fmt(summary['clear_median_s'])}, p95 {fmt(summary['clear_p95_s'])}")
+    print(f"\n{Colors.OKBLUE}Errors:{Colors.ENDC}")
+    color = Colors.OKGREEN if not summary['false_clears'] else Colors.WARNING
+    print(f"  False clears (asleep): {color}{summary['false_clears']}{Colors.ENDC} "
+          f"({pct(summary['false_clear_fraction'])} of in-bed time)")
+    color = Colors.OKGREEN if not summary['phantom_episodes'] else Colors.WARNING
+    print(f"  Phantom occupancy:     {color}{summary['phantom_episodes']}{Colors.ENDC} "
+          f"({pct(summary['phantom_fraction'])} of empty-bed time)")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score presence engine output against labeled intervals')
+    parser.add_argument('--session', required=True, help='CSV written by monitor_phase2.py --csv')
+    parser.add_argument('--labels', required=True, help='Labeled intervals CSV (start_ms,end_ms,occupied)')
+    parser.add_argument('--detect-window', type=float, default=120.0,
+                        help='Seconds after entry before a detection counts as missed (default: 120)')
+    parser.add_argument('--clear-window', type=float, default=300.0,
+                        help='Seconds after exit before a clear counts as missed (default: 300)')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    origin, timestamps, states = load_session(args.session)
+    labels = load_labels(args.labels, origin)
+    config = ScoringConfig(detect_window_ms=int(args.detect_window * 1000),
+                           clear_window_ms=int(args.clear_window * 1000))
+
+    score = score_night(occupancy_from_frames(timestamps, states), labels, config)
+    summary = summarize([score])
+
+    if args.json:
+        print(json.dumps({"summary": summary, "night": asdict(score)}, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (OSError, ValueError, KeyError) as e:
+        print(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+        sys.exit(1)
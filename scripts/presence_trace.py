@@ -0,0 +1,116 @@
+"""
+Radar Trace File Format
+
+Shared reader/writer for recorded or synthetic LD2410 frame streams used by the
+replay, scoring and benchmarking tools.
+
+A trace is a CSV file with one row per radar frame:
+    t_ms,still_energy,moving_energy,still_distance
+    0,7,3,142
+    100,6,2,139
+
+- `t_ms` is the frame time in milliseconds (integer, non-decreasing)
+- energies are LD2410 percentages (0-100), distance is in cm
+- a channel that was not captured is left empty and reads back as NaN
+
+Files ending in `.gz` are gzip-compressed transparently. Ground-truth labels
+are stored next to the trace in the `night_scoring.py` label format.
+"""
+
+import csv
+import gzip
+import io
+import math
+from array import array
+from dataclasses import dataclass, field
+from typing import IO, Iterable, Iterator, NamedTuple
+
+FIELDS = ('t_ms', 'still_energy', 'moving_energy', 'still_distance')
+
+
+class TraceFrame(NamedTuple):
+    """One LD2410 frame."""
+    t_ms: int
+    still_energy: float
+    moving_energy: float = math.nan
+    still_distance: float = math.nan
+
+
+@dataclass
+class TraceColumns:
+    """Column-oriented trace, ready to pass to `engine_replay.replay`."""
+    t_ms: array = field(default_factory=lambda: array('I'))
+    still_energy: array = field(default_factory=lambda: array('f'))
+    moving_energy: array = field(default_factory=lambda: array('f'))
+    still_distance: array = field(default_factory=lambda: array('f'))
+
+    def __len__(self) -> int:
+        return len(self.t_ms)
+
+    def append(self, frame: TraceFrame) -> None:
+        self.t_ms.append(frame.t_ms)
+        self.still_energy.append(frame.still_energy)
+        self.moving_energy.append(frame.moving_energy)
+        self.still_distance.append(frame.still_distance)
+
+
+def open_trace(path: str, mode: str = 'r') -> IO[str]:
+    """Open a trace for text I/O, gzip-compressed when the name ends in .gz."""
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b', compresslevel=6), newline='')
+    return open(path, mode, newline='')
+
+
+def _fmt(value: float) -> str:
+    if value != value:  # NaN → empty cell
+        return ''
+    if value == int(value):
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def write_trace(path: str, frames: Iterable[TraceFrame]) -> int:
+    """
+    Stream frames to disk without holding them in memory.
+
+    Returns:
+        Number of frames written
+    """
+    count = 0
+    with open_trace(path, 'w') as f:
+        f.write(','.join(FIELDS) + '\n')
+        lines = []
+        for t_ms, still, moving, distance in frames:
+            lines.append(f"{t_ms},{_fmt(still)},{_fmt(moving)},{_fmt(distance)}\n")
+            if len(lines) >= 4096:
+                f.writelines(lines)
+                count += len(lines)
+                lines.clear()
+        f.writelines(lines)
+        count += len(lines)
+    return count
+
+
+def _parse(cell: str) -> float:
+    return float(cell) if cell else math.nan
+
+
+def iter_trace(path: str) -> Iterator[TraceFrame]:
+    """Lazily read frames from a trace file."""
+    with open_trace(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        if tuple(header[:len(FIELDS)]) != FIELDS:
+            raise ValueError(f"{path}: not a trace file (header {header})")
+        for row in reader:
+            yield TraceFrame(int(row[0]), _parse(row[1]), _parse(row[2]), _parse(row[3]))
+
+
+def load_trace(path: str) -> TraceColumns:
+    """Read a whole trace into typed columns."""
+    columns = TraceColumns()
+    for frame in iter_trace(path):
+        columns.append(frame)
+    return columns
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Performance Benchmarks for the Presence Engine Tooling
+
+Measures throughput of the pieces that sit on hot paths during replay,
+calibration and live monitoring, and writes a machine-readable report:
+
+- engine: batch replay and per-frame feeding through the native host build,
+  plus the pure-Python reference model
+- calibration: the firmware MAD calibration (`finalize_calibration`, via the
+  host build) and `collect_baseline.calculate_statistics`
+- trace: writing, loading and scanning a synthetic trace
+- ha_client: `HomeAssistantClient` request round trips and event delivery
+  against the local stand-in server in `tests/e2e/ha_standin.py`
+
+Benchmarks whose prerequisites are missing (host library not built, aiohttp
+not installed) are reported as skipped rather than failing the run.
+
+Usage:
+    make -C esphome/host
+    python3 run_benchmarks.py [--quick] [--output report.json] [--history bench.jsonl]
+    python3 run_benchmarks.py --baseline previous.json --max-regression 0.25
+
+    Every result is a rate (higher is better). The run exits with status 1
+    when a result falls below its floor in `benchmark_thresholds.json`, or
+    drops by more than `--max-regression` relative to `--baseline`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'tests', 'e2e'))
+
+import engine_replay  # noqa: E402
+import presence_trace  # noqa: E402
+from synth_trace import SceneConfig, SyntheticTrace  # noqa: E402
+
+DEFAULT_THRESHOLDS = os.path.join(SCRIPT_DIR, 'benchmark_thresholds.json')
+REPORT_VERSION = 1
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+@dataclass
+class BenchResult:
+    """One measurement; `value` is `unit` per second (higher is better)."""
+    name: str
+    unit: str
+    value: Optional[float]
+    iterations: int = 0
+    repeats: List[float] = field(default_factory=list)
+    skipped: Optional[str] = None
+
+
+def measure(name: str, unit: str, work: Callable[[], int], repeats: int) -> BenchResult:
+    """
+    Run `work` several times and report the median rate.
+
+    Args:
+        name: benchmark id (e.g. 'engine.replay_batch')
+        unit: what `work` counts (frames, samples, requests ...)
+        work: callable returning the number of units it processed
+        repeats: number of timed runs
+
+    Returns:
+        BenchResult with the median of the per-run rates
+    """
+    rates = []
+    units = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        units = work()
+        elapsed = time.perf_counter() - start
+        rates.append(units / elapsed if elapsed > 0 else float('inf'))
+    return BenchResult(name, unit, statistics.median(rates), units, [round(r, 1) for r in rates])
+
+
+def skipped(name: str, unit: str, reason: str) -> BenchResult:
+    return BenchResult(name, unit, None, skipped=reason)
+
+
+# ---------------------------------------------------------------------------
+# Workloads
+# ---------------------------------------------------------------------------
+
+def synthetic_columns(hours: float, seed: int = 1) -> presence_trace.TraceColumns:
+    """Generate an in-memory trace (one night of `hours`) for the engine benchmarks."""
+    trace = SyntheticTrace(1, SceneConfig(night_hours=hours), seed=seed)
+    columns = presence_trace.TraceColumns()
+    for frame in trace:
+        columns.append(frame)
+    return columns
+
+
+def bench_engine(columns: presence_trace.TraceColumns, repeats: int) -> List[BenchResult]:
+    n = len(columns)
+    results = []
+
+    if engine_replay.native_available():
+        def batch() -> int:
+            engine_replay.replay(columns.t_ms, columns.still_energy, columns.still_distance)
+            return n
+
+        def per_frame() -> int:
+            with engine_replay.NativeEngine() as engine:
+                feed = engine.feed
+                for t, e, d in zip(columns.t_ms, columns.still_energy, columns.still_distance):
+                    feed(t, e, d)
+            return n
+
+        results.append(measure('engine.replay_batch', 'frames', batch, repeats))
+        results.append(measure('engine.native_feed', 'frames', per_frame, repeats))
+    else:
+        reason = 'host library not built (make -C esphome/host)'
+        results.append(skipped('engine.replay_batch', 'frames', reason))
+        results.append(skipped('engine.native_feed', 'frames', reason))
+
+    def python_model() -> int:
+        engine_replay.python_replay(columns.t_ms, columns.still_energy, columns.still_distance)
+        return n
+
+    results.append(measure('engine.python_model', 'frames', python_model, repeats))
+    return results
+
+
+def bench_calibration(samples: List[float], repeats: int) -> List[BenchResult]:
+    results = []
+    n = len(samples)
+
+    if engine_replay.native_available():
+        def firmware() -> int:
+            engine_replay.native_calibrate(samples)
+            return n
+        results.append(measure('calibration.finalize_calibration', 'samples', firmware, repeats))
+    else:
+        results.append(skipped('calibration.finalize_calibration', 'samples',
+                               'host library not built (make -C esphome/host)'))
+
+    try:
+        from collect_baseline import calculate_statistics
+    except ImportError as e:
+        results.append(skipped('calibration.calculate_statistics', 'samples', f'import failed: {e}'))
+    else:
+        def collector() -> int:
+            calculate_statistics(samples)
+            return n
+        results.append(measure('calibration.calculate_statistics', 'samples', collector, repeats))
+
+    return results
+
+
+def bench_trace(hours: float, repeats: int) -> List[BenchResult]:
+    trace = SyntheticTrace(1, SceneConfig(night_hours=hours), seed=2)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.csv')
+        results = [measure('trace.write', 'frames', lambda: presence_trace.write_trace(path, trace), repeats)]
+
+        def scan() -> int:
+            count = 0
+            for _ in presence_trace.iter_trace(path):
+                count += 1
+            return count
+
+        results.append(measure('trace.load', 'frames', lambda: len(presence_trace.load_trace(path)), repeats))
+        results.append(measure('trace.scan', 'frames', scan, repeats))
+    return results
+
+
+async def _client_benchmarks(requests_n: int, events_n: int, concurrency: int,
+                             repeats: int) -> List[BenchResult]:
+    from ha_standin import HomeAssistantStandIn
+    from hass_ws import HomeAssistantClient
+
+    standin = HomeAssistantStandIn(token='bench')
+    url = await standin.start()
+    client = HomeAssistantClient(url, 'bench')
+    await client.connect()
+    loop = asyncio.get_running_loop()
+
+    async def timed(work) -> float:
+        start = time.perf_counter()
+        units = await work()
+        return units / (time.perf_counter() - start)
+
+    async def sequential() -> int:
+        for _ in range(requests_n):
+            await client.call_service('esphome', 'bed_presence_detector_reset_to_defaults')
+        return requests_n
+
+    async def concurrent() -> int:
+        per_worker = requests_n // concurrency
+
+        async def worker():
+            for _ in range(per_worker):
+                await client.call_service('esphome', 'bed_presence_detector_reset_to_defaults')
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return per_worker * concurrency
+
+    async def events() -> int:
+        received = 0
+        done = loop.create_future()
+
+        def on_event(_event):
+            nonlocal received
+            received += 1
+            if received == events_n and not done.done():
+                done.set_result(None)
+
+        subscription = await client.subscribe_events(on_event)
+        for i in range(events_n):
+            await standin.async_set_state('sensor.bed_presence_detector_still_energy', str(i % 100))
+        await asyncio.wait_for(done, timeout=30)
+        await client.unsubscribe_events(subscription)
+        return received
+
+    results = []
+    try:
+        for name, unit, work in (
+            ('ha_client.request_sequential', 'requests', sequential),
+            ('ha_client.request_concurrent', 'requests', concurrent),
+            ('ha_client.events', 'events', events),
+        ):
+            rates = [await timed(work) for _ in range(repeats)]
+            iterations = events_n if unit == 'events' else requests_n
+            results.append(BenchResult(name, unit, statistics.median(rates), iterations,
+                                       [round(r, 1) for r in rates]))
+    finally:
+        await client.disconnect()
+        await standin.stop()
+    return results
+
+
+def bench_ha_client(requests_n: int, events_n: int, concurrency: int, repeats: int) -> List[BenchResult]:
+    names = (('ha_client.request_sequential', 'requests'), ('ha_client.request_concurrent', 'requests'),
+             ('ha_client.events', 'events'))
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return [skipped(name, unit, 'aiohttp not installed') for name, unit in names]
+    return asyncio.run(_client_benchmarks(requests_n, events_n, concurrency, repeats))
+
+
+# ---------------------------------------------------------------------------
+# Report + regression checks
+# ---------------------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return out.stdout.strip() or None
+
+
+def build_report(results: List[BenchResult], quick: bool) -> Dict:
+    return {
+        'version': REPORT_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'quick': quick,
+        'host': {
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+        },
+        'results': {r.name: asdict(r) for r in results},
+    }
+
+
+def check_regressions(report: Dict, thresholds: Dict[str, Dict[str, float]],
+                      baseline: Optional[Dict], max_regression: float) -> List[str]:
+    """
+    Compare a report against absolute floors and an optional earlier report.
+
+    Args:
+        report: output of `build_report`
+        thresholds: {name: {"min": rate}} floors (see benchmark_thresholds.json)
+        baseline: earlier report to compare against, or None
+        max_regression: allowed fractional drop versus the baseline (0.25 = 25%)
+
+    Returns:
+        Human-readable failure descriptions (empty when everything passed)
+    """
+    failures = []
+    for name, result in report['results'].items():
+        value = result['value']
+        if value is None:
+            continue
+        floor = thresholds.get(name, {}).get('min')
+        if floor is not None and value < floor:
+            failures.append(f"{name}: {value:,.0f} {result['unit']}/s below floor {floor:,.0f}")
+        if baseline:
+            previous = baseline.get('results', {}).get(name, {}).get('value')
+            if previous and value < previous * (1.0 - max_regression):
+                drop = 1.0 - value / previous
+                failures.append(f"{name}: {value:,.0f} {result['unit']}/s is {drop:.0%} below "
+                                f"baseline {previous:,.0f}")
+    return failures
+
+
+def load_thresholds(path: str) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {name: spec for name, spec in data.items() if not name.startswith('_')}
+
+
+def print_results(results: List[BenchResult]) -> None:
+    print(f"\n{Colors.BOLD}{'Benchmark':<36} {'Rate':>16}  Unit{Colors.ENDC}")
+    print("-" * 64)
+    for r in results:
+        if r.value is None:
+            print(f"{r.name:<36} {Colors.WARNING}{'skipped':>16}{Colors.ENDC}  ({r.skipped})")
+        else:
+            print(f"{r.name:<36} {r.value:>16,.0f}  {r.unit}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run presence engine tooling benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Smaller workloads (CI smoke run)')
+    parser.add_argument('--repeats', type=int, default=None, help='Timed runs per benchmark')
+    parser.add_argument('--only', action='append', choices=['engine', 'calibration', 'trace', 'ha_client'],
+                        help='Run only the given group (repeatable)')
+    parser.add_argument('--output', '-o', help='Write the JSON report to this file')
+    parser.add_argument('--history', help='Append the report as one line to this JSONL file')
+    parser.add_argument('--thresholds', default=DEFAULT_THRESHOLDS, help='Floors file (JSON)')
+    parser.add_argument('--baseline', help='Earlier report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='Allowed fractional drop versus --baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    groups = set(args.only or ['engine', 'calibration', 'trace', 'ha_client'])
+    repeats = args.repeats or (3 if args.quick else 5)
+    hours = 0.5 if args.quick else 4.0
+    calibration_n = 4096  # About 7 minutes of LD2410 frames
+    requests_n = 200 if args.quick else 1000
+    events_n = 500 if args.quick else 5000
+
+    try:
+        results: List[BenchResult] = []
+        print(f"{Colors.HEADER}{Colors.BOLD}Presence engine benchmarks{Colors.ENDC}"
+              f" ({'quick' if args.quick else 'full'}, {repeats} repeats)")
+
+        if 'engine' in groups:
+            columns = synthetic_columns(hours)
+            results += bench_engine(columns, repeats)
+        if 'calibration' in groups:
+            samples = [float(x) for x in synthetic_columns(0.2, seed=3).still_energy[:calibration_n]]
+            results += bench_calibration(samples, repeats)
+        if 'trace' in groups:
+            results += bench_trace(hours, repeats)
+        if 'ha_client' in groups:
+            results += bench_ha_client(requests_n, events_n, concurrency=8, repeats=repeats)
+
+        print_results(results)
+        report = build_report(results, args.quick)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n{Colors.OKGREEN}✅ Report written to {args.output}{Colors.ENDC}")
+        if args.history:
+            with open(args.history, 'a') as f:
+                f.write(json.dumps(report) + '\n')
+
+        baseline = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        failures = check_regressions(report, load_thresholds(args.thresholds), baseline, args.max_regression)
+        if failures:
+            print(f"\n{Colors.FAIL}❌ {len(failures)} benchmark regression(s):{Colors.ENDC}")
+            for failure in failures:
+                print(f"   {failure}")
+            sys.exit(1)
+        print(f"\n{Colors.OKGREEN}✅ No regressions{Colors.ENDC}")
+
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Interrupted{Colors.ENDC}")
+        sys.exit(130)
+    except Exception as e:
+        print(f"\n{Colors.FAIL}❌ Error: {e}{Colors.ENDC}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Synthetic LD2410 Trace Generator
+
+Produces realistic still/moving energy and distance streams with ground-truth
+occupancy labels, for stress-testing replay, tuning and the Home Assistant
+tooling when labeled recordings are scarce.
+
+Each simulated night contains:
+- empty-bed noise drawn from the calibrated baseline in bed_presence.h (μ/σ)
+- an occupant who gets in, sleeps with low, slowly wandering still energy,
+  rolls over now and then, may get up for a bathroom trip, and leaves
+- optional pets visiting the bed (not labeled as occupancy)
+- an optional fan adding periodic moving energy at the far end of the room
+- optional slow baseline drift (HVAC, furniture) over the night
+
+Frames are generated lazily, so weeks of data can be streamed straight to disk
+(or into a consumer) without holding them in memory.
+
+Usage:
+    python3 synth_trace.py --nights 14 --out week.csv.gz [--pets] [--fan] [--drift 3] [--seed 7]
+
+    Writes the trace (presence_trace.py format) and a label file
+    (`<out>_labels.csv`, night_scoring.py format) next to it.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, replace
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from night_scoring import LabeledInterval, save_labels
+from presence_trace import TraceFrame, write_trace
+
+# ANSI color codes
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+
+
+def firmware_baseline() -> Tuple[float, float]:
+    """Read the compiled-in empty-bed baseline (μ, σ) from bed_presence.h."""
+    header_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'esphome', 'custom_components',
+                               'bed_presence_engine', 'bed_presence.h')
+    mu, sigma = 6.7, 3.5
+    try:
+        with open(header_file, 'r') as f:
+            for line in f:
+                if 'float mu_still_{' in line:
+                    mu = float(line.split('{')[1].split('f}')[0])
+                elif 'float sigma_still_{' in line:
+                    sigma = float(line.split('{')[1].split('f}')[0])
+    except (OSError, ValueError):
+        pass
+    return mu, sigma
+
+
+@dataclass(frozen=True)
+class SceneConfig:
+    """Knobs for the simulated bedroom (energies in %, distances in cm)."""
+    frame_interval_ms: int = 100          # LD2410 engineering frames arrive at ~10 Hz
+    frame_jitter_ms: int = 10
+    night_hours: float = 9.0
+    empty_mu: float = 6.7                 # Overridden from bed_presence.h by default
+    empty_sigma: float = 3.5
+    bed_distance_cm: float = 90.0
+    sleep_energy: float = 42.0            # Mean still energy of a settled sleeper
+    sleep_energy_sd: float = 7.0          # Night-to-night and slow within-night wander
+    rollovers_per_hour: float = 2.5
+    bathroom_trip_probability: float = 0.4
+    pets: bool = False
+    pet_visits_per_night: float = 2.0
+    fan: bool = False
+    fan_period_ms: int = 2400
+    drift: float = 0.0                    # Peak empty-bed baseline drift over a night
+
+
+@dataclass(frozen=True)
+class _Event:
+    start_ms: int
+    end_ms: int
+    kind: str
+
+
+@dataclass
+class _NightPlan:
+    start_ms: int
+    end_ms: int
+    labels: List[LabeledInterval]
+    events: List[_Event]
+    sleep_energy: float
+    drift: float
+
+
+class SyntheticTrace:
+    """
+    Lazily generated multi-night trace.
+
+    `labels` is available immediately (the schedule is planned up front, which
+    is cheap); iterating yields `TraceFrame`s one at a time.
+    """
+
+    def __init__(self, nights: int = 1, config: Optional[SceneConfig] = None, seed: Optional[int] = None):
+        if config is None:
+            mu, sigma = firmware_baseline()
+            config = SceneConfig(empty_mu=mu, empty_sigma=sigma)
+        self.config = config
+        self.seed = seed
+        self._plans = [self._plan_night(n, _rng(seed, n, 'plan')) for n in range(nights)]
+
+    @property
+    def labels(self) -> List[LabeledInterval]:
+        return [label for plan in self._plans for label in plan.labels]
+
+    @property
+    def duration_ms(self) -> int:
+        return self._plans[-1].end_ms if self._plans else 0
+
+    def _plan_night(self, n: int, rng: random.Random) -> _NightPlan:
+        cfg = self.config
+        night_ms = int(cfg.night_hours * HOUR_MS)
+        start = n * night_ms
+        end = start + night_ms
+        bedtime = start + min(rng.randint(15, 60) * MINUTE_MS, night_ms // 5)
+        wake = end - min(rng.randint(10, 40) * MINUTE_MS, night_ms // 5)
+
+        in_bed: List[Tuple[int, int]] = [(bedtime, wake)]
+        if rng.random() < cfg.bathroom_trip_probability:
+            leave = bedtime + int((wake - bedtime) * rng.uniform(0.3, 0.8))
+            back = leave + rng.randint(3, 10) * MINUTE_MS
+            in_bed = [(bedtime, leave), (back, wake)]
+
+        labels = []
+        cursor = start
+        events = []
+        for get_in, get_out in in_bed:
+            labels.append(LabeledInterval(cursor, get_in, False))
+            labels.append(LabeledInterval(get_in, get_out, True))
+            cursor = get_out
+            # Climbing in/out of bed produces a burst of motion around the boundary
+            events.append(_Event(get_in - rng.randint(3, 8) * 1000, get_in + rng.randint(5, 20) * 1000, 'settle'))
+            events.append(_Event(get_out - rng.randint(5, 15) * 1000, get_out + rng.randint(2, 6) * 1000, 'settle'))
+            # Rollovers while asleep (Poisson arrivals)
+            t = get_in
+            while True:
+                t += int(rng.expovariate(cfg.rollovers_per_hour / HOUR_MS)) if cfg.rollovers_per_hour > 0 else end
+                if t >= get_out - 60_000:
+                    break
+                events.append(_Event(t, t + rng.randint(2, 8) * 1000, 'rollover'))
+        labels.append(LabeledInterval(cursor, end, False))
+
+        if cfg.pets:
+            for _ in range(_poisson(rng, cfg.pet_visits_per_night)):
+                visit = rng.randint(start, max(start, end - 15 * MINUTE_MS))
+                events.append(_Event(visit, visit + rng.randint(1, 15) * MINUTE_MS, 'pet'))
+
+        events.sort(key=lambda e: e.start_ms)
+        sleep_energy = max(15.0, rng.gauss(cfg.sleep_energy, cfg.sleep_energy_sd))
+        drift = cfg.drift * rng.uniform(-1.0, 1.0)
+        return _NightPlan(start, end, labels, events, sleep_energy, drift)
+
+    def __iter__(self) -> Iterator[TraceFrame]:
+        for n, plan in enumerate(self._plans):
+            yield from self._frames(plan, _rng(self.seed, n, 'frames'))
+
+    def _frames(self, plan: _NightPlan, rng: random.Random) -> Iterator[TraceFrame]:
+        cfg = self.config
+        gauss = rng.gauss
+        uniform = rng.uniform
+        interval = cfg.frame_interval_ms
+        jitter = cfg.frame_jitter_ms
+        night_ms = plan.end_ms - plan.start_ms
+        two_pi_fan = 2.0 * math.pi / cfg.fan_period_ms
+
+        labels = plan.labels
+        events = plan.events
+        label_i = 0
+        event_i = 0
+        active: List[_Event] = []
+        sleeper = plan.sleep_energy
+        target = plan.sleep_energy
+
+        t = plan.start_ms
+        while t < plan.end_ms:
+            while labels[label_i].end_ms <= t:
+                label_i += 1
+            occupied = labels[label_i].occupied
+
+            while event_i < len(events) and events[event_i].start_ms <= t:
+                active.append(events[event_i])
+                event_i += 1
+            if active:
+                active = [e for e in active if e.end_ms > t]
+
+            drift = plan.drift * math.sin(math.pi * (t - plan.start_ms) / night_ms)
+            still = gauss(cfg.empty_mu + drift, cfg.empty_sigma)
+            moving = abs(gauss(2.0, 2.0))
+            distance = uniform(40.0, 500.0)
+
+            if occupied:
+                # Slowly wandering sleep depth (AR(1)) with frame-level noise and breathing
+                if rng.random() < 0.0005:
+                    target = max(15.0, gauss(plan.sleep_energy, cfg.sleep_energy_sd / 2))
+                sleeper += 0.002 * (target - sleeper) + gauss(0.0, 0.15)
+                still = sleeper + gauss(0.0, 3.0) + 2.0 * math.sin(t * 2.0 * math.pi / 4000.0)
+                moving = abs(gauss(4.0, 3.0))
+                distance = gauss(cfg.bed_distance_cm, 6.0)
+
+            for event in active:
+                if event.kind == 'rollover' or event.kind == 'settle':
+                    still += uniform(10.0, 30.0)
+                    moving = max(moving, uniform(40.0, 85.0))
+                    distance = gauss(cfg.bed_distance_cm, 15.0)
+                elif event.kind == 'pet':
+                    still = max(still, gauss(22.0, 6.0))
+                    if rng.random() < 0.1:
+                        moving = max(moving, uniform(20.0, 60.0))
+                    if not occupied:
+                        distance = gauss(cfg.bed_distance_cm + 50.0, 20.0)
+
+            if cfg.fan:
+                moving = max(moving, 8.0 + 6.0 * math.sin(t * two_pi_fan) + gauss(0.0, 1.5))
+                still += 2.0
+
+            yield TraceFrame(t, _clip_energy(still), _clip_energy(moving), float(max(0, round(distance))))
+            t += interval + (rng.randint(-jitter, jitter) if jitter else 0)
+
+
+def _rng(seed: Optional[int], night: int, stream: str) -> random.Random:
+    """Independent, reproducible random stream per night (string seeds are hashed deterministically)."""
+    if seed is None:
+        return random.Random()
+    return random.Random(f"{seed}:{night}:{stream}")
+
+
+def _clip_energy(value: float) -> float:
+    """LD2410 reports integer percentages."""
+    return float(min(100, max(0, round(value))))
+
+
+def _poisson(rng: random.Random, mean: float) -> int:
+    count = 0
+    limit = math.exp(-mean)
+    product = rng.random()
+    while product > limit:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def paced(frames: Iterable[TraceFrame], speed: float = 1.0) -> Iterator[TraceFrame]:
+    """
+    Yield frames in wall-clock time (speed > 1 replays faster than real time).
+
+    Useful for driving live consumers such as the Home Assistant tooling.
+    """
+    start_wall = time.monotonic()
+    start_t = None
+    for frame in frames:
+        if start_t is None:
+            start_t = frame.t_ms
+        due = start_wall + (frame.t_ms - start_t) / 1000.0 / speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic LD2410 traces with ground-truth labels')
+    parser.add_argument('--nights', type=int, default=1, help='Number of nights to simulate (default: 1)')
+    parser.add_argument('--out', required=True, help='Trace file to write (.csv or .csv.gz)')
+    parser.add_argument('--labels', help='Label file (default: <out>_labels.csv)')
+    parser.add_argument('--rate-hz', type=float, default=10.0, help='Frame rate (default: 10)')
+    parser.add_argument('--night-hours', type=float, default=9.0, help='Hours per simulated night (default: 9)')
+    parser.add_argument('--sleep-energy', type=float, default=42.0,
+                        help='Mean still energy of the sleeper in %% (default: 42)')
+    parser.add_argument('--pets', action='store_true', help='Add pet visits')
+    parser.add_argument('--fan', action='store_true', help='Add a running fan')
+    parser.add_argument('--drift', type=float, default=0.0, help='Peak baseline drift per night in %% (default: 0)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible traces')
+    args = parser.parse_args()
+
+    mu, sigma = firmware_baseline()
+    config = replace(SceneConfig(empty_mu=mu, empty_sigma=sigma),
+                     frame_interval_ms=max(1, int(round(1000.0 / args.rate_hz))),
+                     frame_jitter_ms=max(0, int(round(100.0 / args.rate_hz))),
+                     night_hours=args.night_hours, sleep_energy=args.sleep_energy,
+                     pets=args.pets, fan=args.fan, drift=args.drift)
+    trace = SyntheticTrace(args.nights, config, seed=args.seed)
+
+    labels_path = args.labels or _default_labels_path(args.out)
+    print(f"{Colors.OKBLUE}📡 Generating {args.nights} night(s) at {args.rate_hz:g} Hz "
+          f"(empty bed μ={mu:.1f}%, σ={sigma:.1f}%)...{Colors.ENDC}")
+    started = time.perf_counter()
+    count = write_trace(args.out, trace)
+    save_labels(labels_path, trace.labels)
+    elapsed = time.perf_counter() - started
+
+    print(f"{Colors.OKGREEN}✅ Wrote {count:,} frames to {args.out} "
+          f"({count / max(elapsed, 1e-9):,.0f} frames/s){Colors.ENDC}")
+    print(f"{Colors.OKGREEN}🏷️  Labels: {labels_path}{Colors.ENDC}")
+
+
+def _default_labels_path(out: str) -> str:
+    for suffix in ('.csv.gz', '.csv'):
+        if out.endswith(suffix):
+            return out[:-len(suffix)] + '_labels.csv'
+    return out + '_labels.csv'
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}⚠️  Generation interrupted by user{Colors.ENDC}")
+        sys.exit(1)
+    except (OSError, ValueError) as e:
+        print(f"{Colors.FAIL}❌ {e}{Colors.ENDC}")
+        sys.exit(1)
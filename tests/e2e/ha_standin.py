@@ -0,0 +1,202 @@
+"""
+Local Home Assistant WebSocket stand-in.
+
+Speaks the subset of the HA WebSocket protocol that `HomeAssistantClient`
+uses (auth handshake, get_states, get_services, device registry, call_service,
+subscribe/unsubscribe_events) so client code can be exercised and benchmarked
+without a live Home Assistant instance.
+
+    standin = HomeAssistantStandIn(token="test")
+    url = await standin.start()
+    client = HomeAssistantClient(url, "test")
+    ...
+    await standin.async_set_state("binary_sensor.bed_occupied", "on")
+    await standin.stop()
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiohttp import WSMsgType, web
+
+ServiceHook = Callable[[str, str, Dict[str, Any]], Optional[Awaitable[None]]]
+
+
+class HomeAssistantStandIn:
+    """In-process aiohttp server imitating the HA WebSocket API."""
+
+    def __init__(self, token: str = "standin-token", ha_version: str = "2025.1.0") -> None:
+        self.token = token
+        self.ha_version = ha_version
+        self.states: Dict[str, Dict[str, Any]] = {}
+        self.services: Dict[str, Dict[str, Any]] = {}
+        self.devices: List[Dict[str, Any]] = []
+        self.service_calls: List[Tuple[str, str, Dict[str, Any]]] = []
+        self.service_hook: Optional[ServiceHook] = None
+
+        self._runner: Optional[web.AppRunner] = None
+        # (socket, subscription id, event type filter)
+        self._subscriptions: Dict[Tuple[int, int], Tuple[web.WebSocketResponse, Optional[str]]] = {}
+        self._sockets: Set[web.WebSocketResponse] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the WebSocket URL."""
+        app = web.Application()
+        app.router.add_get("/api/websocket", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        return f"ws://{host}:{bound_port}/api/websocket"
+
+    async def stop(self) -> None:
+        for ws in list(self._sockets):
+            with contextlib.suppress(Exception):
+                await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def async_set_state(
+        self,
+        entity_id: str,
+        state: str,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Update an entity and broadcast a `state_changed` event to subscribers."""
+        now = datetime.now(timezone.utc).isoformat()
+        old_state = self.states.get(entity_id)
+        new_state = {
+            "entity_id": entity_id,
+            "state": state,
+            "attributes": dict(attributes or {}),
+            "last_changed": now,
+            "last_updated": now,
+        }
+        if old_state is not None and old_state["state"] == state:
+            new_state["last_changed"] = old_state["last_changed"]
+        self.states[entity_id] = new_state
+
+        await self.fire_event(
+            "state_changed",
+            {"entity_id": entity_id, "old_state": old_state, "new_state": new_state},
+            time_fired=now,
+        )
+        return new_state
+
+    async def fire_event(
+        self,
+        event_type: str,
+        data: Dict[str, Any],
+        *,
+        time_fired: Optional[str] = None,
+    ) -> None:
+        """Deliver an event to every matching subscription."""
+        event = {
+            "event_type": event_type,
+            "data": data,
+            "origin": "LOCAL",
+            "time_fired": time_fired or datetime.now(timezone.utc).isoformat(),
+        }
+        for (_, sub_id), (ws, type_filter) in list(self._subscriptions.items()):
+            if type_filter is not None and type_filter != event_type:
+                continue
+            with contextlib.suppress(ConnectionResetError):
+                await ws.send_json({"id": sub_id, "type": "event", "event": event})
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._sockets.add(ws)
+
+        try:
+            await ws.send_json({"type": "auth_required", "ha_version": self.ha_version})
+            auth = await ws.receive_json()
+            if auth.get("type") != "auth" or auth.get("access_token") != self.token:
+                await ws.send_json({"type": "auth_invalid", "message": "Invalid access token"})
+                return ws
+            await ws.send_json({"type": "auth_ok", "ha_version": self.ha_version})
+
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                command = msg.json()
+                await self._dispatch(ws, command)
+        finally:
+            self._sockets.discard(ws)
+            for key in [k for k, (sock, _) in self._subscriptions.items() if sock is ws]:
+                del self._subscriptions[key]
+
+        return ws
+
+    async def _dispatch(self, ws: web.WebSocketResponse, command: Dict[str, Any]) -> None:
+        msg_id = command.get("id")
+        kind = command.get("type")
+
+        if kind == "get_states":
+            await self._result(ws, msg_id, list(self.states.values()))
+        elif kind == "get_services":
+            await self._result(ws, msg_id, self.services)
+        elif kind == "config/device_registry/list":
+            await self._result(ws, msg_id, self.devices)
+        elif kind == "call_service":
+            domain = command.get("domain", "")
+            service = command.get("service", "")
+            data = command.get("service_data") or {}
+            self.service_calls.append((domain, service, data))
+            if self.service_hook is not None:
+                pending = self.service_hook(domain, service, data)
+                if pending is not None:
+                    await pending
+            await self._result(ws, msg_id, {"context": {"id": f"standin-{msg_id}"}})
+        elif kind == "subscribe_events":
+            self._subscriptions[(id(ws), msg_id)] = (ws, command.get("event_type"))
+            await self._result(ws, msg_id, None)
+        elif kind == "unsubscribe_events":
+            key = (id(ws), command.get("subscription"))
+            if key not in self._subscriptions:
+                await self._error(ws, msg_id, "not_found", "Subscription not found.")
+                return
+            del self._subscriptions[key]
+            await self._result(ws, msg_id, None)
+        else:
+            await self._error(ws, msg_id, "unknown_command", f"Unknown command: {kind}")
+
+    @staticmethod
+    async def _result(ws: web.WebSocketResponse, msg_id: Any, result: Any) -> None:
+        await ws.send_json({"id": msg_id, "type": "result", "success": True, "result": result})
+
+    @staticmethod
+    async def _error(ws: web.WebSocketResponse, msg_id: Any, code: str, message: str) -> None:
+        await ws.send_json({
+            "id": msg_id,
+            "type": "result",
+            "success": False,
+            "error": {"code": code, "message": message},
+        })
+
+
+async def _serve_forever(port: int, token: str) -> None:  # pragma: no cover - manual use
+    standin = HomeAssistantStandIn(token=token)
+    url = await standin.start(port=port)
+    print(f"Home Assistant stand-in listening on {url} (token: {token})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await standin.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover - manual use
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local Home Assistant WebSocket stand-in")
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--token", default="standin-token")
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve_forever(args.port, args.token))
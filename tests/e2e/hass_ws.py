@@ -4,7 +4,8 @@ Lightweight Home Assistant WebSocket client used by the E2E tests.
 The official HA WebSocket API is documented at:
 https://developers.home-assistant.io/docs/api/websocket/#websocket-api
 This helper implements just enough of the protocol for the Phase 3
-integration tests (state queries, service calls, registry access).
+integration tests (state queries, service calls, registry access) and the
+tooling that streams live entity updates (event subscriptions).
 """
 
 from __future__ import annotations
@@ -12,7 +13,7 @@ from __future__ import annotations
 import asyncio
 import contextlib
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
 
 import aiohttp
@@ -29,6 +30,7 @@ class HomeAssistantClient:
         self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
         self._listener_task: Optional[asyncio.Task] = None
         self._pending: Dict[int, asyncio.Future] = {}
+        self._event_handlers: Dict[int, Callable[[Dict[str, Any]], None]] = {}
         self._msg_id = 0
         self._id_lock = asyncio.Lock()
 
@@ -70,6 +72,8 @@ class HomeAssistantClient:
             await self._session.close()
             self._session = None
 
+        self._event_handlers.clear()
+
         # Fail any pending requests
         while self._pending:
             _, fut = self._pending.popitem()
@@ -81,8 +85,20 @@ class HomeAssistantClient:
         payload: Dict[str, Any],
         *,
         timeout: Optional[float] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
     ) -> Any:
         """Send a command and wait for the matching response."""
+        result, _ = await self._send_command_with_id(payload, timeout=timeout, on_event=on_event)
+        return result
+
+    async def _send_command_with_id(
+        self,
+        payload: Dict[str, Any],
+        *,
+        timeout: Optional[float] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> Tuple[Any, int]:
+        """Like `_send_command`, also returning the message id used."""
         if not self._ws:
             raise RuntimeError("Client is not connected")
 
@@ -92,15 +108,24 @@ class HomeAssistantClient:
 
         fut: asyncio.Future = asyncio.get_running_loop().create_future()
         self._pending[msg_id] = fut
+        if on_event is not None:
+            # Register before sending: events can arrive right behind the result
+            self._event_handlers[msg_id] = on_event
 
         message = dict(payload)
         message["id"] = msg_id
-        await self._ws.send_json(message)
+        try:
+            await self._ws.send_json(message)
+            result = await asyncio.wait_for(
+                fut,
+                timeout=timeout or self._request_timeout,
+            )
+        except BaseException:
+            self._pending.pop(msg_id, None)
+            self._event_handlers.pop(msg_id, None)
+            raise
 
-        return await asyncio.wait_for(
-            fut,
-            timeout=timeout or self._request_timeout,
-        )
+        return result, msg_id
 
     async def _listen(self) -> None:
         """Background listener that routes responses back to awaiting callers."""
@@ -111,7 +136,11 @@ class HomeAssistantClient:
                 if msg.type == aiohttp.WSMsgType.TEXT:
                     data = json.loads(msg.data)
                     msg_id = data.get("id")
-                    if msg_id is not None and msg_id in self._pending:
+                    if data.get("type") == "event":
+                        handler = self._event_handlers.get(msg_id)
+                        if handler is not None:
+                            handler(data["event"])
+                    elif msg_id is not None and msg_id in self._pending:
                         fut = self._pending.pop(msg_id)
                         if data.get("type") == "result" and data.get("success", True):
                             fut.set_result(data.get("result"))
@@ -163,6 +192,29 @@ class HomeAssistantClient:
         }
         return await self._send_command(payload)
 
+    async def subscribe_events(
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        event_type: Optional[str] = "state_changed",
+    ) -> int:
+        """
+        Subscribe to bus events; `callback` receives each event dictionary.
+
+        The callback runs on the listener task, so it must not block. Returns
+        the subscription id for `unsubscribe_events`.
+        """
+        payload: Dict[str, Any] = {"type": "subscribe_events"}
+        if event_type is not None:
+            payload["event_type"] = event_type
+
+        _, subscription = await self._send_command_with_id(payload, on_event=callback)
+        return subscription
+
+    async def unsubscribe_events(self, subscription: int) -> None:
+        """Cancel a subscription created by `subscribe_events`."""
+        self._event_handlers.pop(subscription, None)
+        await self._send_command({"type": "unsubscribe_events", "subscription": subscription})
+
     @staticmethod
     def _normalize_url(url: str) -> str:
         """Convert http(s) URLs into ws(s) endpoints if needed."""
@@ -0,0 +1,15 @@
+"""
+Shared setup for the offline tooling tests.
+
+The analysis tools live in `scripts/` as standalone programs rather than an
+installable package, so expose that directory on the import path here
+(along with `tests/e2e/` for the Home Assistant client and its stand-in).
+"""
+
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(TESTS_DIR, "..", "scripts")
+sys.path.insert(0, os.path.abspath(SCRIPTS_DIR))
+sys.path.insert(0, os.path.join(TESTS_DIR, "e2e"))
@@ -0,0 +1,144 @@
+"""Tests for event-driven baseline collection."""
+
+import asyncio
+import math
+import random
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from collect_baseline import (DISTANCE_ENTITY, STILL_ENTITY, BaselineRecorder,  # noqa: E402
+                              ConvergenceCriteria, ConvergenceMonitor, baseline_from_samples,
+                              calculate_statistics, collect_samples, frame_note, service_call)
+from ha_standin import HomeAssistantStandIn  # noqa: E402
+from hass_ws import HomeAssistantClient  # noqa: E402
+
+
+def test_recorder_holds_unchanged_readings():
+    recorder = BaselineRecorder(STILL_ENTITY, frame_interval_ms=1000)
+    recorder.seed(5.0, distance=120.0)
+    recorder.handle(STILL_ENTITY, 7.0, 2500)   # 5 held at 1000 and 2000
+    recorder.handle(DISTANCE_ENTITY, 130.0, 2600)
+    recorder.handle(STILL_ENTITY, 6.0, 2700)   # Faster than the throttle: kept
+    recorder.finish(4000)
+
+    assert list(recorder.frames.t_ms) == [0, 1000, 2000, 2500, 2700, 3700]
+    assert recorder.samples == [5.0, 5.0, 5.0, 7.0, 6.0, 6.0]
+    assert list(recorder.frames.still_distance)[-1] == 130.0
+    assert recorder.events == 2
+
+
+def test_recorder_stops_holding_while_unavailable():
+    recorder = BaselineRecorder(STILL_ENTITY, frame_interval_ms=1000)
+    recorder.seed(5.0)
+    recorder.handle(STILL_ENTITY, math.nan, 1500)
+    recorder.handle(STILL_ENTITY, 8.0, 5000)
+    recorder.finish(5000)
+    assert recorder.samples == [5.0, 5.0, 8.0]
+
+
+def test_collect_samples_from_state_changes():
+    async def scenario():
+        standin = HomeAssistantStandIn(token="t")
+        url = await standin.start()
+        await standin.async_set_state(STILL_ENTITY, "6")
+        client = HomeAssistantClient(url, "t")
+        await client.connect()
+
+        async def device():
+            for value in (7, 5, 9, 6):
+                await asyncio.sleep(0.05)
+                await standin.async_set_state(STILL_ENTITY, str(value))
+
+        try:
+            feeder = asyncio.create_task(device())
+            recorder = await collect_samples(client, STILL_ENTITY, duration=0.4, frame_interval_ms=100,
+                                             progress_interval=0.1)
+            await feeder
+        finally:
+            await client.disconnect()
+            await standin.stop()
+        return recorder
+
+    recorder = asyncio.run(scenario())
+    assert recorder.events == 4
+    assert recorder.samples[0] == 6.0
+    assert {7.0, 5.0, 9.0} <= set(recorder.samples)
+    assert len(recorder.samples) >= 5
+    mean, stdev, _, _ = calculate_statistics(recorder.samples)
+    assert 5.0 <= mean <= 9.0 and stdev > 0
+
+
+def test_quiet_room_converges_on_held_frames():
+    async def scenario():
+        standin = HomeAssistantStandIn(token="t")
+        url = await standin.start()
+        await standin.async_set_state(STILL_ENTITY, "7")  # ...and never changes
+        client = HomeAssistantClient(url, "t")
+        await client.connect()
+        try:
+            return await collect_samples(client, STILL_ENTITY, duration=5.0, frame_interval_ms=20,
+                                         progress_interval=0.1, convergence=ConvergenceMonitor())
+        finally:
+            await client.disconnect()
+            await standin.stop()
+
+    recorder = asyncio.run(scenario())
+    assert recorder.events == 0
+    assert recorder.converged
+    assert recorder.duration_s < 4.0
+    assert set(recorder.samples) == {7.0}
+    assert len(recorder.samples) >= 100  # Checks at 25, 50, 75, 100 frames
+
+
+def test_convergence_checks_every_25_samples():
+    monitor = ConvergenceMonitor(ConvergenceCriteria(min_samples=50, stable_checks=3))
+    samples = [6.0] * 60
+    assert not monitor.check_due(samples)
+    assert monitor.checked == 50  # Two checks; the last 10 samples wait for the next boundary
+    assert monitor.stable_count == 1
+    assert monitor.check_due(samples * 2)  # Checks at 75 and 100
+    assert monitor.checked == 100
+
+
+def _samples_until_converged(sd, seed=5, limit=20000):
+    rng = random.Random(seed)
+    monitor = ConvergenceMonitor()
+    samples = []
+    while len(samples) < limit:
+        samples.extend(rng.gauss(6.0, sd) for _ in range(25))
+        if monitor.check(samples):
+            return len(samples), monitor
+    return None, monitor
+
+
+def test_convergence_monitor_scales_with_noise():
+    quiet, monitor = _samples_until_converged(0.8)
+    noisy, _ = _samples_until_converged(4.0)
+
+    assert quiet is not None and noisy is not None
+    assert quiet <= 200
+    assert noisy > 3 * quiet
+    assert monitor.mu == pytest.approx(6.0, abs=0.3)
+    assert monitor.se_mu <= ConvergenceCriteria().mu_tolerance
+
+
+def test_convergence_monitor_requires_min_samples():
+    monitor = ConvergenceMonitor(ConvergenceCriteria(min_samples=500, stable_checks=1))
+    samples = [6.0] * 100
+    assert not monitor.check(samples)
+    assert not monitor.check(samples)
+    assert monitor.check(samples * 5)
+
+
+def test_results_state_synthesized_frames_and_apply_service():
+    recorder = BaselineRecorder(STILL_ENTITY, frame_interval_ms=500)
+    recorder.seed(5.0)
+    recorder.handle(STILL_ENTITY, 6.0, 1200)
+    assert frame_note(recorder).startswith("synthesized from 1 HA state changes, unchanged readings repeated every 500 ms")
+
+    mu, sigma = baseline_from_samples(7.0, 0.0)
+    assert (mu, sigma) == (7.0, 0.05)  # The firmware's σ floor
+    assert service_call(7.0, 1.4826) == ("action: esphome.bed_presence_detector_apply_baseline\n"
+                                         "data:\n  mu: 7.00\n  sigma: 1.48\n")
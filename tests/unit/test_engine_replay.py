@@ -0,0 +1,132 @@
+"""
+Parity tests between the production engine (native host build) and the
+Python reference model in scripts/engine_replay.py.
+
+The native tests are skipped until the library is built:
+    make -C esphome/host
+"""
+
+import math
+import random
+
+import pytest
+
+from engine_replay import (FUSION_MAX, FUSION_MOVING_ARMS, FUSION_STILL, FUSION_WEIGHTED, PREFILTER_HAMPEL,
+                           PREFILTER_MEDIAN, EngineParams, SlidingPrefilter, check_parity, native_available,
+                           python_replay, replay)
+
+needs_native = pytest.mark.skipif(not native_available(), reason="run `make -C esphome/host` first")
+
+
+def _restless_night(seed: int, frames: int = 20_000):
+    """Random walk between empty-bed noise and occupied energy with jittery frame spacing."""
+    rng = random.Random(seed)
+    timestamps, energies, distances = [], [], []
+    t = 0
+    occupied = False
+    for _ in range(frames):
+        t += rng.choice((80, 100, 100, 120))
+        if rng.random() < 0.002:
+            occupied = not occupied
+        base = rng.gauss(60, 8) if occupied else rng.gauss(6.7, 3.5)
+        energies.append(float(max(0, min(100, round(base)))))
+        distances.append(float(rng.choice((60, 90, 120, 400))))
+        timestamps.append(t)
+    return timestamps, energies, distances
+
+
+def test_python_model_debounces_on_and_off():
+    timestamps = [i * 100 for i in range(1200)]
+    energies = [55.0 if 100 <= i < 700 else 6.0 for i in range(1200)]
+    result = python_replay(timestamps, energies)
+    assert result.transitions == [(13_000, True), (104_900, False)]
+
+
+def test_python_model_moving_energy_arms_earlier():
+    # Moving energy jumps 2s before still energy rises
+    timestamps = [i * 100 for i in range(300)]
+    energies = [55.0 if i >= 120 else 6.0 for i in range(300)]
+    moving = [60.0 if i >= 100 else 2.0 for i in range(300)]
+    params = EngineParams(mu_moving=2.0, sigma_moving=2.0, fusion_mode=FUSION_MOVING_ARMS)
+
+    assert python_replay(timestamps, energies).transitions == [(15_000, True)]
+    assert python_replay(timestamps, energies, None, params, moving_energies=moving).transitions == [(13_000, True)]
+
+
+def test_prefilter_median_and_hampel():
+    median = SlidingPrefilter(PREFILTER_MEDIAN, window=5)
+    # The spike never reaches the output; the step arrives once it holds the window's majority
+    assert [median.filter(x) for x in (5.0, 5.0, 90.0, 5.0, 6.0, 7.0, 40.0, 40.0, 40.0)] == \
+        [5.0, 5.0, 5.0, 5.0, 5.0, 6.0, 7.0, 7.0, 40.0]
+
+    hampel = SlidingPrefilter(PREFILTER_HAMPEL, window=5, threshold=3.0)
+    # Outliers become the median; frames within t·1.4826·MAD of it pass as reported
+    assert [hampel.filter(x) for x in (5.0, 6.0, 90.0, 5.0, 7.0, 6.0, 40.0, 40.0, 40.0)] == \
+        [5.0, 6.0, 6.0, 5.0, 7.0, 6.0, 7.0, 7.0, 40.0]
+
+    # The MAD is floored at one energy unit, so a flat window of whole percents passes a one-unit step
+    flat = SlidingPrefilter(PREFILTER_HAMPEL, window=5, threshold=3.0)
+    assert [flat.filter(x) for x in (7.0, 7.0, 7.0, 7.0, 8.0, 20.0)] == [7.0, 7.0, 7.0, 7.0, 8.0, 7.0]
+
+
+def test_python_model_prefilter_ignores_spikes():
+    # 0.5s bursts every 10s: enough to arm with a short on-debounce, not once filtered
+    timestamps = [i * 100 for i in range(600)]
+    energies = [80.0 if i % 100 >= 95 else 6.0 for i in range(600)]
+    params = EngineParams(on_debounce_ms=300)
+    assert python_replay(timestamps, energies, None, params).transitions
+    filtered = EngineParams(on_debounce_ms=300, prefilter_mode=PREFILTER_MEDIAN, prefilter_window=11)
+    assert python_replay(timestamps, energies, None, filtered).transitions == []
+
+
+@needs_native
+def test_native_replay_reports_transitions():
+    timestamps = [i * 100 for i in range(1200)]
+    energies = [55.0 if 100 <= i < 700 else 6.0 for i in range(1200)]
+    result = replay(timestamps, energies, per_frame=True)
+    assert result.transitions == [(13_000, True), (104_900, False)]
+    assert len(result.states) == 1200
+
+
+@needs_native
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_python_model_matches_firmware(seed):
+    timestamps, energies, distances = _restless_night(seed)
+    params = EngineParams(k_on=7.0, k_off=3.0, abs_clear_delay_ms=10_000, d_max_cm=300.0)
+    assert replay(timestamps, energies, distances, params).transitions, "trace should exercise the state machine"
+    assert check_parity(timestamps, energies, distances, params) == []
+    assert check_parity(timestamps, energies, None, EngineParams()) == []
+
+
+@needs_native
+@pytest.mark.parametrize("mode", [FUSION_STILL, FUSION_MAX, FUSION_WEIGHTED, FUSION_MOVING_ARMS])
+def test_python_fusion_matches_firmware(mode):
+    timestamps, energies, distances = _restless_night(4)
+    rng = random.Random(mode)
+    moving = [float(max(0, min(100, round(e * rng.uniform(0.2, 1.5) + rng.gauss(0, 3))))) for e in energies]
+    moving = [m if rng.random() > 0.1 else math.nan for m in moving]  # Frames without a moving publish
+    params = EngineParams(k_on=7.0, k_off=3.0, abs_clear_delay_ms=10_000, mu_moving=3.0, sigma_moving=2.5,
+                          fusion_mode=mode, fusion_moving_weight=0.3)
+    assert check_parity(timestamps, energies, distances, params, moving_energies=moving) == []
+
+
+@needs_native
+@pytest.mark.parametrize("mode", [PREFILTER_MEDIAN, PREFILTER_HAMPEL])
+def test_python_prefilter_matches_firmware(mode):
+    timestamps, energies, distances = _restless_night(5)
+    rng = random.Random(mode)
+    energies = [100.0 if rng.random() < 0.01 else e for e in energies]  # Single-frame spikes
+    params = EngineParams(k_on=7.0, k_off=3.0, abs_clear_delay_ms=10_000, d_max_cm=300.0, prefilter_mode=mode,
+                          prefilter_window=7, prefilter_threshold=2.5)
+    assert check_parity(timestamps, energies, distances, params) == []
+
+
+@needs_native
+def test_python_model_matches_firmware_at_threshold_ties():
+    # Energies exactly on μ + kσ exercise the firmware's energy-domain comparison
+    params = EngineParams(mu_still=6.5, sigma_still=3.25, k_on=9.0, k_off=4.0, abs_clear_delay_ms=2_000)
+    on, off = 6.5 + 9.0 * 3.25, 6.5 + 4.0 * 3.25
+    rng = random.Random(6)
+    timestamps = [i * 100 for i in range(5_000)]
+    energies = [rng.choice((on, on, off, off, 6.0, 60.0)) for _ in timestamps]
+    assert check_parity(timestamps, energies, None, params) == []
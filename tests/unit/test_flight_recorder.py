@@ -0,0 +1,64 @@
+"""
+Unit tests for the flight recorder dump decoder (scripts/flight_recorder.py).
+"""
+
+import math
+import struct
+
+import pytest
+
+from flight_recorder import decode_dump, parse_dumps, to_trace
+from presence_trace import load_trace, write_trace
+
+
+def pack(dt_ms, energy, distance_steps, z_halves, flags):
+    return struct.pack('<HBBbB', dt_ms, energy, distance_steps, z_halves, flags)
+
+
+def dump_lines(records, t_last_ms, chunk=16):
+    data = b''.join(records)
+    lines = [f"[I][bed_presence_engine:123]: FR1 begin frames={len(records)} capacity=100 "
+             f"t_last_ms={t_last_ms} frozen=1 missed=0"]
+    for seq, start in enumerate(range(0, len(data), chunk * 6)):
+        lines.append(f"[I][bed_presence_engine:123]: FR1 {seq:04d} {data[start:start + chunk * 6].hex()}")
+    lines.append("[I][bed_presence_engine:123]: FR1 end")
+    return lines
+
+
+def test_decodes_frames_and_rebuilds_device_time(tmp_path):
+    records = [pack(0, 10, 25, 2, 0), pack(500, 255, 255, -3, 0x04 | 1), pack(250, 60, 40, 60, 2 | 0x08)]
+    lines = ["unrelated log line"] + dump_lines(records, t_last_ms=10_000)
+
+    dumps = parse_dumps(lines)
+    assert len(dumps) == 1
+    frames = decode_dump(dumps[0])
+
+    assert [f.t_ms for f in frames] == [9_250, 9_750, 10_000]
+    assert frames[0].still_energy == 10.0 and frames[0].still_distance == 100.0 and frames[0].z == 1.0
+    assert math.isnan(frames[1].still_energy) and math.isnan(frames[1].still_distance)
+    assert frames[1].z == -1.5 and frames[1].held and frames[1].state == 1
+    assert frames[2].gated and frames[2].occupied
+
+    path = tmp_path / 'lead_up.csv'
+    write_trace(str(path), to_trace(frames))
+    assert list(load_trace(str(path)).t_ms) == [0, 500, 750]
+
+
+def test_spans_chunks_and_picks_complete_dumps():
+    records = [pack(100, i % 100, 10, 0, 0) for i in range(40)]
+    lines = dump_lines(records[:5], t_last_ms=1_000) + dump_lines(records, t_last_ms=50_000)
+
+    dumps = parse_dumps(lines)
+    assert len(dumps) == 2
+    frames = decode_dump(dumps[-1])
+    assert len(frames) == 40
+    assert frames[-1].t_ms == 50_000 and frames[0].t_ms == 50_000 - 39 * 100
+
+
+def test_rejects_missing_chunks_and_truncated_dumps():
+    lines = dump_lines([pack(100, 1, 1, 0, 0) for _ in range(40)], t_last_ms=5_000)
+
+    with pytest.raises(ValueError, match='missing chunk'):
+        decode_dump(parse_dumps(lines[:2] + lines[3:])[0])
+    with pytest.raises(ValueError, match='FR1 end'):
+        decode_dump(parse_dumps(lines[:-1])[0])
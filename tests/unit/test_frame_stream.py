@@ -0,0 +1,70 @@
+"""
+Unit tests for the batched frame stream decoder (scripts/frame_stream.py).
+"""
+
+import math
+import struct
+
+import pytest
+
+from frame_stream import decode_batch, decode_capture, parse_batches, split_captures, to_trace
+from presence_trace import load_trace, write_trace
+
+
+def pack(dt_ms, still, moving, distance_cm, z_centi, flags):
+    return struct.pack('<HBBHhB', dt_ms, still, moving, distance_cm, z_centi, flags)
+
+
+def batch_line(seq, t_first_ms, records):
+    return f"[I][bed_presence_engine:456]: FS1 {seq:05d} {t_first_ms} {b''.join(records).hex()}"
+
+
+def test_decodes_the_firmware_line_format(tmp_path):
+    # Line produced by FrameStreamTest in esphome/host/test/test_host_engine.cpp
+    line = "FS1 00000 1000 000007ff7800090000640007ff7900090000820007ff9001090008"
+    frames = decode_capture(split_captures(parse_batches([line]))[0])
+
+    assert [f.t_ms for f in frames] == [1000, 1100, 1230]
+    assert [f.still_distance for f in frames] == [120.0, 121.0, 400.0]
+    assert frames[0].still_energy == 7.0 and math.isnan(frames[0].moving_energy)
+    assert frames[0].z == pytest.approx(0.09) and frames[0].state == 0
+    assert frames[2].gated and not frames[2].held
+
+    path = tmp_path / 'night.csv'
+    write_trace(str(path), to_trace(frames))
+    assert list(load_trace(str(path)).t_ms) == [0, 100, 230]
+
+
+def test_held_frames_and_saturated_fields():
+    records = [pack(0, 255, 60, 0xFFFF, -32767, 2), pack(500, 30, 0, 85, 250, 0x04 | 3)]
+    frames = decode_batch(parse_batches([batch_line(7, 40_000, records)])[0])
+
+    assert math.isnan(frames[0].still_energy) and math.isnan(frames[0].still_distance)
+    assert frames[0].z == -327.67 and frames[0].occupied
+    assert frames[1].t_ms == 40_500 and frames[1].held and frames[1].state == 3
+    assert [f.t_ms for f in to_trace(frames)] == [0]
+    assert len(to_trace(frames, include_held=True)) == 2
+
+
+def test_deduplicates_counts_lost_batches_and_splits_reboots():
+    lines = [batch_line(seq, 1_000 * seq, [pack(0, seq, 0, 100, 0, 0)]) for seq in (0, 1, 2, 5)]
+    lines.insert(2, "state changed to: " + lines[1].split(': ', 1)[1])  # Text sensor copy of batch 1
+    lines.append(batch_line(0, 300, [pack(0, 9, 0, 100, 0, 0)]))      # Reboot
+    lines.append(batch_line(1, 1_300, [pack(0, 9, 0, 100, 0, 0)]))
+
+    captures = split_captures(parse_batches(lines))
+    assert [len(c.batches) for c in captures] == [4, 2]
+    assert [c.lost_batches for c in captures] == [2, 0]
+    assert [f.still_energy for f in decode_capture(captures[0])] == [0.0, 1.0, 2.0, 5.0]
+
+
+def test_sequence_wraps_without_splitting():
+    lines = [batch_line(65535, 10_000, [pack(0, 1, 0, 100, 0, 0)]), batch_line(0, 11_000, [pack(0, 1, 0, 100, 0, 0)])]
+    captures = split_captures(parse_batches(lines))
+    assert len(captures) == 1 and captures[0].lost_batches == 0
+
+
+def test_rejects_truncated_records():
+    batch = parse_batches([batch_line(0, 0, [pack(0, 1, 0, 100, 0, 0)])])[0]
+    with pytest.raises(ValueError):
+        decode_batch(batch._replace(data=batch.data[:-1]))
@@ -0,0 +1,72 @@
+"""Tests for the HomeAssistantClient against the local HA stand-in."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest_asyncio = pytest.importorskip("pytest_asyncio")
+
+from ha_standin import HomeAssistantStandIn  # noqa: E402
+from hass_ws import HomeAssistantClient  # noqa: E402
+
+
+@pytest_asyncio.fixture
+async def standin_client():
+    standin = HomeAssistantStandIn(token="test")
+    url = await standin.start()
+    client = HomeAssistantClient(url, "test", request_timeout=5)
+    await client.connect()
+    yield standin, client
+    await client.disconnect()
+    await standin.stop()
+
+
+@pytest.mark.asyncio
+async def test_state_and_service_round_trip(standin_client):
+    standin, client = standin_client
+    await standin.async_set_state("binary_sensor.bed_occupied", "on", {"device_class": "occupancy"})
+
+    state = await client.get_state("binary_sensor.bed_occupied")
+    assert state["state"] == "on"
+    assert await client.get_state("binary_sensor.missing") is None
+
+    await client.call_service("esphome", "bed_presence_detector_calibrate_start_baseline", duration_s=5)
+    assert standin.service_calls == [
+        ("esphome", "bed_presence_detector_calibrate_start_baseline", {"duration_s": 5})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_event_subscription_delivers_in_order(standin_client):
+    standin, client = standin_client
+    received = []
+    subscription = await client.subscribe_events(received.append)
+
+    for value in ("10", "11", "12"):
+        await standin.async_set_state("sensor.still_energy", value)
+    for _ in range(50):
+        if len(received) == 3:
+            break
+        await asyncio.sleep(0.01)
+
+    assert [e["data"]["new_state"]["state"] for e in received] == ["10", "11", "12"]
+    assert received[1]["data"]["old_state"]["state"] == "10"
+
+    await client.unsubscribe_events(subscription)
+    await standin.async_set_state("sensor.still_energy", "13")
+    await asyncio.sleep(0.05)
+    assert len(received) == 3
+
+
+@pytest.mark.asyncio
+async def test_rejected_token():
+    standin = HomeAssistantStandIn(token="right")
+    url = await standin.start()
+    client = HomeAssistantClient(url, "wrong")
+    try:
+        with pytest.raises(RuntimeError, match="Authentication failed"):
+            await client.connect()
+    finally:
+        await client.disconnect()
+        await standin.stop()
@@ -0,0 +1,38 @@
+"""Tests for the detection latency profiler."""
+
+import asyncio
+
+import pytest
+
+from engine_replay import EngineParams, native_available
+from latency_profiler import StreakTracker, distribution, percentile, profile_simulated, summarize
+
+
+def test_percentile_and_distribution():
+    assert percentile([10.0, 20.0, 30.0, 40.0], 50) == 25.0
+    d = distribution([5.0, 1.0, 3.0])
+    assert (d["count"], d["min"], d["p50"], d["max"]) == (3, 1.0, 3.0, 5.0)
+    assert distribution([]) == {"count": 0}
+
+
+def test_streak_tracker_restarts_on_break():
+    streaks = StreakTracker(mu=6.7, sigma=3.5, k_on=9.0, k_off=4.0)
+    for t, energy in ((0, 50), (100, 60), (200, 10), (300, 55), (400, 60)):
+        streaks.update(t, energy)
+    assert streaks.qualifying(True) == 300
+    assert streaks.qualifying(False) is None
+
+
+def test_simulated_run_attributes_debounce():
+    pytest.importorskip("aiohttp")
+    params = EngineParams()
+    timings = asyncio.run(profile_simulated(1, 4, params, api_delay_ms=0, api_jitter_ms=0,
+                                            use_native=native_available()))
+    report = summarize(timings, ("debounce", "api", "delivery", "total"))
+
+    assert report["on"]["debounce"]["count"] > 0
+    assert report["on"]["debounce"]["min"] >= params.on_debounce_ms
+    assert report["off"]["debounce"]["min"] >= params.off_debounce_ms
+    for timing in timings:
+        assert timing.api >= 0 and timing.delivery >= 0
+        assert timing.total >= timing.debounce
@@ -0,0 +1,108 @@
+"""
+Unit tests for the ground-truth scorer (scripts/night_scoring.py).
+
+These run anywhere (no Home Assistant or hardware required):
+    cd tests/unit && pytest
+"""
+
+from night_scoring import (
+    IntervalIndex,
+    LabeledInterval,
+    ScoringConfig,
+    load_labels,
+    occupancy_from_frames,
+    occupancy_from_transitions,
+    save_labels,
+    score_night,
+    summarize,
+)
+
+MIN = 60_000
+
+# Empty for 30 min, asleep for 7 h, up for 30 min
+NIGHT = [
+    LabeledInterval(0, 30 * MIN, False),
+    LabeledInterval(30 * MIN, 450 * MIN, True),
+    LabeledInterval(450 * MIN, 480 * MIN, False),
+]
+
+
+def test_interval_index_lookups():
+    index = IntervalIndex([(10, 20), (30, 40)])
+    assert index.covering(15) == 0
+    assert index.covering(25) == -1
+    assert index.first_inside_from(21) == 30
+    assert index.first_inside_from(41) is None
+    assert index.first_outside_from(35) == 40
+    assert list(index.starts_between(0, 30)) == [0]
+
+
+def test_transitions_and_frames_agree():
+    frames_t = [0, 1000, 2000, 3000, 4000, 5000]
+    frames_s = [False, True, True, False, True, True]
+    assert occupancy_from_frames(frames_t, frames_s) == [(1000, 3000), (4000, 5000)]
+    assert occupancy_from_transitions([(1000, True), (3000, False), (4000, True)], 5000) == [
+        (1000, 3000),
+        (4000, 5000),
+    ]
+
+
+def test_perfect_night_reports_latencies():
+    predicted = [(30 * MIN + 3_000, 450 * MIN + 35_000)]
+    score = score_night(predicted, NIGHT)
+
+    assert score.entries == 1 and score.missed_entries == 0
+    assert score.detect_latencies_ms == [3_000]
+    assert score.exits == 1 and score.missed_exits == 0
+    assert score.clear_latencies_ms == [35_000]
+    assert score.false_clears == 0
+    assert score.phantom_episodes == 0
+
+
+def test_false_clear_during_sleep_is_counted():
+    predicted = [(30 * MIN + 3_000, 200 * MIN), (200 * MIN + 90_000, 450 * MIN + 35_000)]
+    score = score_night(predicted, NIGHT)
+
+    assert score.false_clears == 1
+    assert score.false_clear_ms == 90_000
+
+
+def test_phantom_occupancy_and_missed_exit():
+    predicted = [(10 * MIN, 11 * MIN), (30 * MIN + 3_000, 480 * MIN)]
+    score = score_night(predicted, NIGHT, ScoringConfig(clear_window_ms=5 * MIN))
+
+    assert score.phantom_episodes == 1
+    assert score.phantom_ms == MIN
+    assert score.missed_exits == 1
+
+
+def test_phantom_span_in_progress_at_label_start_is_clipped():
+    # Labels start at 10 min; the engine has shown PRESENT since 5 min
+    labels = [LabeledInterval(10 * MIN, 20 * MIN, False), LabeledInterval(20 * MIN, 30 * MIN, False)]
+    score = score_night([(5 * MIN, 12 * MIN)], labels)
+    assert score.phantom_episodes == 1
+    assert score.phantom_ms == 2 * MIN
+
+    # A span crossing into the next vacant label is one episode, counted in full
+    score = score_night([(15 * MIN, 25 * MIN)], labels)
+    assert score.phantom_episodes == 1
+    assert score.phantom_ms == 10 * MIN
+
+
+def test_missed_entry():
+    score = score_night([], NIGHT)
+    assert score.missed_entries == 1
+    assert score.detect_latencies_ms == []
+
+
+def test_summary_and_label_round_trip(tmp_path):
+    path = tmp_path / "labels.csv"
+    save_labels(str(path), NIGHT)
+    assert load_labels(str(path)) == NIGHT
+
+    predicted = [(30 * MIN + 3_000, 450 * MIN + 35_000)]
+    summary = summarize([score_night(predicted, NIGHT)] * 3)
+    assert summary["nights"] == 3
+    assert summary["entries"] == 3
+    assert summary["detect_median_s"] == 3.0
+    assert summary["phantom_fraction"] == 0.0
@@ -0,0 +1,52 @@
+"""
+Unit tests for the synthetic trace generator and trace file format
+(scripts/synth_trace.py, scripts/presence_trace.py).
+"""
+
+import math
+from itertools import islice
+
+from presence_trace import TraceFrame, iter_trace, load_trace, write_trace
+from synth_trace import SceneConfig, SyntheticTrace
+
+SHORT_NIGHT = SceneConfig(night_hours=2.0, pets=True, fan=True, drift=2.0)
+
+
+def test_generation_is_reproducible_and_lazy():
+    first = list(islice(SyntheticTrace(2, SHORT_NIGHT, seed=5), 500))
+    second = list(islice(SyntheticTrace(2, SHORT_NIGHT, seed=5), 500))
+    assert first == second
+    assert all(0 <= f.still_energy <= 100 and 0 <= f.moving_energy <= 100 for f in first)
+
+
+def test_labels_tile_the_trace():
+    trace = SyntheticTrace(2, SHORT_NIGHT, seed=3)
+    labels = trace.labels
+    assert labels[0].start_ms == 0
+    assert labels[-1].end_ms == trace.duration_ms
+    assert all(a.end_ms == b.start_ms for a, b in zip(labels, labels[1:]))
+    assert any(label.occupied for label in labels)
+
+
+def test_sleeper_is_above_empty_bed_baseline():
+    trace = SyntheticTrace(1, SceneConfig(night_hours=2.0), seed=11)
+    occupied = [label for label in trace.labels if label.occupied]
+    in_bed, empty = [], []
+    for frame in trace:
+        inside = any(label.start_ms + 60_000 <= frame.t_ms < label.end_ms - 60_000 for label in occupied)
+        (in_bed if inside else empty).append(frame.still_energy)
+    assert sum(empty) / len(empty) < 12
+    assert sum(in_bed) / len(in_bed) > 25
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / "trace.csv.gz")
+    frames = [TraceFrame(0, 7.0, 3.0, 120.0), TraceFrame(100, 6.5, math.nan, math.nan)]
+    assert write_trace(path, frames) == 2
+
+    read = list(iter_trace(path))
+    assert read[0] == frames[0]
+    assert read[1].still_energy == 6.5 and math.isnan(read[1].moving_energy)
+
+    columns = load_trace(path)
+    assert list(columns.t_ms) == [0, 100]